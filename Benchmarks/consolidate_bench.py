@@ -0,0 +1,52 @@
+# Copyright 2018 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# -----------------------------------------------------------------------------
+"""
+benchmark of consolidate_metrics, run with the python 2 of the code analysis
+
+    python2.7 consolidate_bench.py ROWS REPEAT
+
+prints the seconds of each run as json. the SourceMeter results are written
+again before each run, consolidate_metrics removes them.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+
+BENCHMARKS_DIR = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(os.path.dirname(BENCHMARKS_DIR), 'CodeAnalysis',
+                             'SourceMeter_Interface', 'src'))
+from sourceMeterWrapper import consolidate_metrics #pylint: disable=wrong-import-position,import-error
+from generators import write_sourcemeter_results #pylint: disable=wrong-import-position
+
+PROJECT = 'benchmark'
+
+def main(rows, repeat):
+    results_dir = tempfile.mkdtemp(prefix='consolidate-')
+    times = []
+    try:
+        for _ in range(repeat):
+            write_sourcemeter_results(results_dir, PROJECT, rows)
+            started = time.time()
+            consolidate_metrics(PROJECT, 'python', results_dir)
+            times.append(time.time() - started)
+    finally:
+        shutil.rmtree(results_dir, ignore_errors=True)
+    print(json.dumps(times))
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]), int(sys.argv[2]))
@@ -0,0 +1,432 @@
+# Copyright 2018 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# -----------------------------------------------------------------------------
+"""
+sawtooth rest api stand-in
+
+serves /transactions, /batches and /blocks with the paging of the sawtooth
+rest api (100 resources per page by default, 1000 at most, newest first),
+/state, /batch_statuses (with long polling) and /peers, and accepts POST
+/batches, so the clients can be measured without a validator network.
+
+without a validator the api serves a fixed list of transactions and has no
+state. with a LocalValidator (local_validator.py) the posted batches are
+applied by the transaction handlers of the families and committed in memory.
+"""
+import json
+import base64
+import bisect
+import threading
+from socketserver import ThreadingMixIn
+from http.server import HTTPServer
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+MAX_WAIT = 300
+
+#status, error code and title of the rest api errors
+NOT_FOUND = {
+    'blocks': (404, 70, 'Block Not Found'),
+    'batches': (404, 71, 'Batch Not Found'),
+    'transactions': (404, 72, 'Transaction Not Found'),
+    'state': (404, 75, 'State Not Found'),
+}
+VALIDATOR_NOT_READY = (503, 15, 'Validator Not Ready')
+QUEUE_FULL = (429, 31, 'Unable to Accept Batches')
+NO_BATCHES = (400, 34, 'No Batches Submitted')
+BAD_PROTOBUF = (400, 35, 'Protobuf Not Decodable')
+WRONG_CONTENT_TYPE = (400, 43, 'Wrong Content Type')
+BAD_STATUS_REQUEST = (400, 53, 'Bad Status Request')
+UNKNOWN_RESOURCE = (404, 404, 'Not Found')
+
+class QueueFull(Exception):
+    """
+    the validator does not accept more batches for now
+    """
+    pass
+
+def _limit(query):
+    try:
+        return max(1, min(MAX_LIMIT, int(query.get('limit', [DEFAULT_LIMIT])[0])))
+    except ValueError:
+        return DEFAULT_LIMIT
+
+def _b64(data):
+    return base64.b64encode(data).decode()
+
+def _error(error):
+    status, code, title = error
+    return status, {'error': {'code': code, 'title': title}}
+
+class Listing:
+    """
+    resources listed newest first, transactions, batches or blocks
+    """
+    def __init__(self, entries=None):
+        """
+        Constructor
+
+        Args:
+            entries (list): resources, newest first
+        """
+        self._lock = threading.Lock()
+        self._entries = []
+        self._index = {}
+        self.extend(reversed(list(entries or [])))
+
+    def __len__(self):
+        return len(self._entries)
+
+    def append(self, entry):
+        """
+        add a resource, it becomes the newest one
+
+        Args:
+            entry (dict): resource with its header_signature
+        """
+        self.extend([entry])
+
+    def extend(self, entries):
+        """
+        add resources
+
+        Args:
+            entries (list): resources, oldest first
+        """
+        with self._lock:
+            for entry in entries:
+                self._index[entry['header_signature']] = len(self._entries)
+                self._entries.append(entry)
+
+    def get(self, resource_id):
+        """
+        return a resource
+
+        Args:
+            resource_id (str): header signature
+
+        Returns:
+            dict: resource, None when unknown
+        """
+        with self._lock:
+            position = self._index.get(resource_id)
+            return None if position is None else self._entries[position]
+
+    def head(self):
+        """
+        return the id of the newest resource
+
+        Returns:
+            str: header signature, None when empty
+        """
+        with self._lock:
+            return self._entries[-1]['header_signature'] if self._entries else None
+
+    def page(self, query, url):
+        """
+        return a page of the listing
+
+        Args:
+            query (dict): parsed query string (start, limit)
+            url (str): url of the listing
+
+        Returns:
+            dict: response body
+        """
+        limit = _limit(query)
+        start = query.get('start', [None])[0]
+        with self._lock:
+            end = len(self._entries)
+            if start in self._index:
+                end = self._index[start] + 1
+            first = max(0, end - limit)
+            data = self._entries[first:end][::-1]
+            paging = {'limit': limit, 'start': data[0]['header_signature'] if data else None}
+            if first > 0:
+                next_start = self._entries[first - 1]['header_signature']
+                paging['next_position'] = next_start
+                paging['next'] = '{}?limit={}&start={}'.format(url, limit, next_start)
+        return {'data': data, 'paging': paging}
+
+class StateStore:
+    """
+    state addresses and their data, listed in address order
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = {}
+        self._addresses = []
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, address):
+        """
+        return the data at an address
+
+        Args:
+            address (str): state address
+
+        Returns:
+            bytes: data, None when the address is not set
+        """
+        with self._lock:
+            return self._data.get(address)
+
+    def update(self, changes):
+        """
+        apply state changes
+
+        Args:
+            changes (dict): address, data (None deletes the address)
+        """
+        with self._lock:
+            for address, data in changes.items():
+                if data is None:
+                    if self._data.pop(address, None) is not None:
+                        del self._addresses[bisect.bisect_left(self._addresses, address)]
+                    continue
+                if address not in self._data:
+                    bisect.insort(self._addresses, address)
+                self._data[address] = data
+
+    def page(self, query, url):
+        """
+        return a page of the addresses starting with a prefix
+
+        Args:
+            query (dict): parsed query string (address, start, limit)
+            url (str): url of the state
+
+        Returns:
+            dict: response body, data is base64 encoded by the api
+        """
+        limit = _limit(query)
+        prefix = query.get('address', [''])[0]
+        start = query.get('start', [None])[0] or prefix
+        with self._lock:
+            position = bisect.bisect_left(self._addresses, start)
+            addresses = []
+            for address in self._addresses[position:position + limit + 1]:
+                if not address.startswith(prefix):
+                    break
+                addresses.append(address)
+            data = [(address, self._data[address]) for address in addresses[:limit]]
+        paging = {'limit': limit, 'start': data[0][0] if data else None}
+        if len(addresses) > limit:
+            paging['next_position'] = addresses[limit]
+            paging['next'] = '{}?address={}&limit={}&start={}'.format(
+                url, prefix, limit, addresses[limit])
+        return {'data': data, 'paging': paging}
+
+class _Handler(BaseHTTPRequestHandler):
+    """
+    requests of the rest api
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self): #pylint: disable=invalid-name
+        parsed = urlparse(self.path)
+        self._send(*self.server.api.handle_get(self._parts(parsed), parse_qs(parsed.query)))
+
+    def do_POST(self): #pylint: disable=invalid-name
+        parsed = urlparse(self.path)
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self._send(*self.server.api.handle_post(
+            self._parts(parsed), parse_qs(parsed.query), body,
+            self.headers.get('Content-Type', '')))
+
+    @staticmethod
+    def _parts(parsed):
+        return [part for part in parsed.path.split('/') if part]
+
+    def _send(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        if status == QUEUE_FULL[0]:
+            self.send_header('Retry-After', '1')
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args): #pylint: disable=redefined-builtin
+        pass
+
+class _Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+class FakeRestApi:
+    """
+    rest api of a chain held in memory
+    """
+    def __init__(self, entries=None, port=0, validator=None, peers=None):
+        """
+        Constructor
+
+        Args:
+            entries (list): transactions, newest first, used without validator
+            port (int): port, 0 for any free port
+            validator (LocalValidator): validator applying the posted batches
+            peers (list): peer endpoints listed by /peers
+        """
+        self._validator = validator
+        if validator is None:
+            self._listings = {'transactions': Listing(entries), 'batches': Listing(),
+                              'blocks': Listing()}
+            self._state = StateStore()
+        else:
+            self._listings = {'transactions': validator.transactions,
+                              'batches': validator.batches, 'blocks': validator.blocks}
+            self._state = validator.state
+        self._peers = list(peers or [])
+        self._server = _Server(('127.0.0.1', port), _Handler)
+        self._server.api = self
+        self._thread = None
+
+    @property
+    def url(self):
+        """
+        return the url of the rest api
+
+        Returns:
+            str: http://127.0.0.1:port
+        """
+        return 'http://127.0.0.1:{}'.format(self._server.server_address[1])
+
+    def start(self):
+        """
+        serve requests in a thread
+
+        Returns:
+            str: url of the rest api
+        """
+        self._thread = threading.Thread(target=self._server.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self.url
+
+    def stop(self):
+        """
+        stop serving requests
+        """
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread = None
+        self._server.server_close()
+
+    def add(self, entry):
+        """
+        commit a transaction, it becomes the newest one
+
+        Args:
+            entry (dict): transaction
+        """
+        self._listings['transactions'].append(entry)
+
+    def handle_get(self, parts, query):
+        """
+        answer a GET request
+
+        Args:
+            parts (list): path of the resource
+            query (dict): parsed query string
+
+        Returns:
+            (int, dict): status, response body
+        """
+        link = '{}/{}'.format(self.url, '/'.join(parts))
+        if len(parts) == 1 and parts[0] in self._listings:
+            body = self._listings[parts[0]].page(query, link)
+            body.update({'head': self._head(), 'link': link})
+            return 200, body
+        if len(parts) == 2 and parts[0] in self._listings:
+            entry = self._listings[parts[0]].get(parts[1])
+            if entry is None:
+                return _error(NOT_FOUND[parts[0]])
+            return 200, {'data': entry, 'head': self._head(), 'link': link}
+        if parts == ['state']:
+            body = self._state.page(query, link)
+            body['data'] = [{'address': address, 'data': _b64(data)}
+                            for address, data in body['data']]
+            body.update({'head': self._head(), 'link': link})
+            return 200, body
+        if len(parts) == 2 and parts[0] == 'state':
+            data = self._state.get(parts[1])
+            if data is None:
+                return _error(NOT_FOUND['state'])
+            return 200, {'data': _b64(data), 'head': self._head(), 'link': link}
+        if parts == ['batch_statuses']:
+            ids = [batch_id for batch_id in query.get('id', [''])[0].split(',') if batch_id]
+            return self._batch_statuses(ids, query, link)
+        if parts == ['peers']:
+            return 200, {'data': self._peers, 'link': link}
+        return _error(UNKNOWN_RESOURCE)
+
+    def handle_post(self, parts, query, body, content_type):
+        """
+        answer a POST request
+
+        Args:
+            parts (list): path of the resource
+            query (dict): parsed query string
+            body (bytes): request body
+            content_type (str): content type of the body
+
+        Returns:
+            (int, dict): status, response body
+        """
+        if parts == ['batches']:
+            if content_type != 'application/octet-stream':
+                return _error(WRONG_CONTENT_TYPE)
+            if self._validator is None:
+                return _error(VALIDATOR_NOT_READY)
+            try:
+                ids = self._validator.submit(body)
+            except QueueFull:
+                return _error(QUEUE_FULL)
+            except ValueError as err:
+                return _error(NO_BATCHES if 'no batches' in str(err) else BAD_PROTOBUF)
+            return 202, {'link': '{}/batch_statuses?id={}'.format(self.url, ','.join(ids))}
+        if parts == ['batch_statuses']:
+            try:
+                ids = json.loads(body.decode())
+            except ValueError:
+                return _error(BAD_STATUS_REQUEST)
+            if not isinstance(ids, list):
+                return _error(BAD_STATUS_REQUEST)
+            return self._batch_statuses(ids, query, '{}/batch_statuses'.format(self.url))
+        return _error(UNKNOWN_RESOURCE)
+
+    def _batch_statuses(self, ids, query, link):
+        if not ids:
+            return _error(BAD_STATUS_REQUEST)
+        try:
+            wait = min(MAX_WAIT, int(query.get('wait', [0])[0] or 0))
+        except ValueError:
+            wait = 0
+        if self._validator is None:
+            data = [{'id': batch_id, 'status': 'UNKNOWN', 'invalid_transactions': []}
+                    for batch_id in ids]
+        else:
+            data = self._validator.statuses(ids, wait)
+        return 200, {'data': data, 'link': link}
+
+    def _head(self):
+        head = self._listings['blocks'].head()
+        if head is None:
+            head = self._listings['transactions'].head()
+        return head
@@ -0,0 +1,214 @@
+# Copyright 2018 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# -----------------------------------------------------------------------------
+"""
+synthetic inputs of the benchmarks
+
+metrics files of the code analyzer, SourceMeter results, .suse configurations
+and chains of transactions as the rest api returns them. the same seed gives
+the same data so runs can be compared. this module is also imported by the
+python 2 benchmark of the code analysis.
+"""
+import os
+import csv
+import json
+import base64
+import random
+import hashlib
+
+METRICS_HEADER = ['Type of Smell', 'Name', 'Lines of Code', 'Comment-to-Code Ratio',
+                  'Number of Directly-Used Elements', 'Number of Outgoing Invocations',
+                  'Name of Owner Class', 'Number of Parameters']
+CODE_SMELLS = {
+    'class': {'LargeClass': [500, 1], 'SmallClass': [5, 1], 'GodClass': [20, 1],
+              'InappropriateIntimacy': [10, 1]},
+    'method': {'LargeMethod': [60, 1], 'SmallMethod': [2, 1], 'LargeParameterList': [5, 1]},
+    'comments': {'CommentsToCodeRatioLower': [0.1, 1.0], 'CommentsToCodeRatioUpper': [0.6, 1.0]}
+}
+DATE = '2018-11-20-10-00-00'
+
+def _hex(rng, length):
+    return ''.join(rng.choice('0123456789abcdef') for _ in range(length))
+
+def metrics_rows(rows, seed=1):
+    """
+    return rows of a consolidated metrics file, one class for five methods
+
+    Args:
+        rows (int): number of classes and methods
+        seed (int): random seed
+
+    Returns:
+        list: rows, without header
+    """
+    rng = random.Random(seed)
+    result = []
+    owner = 'Class0'
+    for index in range(rows):
+        if index % 6 == 0:
+            owner = 'Class{}'.format(index)
+            result.append(['Class', owner, str(rng.randint(1, 900)),
+                           '{:.4f}'.format(rng.random()), str(rng.randint(0, 30)),
+                           str(rng.randint(0, 60)), '-', '-'])
+        else:
+            result.append(['Method', 'method{}'.format(index), str(rng.randint(1, 120)),
+                           '{:.4f}'.format(rng.random()), '-', '-', owner,
+                           str(rng.randint(0, 9))])
+    return result
+
+def write_metrics_csv(path, rows, seed=1):
+    """
+    write a consolidated metrics file of the code analyzer
+
+    Args:
+        path (str): csv file
+        rows (int): number of classes and methods
+        seed (int): random seed
+    """
+    with open(path, 'w') as metrics_file:
+        writer = csv.writer(metrics_file)
+        writer.writerow(METRICS_HEADER)
+        writer.writerows(metrics_rows(rows, seed))
+
+def write_sourcemeter_results(results_dir, project, rows, seed=1):
+    """
+    write the class and method files of a SourceMeter analysis of a python
+    project, as read by consolidate_metrics
+
+    Args:
+        results_dir (str): results directory of the analysis
+        project (str): project name
+        rows (int): number of classes and methods
+        seed (int): random seed
+    """
+    rng = random.Random(seed)
+    analysis_dir = os.path.join(results_dir, project, 'python', '2018-11-20-10-00-00')
+    if not os.path.isdir(analysis_dir):
+        os.makedirs(analysis_dir)
+    classes = rows // 6 + 1
+    with open(os.path.join(analysis_dir, project + '-Class.csv'), 'w') as class_file:
+        writer = csv.writer(class_file)
+        writer.writerow(['ID', 'Name', 'Path', 'LOC', 'CD', 'CBO', 'NOI', 'NOA'])
+        for index in range(classes):
+            writer.writerow(['L{}'.format(index), 'Class{}'.format(index),
+                             '/src/module{}.py'.format(index // 10), rng.randint(1, 900),
+                             round(rng.random(), 4), rng.randint(0, 30), rng.randint(0, 60),
+                             rng.randint(0, 5)])
+    with open(os.path.join(analysis_dir, project + '-Method.csv'), 'w') as method_file:
+        writer = csv.writer(method_file)
+        writer.writerow(['ID', 'Name', 'Path', 'LOC', 'NUMPAR', 'CD', 'McCC'])
+        for index in range(rows - classes):
+            writer.writerow(['M{}'.format(index), 'method{}'.format(index),
+                             '/src/module{}.py'.format(index // 50), rng.randint(1, 120),
+                             rng.randint(0, 9), round(rng.random(), 4), rng.randint(1, 20)])
+
+def suse_text(seed=1, url='https://github.com/obahy/Susereum'):
+    """
+    return a .suse configuration as written by the gui
+
+    Args:
+        seed (int): random seed, changes the code smell values
+        url (str): project url
+
+    Returns:
+        str: toml
+    """
+    rng = random.Random(seed)
+    lines = ['[about]', 'NewuserLink = "{}"'.format(url),
+             'Title = "Code Smell Family Configuration"', '',
+             '[vote_setting]', 'proposal_active_days = {}'.format(rng.randint(1, 10)),
+             'approval_treshold = {}'.format(rng.randint(1, 10)), '']
+    for code_type in ('class', 'comments', 'method'):
+        lines.append('[code_smells.{}]'.format(code_type))
+        for name, (value, weight) in sorted(CODE_SMELLS[code_type].items()):
+            if isinstance(value, float):
+                value = round(value * rng.uniform(0.5, 1.5), 2)
+            else:
+                value = max(1, int(value * rng.uniform(0.5, 1.5)))
+            lines.append('{} = [{},{},]'.format(name, value, weight))
+        lines.append('')
+    return '\n'.join(lines)
+
+def transaction_entry(family, payload, rng):
+    """
+    return a transaction as listed by the rest api
+
+    Args:
+        family (str): family name
+        payload (str): csv payload
+        rng (Random): random generator of the signatures
+
+    Returns:
+        dict: transaction
+    """
+    return {
+        'header_signature': _hex(rng, 128),
+        'header': {
+            'family_name': family,
+            'family_version': '0.1',
+            'signer_public_key': '02' + _hex(rng, 64),
+            'inputs': [], 'outputs': [], 'dependencies': [],
+            'nonce': '', 'payload_sha512': hashlib.sha512(payload.encode()).hexdigest(),
+            'batcher_public_key': ''},
+        'payload': base64.b64encode(payload.encode()).decode()
+    }
+
+def chain_transactions(count, seed=1, votes=50):
+    """
+    return the transactions of a project, newest first as the rest api lists
+    them: commits and their healths, suse rewards, configurations, and an
+    active proposal with its votes among the latest transactions
+
+    Args:
+        count (int): number of transactions
+        seed (int): random seed
+        votes (int): votes of the active proposal
+
+    Returns:
+        (list, str): transactions, transaction id of the active proposal
+    """
+    rng = random.Random(seed)
+    entries = []
+    config = json.dumps({'code_smells': CODE_SMELLS}).replace(',', ';')
+    for index in range(max(0, count - votes - 1)):
+        kind = index % 5
+        commit = 'https://github.com/obahy/Susereum/commit/' + _hex(rng, 40)
+        peer = 'tcp://10.0.0.{}:8800'.format(rng.randint(1, 8))
+        if kind in (0, 1):
+            payload = ','.join(['commit', 'user{}'.format(rng.randint(1, 20)), commit, 'new',
+                                'http://127.0.0.1:8008', peer, DATE])
+            entries.append(transaction_entry('health', payload, rng))
+        elif kind == 2:
+            payload = ','.join(['health', 'user{}'.format(rng.randint(1, 20)),
+                                str(rng.uniform(0, 100)), 'processed:' + _hex(rng, 32),
+                                commit, peer, DATE])
+            entries.append(transaction_entry('health', payload, rng))
+        elif kind == 3:
+            payload = ','.join(['suse', 'user{}'.format(rng.randint(1, 20)),
+                                str(rng.randint(1, 40)), 'new', DATE])
+            entries.append(transaction_entry('suse', payload, rng))
+        else:
+            payload = ','.join(['config', str(rng.randint(1, 99999)), config, 'update', DATE])
+            entries.append(transaction_entry('code-smell', payload, rng))
+
+    proposal_id = str(rng.randint(1, 99999))
+    proposal = transaction_entry('code-smell', ','.join(
+        ['proposal', proposal_id, "{'LargeClass': 400; 'SmallMethod': 3}", 'active', DATE]), rng)
+    latest = [proposal]
+    for _ in range(min(votes, count - 1)):
+        latest.append(transaction_entry('code-smell', ','.join(
+            ['vote', str(rng.randint(1, 99999)), proposal_id, str(rng.randint(0, 1)), DATE]), rng))
+    entries = entries + latest
+    entries.reverse()
+    return entries[:count], proposal['header_signature']
@@ -0,0 +1,250 @@
+# Copyright 2018 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# -----------------------------------------------------------------------------
+"""
+load test of the family clients
+
+starts the rest api stand-in with a LocalValidator on a synthetic chain and
+drives transactions through the real clients: health commits, suse rewards
+and votes on the active proposal. the clients of each family run in their own
+python process (the families all name their package client) with several
+threads, and sign with keys generated for the test in a temporary home.
+
+usage:
+    python3 load_test.py [--transactions 1000] [--threads 4] [--history 1000]
+                         [--families code-smell,health,suse] [--wait]
+                         [--block-interval 0] [--max-batches 100]
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+from generators import DATE
+from generators import chain_transactions
+from fake_rest_api import FakeRestApi
+
+BENCHMARKS_DIR = os.path.dirname(os.path.realpath(__file__))
+FAMILIES_DIR = os.path.join(os.path.dirname(BENCHMARKS_DIR), 'Sawtooth', 'families')
+
+FAMILIES = ('code-smell', 'health', 'suse')
+KEY_NAME = 'loader'
+WAIT = 30
+IDLE_TIMEOUT = 300
+
+def parse_args(args):
+    """
+    Parse Arguments.
+
+    Args:
+        args (*args): Program Arguments
+
+    Returns:
+        args: list of arguments
+    """
+    parser = argparse.ArgumentParser(description='Drive transactions through the clients')
+    parser.add_argument('--transactions', type=int, default=1000,
+                        help='transactions sent by the clients of each family')
+    parser.add_argument('--threads', type=int, default=4, help='client threads per family')
+    parser.add_argument('--history', type=int, default=1000,
+                        help='transactions of the chain before the test')
+    parser.add_argument('--families', type=str, default=','.join(FAMILIES),
+                        help='families to load, comma separated')
+    parser.add_argument('--wait', action='store_true',
+                        help='clients wait for the commit of each batch')
+    parser.add_argument('--block-interval', type=float, default=0,
+                        help='seconds between blocks')
+    parser.add_argument('--max-batches', type=int, default=100, help='batches per block')
+    parser.add_argument('--worker', type=str, choices=FAMILIES, help=argparse.SUPPRESS)
+    parser.add_argument('--url', type=str, help=argparse.SUPPRESS)
+    parser.add_argument('--proposal', type=str, help=argparse.SUPPRESS)
+    return parser.parse_args(args)
+
+def make_keys(home):
+    """
+    write the validator key and the key of the clients in a sawtooth home
+
+    Args:
+        home (str): home directory of the clients
+
+    Returns:
+        str: private key file of the clients
+    """
+    from sawtooth_signing import create_context #pylint: disable=import-error
+    context = create_context('secp256k1')
+    key_dir = os.path.join(home, '.sawtooth', 'keys')
+    os.makedirs(key_dir)
+    for name in ('root', KEY_NAME):
+        private_key = context.new_random_private_key()
+        with open(os.path.join(key_dir, name + '.priv'), 'w') as key_file:
+            key_file.write(private_key.as_hex())
+        with open(os.path.join(key_dir, name + '.pub'), 'w') as key_file:
+            key_file.write(context.get_public_key(private_key).as_hex())
+    return os.path.join(key_dir, KEY_NAME + '.priv')
+
+def _sender(family, opts, keyfile, work_path):
+    """
+    return a function sending the transaction number index with the client of
+    a family
+    """
+    wait = WAIT if opts.wait else None
+    if family == 'health':
+        from client.health_client import HealthClient #pylint: disable=import-error
+        client = HealthClient(base_url=opts.url, keyfile=keyfile, work_path=work_path, wait=wait)
+        return lambda index: client.commit(
+            'https://github.com/obahy/Susereum/commit/{:040x}'.format(index),
+            'user{}'.format(index % 20), DATE, 'tcp://127.0.0.1:8800')
+    if family == 'suse':
+        from client.suse_client import SuseClient #pylint: disable=import-error
+        client = SuseClient(base_url=opts.url, keyfile=keyfile, work_path=work_path, wait=wait)
+        return lambda index: client.suse(str(random.uniform(0, 100)), 'user{}'.format(index % 20))
+    from client.code_smell_client import CodeSmellClient #pylint: disable=import-error
+    client = CodeSmellClient(base_url=opts.url, keyfile=keyfile, work_path=work_path, wait=wait)
+    return lambda index: client.vote(opts.proposal, index % 2)
+
+def run_worker(opts):
+    """
+    worker, send transactions with the client of a family and print the
+    result as json
+    """
+    sys.path.insert(0, FAMILIES_DIR)
+    sys.path.insert(0, os.path.join(FAMILIES_DIR, opts.worker))
+    #the suse client imports its sibling modules without the client package
+    sys.path.append(os.path.join(FAMILIES_DIR, 'suse', 'client'))
+    home = os.path.expanduser('~')
+    send = _sender(opts.worker, opts, os.path.join(home, '.sawtooth', 'keys', KEY_NAME + '.priv'),
+                   home)
+
+    def timed(index):
+        started = time.perf_counter()
+        try:
+            response = send(index)
+        except Exception as err: #pylint: disable=broad-except
+            return time.perf_counter() - started, str(err)
+        if isinstance(response, dict) and 'INVALID' in response.values():
+            return time.perf_counter() - started, 'INVALID'
+        if not isinstance(response, dict):
+            return time.perf_counter() - started, str(response)
+        return time.perf_counter() - started, None
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=opts.threads) as pool:
+        results = list(pool.map(timed, range(opts.transactions)))
+    seconds = time.perf_counter() - started
+
+    latencies = sorted(latency for latency, _ in results)
+    errors = [error for _, error in results if error is not None]
+    print(json.dumps({
+        'sent': len(results),
+        'errors': len(errors),
+        'first_error': errors[0] if errors else None,
+        'seconds': seconds,
+        'per_second': len(results) / seconds if seconds else 0,
+        'latency': {'median': latencies[len(latencies) // 2],
+                    'p95': latencies[int(len(latencies) * 0.95)],
+                    'max': latencies[-1]} if latencies else {}
+    }))
+
+def run_load(families=FAMILIES,
+             transactions=1000,
+             threads=4,
+             history=1000,
+             wait=False,
+             block_interval=0,
+             max_batches=100):
+    """
+    run a load test
+
+    Args:
+        families (list): families to load
+        transactions (int): transactions sent by each family
+        threads (int): client threads per family
+        history (int): transactions of the chain before the test
+        wait (bool): clients wait for the commit of each batch
+        block_interval (float): seconds between blocks
+        max_batches (int): batches per block
+
+    Returns:
+        dict: results of the clients of each family and of the validator
+    """
+    from local_validator import LocalValidator, load_handlers
+
+    home = tempfile.mkdtemp(prefix='susereum-load-')
+    entries, proposal = chain_transactions(history)
+    validator = LocalValidator(load_handlers(), transactions=entries,
+                               block_interval=block_interval, max_batches=max_batches)
+    api = FakeRestApi(validator=validator)
+    try:
+        make_keys(home)
+        validator.start()
+        url = api.start()
+
+        started = time.perf_counter()
+        processes = {}
+        for family in families:
+            command = [sys.executable, os.path.realpath(__file__), '--worker', family,
+                       '--url', url, '--proposal', proposal,
+                       '--transactions', str(transactions), '--threads', str(threads)]
+            if wait:
+                command.append('--wait')
+            processes[family] = subprocess.Popen(
+                command, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                cwd=BENCHMARKS_DIR, env=dict(os.environ, HOME=home))
+
+        clients = {}
+        for family, process in processes.items():
+            output, error = process.communicate()
+            try:
+                clients[family] = json.loads(output.decode().strip().split('\n')[-1])
+            except ValueError:
+                clients[family] = {'failed': error.decode().strip().split('\n')[-1]}
+        sent = time.perf_counter()
+        idle = validator.wait_idle(IDLE_TIMEOUT)
+        committed = time.perf_counter()
+
+        stats = validator.stats()
+        stats['idle'] = idle
+        stats['send_seconds'] = sent - started
+        stats['commit_seconds'] = committed - started
+        stats['committed_per_second'] = \
+            stats.get('transactions_committed', 0) / (committed - started)
+        return {'clients': clients, 'validator': stats}
+    finally:
+        api.stop()
+        validator.stop()
+        shutil.rmtree(home, ignore_errors=True)
+
+def main(args=None):
+    if args is None:
+        args = sys.argv[1:]
+    opts = parse_args(args)
+    if opts.worker is not None:
+        run_worker(opts)
+        return 0
+
+    families = [family for family in opts.families.split(',') if family]
+    result = run_load(families, opts.transactions, opts.threads, opts.history,
+                      opts.wait, opts.block_interval, opts.max_batches)
+    print(json.dumps(result, indent=2, sort_keys=True))
+    failed = [family for family, client in result['clients'].items() if 'failed' in client]
+    return 1 if failed or not result['validator']['idle'] else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,582 @@
+# Copyright 2018 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# -----------------------------------------------------------------------------
+"""
+validator held in memory
+
+applies the batches posted to the rest api stand-in with the transaction
+handlers of the families, without validator, consensus or transaction
+processor. posted batches are PENDING until a publisher thread takes them in a
+block: each transaction is applied by the handler of its family through a
+context reading and writing the in-memory state, a batch is committed when all
+its transactions are valid and INVALID otherwise, its state changes are then
+discarded. signatures are not verified and the chain has no forks.
+"""
+import os
+import sys
+import json
+import time
+import base64
+import hashlib
+import logging
+import importlib
+import threading
+import collections
+
+from google.protobuf.message import DecodeError #pylint: disable=import-error
+from sawtooth_sdk.processor.exceptions import InvalidTransaction #pylint: disable=import-error
+from sawtooth_sdk.processor.exceptions import AuthorizationException #pylint: disable=import-error
+from sawtooth_sdk.protobuf.batch_pb2 import BatchList #pylint: disable=import-error
+from sawtooth_sdk.protobuf.batch_pb2 import BatchHeader #pylint: disable=import-error
+from sawtooth_sdk.protobuf.transaction_pb2 import TransactionHeader #pylint: disable=import-error
+
+from fake_rest_api import Listing
+from fake_rest_api import StateStore
+from fake_rest_api import QueueFull
+
+BENCHMARKS_DIR = os.path.dirname(os.path.realpath(__file__))
+FAMILIES_DIR = os.path.join(os.path.dirname(BENCHMARKS_DIR), 'Sawtooth', 'families')
+sys.path.append(FAMILIES_DIR)
+from common.batches import COMMITTED, INVALID, PENDING, UNKNOWN #pylint: disable=wrong-import-position
+
+LOGGER = logging.getLogger(__name__)
+
+FAMILIES = ('code-smell', 'health', 'suse')
+HANDLER_CLASSES = {
+    'code-smell': 'CodeSmellTransactionHandler',
+    'health': 'HealthTransactionHandler',
+    'suse': 'SuseTransactionHandler',
+}
+MAX_BATCHES_PER_BLOCK = 100
+MAX_PENDING = 10000
+GENESIS_BLOCK_ID = '0' * 128
+
+#state entry returned by get_state, as TpStateEntry of the sdk
+StateEntry = collections.namedtuple('StateEntry', ['address', 'data'])
+#transaction given to the handlers, as TpProcessRequest of the sdk
+ProcessRequest = collections.namedtuple(
+    'ProcessRequest', ['header', 'payload', 'signature', 'context_id'])
+
+def _forget(package):
+    for name in list(sys.modules):
+        if name == package or name.startswith(package + '.'):
+            del sys.modules[name]
+
+def load_handlers(families=FAMILIES):
+    """
+    return the transaction handler of each family. the families all name
+    their package processor, each one is imported in turn and removed from
+    sys.modules once its handler is loaded.
+
+    Args:
+        families (list): family names (code-smell, health, suse)
+
+    Returns:
+        list: TransactionHandler
+    """
+    handlers = []
+    for family in families:
+        _forget('processor')
+        sys.path.insert(0, os.path.join(FAMILIES_DIR, family))
+        try:
+            module = importlib.import_module('processor.handler')
+        finally:
+            sys.path.remove(os.path.join(FAMILIES_DIR, family))
+            _forget('processor')
+        handlers.append(getattr(module, HANDLER_CLASSES[family])())
+    return handlers
+
+def transaction_entry(header, transaction):
+    """
+    return a transaction as listed by the rest api
+
+    Args:
+        header (TransactionHeader): parsed header
+        transaction (Transaction): transaction
+
+    Returns:
+        dict: transaction
+    """
+    return {
+        'header': {
+            'batcher_public_key': header.batcher_public_key,
+            'dependencies': list(header.dependencies),
+            'family_name': header.family_name,
+            'family_version': header.family_version,
+            'inputs': list(header.inputs),
+            'nonce': header.nonce,
+            'outputs': list(header.outputs),
+            'payload_sha512': header.payload_sha512,
+            'signer_public_key': header.signer_public_key},
+        'header_signature': transaction.header_signature,
+        'payload': base64.b64encode(transaction.payload).decode()
+    }
+
+class MockContext:
+    """
+    context of a transaction, reads see the state of the block being built and
+    writes are kept in the changes of the batch. addresses outside the inputs
+    and outputs of the transaction are refused as by the validator.
+    """
+    def __init__(self, read, header, changes, events):
+        """
+        Constructor
+
+        Args:
+            read (function): returns the data of an address before the batch
+            header (TransactionHeader): header of the transaction
+            changes (dict): state changes of the batch, updated
+            events (list): events of the batch, updated
+        """
+        self._read = read
+        self._header = header
+        self._changes = changes
+        self._events = events
+        self.receipts = []
+
+    def get_state(self, addresses, timeout=None): #pylint: disable=unused-argument
+        """
+        return the entries set at addresses
+
+        Args:
+            addresses (list): state addresses
+            timeout (int): unused
+
+        Returns:
+            list: StateEntry of the addresses that are set
+        """
+        self._authorize(addresses, self._header.inputs)
+        result = []
+        for address in addresses:
+            data = self._changes[address] if address in self._changes else self._read(address)
+            if data is not None:
+                result.append(StateEntry(address, data))
+        return result
+
+    def set_state(self, entries, timeout=None): #pylint: disable=unused-argument
+        """
+        set state entries
+
+        Args:
+            entries (dict): address, data
+            timeout (int): unused
+
+        Returns:
+            list: addresses set
+        """
+        self._authorize(entries, self._header.outputs)
+        self._changes.update(entries)
+        return list(entries)
+
+    def delete_state(self, addresses, timeout=None): #pylint: disable=unused-argument
+        """
+        delete state entries
+
+        Args:
+            addresses (list): state addresses
+            timeout (int): unused
+
+        Returns:
+            list: addresses deleted
+        """
+        self._authorize(addresses, self._header.outputs)
+        deleted = [entry.address for entry in self.get_state(addresses)]
+        for address in deleted:
+            self._changes[address] = None
+        return deleted
+
+    def add_event(self, event_type, attributes=None, data=None, timeout=None): #pylint: disable=unused-argument
+        """
+        emit an event, delivered when the block is committed
+
+        Args:
+            event_type (str): event type
+            attributes (list): (key, value) pairs
+            data (bytes): event data
+            timeout (int): unused
+        """
+        self._events.append({'event_type': event_type,
+                             'attributes': list(attributes or []),
+                             'data': data or b''})
+
+    def add_receipt_data(self, data, timeout=None): #pylint: disable=unused-argument
+        """
+        add data to the receipt of the transaction
+
+        Args:
+            data (bytes): receipt data
+            timeout (int): unused
+        """
+        self.receipts.append(data)
+
+    @staticmethod
+    def _authorize(addresses, allowed):
+        for address in addresses:
+            if not any(address.startswith(prefix) for prefix in allowed):
+                raise AuthorizationException(
+                    'Tried to access unauthorized address {}'.format(address))
+
+class LocalValidator:
+    """
+    apply batches with the handlers of the families and commit them in memory
+    """
+    def __init__(self,
+                 handlers=None,
+                 transactions=None,
+                 block_interval=0,
+                 max_batches=MAX_BATCHES_PER_BLOCK,
+                 max_pending=MAX_PENDING):
+        """
+        Constructor
+
+        Args:
+            handlers (list): TransactionHandler, the handlers of all the
+                             families by default
+            transactions (list): transactions committed before the first
+                                 block, newest first as the rest api lists them
+            block_interval (float): seconds between blocks
+            max_batches (int): batches per block
+            max_pending (int): pending batches, more are refused with a 429
+        """
+        self._handlers = {}
+        for handler in load_handlers() if handlers is None else handlers:
+            for version in handler.family_versions:
+                self._handlers[(handler.family_name, version)] = handler
+        self.transactions = Listing(transactions)
+        self.batches = Listing()
+        self.blocks = Listing()
+        self.state = StateStore()
+        self._block_interval = block_interval
+        self._max_batches = max_batches
+        self._max_pending = max_pending
+        self._queue = collections.deque()
+        self._statuses = {}
+        self._publishing = False
+        self._condition = threading.Condition()
+        self._listeners = []
+        self._counts = collections.Counter()
+        self._errors = collections.Counter()
+        self._state_root = hashlib.sha256(b'').hexdigest()
+        self._running = False
+        self._thread = None
+        self.blocks.append(_block_entry(0, GENESIS_BLOCK_ID, '', []))
+
+    @property
+    def head(self):
+        """
+        return the id of the last block
+
+        Returns:
+            str: block id
+        """
+        return self.blocks.head()
+
+    def start(self):
+        """
+        publish blocks in a thread
+        """
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """
+        stop publishing, pending batches stay pending
+        """
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+
+    def subscribe(self, callback):
+        """
+        call a function after each block is committed
+
+        Args:
+            callback (function): called with the block and the events of its
+                                 transactions
+        """
+        self._listeners.append(callback)
+
+    def submit(self, data):
+        """
+        queue the batches of a serialized batch list
+
+        Args:
+            data (bytes): BatchList
+
+        Returns:
+            list: batch ids
+
+        Raises:
+            ValueError: batch list not decodable or empty
+            QueueFull: too many batches pending
+        """
+        batch_list = BatchList()
+        try:
+            batch_list.ParseFromString(data)
+        except DecodeError as err:
+            raise ValueError('protobuf not decodable: {}'.format(err))
+        if not batch_list.batches:
+            raise ValueError('no batches submitted')
+
+        ids = [batch.header_signature for batch in batch_list.batches]
+        with self._condition:
+            if self._max_pending and len(self._queue) + len(ids) > self._max_pending:
+                raise QueueFull()
+            for batch in batch_list.batches:
+                if batch.header_signature in self._statuses:
+                    continue
+                self._statuses[batch.header_signature] = (PENDING, [])
+                self._queue.append(batch)
+            self._condition.notify_all()
+        return ids
+
+    def statuses(self, ids, wait=None):
+        """
+        return the status of batches, with wait the answer is held until no
+        batch is pending
+
+        Args:
+            ids (list): batch ids
+            wait (int): seconds to hold the answer
+
+        Returns:
+            list: id, status and invalid transactions of each batch
+        """
+        deadline = time.time() + (wait or 0)
+        with self._condition:
+            while any(self._statuses.get(batch_id, (UNKNOWN,))[0] == PENDING
+                      for batch_id in ids):
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            result = []
+            for batch_id in ids:
+                status, invalid = self._statuses.get(batch_id, (UNKNOWN, []))
+                result.append({'id': batch_id, 'status': status,
+                               'invalid_transactions': invalid})
+            return result
+
+    def wait_idle(self, timeout=None):
+        """
+        wait until the pending batches are committed or invalid
+
+        Args:
+            timeout (float): seconds to wait, None waits without limit
+
+        Returns:
+            bool: False when batches are still pending after timeout
+        """
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: not self._queue and not self._publishing, timeout)
+
+    def stats(self):
+        """
+        return the counters of the validator
+
+        Returns:
+            dict: blocks, committed and invalid batches and transactions,
+                  pending batches, state entries and the most common errors
+        """
+        with self._condition:
+            result = dict(self._counts)
+            result['blocks'] = len(self.blocks) - 1
+            result['pending'] = len(self._queue)
+            result['state_entries'] = len(self.state)
+            result['errors'] = dict(self._errors.most_common(5))
+            return result
+
+    def _run(self):
+        """
+        publish a block of the pending batches, every block_interval
+        """
+        while True:
+            with self._condition:
+                while self._running and not self._queue:
+                    self._condition.wait()
+                if not self._running:
+                    return
+                batches = [self._queue.popleft()
+                           for _ in range(min(len(self._queue), self._max_batches))]
+                self._publishing = True
+            try:
+                self._publish(batches)
+            except Exception as err: #pylint: disable=broad-except
+                LOGGER.exception("Unable to publish block: %s", err)
+                self._finish(batches, {}, [], {}, None)
+            if self._block_interval:
+                time.sleep(self._block_interval)
+
+    def _publish(self, batches):
+        """
+        apply batches and commit the valid ones in a new block
+        """
+        block_changes = {}
+        committed = []
+        events = []
+        invalid = {}
+        seen = set()
+        for batch in batches:
+            result = self._apply_batch(batch, block_changes, seen)
+            if isinstance(result, list):
+                invalid[batch.header_signature] = result
+                continue
+            changes, batch_events, entries = result
+            block_changes.update(changes)
+            events.extend(batch_events)
+            committed.append((batch, entries))
+        self._finish(batches, block_changes, committed, invalid, events)
+
+    def _finish(self, batches, changes, committed, invalid, events):
+        """
+        commit a block, update the statuses and notify the listeners
+        """
+        block = None
+        with self._condition:
+            if committed:
+                self.state.update(changes)
+                root = hashlib.sha256(self._state_root.encode())
+                root.update(json.dumps(sorted((address, None if data is None else _digest(data))
+                                              for address, data in changes.items())).encode())
+                self._state_root = root.hexdigest()
+                batch_entries = []
+                for batch, entries in committed:
+                    self.transactions.extend(entries)
+                    batch_entries.append(_batch_entry(batch, entries))
+                    self._statuses[batch.header_signature] = (COMMITTED, [])
+                    self._counts['batches_committed'] += 1
+                    self._counts['transactions_committed'] += len(entries)
+                self.batches.extend(batch_entries)
+                block = _block_entry(len(self.blocks), self.head, self._state_root, batch_entries)
+                self.blocks.append(block)
+            for batch in batches:
+                if self._statuses[batch.header_signature][0] != PENDING:
+                    continue
+                problems = invalid.get(batch.header_signature)
+                if problems is None:
+                    problems = [{'id': '', 'message': 'Internal error', 'extended_data': ''}]
+                self._statuses[batch.header_signature] = (INVALID, problems)
+                self._counts['batches_invalid'] += 1
+                for problem in problems:
+                    self._errors[problem['message']] += 1
+            self._publishing = False
+            self._condition.notify_all()
+        if block is not None:
+            for listener in self._listeners:
+                try:
+                    listener(block, events)
+                except Exception as err: #pylint: disable=broad-except
+                    LOGGER.exception("Block listener failed: %s", err)
+
+    def _apply_batch(self, batch, block_changes, seen):
+        """
+        apply the transactions of a batch
+
+        Returns:
+            tuple: state changes, events and transaction entries of a valid
+                   batch, list of invalid transactions otherwise
+        """
+        changes = {}
+        events = []
+        entries = []
+
+        def read(address):
+            if address in block_changes:
+                return block_changes[address]
+            return self.state.get(address)
+
+        header = BatchHeader()
+        header.ParseFromString(batch.header)
+        if list(header.transaction_ids) != [txn.header_signature for txn in batch.transactions]:
+            return [_invalid('', 'Batch transaction ids do not match its transactions')]
+
+        for transaction in batch.transactions:
+            txn_header = TransactionHeader()
+            try:
+                txn_header.ParseFromString(transaction.header)
+            except DecodeError:
+                return [_invalid(transaction.header_signature, 'Transaction header not decodable')]
+            if transaction.header_signature in seen or \
+                    self.transactions.get(transaction.header_signature) is not None:
+                return [_invalid(transaction.header_signature, 'Duplicate transaction')]
+            if hashlib.sha512(transaction.payload).hexdigest() != txn_header.payload_sha512:
+                return [_invalid(transaction.header_signature,
+                                 'Payload does not match payload_sha512')]
+            handler = self._handlers.get((txn_header.family_name, txn_header.family_version))
+            if handler is None:
+                return [_invalid(transaction.header_signature,
+                                 'No transaction processor for {} {}'.format(
+                                     txn_header.family_name, txn_header.family_version))]
+
+            context = MockContext(read, txn_header, changes, events)
+            request = ProcessRequest(txn_header, transaction.payload,
+                                     transaction.header_signature, batch.header_signature)
+            try:
+                handler.apply(request, context)
+            except (InvalidTransaction, AuthorizationException) as err:
+                return [_invalid(transaction.header_signature, str(err))]
+            except Exception as err: #pylint: disable=broad-except
+                #the validator retries a processor failing this way forever
+                LOGGER.exception("Handler %s failed: %s", txn_header.family_name, err)
+                return [_invalid(transaction.header_signature,
+                                 'Internal error: {}: {}'.format(type(err).__name__, err))]
+            entries.append(transaction_entry(txn_header, transaction))
+
+        seen.update(entry['header_signature'] for entry in entries)
+        return changes, events, entries
+
+def _block_entry(block_num, previous_block_id, state_root_hash, batch_entries):
+    """
+    return a block as listed by the rest api
+    """
+    batch_ids = [entry['header_signature'] for entry in batch_entries]
+    block_id = hashlib.sha512(
+        (previous_block_id + ''.join(batch_ids)).encode()).hexdigest()
+    return {
+        'header': {
+            'batch_ids': batch_ids,
+            'block_num': str(block_num),
+            'consensus': '',
+            'previous_block_id': previous_block_id,
+            'signer_public_key': '',
+            'state_root_hash': state_root_hash},
+        'header_signature': block_id,
+        'batches': batch_entries
+    }
+
+def _digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+def _invalid(transaction_id, message):
+    return {'id': transaction_id, 'message': message, 'extended_data': ''}
+
+def _batch_entry(batch, entries):
+    header = BatchHeader()
+    header.ParseFromString(batch.header)
+    return {
+        'header': {
+            'signer_public_key': header.signer_public_key,
+            'transaction_ids': list(header.transaction_ids)},
+        'header_signature': batch.header_signature,
+        'trace': batch.trace,
+        'transactions': entries
+    }
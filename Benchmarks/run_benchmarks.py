@@ -0,0 +1,393 @@
+# Copyright 2018 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# -----------------------------------------------------------------------------
+"""
+Susereum benchmarks
+
+Times the hot paths of the families on synthetic data: the health of a
+metrics file, the consolidation of SourceMeter results, the client reads of
+the transaction list against a fake rest api, the encoding and decoding of
+payloads, and a load test of the clients against the validator stand-in. Each
+run is appended to a json history and compared with the last run of the same
+size, benchmarks slower than the threshold are reported as regressions.
+
+The families all name their packages client and processor, the benchmarks of
+each family run in their own python process. A benchmark whose dependencies
+are not installed is reported as skipped.
+
+usage:
+    python3 run_benchmarks.py [--rows 5000] [--transactions 2000] [--repeat 5]
+                              [--only NAME] [--history FILE] [--threshold 0.2]
+                              [--fail-on-regression]
+"""
+import os
+import sys
+import json
+import time
+import base64
+import shutil
+import socket
+import argparse
+import datetime
+import tempfile
+import subprocess
+
+from generators import write_metrics_csv
+from generators import chain_transactions
+from generators import suse_text
+from fake_rest_api import FakeRestApi
+
+BENCHMARKS_DIR = os.path.dirname(os.path.realpath(__file__))
+ROOT_DIR = os.path.dirname(BENCHMARKS_DIR)
+FAMILIES_DIR = os.path.join(ROOT_DIR, 'Sawtooth', 'families')
+HISTORY_PATH = os.path.join(BENCHMARKS_DIR, 'history.json')
+PYTHON2 = os.environ.get('PYTHON2', 'python2.7')
+
+GROUPS = ('health', 'code-smell', 'suse', 'common', 'code-analysis', 'load')
+DEFAULT_THRESHOLD = 0.2
+
+def parse_args(args):
+    """
+    Parse Arguments.
+
+    Args:
+        args (*args): Program Arguments
+
+    Returns:
+        args: list of arguments
+    """
+    parser = argparse.ArgumentParser(description='Time the Susereum hot paths')
+    parser.add_argument('--rows', type=int, default=5000,
+                        help='classes and methods of the metrics files')
+    parser.add_argument('--transactions', type=int, default=2000,
+                        help='transactions of the fake chain')
+    parser.add_argument('--repeat', type=int, default=5, help='runs of each benchmark')
+    parser.add_argument('--only', type=str, help='run the benchmarks starting with NAME')
+    parser.add_argument('--history', type=str, default=HISTORY_PATH, help='json history')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='slowdown reported as a regression (0.2 = 20%%)')
+    parser.add_argument('--fail-on-regression', action='store_true',
+                        help='exit with status 1 on a regression')
+    parser.add_argument('--group', type=str, choices=GROUPS, help=argparse.SUPPRESS)
+    return parser.parse_args(args)
+
+def measure(function, repeat):
+    """
+    return the timing of a function, after a first call that is not counted
+
+    Args:
+        function (function): code to time
+        repeat (int): number of timed calls
+
+    Returns:
+        dict: seconds (median, min, max) and number of calls
+    """
+    function()
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - started)
+    return summarize(times)
+
+def summarize(times):
+    """
+    return the median, min and max of timings
+    """
+    ordered = sorted(times)
+    return {'median': ordered[len(ordered) // 2], 'min': ordered[0], 'max': ordered[-1],
+            'repeat': len(ordered)}
+
+class Runner:
+    """
+    run the benchmarks of a group, a benchmark is skipped when its setup
+    fails on a missing dependency
+    """
+    def __init__(self, opts, work_dir):
+        self.opts = opts
+        self.work_dir = work_dir
+        self.results = {}
+
+    def run(self, name, setup):
+        """
+        time a benchmark
+
+        Args:
+            name (str): benchmark name
+            setup (function): returns the function to time
+        """
+        if self.opts.only and not name.startswith(self.opts.only):
+            return
+        try:
+            function = setup()
+        except ImportError as err:
+            self.results[name] = {'skipped': str(err)}
+            return
+        self.results[name] = measure(function, self.opts.repeat)
+
+def _family_path(family):
+    sys.path.insert(0, FAMILIES_DIR)
+    sys.path.insert(0, os.path.join(FAMILIES_DIR, family))
+
+def _fake_chain(opts):
+    entries, proposal = chain_transactions(opts.transactions)
+    api = FakeRestApi(entries)
+    api.start()
+    return entries, proposal, api
+
+def _payloads(entries, family):
+    return [base64.b64decode(entry['payload']) for entry in entries
+            if entry['header']['family_name'] == family]
+
+def bench_health(runner):
+    _family_path('health')
+    entries, _, api = _fake_chain(runner.opts)
+
+    def calculate():
+        import toml #pylint: disable=import-error
+        from client.health_process import calculate_health
+        csv_path = os.path.join(runner.work_dir, 'metrics.csv')
+        write_metrics_csv(csv_path, runner.opts.rows)
+        suse_config = toml.loads(suse_text())['code_smells']
+        return lambda: calculate_health(suse_config, csv_path)
+    runner.run('calculate_health', calculate)
+
+    def listing():
+        from client.health_client import HealthClient
+        client = HealthClient(base_url=api.url, work_path=runner.work_dir)
+        return lambda: client.list(txn_type='health')
+    runner.run('health_client_list', listing)
+
+    def decode():
+        from processor.health_payload import HealthPayload
+        payloads = _payloads(entries, 'health')
+        return lambda: [HealthPayload.from_bytes(payload) for payload in payloads]
+    runner.run('health_payload_decode', decode)
+    api.stop()
+
+def bench_code_smell(runner):
+    _family_path('code-smell')
+    entries, proposal, api = _fake_chain(runner.opts)
+
+    def votes():
+        from client.code_smell_client import CodeSmellClient
+        client = CodeSmellClient(base_url=api.url, work_path=runner.work_dir)
+        return lambda: client.check_votes(proposal)
+    runner.run('code_smell_check_votes', votes)
+
+    def listing():
+        from client.code_smell_client import CodeSmellClient
+        client = CodeSmellClient(base_url=api.url, work_path=runner.work_dir)
+        return lambda: client.list(txn_type='vote')
+    runner.run('code_smell_client_list', listing)
+
+    def decode():
+        from processor.code_smell_payload import CodeSmellPayload
+        payloads = _payloads(entries, 'code-smell')
+        return lambda: [CodeSmellPayload.from_bytes(payload) for payload in payloads]
+    runner.run('code_smell_payload_decode', decode)
+    api.stop()
+
+def bench_suse(runner):
+    _family_path('suse')
+    entries, _ = chain_transactions(runner.opts.transactions)
+
+    def decode():
+        from processor.suse_payload import SusePayload
+        payloads = _payloads(entries, 'suse')
+        return lambda: [SusePayload.from_bytes(payload) for payload in payloads]
+    runner.run('suse_payload_decode', decode)
+
+def bench_common(runner):
+    sys.path.insert(0, FAMILIES_DIR)
+    entries, _, api = _fake_chain(runner.opts)
+
+    def encode():
+        fields = [base64.b64decode(entry['payload']).decode().split(',') for entry in entries]
+        return lambda: [base64.b64encode(','.join(field).encode()) for field in fields]
+    runner.run('payload_encode', encode)
+
+    def parse():
+        from common.chain_client import parse_transaction
+        return lambda: [parse_transaction(entry) for entry in entries]
+    runner.run('chain_parse_transactions', parse)
+
+    def chain():
+        from common.chain_client import ChainClient
+        return lambda: ChainClient(api.url).healths()
+    runner.run('chain_client_healths', chain)
+
+    def config():
+        from common.suse_config import load_suse_config
+        suse_path = os.path.join(runner.work_dir, '.suse')
+        with open(suse_path, 'w') as suse_file:
+            suse_file.write(suse_text())
+        #older than the settle time of the cache
+        os.utime(suse_path, (time.time() - 60, time.time() - 60))
+        return lambda: load_suse_config(suse_path).code_smells
+    runner.run('suse_config_load', config)
+    api.stop()
+
+def bench_code_analysis(runner):
+    name = 'consolidate_metrics'
+    if runner.opts.only and not name.startswith(runner.opts.only):
+        return
+    try:
+        output = subprocess.check_output(
+            [PYTHON2, os.path.join(BENCHMARKS_DIR, 'consolidate_bench.py'),
+             str(runner.opts.rows), str(runner.opts.repeat)],
+            stderr=subprocess.STDOUT, cwd=BENCHMARKS_DIR)
+    except (OSError, subprocess.CalledProcessError) as err:
+        output = getattr(err, 'output', None) or str(err).encode()
+        runner.results[name] = {'skipped': output.decode().strip().split('\n')[-1]}
+        return
+    runner.results[name] = summarize(json.loads(output.decode().strip().split('\n')[-1]))
+
+def bench_load(runner):
+    def load():
+        import sawtooth_signing #pylint: disable=import-error,unused-variable
+        import local_validator #pylint: disable=unused-variable
+        from load_test import run_load
+        count = max(1, runner.opts.transactions // 10)
+        return lambda: run_load(transactions=count, history=runner.opts.transactions)
+    runner.run('load_commit', load)
+
+BENCHMARKS = {
+    'health': bench_health,
+    'code-smell': bench_code_smell,
+    'suse': bench_suse,
+    'common': bench_common,
+    'code-analysis': bench_code_analysis,
+    'load': bench_load,
+}
+
+def run_group(opts):
+    """
+    worker, run the benchmarks of a group and print the results as json
+    """
+    work_dir = tempfile.mkdtemp(prefix='susereum-bench-')
+    try:
+        runner = Runner(opts, work_dir)
+        BENCHMARKS[opts.group](runner)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    print(json.dumps(runner.results))
+
+def run_all(opts, args):
+    """
+    run every group in its own process
+
+    Returns:
+        dict: benchmark name, result
+    """
+    results = {}
+    for group in GROUPS:
+        command = [sys.executable, os.path.realpath(__file__), '--group', group] + args
+        process = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                 cwd=BENCHMARKS_DIR)
+        lines = process.stdout.decode().strip().split('\n')
+        try:
+            results.update(json.loads(lines[-1]))
+        except ValueError:
+            error = process.stderr.decode().strip().split('\n')[-1]
+            results[group] = {'skipped': error or 'no result'}
+    return results
+
+def _commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def load_history(path):
+    try:
+        with open(path) as history_file:
+            return json.load(history_file)
+    except (IOError, OSError, ValueError):
+        return []
+
+def save_history(path, history):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as history_file:
+        json.dump(history, history_file, indent=1, sort_keys=True)
+    os.rename(tmp_path, path)
+
+def compare(run, history, threshold):
+    """
+    return the comparison of a run with the last run of the same size on the
+    same host
+
+    Returns:
+        (dict, list): previous run (None without one), names of the regressions
+    """
+    previous = None
+    for old in reversed(history):
+        if old['params'] == run['params'] and old['host'] == run['host']:
+            previous = old
+            break
+    regressions = []
+    if previous is not None:
+        for name, result in run['results'].items():
+            old = previous['results'].get(name, {})
+            if 'median' in result and 'median' in old and \
+                    result['median'] > old['median'] * (1 + threshold):
+                regressions.append(name)
+    return previous, sorted(regressions)
+
+def report(run, previous, regressions):
+    print('{:<28}{:>12}{:>12}{:>10}'.format('benchmark', 'median', 'previous', 'change'))
+    for name in sorted(run['results']):
+        result = run['results'][name]
+        if 'skipped' in result:
+            print('{:<28}  skipped: {}'.format(name, result['skipped']))
+            continue
+        old = (previous or {}).get('results', {}).get(name, {}).get('median')
+        change = '' if not old else '{:+.0%}'.format(result['median'] / old - 1)
+        print('{:<28}{:>11.2f}ms{:>10}{:>10}{}'.format(
+            name, result['median'] * 1000,
+            '' if not old else '{:.2f}ms'.format(old * 1000),
+            change, '  REGRESSION' if name in regressions else ''))
+
+def main(args=None):
+    if args is None:
+        args = sys.argv[1:]
+    opts = parse_args(args)
+    if opts.group is not None:
+        run_group(opts)
+        return 0
+
+    worker_args = ['--rows', str(opts.rows), '--transactions', str(opts.transactions),
+                   '--repeat', str(opts.repeat)]
+    if opts.only:
+        worker_args += ['--only', opts.only]
+    run = {
+        'date': datetime.datetime.utcnow().strftime('%Y-%m-%d-%H-%M-%S'),
+        'commit': _commit(),
+        'host': socket.gethostname(),
+        'python': sys.version.split()[0],
+        'params': {'rows': opts.rows, 'transactions': opts.transactions, 'only': opts.only},
+        'results': run_all(opts, worker_args),
+    }
+    history = load_history(opts.history)
+    previous, regressions = compare(run, history, opts.threshold)
+    report(run, previous, regressions)
+    history.append(run)
+    save_history(opts.history, history)
+    if regressions and opts.fail_on_regression:
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
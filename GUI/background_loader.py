@@ -0,0 +1,80 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from gi.repository import GLib
+
+"""
+Background loader for the Susereum screens.
+Network and chain queries run on a pool of worker threads so the GTK main loop keeps drawing the window. Results are
+handed back to the main loop with GLib.idle_add, callbacks are the only place where widgets are updated.
+Work still pending when the window is closed is cancelled and its callbacks are dropped.
+"""
+
+
+class BackgroundLoader:
+    def __init__(self, max_workers=8):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.futures = set()
+        self.lock = threading.Lock()
+        self.cancelled = False
+
+    def attach(self, window):
+        """
+          attach - cancel the pending work when the window is destroyed
+          :param window: Gtk.Window
+        """
+        window.connect("destroy", lambda *args: self.cancel())
+
+    def submit(self, function, *args, callback=None, error=None):
+        """
+          submit - run a function on a worker thread
+          :param function: function to run, must not touch widgets
+          :param args: function arguments
+          :param callback: called on the main loop with the result
+          :param error: called on the main loop with the exception
+          :returns: future, None if the loader was cancelled
+        """
+        with self.lock:
+            if self.cancelled:
+                return None
+            future = self.executor.submit(function, *args)
+            self.futures.add(future)
+        future.add_done_callback(lambda done: self._done(done, callback, error))
+        return future
+
+    def cancel(self):
+        """
+          cancel - drop the pending work, running functions finish but their callbacks are not called
+        """
+        with self.lock:
+            self.cancelled = True
+            for future in self.futures:
+                future.cancel()
+            self.futures.clear()
+        self.executor.shutdown(wait=False)
+
+    def _done(self, future, callback, error):
+        """
+          _done - worker side, schedule the callback on the main loop
+        """
+        with self.lock:
+            self.futures.discard(future)
+            if self.cancelled or future.cancelled():
+                return
+        exception = future.exception()
+        if exception is not None:
+            if error is not None:
+                GLib.idle_add(self._dispatch, error, exception)
+            else:
+                print("Background task failed: " + str(exception))
+        elif callback is not None:
+            GLib.idle_add(self._dispatch, callback, future.result())
+
+    def _dispatch(self, function, value):
+        """
+          _dispatch - main loop side, skip callbacks of a cancelled loader
+        """
+        if not self.cancelled:
+            function(value)
+        # run once
+        return False
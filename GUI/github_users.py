@@ -0,0 +1,153 @@
+import os
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+"""
+GitHub user id to username resolver for Susereum.
+Usernames are kept in a cache file shared by all the screens and kept between runs. A username is asked again to
+GitHub once a day at most, with the ETag of the previous answer so an unchanged user answers 304 Not Modified, which
+does not count against the rate limit. The ids of a whole screen are resolved in one call, each id once.
+"""
+
+CACHE_PATH = os.path.join(os.path.expanduser("~"), ".susereum", "github_users.json")
+# seconds before a username is checked again
+TTL = 24 * 60 * 60
+USER_URL = "https://api.github.com/user/"
+MAX_WORKERS = 8
+TIMEOUT = 10
+
+
+class GitHubUsers:
+    def __init__(self, path=CACHE_PATH, ttl=TTL):
+        self.path = path
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        # held from the read of the file to its replacement, saves of the threads of the process do not interleave
+        self.save_lock = threading.Lock()
+        self.session = requests.Session()
+        # id: {"login": username, "etag": etag, "checked": time of the last answer}
+        self.users = self._load()
+        # time when the rate limit resets, no request is sent before
+        self.limited_until = 0
+
+    def username(self, id, token=None):
+        """
+        username - return the username of a GitHub user id
+        :param id: GitHub user id
+        :param token: installation token, or function returning it, called only when GitHub is queried
+        :returns: username, the id when the username is unknown
+        """
+        return self.usernames([id], token)[str(id)]
+
+    def usernames(self, ids, token=None):
+        """
+        usernames - return the usernames of GitHub user ids, ids missing or older than the ttl are asked to GitHub
+        :param ids: GitHub user ids, duplicates are resolved once
+        :param token: installation token, or function returning it, called only when GitHub is queried
+        :returns: dict of id: username, the id when the username is unknown
+        """
+        ids = set(str(id) for id in ids)
+        now = time.time()
+        with self.lock:
+            stale = [id for id in ids
+                     if id not in self.users or now - self.users[id]["checked"] > self.ttl]
+
+        if stale and now >= self.limited_until:
+            if callable(token):
+                try:
+                    token = token()
+                except Exception as error:
+                    print("Unable to create the GitHub token: " + str(error))
+                    token = None
+            with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+                list(executor.map(lambda id: self._fetch(id, token), stale))
+            self._save()
+
+        with self.lock:
+            return {id: self.users[id]["login"] if id in self.users else id for id in ids}
+
+    def _fetch(self, id, token):
+        """
+        _fetch - ask GitHub for a username, the cached ETag makes an unchanged user answer 304
+        :param id: GitHub user id
+        :param token: installation token
+        """
+        if time.time() < self.limited_until:
+            return
+        headers = {}
+        if token:
+            headers['Authorization'] = 'Token ' + token
+        with self.lock:
+            cached = self.users.get(id)
+        if cached is not None and cached.get("etag"):
+            headers['If-None-Match'] = cached["etag"]
+
+        try:
+            r = self.session.get(USER_URL + id, headers=headers, timeout=TIMEOUT)
+        except requests.RequestException as error:
+            print("Problem trying to convert GitHub user id to username: " + str(error))
+            return
+
+        if r.status_code == 304:
+            with self.lock:
+                cached["checked"] = time.time()
+        elif r.status_code == 200:
+            with self.lock:
+                self.users[id] = {"login": r.json()['login'], "etag": r.headers.get('ETag'), "checked": time.time()}
+        elif r.status_code in (403, 429) and r.headers.get('X-RateLimit-Remaining') == '0':
+            self.limited_until = float(r.headers.get('X-RateLimit-Reset', time.time() + 60))
+            print("GitHub rate limit reached, usernames are resolved again after " + time.ctime(self.limited_until))
+        else:
+            print("Problem trying to convert GitHub user id " + id + " to username: " + str(r.status_code))
+
+    def _load(self):
+        """
+        _load - read the cache file
+        :returns: dict of cached users
+        """
+        try:
+            with open(self.path) as file:
+                return json.load(file)
+        except (IOError, ValueError):
+            return {}
+
+    def _save(self):
+        """
+        _save - write the cache file, the file is replaced at once so other screens never read half of it
+        """
+        with self.save_lock:
+            # keep the users resolved by other processes since the file was read
+            saved = self._load()
+            with self.lock:
+                for id, user in saved.items():
+                    if id not in self.users or user["checked"] > self.users[id]["checked"]:
+                        self.users[id] = user
+                data = json.dumps(self.users)
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                tmp_path = self.path + "." + str(os.getpid()) + "." + str(threading.get_ident()) + ".tmp"
+                with open(tmp_path, 'w') as file:
+                    file.write(data)
+                os.replace(tmp_path, self.path)
+            except OSError as error:
+                print("Unable to save the GitHub users: " + str(error))
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared():
+    """
+    shared - return the resolver shared by all the screens of the process
+    :returns: GitHubUsers
+    """
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = GitHubUsers()
+        return _shared
@@ -0,0 +1,229 @@
+import math
+import bisect
+import datetime
+
+import gi
+gi.require_version("Gtk", "3.0")
+from gi.repository import GLib, Gtk
+
+"""
+Health chart for Susereum.
+Draws the health per commit with Cairo straight on the window, points are appended as new healths are committed
+instead of rendering the whole chart to an image. With more points than pixels the points of each pixel column are
+reduced to their lowest and highest health, the reduction is computed again only when points are added or the
+chart is resized.
+"""
+
+MARGIN_LEFT = 50
+MARGIN_RIGHT = 20
+MARGIN_TOP = 30
+MARGIN_BOTTOM = 50
+POINT_RADIUS = 2.5
+Y_MAX = 100
+Y_STEP = 10
+X_TICKS = 6
+# seconds between two queries of the new healths
+REFRESH_INTERVAL = 10
+
+
+class HealthChart(Gtk.DrawingArea):
+    def __init__(self, title="Health per Commit", date_format="%d-%m-%y"):
+        Gtk.DrawingArea.__init__(self)
+        self.title = title
+        self.date_format = date_format
+        # times (seconds) and healths, sorted by time
+        self.times = []
+        self.healths = []
+        self.last_transaction_id = None
+        self.columns = None
+        self.columns_key = None
+        self.loading = False
+        self.set_size_request(600, 400)
+        self.connect("draw", self.on_draw)
+
+    def follow(self, chain, loader, interval=REFRESH_INTERVAL):
+        """
+        follow - load the healths of the chain and append the new ones periodically
+        :param chain: ChainClient
+        :param loader: BackgroundLoader of the window
+        :param interval: seconds between two queries
+        """
+        self.chain = chain
+        self.loader = loader
+        self.refresh()
+        GLib.timeout_add_seconds(interval, self.refresh)
+
+    def refresh(self):
+        """
+        refresh - query the healths committed after the last point on a worker
+        :returns: False once the window is closed, stops the timer
+        """
+        if self.loader.cancelled:
+            return False
+        if not self.loading:
+            self.loading = True
+            self.loader.submit(self.chain.healths_after, self.last_transaction_id,
+                               callback=self.on_healths, error=self.on_error)
+        return True
+
+    def on_healths(self, healths):
+        """
+        on_healths - append the new healths, reload all of them when the last point left the chain
+        :param healths: list of Health, None to reload
+        """
+        self.loading = False
+        if healths is None:
+            self.loading = True
+            self.loader.submit(self.chain.healths, callback=self.on_reload, error=self.on_error)
+        else:
+            self.append_healths(healths)
+
+    def on_reload(self, healths):
+        """
+        on_reload - replace the points with all the healths of the chain
+        :param healths: list of Health
+        """
+        self.loading = False
+        self.set_healths(healths)
+
+    def on_error(self, error):
+        """
+        on_error - keep the points, the next refresh tries again
+        :param error: exception
+        """
+        self.loading = False
+        print("Unable to load the healths: " + str(error))
+
+    def set_healths(self, healths):
+        """
+        set_healths - replace the points of the chart
+        :param healths: list of Health, oldest first
+        """
+        self.times = []
+        self.healths = []
+        self.last_transaction_id = None
+        self.append_healths(healths)
+
+    def append_healths(self, healths):
+        """
+        append_healths - add new points to the chart
+        :param healths: list of Health, oldest first
+        """
+        for health in healths:
+            self.last_transaction_id = health.transaction_id
+            if health.date is None:
+                continue
+            time = health.date.timestamp()
+            if not self.times or time >= self.times[-1]:
+                self.times.append(time)
+                self.healths.append(health.health)
+            else:
+                index = bisect.bisect_right(self.times, time)
+                self.times.insert(index, time)
+                self.healths.insert(index, health.health)
+        if healths:
+            self.columns = None
+            self.queue_draw()
+
+    def on_draw(self, widget, cr):
+        """
+        on_draw - draw the axes and the points
+        :param widget: widget
+        :param cr: cairo context
+        """
+        width = self.get_allocated_width()
+        height = self.get_allocated_height()
+        plot_width = max(1, width - MARGIN_LEFT - MARGIN_RIGHT)
+        plot_height = max(1, height - MARGIN_TOP - MARGIN_BOTTOM)
+
+        cr.set_source_rgb(1, 1, 1)
+        cr.paint()
+
+        # title
+        cr.set_source_rgb(0, 0, 0)
+        cr.set_font_size(14)
+        extents = cr.text_extents(self.title)
+        cr.move_to((width - extents.width) / 2, MARGIN_TOP - 10)
+        cr.show_text(self.title)
+
+        # y axis and grid
+        cr.set_font_size(10)
+        cr.set_line_width(1)
+        for value in range(0, Y_MAX + 1, Y_STEP):
+            y = MARGIN_TOP + plot_height - plot_height * value / Y_MAX
+            cr.set_source_rgb(0.9, 0.9, 0.9)
+            cr.move_to(MARGIN_LEFT, y)
+            cr.line_to(MARGIN_LEFT + plot_width, y)
+            cr.stroke()
+            cr.set_source_rgb(0, 0, 0)
+            label = str(value)
+            extents = cr.text_extents(label)
+            cr.move_to(MARGIN_LEFT - extents.width - 6, y + extents.height / 2)
+            cr.show_text(label)
+        cr.rectangle(MARGIN_LEFT, MARGIN_TOP, plot_width, plot_height)
+        cr.stroke()
+
+        cr.move_to(MARGIN_LEFT / 4, MARGIN_TOP + plot_height / 2)
+        cr.show_text("Health")
+        extents = cr.text_extents("Date")
+        cr.move_to(MARGIN_LEFT + (plot_width - extents.width) / 2, height - 8)
+        cr.show_text("Date")
+
+        if not self.times:
+            return False
+
+        start, end = self.times[0], self.times[-1]
+        if end == start:
+            start, end = start - 86400, end + 86400
+
+        # x axis labels
+        for tick in range(X_TICKS):
+            time = start + (end - start) * tick / (X_TICKS - 1)
+            label = datetime.datetime.fromtimestamp(time).strftime(self.date_format)
+            extents = cr.text_extents(label)
+            x = MARGIN_LEFT + plot_width * tick / (X_TICKS - 1)
+            cr.move_to(x - extents.width / 2, MARGIN_TOP + plot_height + extents.height + 6)
+            cr.show_text(label)
+
+        # points
+        cr.set_source_rgb(0.85, 0.1, 0.1)
+        for column, low, high in self._columns(plot_width, start, end):
+            x = MARGIN_LEFT + column + 0.5
+            y_low = MARGIN_TOP + plot_height - plot_height * min(low, Y_MAX) / Y_MAX
+            y_high = MARGIN_TOP + plot_height - plot_height * min(high, Y_MAX) / Y_MAX
+            if y_low - y_high > 2 * POINT_RADIUS:
+                cr.move_to(x, y_low)
+                cr.line_to(x, y_high)
+                cr.stroke()
+            cr.arc(x, y_low, POINT_RADIUS, 0, 2 * math.pi)
+            cr.fill()
+            if high != low:
+                cr.arc(x, y_high, POINT_RADIUS, 0, 2 * math.pi)
+                cr.fill()
+        return False
+
+    def _columns(self, plot_width, start, end):
+        """
+        _columns - reduce the points to the lowest and highest health of each pixel column
+        :param plot_width: width of the plot in pixels
+        :param start: first time
+        :param end: last time
+        :returns: list of (column, lowest health, highest health)
+        """
+        key = (plot_width, start, end, len(self.times))
+        if self.columns is not None and self.columns_key == key:
+            return self.columns
+
+        columns = []
+        scale = (plot_width - 1) / (end - start)
+        for time, health in zip(self.times, self.healths):
+            column = int((time - start) * scale)
+            if columns and columns[-1][0] == column:
+                _, low, high = columns[-1]
+                columns[-1] = (column, min(low, health), max(high, health))
+            else:
+                columns.append((column, health, health))
+
+        self.columns = columns
+        self.columns_key = key
+        return columns
@@ -1,18 +1,28 @@
 import gi
-import numpy as np
-from datetime import datetime
-import matplotlib.pyplot as plt
-from matplotlib.dates import DateFormatter
-import json
-import subprocess
 import os
 import time
-import base64
-import requests
+import sys
+import getpass
+import threading
 
 gi.require_version("Gtk", "3.0")
 from gi.repository import Gtk
+from gi.repository import GLib
 from ErrorDialog import ErrorDialog
+from background_loader import BackgroundLoader
+from health_chart import HealthChart
+import github_users
+
+FAMILIES_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), 'Sawtooth', 'families')
+sys.path.append(FAMILIES_PATH)
+sys.path.append(os.path.join(FAMILIES_PATH, 'code-smell'))
+from common.rest_client import RestClientError
+from common.chain_client import ChainClient, parse_code_smells
+from common.snapshot import open_project_chain, compact_project_snapshot, SnapshotError
+from common.suse_config import load_suse_config, project_suse_path
+from common.suse_config import watch_suse_config, unwatch_suse_config
+from client.code_smell_client import CodeSmellClient
+from client.code_smell_exceptions import CodeSmellException
 
 
 """
@@ -37,55 +47,22 @@ class MainWindow(Gtk.Window):
         # TODO: Enable the following 2 lines later to do your thing Christian
         ports = open(self.path + '/etc/.ports').read()
         self.api = ports.split('\n')[2].strip()
+        # queries the chain in-process, transactions are indexed once per window starting from
+        # the snapshot of the project, the snapshot is written again when the window is closed
+        self.chain = open_project_chain('http://127.0.0.1:' + str(self.api), self.path)
+        self.connect("destroy", lambda *args: threading.Thread(target=self.compact_snapshot,
+                                                               daemon=True).start())
+
+        # chain queries run on worker threads, the tabs are filled when the results arrive
+        self.loader = BackgroundLoader()
+        self.loader.attach(self)
 
         # First tab
         self.page1 = Gtk.Box()
         self.page1.set_border_width(10)
-        # TODO thread health update
-
-        healths = []
-        myDates = []
-        print(['python3', '../Sawtooth/bin/health.py', 'list', '--type', 'health', '--url','http://127.0.0.1:'+str(self.api)])
-        results = subprocess.check_output(['python3', '../Sawtooth/bin/health.py', 'list', '--type', 'health', '--url','http://127.0.0.1:'+str(self.api)])
-        if not results:
-            pass
-        else:
-            results = results.decode('utf-8').replace("'","\"").replace('": b"','": "').strip()
-            dictionary = json.loads(results)
-            for value in dictionary.values():
-                data = value.split(',')#transaction_name,sender_id,health,status,time
-                health = data[2]
-                date = data[6].split('-') #[data[4][0:4],data[4][5:7],data[4][8:10],data[4][11:13],data[4][14:16],data[4][17:19]]
-                healths.append(float(health))
-                print(date)
-                myDates.append(datetime(int(date[0]),
-                                        int(date[1]),
-                                        int(date[2]),
-                                        int(date[3]),
-                                        int(date[4]),
-                                        int(date[5])))
-                print(health,date)
-
-            fig, ax = plt.subplots()
-            ax.plot(myDates,healths,'ro')
-            myfmt = DateFormatter("%d-%m-%y")
-            ax.xaxis.set_major_formatter(myfmt)
-            #ax.set_xlim(myDates[0], myDates[-1])
-            ax.set_ylim(0, 100)
-            ## Rotate date labels automatically
-            fig.autofmt_xdate()
-            plt.xlabel("Date")
-            plt.ylabel("Health")
-            plt.title("Health per Commit")
-            plt.yticks(np.arange(0,100,10))#TODO make dynamic
-            #plt.xticks(None,1)#TODO make dynamic
-            #plt.locator_params(axis='y',numticks=3)
-            #plt.show()
-            #plt.plot(healths,times,'ro')
-            #plt.axis(['Mon','Tues','Wed'])
-            plt.savefig('health.png')
-            img = Gtk.Image.new_from_file("health.png") #TODO update this periodically and check for blank
-            self.page1.add(img)
+        # points are appended as new healths are committed
+        self.health_chart = HealthChart()
+        self.page1.pack_start(self.health_chart, True, True, 0)
 
         self.notebook.append_page(self.page1, Gtk.Label('Health'))
 
@@ -94,8 +71,13 @@ class MainWindow(Gtk.Window):
         self.page2.set_border_width(10)
         page2_box = Gtk.Box()
         # TODO: Enable the following 2 lines later to do your thing Christian
-        self.suse = open(self.path + '/etc/.suse', 'r').read()
-        page2_box.add(Gtk.Label(self.suse))
+        self.suse = load_suse_config(project_suse_path(self.path)).raw
+        self.lbl_suse = Gtk.Label(self.suse)
+        page2_box.add(self.lbl_suse)
+        # the smells tab follows the configuration written by accepted proposals
+        watch_suse_config(project_suse_path(self.path), self.on_suse_changed)
+        self.connect("destroy", lambda *args: unwatch_suse_config(project_suse_path(self.path),
+                                                                  self.on_suse_changed))
         self.page2.add(page2_box)
         self.notebook.append_page(self.page2, Gtk.Label('Smells'))
 
@@ -129,24 +111,9 @@ class MainWindow(Gtk.Window):
 
 
 
-        lastest_proposal_command = 'python3 ' + os.path.dirname(os.path.dirname(os.path.realpath(__file__).strip()).strip()).strip() + \
-                  '/Sawtooth/bin/code_smell.py list --type proposal --active 1 --url http://127.0.0.1:' + self.api + \
-                  ' | awk \'{print $1;}\' | tr -d "\n"'
-
-        print(lastest_proposal_command)
-        self.lastest_proposal = os.popen(lastest_proposal_command).read().strip()
-        if self.lastest_proposal == "Error: No transactions found":
-            self.lastest_proposal = None
-        if not self.lastest_proposal:
-            votes =[]
-        else:
-            vote_commands='python3 ' + os.path.dirname(os.path.dirname(os.path.realpath(__file__).strip()).strip()).strip() + \
-                  '/Sawtooth/bin/code_smell.py vote --view '+self.lastest_proposal+' --url http://127.0.0.1:'+self.api
-            print(vote_commands)
-            try:
-                votes = eval(os.popen(vote_commands).read())
-            except:
-                votes = []
+        # filled by on_proposal
+        self.lastest_proposal = None
+        votes = []
 
         #self.txt_accept = Gtk.Entry()
         #self.txt_accept.set_text(str(votes.count(1)))
@@ -192,21 +159,7 @@ class MainWindow(Gtk.Window):
         self.row.add(hbox_lb4)
 
         #Label on the Vote tab.
-        command = 'tansaction=`python3 ' +os.path.dirname(os.path.dirname(os.path.realpath(__file__).strip()).strip()).strip() +\
-        '/Sawtooth/bin/code_smell.py list --type proposal --active 1 --url http://127.0.0.1:' + self.api+\
-        ' | awk \'{print $1;}\'`; sawtooth transaction show "$tansaction" --url http://127.0.0.1:'+self.api+\
-        ' | grep "payload:" | awk \'{print $2;}\' | base64 --decode'
-
-        self.proposal = os.popen(command).read()
-        if not self.proposal:
-            self.proposal = "There are no proposals at this time"
-        else:
-            #print("TEMP:",proposal.split(',')[2].replace(";",",").replace("'",'"'))
-            temp = json.loads(self.proposal.split(',')[2].replace(";",",").replace("'",'"'))
-
-            self.proposal = ""
-            for key,value in temp.items():
-                self.proposal = self.proposal+key+" : "+value+"\n"
+        self.proposal = "Loading proposal..."
 
         #print(command)
         self.lbl_vote_text = Gtk.Label(self.proposal)
@@ -393,91 +346,13 @@ class MainWindow(Gtk.Window):
         # we are ignoring URL from the Abel's comma seperated data. The fields are Type, Id, Data, State, URL and Date
         self.historical_data = []
 
-        transactions = self.blockchain_requests(self.api, "/transactions")
-        suse_transactions = []  # To be used later to calculate user/suse tab
-
-        #print("TEST transactions: " + str(transactions))
-
-        try:
-            for transaction in transactions['data']:
-                #print("---TESTING---")
-                if("sawtooth_" in str(transaction)):    # Filter out transactions with "sawtooth_"
-                    continue
-                payload = base64.b64decode(transaction['payload'])  # Returns base64 encoded comma-delimited payload
-                payload = str(payload)
-                payload = payload.replace("b'", "").replace('b"', "").replace("'", "")
-                payload_list = payload.split(',')
-                transaction_type = payload_list[0]  # Transactions type is always the first item
-
-                sender_id = "Anonymous"
-                if (transaction_type in ["commit", "health", "suse"]):
-                    user_github_id = payload_list[1]
-                    # TODO: Uncomment this to get GitHub username
-                    #sender_id = self.github_user_id_to_username(user_github_id)
-                    sender_id = user_github_id
-
-                # Filter out transactions
-                if (transaction_type not in ["code_smell", "commit", "health", "proposal", "suse", "vote"]):
-                    continue
-
-                # Prepare labels for data, different transaction types have different labels
-                if (transaction_type == "suse"):
-                    suse_transactions.append(transaction)
-
-                # Prepare labels for data, different transaction types have different labels
-                if (transaction_type == "code_smell"):
-                    data = "Code Smell: " + payload_list[1] + "\n"
-                    data += "Values: " + payload_list[2] + "\n"
-                elif (transaction_type == "commit"):
-                    data = "GitHub ID: " + payload_list[1] + "\n"
-                    data += "Commit URL: " + payload_list[2] + "\n"
-                elif (transaction_type == "health"):
-                    data = "GitHub ID: " + payload_list[1] + "\n"
-                    data += "Health: " + payload_list[2] + "\n"
-                    data += "Commit URL: " + payload_list[4] + "\n"
-                elif (transaction_type == "proposal"):
-                    data = "GitHub ID: " + payload_list[1] + "\n"
-                    data += "Code Smells: " + self._beautify_code_smells(payload_list[2]) + "\n"
-                    data += "State: " + payload_list[3] + "\n"
-                elif (transaction_type == "suse"):
-                    suse_transactions.append(transaction)  # To sum up the values
-                    data = "GitHub ID: " + payload_list[1] + "\n"
-                    data += "Suse: " + payload_list[2] + "\n"
-                    data += "State: " + payload_list[3] + "\n"
-                elif (transaction_type == "vote"):
-                    data = "Vote ID: " + payload_list[1] + "\n"
-                    data += "Proposal ID: " + payload_list[2] + "\n"
-                    active = payload_list[3]
-                    active = active.replace('0', 'closed').replace('1', 'active')
-                    data += "State: " + active + "\n"
-                else:
-                    data = ""  # Data is everything in between
-                    i = 1
-                    while (i < len(payload_list) - 1):
-                        data += payload_list[i] + "\n"
-                        i += 1
-
-                timestamp = payload_list[len(payload_list) - 1]  # Timestamp is always the last item
-
-                #data = ""  # Data is everything in between
-                #i = 1
-                #while (i < len(payload_list) - 1):
-                #    data += payload_list[i] + "\n"
-                #    i += 1
-
-                self.historical_data.append(
-                    (sender_id, timestamp, transaction_type, data))  # Add a tuple to the list to show in table
-                print(self.historical_data)
-        except:
-            print("Problem trying to parse the history transactions")
-
         # self.historical_data = [("Sender ID 1", "Time stamp 1", "Type 1", "Data 1"),
         #                       ("Sender ID 2", "Time stamp 2", "Type 2", "Data 2")]
         history_list_store = Gtk.ListStore(str, str, str, str)
         # # ListStore (lists that TreeViews can display) and specify data types
         # history_list_store = Gtk.ListStore(str, str)
-        for item in self.historical_data:
-            history_list_store.append(list(item))
+        # rows are appended by on_history
+        self.history_list_store = history_list_store
 
         # x = ["hi", "test"]
         # history_list_store.append(x)
@@ -511,6 +386,119 @@ class MainWindow(Gtk.Window):
         self.set_position(Gtk.WindowPosition.CENTER)
         self.show_all()
 
+        self.health_chart.follow(self.chain, self.loader)
+        self.loader.submit(self.load_proposal, callback=self.on_proposal)
+        self.loader.submit(self.load_history, callback=self.on_history)
+
+    def on_suse_changed(self, config):
+        """
+          on_suse_changed - called from the watcher thread when the .suse file changes, the label is updated on the main loop
+        """
+        self.suse = config.raw
+        GLib.idle_add(self.lbl_suse.set_text, config.raw)
+
+    def load_proposal(self):
+        """
+        load_proposal - worker, read the active proposal and its votes
+        :returns: (proposal, votes), proposal is None without active proposal
+        """
+        active_proposal = self.chain.active_proposal()
+        if active_proposal is None:
+            return None, []
+        return active_proposal, [vote.vote for vote in self.chain.votes(active_proposal.proposal_id)]
+
+    def on_proposal(self, result):
+        """
+        on_proposal - show the active proposal and its votes on the vote tab
+        :param result: (proposal, votes)
+        """
+        active_proposal, votes = result
+        self.lbl_accept.set_text('Overall acceptance: '+str(votes.count(1)))
+        self.lbl_reject.set_text('Overall rejection: '+str(votes.count(0)))
+        if active_proposal is None:
+            self.lastest_proposal = None
+            self.proposal = "There are no proposals at this time"
+        else:
+            self.lastest_proposal = active_proposal.transaction_id
+            self.proposal = ""
+            for key,value in active_proposal.code_smells.items():
+                self.proposal = self.proposal+key+" : "+str(value)+"\n"
+        self.lbl_vote_text.set_text(self.proposal)
+
+    def load_history(self):
+        """
+        load_history - worker, read the transactions of the history tab
+        :returns: list of (sender id, timestamp, type, data)
+        """
+        historical_data = []
+        # the index of a chain opened from its snapshot only holds the transactions committed after the snapshot
+        chain = self.chain if self.chain.snapshot is None else ChainClient('http://127.0.0.1:' + str(self.api))
+
+        try:
+            for transaction in chain.transactions():
+                transaction_type = transaction.txn_type
+
+                sender_id = "Anonymous"
+                if (transaction_type in ["commit", "health", "suse"]):
+                    user_github_id = transaction.txn_id
+                    # TODO: Uncomment this to get GitHub username
+                    #sender_id = self.github_user_id_to_username(user_github_id)
+                    sender_id = user_github_id
+
+                # Filter out transactions
+                if (transaction_type not in ["code_smell", "commit", "health", "proposal", "suse", "vote"]):
+                    continue
+
+                # Prepare labels for data, different transaction types have different labels
+                if (transaction_type == "code_smell"):
+                    data = "Code Smell: " + transaction.txn_id + "\n"
+                    data += "Values: " + transaction.data + "\n"
+                elif (transaction_type == "commit"):
+                    data = "GitHub ID: " + transaction.txn_id + "\n"
+                    data += "Commit URL: " + transaction.data + "\n"
+                elif (transaction_type == "health"):
+                    data = "GitHub ID: " + transaction.txn_id + "\n"
+                    data += "Health: " + transaction.data + "\n"
+                    data += "Commit URL: " + str(transaction.url) + "\n"
+                elif (transaction_type == "proposal"):
+                    data = "GitHub ID: " + transaction.txn_id + "\n"
+                    data += "Code Smells: " + self._beautify_code_smells(transaction.data) + "\n"
+                    data += "State: " + transaction.state + "\n"
+                elif (transaction_type == "suse"):
+                    data = "GitHub ID: " + transaction.txn_id + "\n"
+                    data += "Suse: " + transaction.data + "\n"
+                    data += "State: " + transaction.state + "\n"
+                else:
+                    data = "Vote ID: " + transaction.txn_id + "\n"
+                    data += "Proposal ID: " + transaction.data + "\n"
+                    active = transaction.state
+                    active = active.replace('0', 'closed').replace('1', 'active')
+                    data += "State: " + active + "\n"
+
+                timestamp = transaction.date or ""
+
+                historical_data.append(
+                    (sender_id, timestamp, transaction_type, data))  # Add a tuple to the list to show in table
+        except Exception:
+            print("Problem trying to parse the history transactions")
+
+        return historical_data
+
+    def _beautify_code_smells(self, code_smells):
+        data = "\n"
+        for k, v in parse_code_smells(code_smells).items():
+            data += "\t" + k + ": " + str(v) + "\n"
+        return data
+
+    def on_history(self, historical_data):
+        """
+        on_history - fill the history tab
+        :param historical_data: list of (sender id, timestamp, type, data)
+        """
+        self.historical_data = historical_data
+        for item in self.historical_data:
+            self.history_list_store.append(list(item))
+
     # Gtk.main()
 
     def accept_proposal(self, widget):
@@ -519,13 +507,13 @@ class MainWindow(Gtk.Window):
         :param widget: widget
         """
         print("Accepting project")
-        print("Rejecting project")
         #check locker
 
-        proposal_id = subprocess.check_output(
-            ['python3', os.path.dirname(os.path.dirname(os.path.realpath(__file__))) + '/Sawtooth/bin/code_smell.py',
-             'list', '--type', 'proposal', '--active', '1', '--url', 'http://127.0.0.1:' + self.api])
-        proposal_id = proposal_id.decode('utf-8').split(' ')[0]
+        proposal = self.chain.active_proposal()
+        if proposal is None:
+            ErrorDialog(self, "There are no proposals at this time")
+            return
+        proposal_id = proposal.transaction_id
         try:
             clocker = open('votelock.txt', 'r').read()
             if proposal_id in clocker:
@@ -533,11 +521,8 @@ class MainWindow(Gtk.Window):
                 return
         except:
             pass
-        print(['python3', os.path.dirname(os.path.dirname(os.path.realpath(__file__))) + '/Sawtooth/bin/code_smell.py',
-               'vote', '--id', proposal_id, '--vote', 'yes', '--url', 'http://127.0.0.1:' + self.api])
-        subprocess.Popen(
-            ['python3', os.path.dirname(os.path.dirname(os.path.realpath(__file__))) + '/Sawtooth/bin/code_smell.py',
-             'vote', '--id', proposal_id, '--vote', 'yes', '--url', 'http://127.0.0.1:' + self.api])
+        if not self.send_vote(proposal_id, 1):
+            return
         locker = open('votelock.txt','w')
         locker.write(proposal_id)
         locker.close()
@@ -562,11 +547,11 @@ class MainWindow(Gtk.Window):
         :param widget: widget
         """
         print("Rejecting project")
-        proposal_id = subprocess.check_output(
-            ['python3', os.path.dirname(os.path.dirname(os.path.realpath(__file__))) + '/Sawtooth/bin/code_smell.py',
-             'list',
-             '--type', 'proposal', '--active', '1', '--url', 'http://127.0.0.1:' + self.api])
-        proposal_id = proposal_id.decode('utf-8').split(' ')[0]
+        proposal = self.chain.active_proposal()
+        if proposal is None:
+            ErrorDialog(self, "There are no proposals at this time")
+            return
+        proposal_id = proposal.transaction_id
         try:
             clocker = open('votelock.txt', 'r').read()
             if proposal_id in clocker:
@@ -574,13 +559,8 @@ class MainWindow(Gtk.Window):
                 return
         except:
             pass
-        print(['python3', os.path.dirname(os.path.dirname(os.path.realpath(__file__))) + '/Sawtooth/bin/code_smell.py',
-               'vote',
-               '--id', proposal_id, '--vote', 'no', '--url', 'http://127.0.0.1:' + self.api])
-        subprocess.Popen(
-            ['python3', os.path.dirname(os.path.dirname(os.path.realpath(__file__))) + '/Sawtooth/bin/code_smell.py',
-             'vote',
-             '--id', proposal_id, '--vote', 'no', '--url', 'http://127.0.0.1:' + self.api])
+        if not self.send_vote(proposal_id, 0):
+            return
         locker = open('votelock.txt', 'w')
         locker.write(proposal_id)
         locker.close()
@@ -636,14 +616,9 @@ class MainWindow(Gtk.Window):
             ErrorDialog(self, "Error!\nComments to code ratio: Lower cannot be greater than Upper!")
             return False
 
-        lastest_proposal_command = 'python3 ' + os.path.dirname(
-            os.path.dirname(os.path.realpath(__file__).strip()).strip()).strip() + \
-                                   '/Sawtooth/bin/code_smell.py list --type proposal --active 1 --url http://127.0.0.1:' + self.api + \
-                                   ' | awk \'{print $1;}\' | tr -d "\n"'
-        print(lastest_proposal_command)
-        self.lastest_proposal = os.popen(lastest_proposal_command).read().strip()
-        if self.lastest_proposal == "Error: No transactions found":
-            self.lastest_proposal = None
+        self.chain.refresh()
+        active_proposal = self.chain.active_proposal()
+        self.lastest_proposal = None if active_proposal is None else active_proposal.transaction_id
         if self.lastest_proposal:
             ErrorDialog(self, "Error!\nThere is an active proposal")
             return False
@@ -669,10 +644,43 @@ class MainWindow(Gtk.Window):
                    + "LargeMethod=" + str(self.txt_large_method.get_text()) + "," + "SmallMethod=" + str(self.txt_small_method.get_text()) + "," \
                    + "LargeParameterList=" + str(self.txt_large_param.get_text()) + "," + "CommentsToCodeRatioLower=" + str(float(self.txt_ctc_lw.get_text())) + "," \
                    + "CommentsToCodeRatioUpper=" + str(float(self.txt_ctc_up.get_text()))
-        subprocess.Popen(
-            ['python3', os.path.dirname(os.path.dirname(os.path.realpath(__file__))) + '/Sawtooth/bin/code_smell.py',
-             'proposal',
-             '--propose', proposal, '--url', 'http://127.0.0.1:' + self.api])
+        code_smells = dict(code_smell.split("=") for code_smell in proposal.split(","))
+        try:
+            self.code_smell_client().propose(code_smells=code_smells)
+        except CodeSmellException as err:
+            ErrorDialog(self, "Error!\n" + str(err))
+
+    def code_smell_client(self):
+        """
+          code_smell_client - client to send code smell transactions, signed with the user's key
+          :returns: CodeSmellClient
+        """
+        keyfile = os.path.join(os.path.expanduser("~"), ".sawtooth", "keys", getpass.getuser() + ".priv")
+        return CodeSmellClient(base_url='http://127.0.0.1:' + str(self.api), work_path=self.path, keyfile=keyfile)
+
+    def compact_snapshot(self):
+        """
+          compact_snapshot - write the snapshot of the project once enough transactions were committed after it,
+                             runs on its own thread when the window is closed
+        """
+        try:
+            compact_project_snapshot(self.chain, self.path)
+        except (SnapshotError, RestClientError) as err:
+            print("Unable to write the snapshot of " + self.path + ": " + str(err))
+
+    def send_vote(self, proposal_id, vote):
+        """
+          send_vote - send a vote of the active proposal
+          :param proposal_id: transaction id of the proposal
+          :param vote: 1 accept, 0 reject
+          :returns: True if the vote was sent
+        """
+        try:
+            self.code_smell_client().vote(proposal_id=proposal_id, vote=vote)
+        except CodeSmellException as err:
+            ErrorDialog(self, "Error!\n" + str(err))
+            return False
+        return True
 
     def on_tog_large_class(self, tog_large_class):
         """
@@ -754,36 +762,18 @@ class MainWindow(Gtk.Window):
         return time.strftime("%m-%d-%Y %H:%M")
 
     def github_user_id_to_username(self, id):
-        username = ""
-        if id in self.username_mappings:
-            username = self.username_mappins[id]
-            return username
-
-        try:
-            url = "https://api.github.com/user/" + id
-            r = requests.get(url)
-            username = r.json()['login'].encode('ascii')     # unicode to ascii
-            username = str(username).replace("b'", "").replace("'", "")
-            return username
-        except:
-            print("Problem trying to convert GitHub user id to username. You only have 60 requests/hour.")
-        return str(id)
-
-    def blockchain_requests(self, api_port, endpoint):
         """
-        Makes GET request to blockchain. Hard coded server IP.
-
-        Args:
-            api_port: The port of the blockchain REST API you want to query
-            endpoint: The blockchain resource endpoint (refer to https://sawtooth.hyperledger.org/docs/core/releases/1.0/architecture/rest_api.html)
-        Returns:
-            A JSON dictionary of the response
+        github_user_id_to_username - return the username of a GitHub user id
+        :param id: GitHub user id
+        :returns: username, the id when the username is unknown
         """
-        SERVER_IP = '129.108.7.2'
-        url = "http://" + SERVER_IP + ":" + str(api_port) + endpoint
-        #print("URL requesting: " + url)
-        r = requests.get(url)
-        return r.json()
+        if id in self.username_mappings:
+            return self.username_mappings[id]
+
+        # unauthenticated, the shared cache keeps this screen within 60 requests/hour
+        username = github_users.shared().username(id)
+        self.username_mappings[id] = username
+        return username
 
 
 if __name__ == '__main__':
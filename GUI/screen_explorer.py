@@ -4,9 +4,15 @@ gi.require_version("Gtk", "3.0")
 from gi.repository import Gtk
 import re
 from itertools import dropwhile
+import sys
 import requests
-import subprocess
-import json
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), 'Sawtooth', 'families'))
+from common.chain_client import ChainClient
+from common.rest_client import RestClientError
+from common.snapshot import compact_project_snapshot, SnapshotError
+from common.suse_config import write_suse_config
+from background_loader import BackgroundLoader
 
 """
 Sawtooth Explorer screen for Susereum.
@@ -20,7 +26,9 @@ class MainWindow(Gtk.Window):
 
         #TODO: Martin you can read data that you want to display on the list and add it to projects below.
         self.projects=[]#[("Project 1", "Project Name 1", "Health value 1", "11-11-2018"),("Project 2", "Project Name 2", "Health value 2", "12-12-2018")]
-        self.read_projects()
+        # projects are read on worker threads, rows are added as they arrive
+        self.loader = BackgroundLoader()
+        self.loader.attach(self)
         self.set_border_width(5)
         self.set_size_request(600, 300)
 
@@ -117,6 +125,7 @@ class MainWindow(Gtk.Window):
         self.connect("delete-event", Gtk.main_quit)
         self.set_position(Gtk.WindowPosition.CENTER)
         self.show_all()
+        self.read_projects()
 
     def findnth(self, haystack, needle, n):
         parts= haystack.split(needle, n+1)
@@ -142,24 +151,20 @@ class MainWindow(Gtk.Window):
         home = str((os.environ['HOME']+'/.sawtooth_projects/').encode('utf-8'))[2:-1]
         #print(home, prj_name, prj_id)
         #print(type(home), type(prj_name), type(prj_id))
-        etc_dir = home+"."+prj_name+"_"+prj_id+"/etc/"
+        prj_dir = home+"."+prj_name+"_"+prj_id
+        etc_dir = prj_dir+"/etc/"
 
-        print(['python3', '../Sawtooth/bin/health.py', 'list', '--type', 'health', '--url',
-               'http://129.108.7.2:' + str(api)])
-        results = subprocess.check_output(['python3', '../Sawtooth/bin/health.py', 'list', '--type', 'health', '--url',
-                                           'http://129.108.7.2:' + str(api)])
+        chain = ChainClient('http://' + os.getenv('SUSEREUM_API_HOST', '129.108.7.2') + ':' + str(api))
+        results = chain.healths()
         if not results:
             health = "50"
         else:
-            results = results.decode('utf-8').replace("'", "\"").replace('": b"', '": "').strip()
-            dictionary = json.loads(results)
-            for value in dictionary.values():
-                dataz = value.split(',')
-                print(dataz)
-                health = dataz[2]
-                if '-2' in health:
+            # latest health, -2 marks a failed analysis
+            for value in reversed(results):
+                if value.health == -2:
                     health = "-"
                 else:
+                    health = str(value.health)
                     break
 
         try:
@@ -167,6 +172,11 @@ class MainWindow(Gtk.Window):
                 os.makedirs(etc_dir)
         except:
             print("ERROR: Couldn't make " + etc_dir)
+        # the chain was just read, its snapshot spares the details screen a full replay
+        try:
+            compact_project_snapshot(chain, prj_dir)
+        except (SnapshotError, RestClientError) as err:
+            print("ERROR: Couldn't write the snapshot of " + prj_dir + ": " + str(err))
 
 
         """
@@ -189,29 +199,54 @@ class MainWindow(Gtk.Window):
         """
 
         ports = open(etc_dir+'.ports','w+')
-        suse = open(etc_dir+'.suse','w+')
         #repo = open(os.listdir((os.environ['HOME'])+'/.sawtooth_projects/.'+prj_name+"_"+prj_id+"/etc/")+'.repo','w')
         ports.write(data[0]+'\n')
         ports.write(data[1]+'\n')
         ports.write(data[2]+'\n')
         ports.close()
-        suse.write(r.text[self.findnth(r.text,'\n',3):])
-        suse.close()
+        write_suse_config(etc_dir+'.suse', r.text[self.findnth(r.text,'\n',3):])
         x = [prj_id,prj_name,health,self.get_time_date()]#TODO query suse
-        self.projects.append(x)
+        return x
        
 
     def read_projects(self):
         """
           read_projects - checks if there are any existing projects added to Susereum and adds them to the list view.
+                          the project list and every project are fetched on worker threads.
+        """
+        self.loader.submit(self.fetch_project_urls, callback=self.on_project_urls)
+
+    def fetch_project_urls(self):
+        """
+          fetch_project_urls - worker, read the url of every project
+          :returns: list of urls
         """
         r = requests.get('http://129.108.7.2/project_list.php')#check if there are project
         urls = r.text.split('\n')
-        #print(r.text)
+        return [url.strip() for url in urls if "http" in url]
+
+    def on_project_urls(self, urls):
+        """
+          on_project_urls - main loop, fetch all projects concurrently
+          :param urls: list of urls
+        """
         for url in urls:
-            #print(url)
-            if "http" in url:
-                self.add_project(url.strip())
+            self.loader.submit(self.add_project, url, callback=self.on_project, error=self.on_project_error)
+
+    def on_project(self, project):
+        """
+          on_project - main loop, add a project row as soon as it is loaded
+          :param project: project row
+        """
+        self.projects.append(project)
+        self.projects_list_store.append(list(project))
+
+    def on_project_error(self, error):
+        """
+          on_project_error - main loop, a project could not be loaded
+          :param error: exception
+        """
+        print("Problem trying to load a project: " + str(error))
         '''for prj in os.listdir((os.environ['HOME'])+'/.sawtooth_projects/'):
             if prj == '.' or prj == '..' or not prj.startswith('.'):
                 continue
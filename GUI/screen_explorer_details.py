@@ -1,10 +1,7 @@
 import gi
-import numpy as np
 #from datetime import datetime
-import matplotlib.pyplot as plt
-from matplotlib.dates import DateFormatter
 import json
-import subprocess
+import sys
 gi.require_version("Gtk", "3.0")
 from gi.repository import Gtk
 import requests     # Have to manually send requests to each blockchain REST API bc Sawtooth doesn't support 32-bit architecture
@@ -14,6 +11,12 @@ import jwt
 import datetime
 import calendar
 
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), 'Sawtooth', 'families'))
+from common.chain_client import ChainClient
+from background_loader import BackgroundLoader
+from health_chart import HealthChart
+import github_users
+
 """
 Project details screen for Susereum explorer.
 From the explorer screen, user can select any particuar existing project and navigate to this screen to see
@@ -33,57 +36,18 @@ class MainWindow(Gtk.Window):
         self.notebook = Gtk.Notebook()
         self.add(self.notebook)
 
-        # First tab
-        healths = []
-        myDates = []
-        print(['python3', '../Sawtooth/bin/health.py', 'list', '--type', 'health', '--url',
-               'http://127.0.0.1:' + str(self.api)])
-        results = subprocess.check_output(['python3', '../Sawtooth/bin/health.py', 'list', '--type', 'health', '--url',
-                                           'http://127.0.0.1:' + str(self.api)])
-        if not results:
-            pass
-        else:
-            results = results.decode('utf-8').replace("'", "\"").replace('": b"', '": "').strip()
-            dictionary = json.loads(results)
-            for value in dictionary.values():
-                data = value.split(',')  # transaction_name,sender_id,health,status,time
-                health = data[2]
-                date = data[6].split(
-                    '-')  # [data[4][0:4],data[4][5:7],data[4][8:10],data[4][11:13],data[4][14:16],data[4][17:19]]
-                healths.append(float(health))
-                print(date)
-                myDates.append(datetime.datetime(int(date[0]),
-                                        int(date[1]),
-                                        int(date[2]),
-                                        int(date[3]),
-                                        int(date[4]),
-                                        int(date[5])))
-                print(health, date)
-
-            fig, ax = plt.subplots()
-            ax.plot(myDates, healths, 'ro')
-            myfmt = DateFormatter("%y-%m-%d")
-            ax.xaxis.set_major_formatter(myfmt)
-            # ax.set_xlim(myDates[0], myDates[-1])
-            ax.set_ylim(0, 100)
-            ## Rotate date labels automatically
-            fig.autofmt_xdate()
-            plt.xlabel("Date")
-            plt.ylabel("Health")
-            plt.title("Health per Commit")
-            plt.yticks(np.arange(0, 100, 10))  # TODO make dynamic
-            # plt.xticks(None,1)#TODO make dynamic
-            # plt.locator_params(axis='y',numticks=3)
-            # plt.show()
-            # plt.plot(healths,times,'ro')
-            # plt.axis(['Mon','Tues','Wed'])
-            plt.savefig('health.png')
-            img = Gtk.Image.new_from_file("health.png")  # TODO update this periodically and check for blank
+        self.chain = ChainClient('http://127.0.0.1:' + str(self.api))
+
+        # chain and GitHub queries run on worker threads, the tabs are filled when the results arrive
+        self.loader = BackgroundLoader()
+        self.loader.attach(self)
 
+        # First tab
         self.page1 = Gtk.Box()
         self.page1.set_border_width(10)
-        img = Gtk.Image.new_from_file("health.png")
-        self.page1.add(img)
+        # points are appended as new healths are committed
+        self.health_chart = HealthChart(date_format="%y-%m-%d")
+        self.page1.pack_start(self.health_chart, True, True, 0)
 
         self.notebook.append_page(self.page1, Gtk.Label('Health'))
 
@@ -94,11 +58,96 @@ class MainWindow(Gtk.Window):
         # Required columns for History tab
         self.historical_data = []
 
-        transactions = self.blockchain_requests(api_port, "/transactions")
+        #self.historical_data = [("Sender ID 1", "Time stamp 1", "Type 1", "Data 1"),
+        #                       ("Sender ID 2", "Time stamp 2", "Type 2", "Data 2")]
+        history_list_store = Gtk.ListStore(str, str, str, str)
+
+        # # ListStore (lists that TreeViews can display) and specify data types
+        # history_list_store = Gtk.ListStore(str, str)
+        # rows are appended by on_history
+        self.history_list_store = history_list_store
+
+        # TreeView is the item that is displayed
+        history_tree_view = Gtk.TreeView(history_list_store)
+        # Enumerate to add counter (i) to loop
+
+        for i, col_title in enumerate(["Sender ID", "Time", "Type", "Data"]):
+            # Render means draw or display the data (just display as normal text)
+            renderer = Gtk.CellRendererText()
+            renderer.props.wrap_width = 250
+            # Create columns (text is column number)
+            column = Gtk.TreeViewColumn(col_title, renderer, text=i)
+            # Make column sortable and selectable
+            column.set_sort_column_id(i)
+            # Add columns to TreeView
+            history_tree_view.append_column(column)
+
+        self.page2.add(history_tree_view)
+        self.notebook.append_page(self.page2, Gtk.Label('History'))
+
+        # 3rd Tab
+        self.page3 = Gtk.ScrolledWindow()
+        self.page3.set_border_width(10)
+
+        # Required columns for History tab
+        self.user_data = []     # List of users and their suse values to be rendered
+
+        # Adding them dynamically now
+        #self.user_data = [("User ID 1", "Suse 1"),
+        #                  ("User ID 2", "Suse 2")]
+        user_list_store = Gtk.ListStore(str, str)
+
+        self.listbox_users = Gtk.ListBox()
+        self.listbox_users.set_selection_mode(Gtk.SelectionMode.NONE)
+
+        # # ListStore (lists that TreeViews can display) and specify data types
+        # user_list_store = Gtk.ListStore(str, str)
+        # rows are appended by on_history
+        self.user_list_store = user_list_store
+
+        # TreeView is the item that is displayed
+        user_tree_view = Gtk.TreeView(user_list_store)
+        # Enumerate to add counter (i) to loop
+
+        for i, col_title in enumerate(["User ID", "Suse"]):
+            # Render means draw or display the data (just display as normal text)
+            renderer = Gtk.CellRendererText()
+            renderer.props.wrap_width = 250
+            # Create columns (text is column number)
+            column = Gtk.TreeViewColumn(col_title, renderer, text=i)
+            # Make column sortable and selectable
+            column.set_sort_column_id(i)
+            # Add columns to TreeView
+            user_tree_view.append_column(column)
+
+        self.page3.add(user_tree_view)
+        self.notebook.append_page(self.page3, Gtk.Label('Users'))
+
+        self.connect("delete-event", Gtk.main_quit)
+        self.set_position(Gtk.WindowPosition.CENTER)
+        self.show_all()
+
+        self.health_chart.follow(self.chain, self.loader)
+        self.loader.submit(self.load_history, callback=self.on_history)
+
+    def load_history(self):
+        """
+        load_history - worker, read the transactions of the history tab and the suse of each user
+        :returns: (list of (sender id, timestamp, type, data), list of (username, suse))
+        """
+        historical_data = []
+        user_data = []      # List of users and their suse values to be rendered
+        transactions = self.blockchain_requests(self.api, "/transactions")
         suse_transactions = []      # To be used later to calculate user/suse tab
 
-        # Get the authentication token ready to increase our rate limit
-        _create_installation_token()
+        # Resolve the usernames of the whole screen at once, the token to increase our rate limit is only created
+        # when some username is not in the shared cache
+        user_github_ids = set()
+        for transaction in transactions.get('data', []):
+            payload_list = str(base64.b64decode(transaction['payload']))[2:-1].split(',')
+            if payload_list[0] in ["commit", "health", "suse"] and len(payload_list) > 1:
+                user_github_ids.add(payload_list[1])
+        self.username_mappings.update(github_users.shared().usernames(user_github_ids, _create_installation_token))
 
         try:
             for transaction in transactions['data']:
@@ -156,43 +205,10 @@ class MainWindow(Gtk.Window):
                         data += payload_list[i] + "\n"
                         i += 1
 
-                self.historical_data.append((sender_id, timestamp, transaction_type, data))     # Add a tuple to the list to show in table
+                historical_data.append((sender_id, timestamp, transaction_type, data))     # Add a tuple to the list to show in table
         except:
             print("Problem trying to parse the history transactions")
 
-        #self.historical_data = [("Sender ID 1", "Time stamp 1", "Type 1", "Data 1"),
-        #                       ("Sender ID 2", "Time stamp 2", "Type 2", "Data 2")]
-        history_list_store = Gtk.ListStore(str, str, str, str)
-
-        # # ListStore (lists that TreeViews can display) and specify data types
-        # history_list_store = Gtk.ListStore(str, str)
-        for item in self.historical_data:
-            history_list_store.append(list(item))
-
-        # TreeView is the item that is displayed
-        history_tree_view = Gtk.TreeView(history_list_store)
-        # Enumerate to add counter (i) to loop
-
-        for i, col_title in enumerate(["Sender ID", "Time", "Type", "Data"]):
-            # Render means draw or display the data (just display as normal text)
-            renderer = Gtk.CellRendererText()
-            renderer.props.wrap_width = 250
-            # Create columns (text is column number)
-            column = Gtk.TreeViewColumn(col_title, renderer, text=i)
-            # Make column sortable and selectable
-            column.set_sort_column_id(i)
-            # Add columns to TreeView
-            history_tree_view.append_column(column)
-
-        self.page2.add(history_tree_view)
-        self.notebook.append_page(self.page2, Gtk.Label('History'))
-
-        # 3rd Tab
-        self.page3 = Gtk.ScrolledWindow()
-        self.page3.set_border_width(10)
-
-        # Required columns for History tab
-        self.user_data = []     # List of users and their suse values to be rendered
         suse_sums = {}          # dictionary to sum up suse values for each user
 
         # Loop through all transactions of type suse, parse user id and suse awarded
@@ -212,46 +228,23 @@ class MainWindow(Gtk.Window):
             else:
                 suse_sums[user_github_username] = suse_awarded
 
-        # Add user and sum values to self.user_data to be rendered
+        # Add user and sum values to user_data to be rendered
         for user_github_username, suse_sum in suse_sums.items():
             suse_sum_formatted = str(format(suse_sum, '.2f'))
-            self.user_data.append((user_github_username, suse_sum_formatted))     # Adds tuple to the user_data for rendering
+            user_data.append((user_github_username, suse_sum_formatted))     # Adds tuple to the user_data for rendering
 
-        # Adding them dynamically now
-        #self.user_data = [("User ID 1", "Suse 1"),
-        #                  ("User ID 2", "Suse 2")]
-        user_list_store = Gtk.ListStore(str, str)
+        return historical_data, user_data
 
-        self.listbox_users = Gtk.ListBox()
-        self.listbox_users.set_selection_mode(Gtk.SelectionMode.NONE)
-
-        # # ListStore (lists that TreeViews can display) and specify data types
-        # user_list_store = Gtk.ListStore(str, str)
+    def on_history(self, result):
+        """
+        on_history - fill the history and users tabs
+        :param result: (history rows, user rows)
+        """
+        self.historical_data, self.user_data = result
+        for item in self.historical_data:
+            self.history_list_store.append(list(item))
         for item in self.user_data:
-            #print(item)
-            user_list_store.append(list(item))
-
-        # TreeView is the item that is displayed
-        user_tree_view = Gtk.TreeView(user_list_store)
-        # Enumerate to add counter (i) to loop
-
-        for i, col_title in enumerate(["User ID", "Suse"]):
-            # Render means draw or display the data (just display as normal text)
-            renderer = Gtk.CellRendererText()
-            renderer.props.wrap_width = 250
-            # Create columns (text is column number)
-            column = Gtk.TreeViewColumn(col_title, renderer, text=i)
-            # Make column sortable and selectable
-            column.set_sort_column_id(i)
-            # Add columns to TreeView
-            user_tree_view.append_column(column)
-
-        self.page3.add(user_tree_view)
-        self.notebook.append_page(self.page3, Gtk.Label('Users'))
-
-        self.connect("delete-event", Gtk.main_quit)
-        self.set_position(Gtk.WindowPosition.CENTER)
-        self.show_all()
+            self.user_list_store.append(list(item))
 
     def _beautify_code_smells(self, code_smells):
         data = "\n"
@@ -262,30 +255,21 @@ class MainWindow(Gtk.Window):
         return data
 
     def github_user_id_to_username(self, id):
-        global TOKEN
-
-        username = ""
+        """
+        github_user_id_to_username - return the username of a GitHub user id
+        :param id: GitHub user id
+        :returns: username, the id when the username is unknown
+        """
         if id in self.username_mappings:
-            #print("Found a user in username mappings")
-            username = self.username_mappings[id]
-            return username
+            return self.username_mappings[id]
 
-        try:
-            headers = {'Authorization': ('Token ' + TOKEN)}		# Adds token to authorize as the Susereum bot
-            url = "https://api.github.com/user/" + id
-            r = requests.get(url, headers=headers)
-            username = r.json()['login'].encode('ascii')     # unicode to ascii
-            username = str(username)[2:-1]
-            self.username_mappings[id] = username
-
-            return username
-        except:
-            print("Problem trying to convert GitHub user id to username. You only have 5000 authenticated requests/hour.")
-        return str(id)
+        username = github_users.shared().username(id, _create_installation_token)
+        self.username_mappings[id] = username
+        return username
 
     def blockchain_requests(self, api_port, endpoint):
         """
-        Makes GET request to blockchain. Hard coded server IP.
+        Makes GET request to blockchain. Server IP from SUSEREUM_API_HOST, the Susereum server by default.
 
         Args:
             api_port: The port of the blockchain REST API you want to query
@@ -293,7 +277,7 @@ class MainWindow(Gtk.Window):
         Returns:
             A JSON dictionary of the response
         """
-        SERVER_IP = '129.108.7.2'
+        SERVER_IP = os.getenv('SUSEREUM_API_HOST', '129.108.7.2')
         url = "http://" + SERVER_IP + ":" + str(api_port) + endpoint
         #print("URL requesting: " + url)
         r = requests.get(url)
@@ -5,10 +5,14 @@ import gi, time
 import requests
 import subprocess
 import os
+import sys
 gi.require_version("Gtk", "3.0")
 from gi.repository import Gtk
 from ErrorDialog import ErrorDialog
 
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), 'Sawtooth', 'families'))
+from common.suse_config import load_suse_config, write_suse_config
+
 """
 Add code smells screen for Susereum.
 Users can navigate to this screen after adding a new project in order to enter initial smells.
@@ -315,7 +319,7 @@ class MainWindow(Gtk.Window):
         """
         #TODO change default vals
         #TODO Christian, Abel needs the REPO ID as well from here.
-        suse = open(self.suse_path,'r')
+        return load_suse_config(self.suse_path)
 
     def are_valid_smells(self):
         int_measures = {'Large class': self.txt_large_class.get_text(),
@@ -384,9 +388,8 @@ class MainWindow(Gtk.Window):
                      str(self.txt_large_param.get_text()),
                      str(self.txt_small_method.get_text())]
 
-            #write to suse
-            suse = open(self.suse_path, 'w')
-            suse.write('''# Copyright 2017 Intel Corporation
+            #written in one rename, readers never see half a file
+            suse = ('''# Copyright 2017 Intel Corporation
 #
 # Licensed under the Apache License, Version 2.0 (the "License");
 # you may not use this file except in compliance with the License.
@@ -404,29 +407,29 @@ class MainWindow(Gtk.Window):
 #
 # Sawtooth -- Settings Transaction Processor Configuration
 #\n''')
-        suse.write('[about]'+'\n')
-        suse.write('NewuserLink = "'+self.url+'"'+'\n')
-        suse.write('Title = "Code Smell Family Configuration"'+'\n')
-        suse.write('\n')
-        suse.write('[vote_setting]'+'\n')
-        suse.write('proposal_active_days = '+smell[0]+'\n')
-        suse.write('approval_treshold = '+smell[1]+'\n')
-        suse.write('\n')
-        suse.write('[code_smells.class]'+'\n')
-        suse.write('LargeClass = ['+smell[2]+',1,]\n')
-        suse.write('GodClass = ['+smell[3]+',1,]\n')
-        suse.write('SmallClass = ['+smell[4]+',1,]\n')
-        suse.write('InappropriateIntimacy = ['+smell[5]+',1,]\n')
-        suse.write('\n')
-        suse.write('[code_smells.comments]'+'\n')
-        suse.write('CommentsToCodeRatioUpper = ['+smell[6]+',1.0,]\n')
-        suse.write('CommentsToCodeRatioLower = ['+smell[7]+',1.0,]\n')
-        suse.write('\n')
-        suse.write('[code_smells.method]'+'\n')
-        suse.write('LargeMethod = ['+smell[8]+',1,]\n')
-        suse.write('LargeParameterList = ['+smell[9]+',1,]\n')
-        suse.write('SmallMethod = ['+smell[10]+',1,]\n')
-        suse.close()
+            suse += '[about]'+'\n'
+            suse += 'NewuserLink = "'+self.url+'"'+'\n'
+            suse += 'Title = "Code Smell Family Configuration"'+'\n'
+            suse += '\n'
+            suse += '[vote_setting]'+'\n'
+            suse += 'proposal_active_days = '+smell[0]+'\n'
+            suse += 'approval_treshold = '+smell[1]+'\n'
+            suse += '\n'
+            suse += '[code_smells.class]'+'\n'
+            suse += 'LargeClass = ['+smell[2]+',1,]\n'
+            suse += 'GodClass = ['+smell[3]+',1,]\n'
+            suse += 'SmallClass = ['+smell[4]+',1,]\n'
+            suse += 'InappropriateIntimacy = ['+smell[5]+',1,]\n'
+            suse += '\n'
+            suse += '[code_smells.comments]'+'\n'
+            suse += 'CommentsToCodeRatioUpper = ['+smell[6]+',1.0,]\n'
+            suse += 'CommentsToCodeRatioLower = ['+smell[7]+',1.0,]\n'
+            suse += '\n'
+            suse += '[code_smells.method]'+'\n'
+            suse += 'LargeMethod = ['+smell[8]+',1,]\n'
+            suse += 'LargeParameterList = ['+smell[9]+',1,]\n'
+            suse += 'SmallMethod = ['+smell[10]+',1,]\n'
+            write_suse_config(self.suse_path, suse)
 
     def save_smells(self, widget):
         """
@@ -0,0 +1,269 @@
+#!/usr/bin/env python2
+
+"""
+Durable event queue of the GitHub API Interface.
+Webhooks are written to a SQLite database (WAL journal) as soon as their signature is verified and GitHub gets its
+answer right away. A pool of workers processes the events afterwards. An event is stored once per delivery id, so a
+delivery sent again by GitHub is not processed twice, and events left unfinished by a crash are processed again at
+the next start. Events of the same repository are processed one at a time, in the order they were received.
+The database also keeps the installation of each repo, messages from Sawtooth only carry the repo id, and the pushes
+waiting in the push coalescer, so a push is not lost once its event is marked done.
+"""
+
+import time
+import sqlite3
+import threading
+
+QUEUE_PATH = 'event_queue.db'
+WORKERS = 4
+MAX_ATTEMPTS = 3
+# Seconds a worker waits for new events before checking the database again
+POLL_INTERVAL = 5
+# Finished events are kept this long to recognize deliveries sent again
+KEEP_DONE = 7 * 24 * 60 * 60
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+class EventQueue:
+	""" Events waiting to be processed, stored in SQLite """
+	def __init__(self, path=QUEUE_PATH):
+		"""
+		Args:
+			path (string): Path of the database
+		"""
+		self.path = path
+		self.local = threading.local()
+		self.available = threading.Condition()
+		connection = self._connection()
+		connection.execute('PRAGMA journal_mode=WAL')
+		connection.execute("""CREATE TABLE IF NOT EXISTS events (
+			id INTEGER PRIMARY KEY AUTOINCREMENT,
+			delivery_id TEXT UNIQUE NOT NULL,
+			event TEXT NOT NULL,
+			repo_id TEXT,
+			payload TEXT NOT NULL,
+			state TEXT NOT NULL,
+			attempts INTEGER NOT NULL DEFAULT 0,
+			received REAL NOT NULL,
+			updated REAL NOT NULL)""")
+		connection.execute('CREATE INDEX IF NOT EXISTS events_state ON events (state, id)')
+		connection.execute("""CREATE TABLE IF NOT EXISTS installations (
+			repo_id TEXT PRIMARY KEY,
+			installation_id TEXT NOT NULL,
+			updated REAL NOT NULL)""")
+		connection.execute("""CREATE TABLE IF NOT EXISTS pending_pushes (
+			repo_id TEXT NOT NULL,
+			ref TEXT NOT NULL,
+			first REAL NOT NULL,
+			state TEXT NOT NULL,
+			PRIMARY KEY (repo_id, ref))""")
+		# Events running when the interface stopped are processed again
+		connection.execute('UPDATE events SET state = ? WHERE state = ?', (QUEUED, RUNNING))
+		connection.commit()
+
+	def put(self, delivery_id, event, repo_id, payload):
+		"""
+		Stores an event, returns False if the delivery was already received
+
+		Args:
+			delivery_id (string): The X-GitHub-Delivery header, unique per delivery
+			event (string): The X-GitHub-Event header
+			repo_id (string): The repo of the event, None if it has no repo
+			payload (string): The raw payload
+		"""
+		now = time.time()
+		connection = self._connection()
+		cursor = connection.execute(
+			'INSERT OR IGNORE INTO events (delivery_id, event, repo_id, payload, state, received, updated) '
+			'VALUES (?, ?, ?, ?, ?, ?, ?)',
+			(delivery_id, event, repo_id, payload, QUEUED, now, now))
+		connection.commit()
+		if cursor.rowcount == 0:
+			return False
+		with self.available:
+			self.available.notify()
+		return True
+
+	def take(self, timeout=POLL_INTERVAL):
+		"""
+		Returns the oldest queued event whose repo has no running event and marks it running,
+		None if there is none within the timeout
+
+		Args:
+			timeout (float): Seconds to wait for an event
+		"""
+		deadline = time.time() + timeout
+		while True:
+			row = self._claim()
+			if row is not None:
+				return row
+			remaining = deadline - time.time()
+			if remaining <= 0:
+				return None
+			with self.available:
+				self.available.wait(remaining)
+
+	def done(self, id):
+		"""
+		Marks an event processed
+
+		Args:
+			id (int): The id of the event in the queue
+		"""
+		self._set_state(id, DONE)
+
+	def retry(self, id, attempts):
+		"""
+		Queues a failed event again, it is given up after MAX_ATTEMPTS
+
+		Args:
+			id (int): The id of the event in the queue
+			attempts (int): Attempts made, including the failed one
+		"""
+		self._set_state(id, QUEUED if attempts < MAX_ATTEMPTS else FAILED)
+
+	def purge(self):
+		""" Deletes the events finished more than KEEP_DONE seconds ago """
+		connection = self._connection()
+		connection.execute('DELETE FROM events WHERE state IN (?, ?) AND updated < ?',
+			(DONE, FAILED, time.time() - KEEP_DONE))
+		connection.commit()
+
+	def set_installation(self, repo_id, installation_id):
+		"""
+		Stores the installation of a repo
+
+		Args:
+			repo_id (string): The GitHub ID of the repo
+			installation_id (string): The installation the repo belongs to
+		"""
+		connection = self._connection()
+		connection.execute('INSERT OR REPLACE INTO installations (repo_id, installation_id, updated) VALUES (?, ?, ?)',
+			(str(repo_id), str(installation_id), time.time()))
+		connection.commit()
+
+	def installation(self, repo_id):
+		"""
+		Returns the installation of a repo, None if no event of the repo was received
+
+		Args:
+			repo_id (string): The GitHub ID of the repo
+		"""
+		row = self._connection().execute('SELECT installation_id FROM installations WHERE repo_id = ?',
+			(str(repo_id),)).fetchone()
+		return row[0] if row is not None else None
+
+	def save_push(self, repo_id, ref, first, state):
+		"""
+		Stores the commits of a branch waiting in the push coalescer
+
+		Args:
+			repo_id (string): The GitHub ID of the repo
+			ref (string): The branch
+			first (float): Time of the first push of the window
+			state (string): The pending push, encoded as json
+		"""
+		connection = self._connection()
+		connection.execute('INSERT OR REPLACE INTO pending_pushes (repo_id, ref, first, state) VALUES (?, ?, ?, ?)',
+			(repo_id, ref, first, state))
+		connection.commit()
+
+	def delete_push(self, repo_id, ref, first):
+		"""
+		Deletes the pending push of a branch once its commits were sent, a window opened since then is kept
+
+		Args:
+			repo_id (string): The GitHub ID of the repo
+			ref (string): The branch
+			first (float): Time of the first push of the flushed window
+		"""
+		connection = self._connection()
+		connection.execute('DELETE FROM pending_pushes WHERE repo_id = ? AND ref = ? AND first = ?', (repo_id, ref, first))
+		connection.commit()
+
+	def pending_pushes(self):
+		""" Returns the pending pushes as (repo id, ref, state) """
+		return self._connection().execute('SELECT repo_id, ref, state FROM pending_pushes').fetchall()
+
+	def _claim(self):
+		""" Marks the next event running in a single write transaction so two workers never take the same event """
+		connection = self._connection()
+		connection.execute('BEGIN IMMEDIATE')
+		try:
+			row = connection.execute(
+				'SELECT id, delivery_id, event, payload, attempts FROM events WHERE state = ? AND '
+				'(repo_id IS NULL OR repo_id NOT IN (SELECT repo_id FROM events WHERE state = ? AND repo_id IS NOT NULL)) '
+				'ORDER BY id LIMIT 1', (QUEUED, RUNNING)).fetchone()
+			if row is not None:
+				connection.execute('UPDATE events SET state = ?, attempts = attempts + 1, updated = ? WHERE id = ?',
+					(RUNNING, time.time(), row[0]))
+			connection.commit()
+		except:
+			connection.rollback()
+			raise
+		if row is None:
+			return None
+		return {'id': row[0], 'delivery_id': row[1], 'event': row[2], 'payload': row[3], 'attempts': row[4] + 1}
+
+	def _set_state(self, id, state):
+		connection = self._connection()
+		connection.execute('UPDATE events SET state = ?, updated = ? WHERE id = ?', (state, time.time(), id))
+		connection.commit()
+		# A finished event may unblock the next event of its repo
+		with self.available:
+			self.available.notify_all()
+
+	def _connection(self):
+		"""
+		Returns the connection of the calling thread, sqlite connections can not be shared between threads.
+		Statements commit on their own (isolation_level=None), _claim opens its transaction explicitly.
+		"""
+		connection = getattr(self.local, 'connection', None)
+		if connection is None:
+			connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+			self.local.connection = connection
+		return connection
+
+class EventWorkers:
+	""" Pool of threads processing the queued events """
+	def __init__(self, queue, handler, workers=WORKERS):
+		"""
+		Args:
+			queue (EventQueue): The queue to process
+			handler (function): Called with (event, payload), raises to have the event retried
+			workers (int): Number of threads
+		"""
+		self.queue = queue
+		self.handler = handler
+		self.workers = workers
+		self.stopped = threading.Event()
+		self.threads = []
+
+	def start(self):
+		""" Starts the workers """
+		self.queue.purge()
+		for _ in range(self.workers):
+			thread = threading.Thread(target=self._work)
+			thread.daemon = True
+			thread.start()
+			self.threads.append(thread)
+
+	def stop(self):
+		""" Stops the workers once their current event is processed """
+		self.stopped.set()
+
+	def _work(self):
+		""" Processes events until stopped """
+		while not self.stopped.is_set():
+			event = self.queue.take()
+			if event is None:
+				continue
+			try:
+				self.handler(event['event'], event['payload'])
+				self.queue.done(event['id'])
+			except Exception as e:
+				print "Problem processing " + event['event'] + " event " + event['delivery_id'] + ": " + str(e)
+				self.queue.retry(event['id'], event['attempts'])
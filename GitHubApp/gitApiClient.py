@@ -0,0 +1,287 @@
+#!/usr/bin/env python2
+
+"""
+GitHub API client shared by the GitHub API Interface.
+All requests go through one pooled session. GET requests send the ETag of the last answer so an unchanged resource
+answers 304 Not Modified, which does not count against the rate limit. Lists are read page by page following the
+Link header. Requests are paced by a token bucket refilled from the X-RateLimit-* headers, and the client waits when
+GitHub asks it to slow down (secondary rate limits). GitHub counts the rate limit of each installation separately, so
+each installation has its own token bucket and its own ETag cache.
+"""
+
+import time
+import json
+import threading
+from collections import OrderedDict
+
+import requests
+from requests.adapters import HTTPAdapter
+
+PER_PAGE = 100
+POOL_SIZE = 8
+TIMEOUT = (3.05, 30)
+MAX_RETRIES = 3
+ETAG_CACHE_SIZE = 1000
+# GitHub asks for at least one second between requests that create or change content
+WRITE_INTERVAL = 1.0
+# Default wait when GitHub reports a secondary rate limit without Retry-After
+SECONDARY_LIMIT_WAIT = 60
+
+class GitApiError(Exception):
+	""" Request to the GitHub API failed """
+	def __init__(self, message, status_code=None):
+		Exception.__init__(self, message)
+		self.status_code = status_code
+
+class TokenBucket:
+	"""
+	Paces the requests to spread the remaining rate limit over the time left before it resets.
+	The bucket is refilled from the X-RateLimit-Remaining and X-RateLimit-Reset headers of each answer.
+	"""
+	def __init__(self, capacity=10):
+		"""
+		Args:
+			capacity (int): Requests that can be sent at once before pacing starts
+		"""
+		self.capacity = capacity
+		self.tokens = float(capacity)
+		self.rate = None		# Tokens per second, None until GitHub reports the rate limit
+		self.remaining = None
+		self.reset = None
+		self.updated = time.time()
+		self.lock = threading.Lock()
+
+	def update(self, headers):
+		"""
+		Refills the bucket from the rate limit headers of an answer
+
+		Args:
+			headers (dict): Headers of a GitHub answer
+		"""
+		try:
+			remaining = int(headers['X-RateLimit-Remaining'])
+			reset = float(headers['X-RateLimit-Reset'])
+		except (KeyError, ValueError):
+			return
+		with self.lock:
+			self.remaining = remaining
+			self.reset = reset
+			self.rate = remaining / max(1.0, reset - time.time())
+			self.tokens = min(self.tokens, float(remaining))
+
+	def acquire(self):
+		"""
+		Waits until a request can be sent
+		"""
+		while True:
+			with self.lock:
+				now = time.time()
+				if self.reset is not None and now >= self.reset:
+					# The rate limit window is over, GitHub reports the new one with the next answer
+					self.rate = None
+					self.remaining = None
+					self.reset = None
+					self.tokens = float(self.capacity)
+				if self.rate is not None:
+					self.tokens = min(float(self.capacity), self.tokens + (now - self.updated) * self.rate)
+				self.updated = now
+				if self.rate is None or self.tokens >= 1:
+					self.tokens = max(0.0, self.tokens - 1)
+					return
+				if self.remaining == 0 or self.rate == 0:
+					wait = self.reset - now
+				else:
+					wait = (1 - self.tokens) / self.rate
+			time.sleep(max(0.01, wait))
+
+class GitApiClient:
+	""" Sends the requests of the app to the GitHub API """
+	def __init__(self, get_token):
+		"""
+		Args:
+			get_token (function): Returns the token of an installation, authorizes as the Susereum bot
+		"""
+		self.get_token = get_token
+		self.session = requests.Session()
+		adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+		self.session.mount('https://', adapter)
+		self.buckets = {}		# installation id: TokenBucket
+		self.buckets_lock = threading.Lock()
+		self.etags = OrderedDict()		# (installation id, url): (etag, json, links), least recently used first
+		self.etags_lock = threading.Lock()
+		self.write_lock = threading.Lock()
+		self.last_write = 0
+
+	def get(self, URL, params=None, installation_id=None):
+		"""
+		Sends a GET request, an unchanged resource is returned from the ETag cache
+
+		Args:
+			URL (string): The URL to send the GET request to (ex. https://api.github.com/repositories/152342203)
+			params (dict): Query parameters
+			installation_id (int): The installation the resource belongs to
+		"""
+		return self._get_json(URL, params, installation_id)[0]
+
+	def paginate(self, URL, params=None, installation_id=None):
+		"""
+		Generator over the items of a list resource, the next pages are requested as the items are consumed
+
+		Args:
+			URL (string): The URL of the first page (ex. https://api.github.com/repositories/152342203/commits)
+			params (dict): Query parameters of the first page, the next pages keep them in the Link header
+			installation_id (int): The installation the resource belongs to
+		"""
+		params = dict(params or {})
+		params.setdefault('per_page', PER_PAGE)
+		while URL:
+			items, links = self._get_json(URL, params, installation_id)
+			if not isinstance(items, list):
+				# Error message instead of a page (ex. empty repository)
+				return
+			for item in items:
+				yield item
+			URL = links.get('next', {}).get('url')
+			params = None
+
+	def put(self, URL, data, installation_id=None):
+		"""
+		Sends a PUT request
+
+		Args:
+			URL (string): The URL to send the PUT request to
+			data (dict): The payload, encoded as json
+			installation_id (int): The installation the resource belongs to
+		"""
+		return self.request('PUT', URL, data=json.dumps(data), installation_id=installation_id).status_code
+
+	def request(self, method, URL, params=None, data=None, headers=None, installation_id=None):
+		"""
+		Sends a request paced by the rate limit, retries when GitHub asks to slow down
+
+		Args:
+			method (string): GET, PUT, POST
+			URL (string): The URL of the resource
+			params (dict): Query parameters
+			data (string): The body of the request
+			headers (dict): Extra headers
+			installation_id (int): The installation the resource belongs to
+		"""
+		headers = dict(headers or {})
+		headers['Authorization'] = 'Token ' + self.get_token(installation_id)
+		if method != 'GET':
+			self._pace_write()
+
+		bucket = self._bucket(installation_id)
+		for attempt in range(MAX_RETRIES + 1):
+			bucket.acquire()
+			try:
+				response = self.session.request(method, URL, params=params, data=data, headers=headers, timeout=TIMEOUT)
+			except requests.RequestException as e:
+				if attempt == MAX_RETRIES:
+					raise GitApiError("Failed to connect to " + URL + ": " + str(e))
+				time.sleep(2 ** attempt)
+				continue
+
+			bucket.update(response.headers)
+			wait = self._limit_wait(response)
+			if wait is None or attempt == MAX_RETRIES:
+				return response
+			print "GitHub rate limit reached, waiting " + str(int(wait)) + " seconds"
+			time.sleep(wait)
+		return response
+
+	def _get_json(self, URL, params, installation_id):
+		"""
+		Sends a conditional GET request
+
+		Args:
+			URL (string): The URL of the resource
+			params (dict): Query parameters
+			installation_id (int): The installation the resource belongs to
+
+		Returns:
+			(json, links): The content and the links of the Link header
+		"""
+		# An installation only gets the answers it was allowed to read
+		key = (_installation_key(installation_id), requests.Request('GET', URL, params=params).prepare().url)
+		headers = {}
+		with self.etags_lock:
+			cached = self.etags.get(key)
+		if cached is not None:
+			headers['If-None-Match'] = cached[0]
+
+		response = self.request('GET', URL, params=params, headers=headers, installation_id=installation_id)
+		if response.status_code == 304 and cached is not None:
+			with self.etags_lock:
+				self.etags.pop(key, None)
+				self.etags[key] = cached
+			return cached[1], cached[2]
+
+		json_data = json.loads(response.text)
+		etag = response.headers.get('ETag')
+		if response.status_code == 200 and etag:
+			with self.etags_lock:
+				self.etags.pop(key, None)
+				self.etags[key] = (etag, json_data, response.links)
+				while len(self.etags) > ETAG_CACHE_SIZE:
+					self.etags.popitem(last=False)
+		return json_data, response.links
+
+	def _bucket(self, installation_id):
+		"""
+		Returns the token bucket of an installation
+
+		Args:
+			installation_id (int): The installation the request is sent for
+		"""
+		key = _installation_key(installation_id)
+		with self.buckets_lock:
+			bucket = self.buckets.get(key)
+			if bucket is None:
+				bucket = TokenBucket()
+				self.buckets[key] = bucket
+			return bucket
+
+	def _pace_write(self):
+		"""
+		Keeps one second between the requests that change content
+		"""
+		with self.write_lock:
+			wait = self.last_write + WRITE_INTERVAL - time.time()
+			if wait > 0:
+				time.sleep(wait)
+			self.last_write = time.time()
+
+	def _limit_wait(self, response):
+		"""
+		Returns the seconds to wait before retrying a request refused by a rate limit, None if it was not refused
+
+		Args:
+			response (Response): The answer of GitHub
+		"""
+		if response.status_code not in (403, 429):
+			return None
+		retry_after = response.headers.get('Retry-After')
+		if retry_after is not None:
+			try:
+				return float(retry_after)
+			except ValueError:
+				pass
+		if response.headers.get('X-RateLimit-Remaining') == '0':
+			try:
+				return max(1.0, float(response.headers['X-RateLimit-Reset']) - time.time())
+			except (KeyError, ValueError):
+				pass
+		if 'secondary rate limit' in response.text or 'abuse' in response.text:
+			return SECONDARY_LIMIT_WAIT
+		return None
+
+def _installation_key(installation_id):
+	"""
+	Returns the key of an installation in the buckets and the ETag cache, ids arrive as numbers or strings
+
+	Args:
+		installation_id (int): The installation id, None for the default installation
+	"""
+	return None if installation_id is None else str(installation_id)
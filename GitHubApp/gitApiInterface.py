@@ -6,16 +6,25 @@ GitHub API Interface responsible for how Susereum communicates with GitHub.
 
 import web
 import os
+import sys
+import signal
 import json
 import hmac
 import hashlib
 import requests
 from requests_oauthlib import OAuth1
-import jwt
 import datetime
-import calendar
 import base64
 import toml
+import uuid
+from gitApiClient import GitApiClient
+from tokenManager import TokenManager
+from eventQueue import EventQueue, EventWorkers
+from pushCoalescer import PushCoalescer
+
+# Installation used by the messages of Central Server Scripts and Sawtooth for a repo not seen in a webhook yet
+DEFAULT_INSTALLATION_ID = "363304"
+REPO_INSTALLATIONS = {}		# repo id: installation id, learned from the webhook payloads and kept in the event queue
 
 class RequestHandler:
 	def _analyze_commit_history(self, repo_id, repo_name):
@@ -29,7 +38,7 @@ class RequestHandler:
 		"""
 		try:
 			url = "https://api.github.com/repositories/" + str(repo_id) + "/commits"
-			commits = self._git_get(url)	# Retreives the list of commits
+			commits = GIT.paginate(url, installation_id=self.installation_id)	# Retreives every page of the list of commits, page by page
 			for commit in commits:
 				# Parse info
 				commit_url = commit['url']
@@ -51,12 +60,7 @@ class RequestHandler:
 				formatted_ts = datetime_object.strftime('%Y-%m-%d-%H-%M-%S')
 
 				# Call Central Server Script commit handler
-				push_command_file = open("push_command", "r")
-				push_command_file = push_command_file.read()
-				push_command_file.rstrip()	# Remove newlines from command
-				command = push_command_file.format(str(sender_id), str(repo_id), repo_name, commit_url, formatted_ts)
-				#print "Command I'm running: " + command
-				os.system(command)
+				_run_push_command(sender_id, repo_id, repo_name, commit_url, formatted_ts)
 		except:
 			print("An exception occured trying to analyze all the past commit history")
 	def _handle_measure_change(self, payload):
@@ -153,36 +157,18 @@ class RequestHandler:
 
 	def _push_event(self, payload):
 		"""
-		Handles a GitHub Push Webhook event. Sends to Central Server Scripts commit handler script.
+		Handles a GitHub Push Webhook event. Every commit of the push is collected by the push coalescer, which
+		sends the commits to analyze to Central Server Scripts commit handler script once the branch is quiet.
 
 		Args:
 			payload (dict): A push event payload from GitHub
 		"""
-		# Parsing useful info
-		sender_id = payload['sender']['id']
-		repo_id = payload['repository']['id']
-		repo_name = payload['repository']['name']
-		commit_url = payload['head_commit']['url']
-		timestamp = payload['repository']['updated_at']		# At UTC time
-		
-		# Format timestamp as yyyy-mm-dd-hh-mm
-		datetime_object = datetime.datetime.strptime(timestamp, '%Y-%m-%dT%H:%M:%SZ')
-		formatted_ts = datetime_object.strftime('%Y-%m-%d-%H-%M-%S')
-		
-		print "Sender ID: " + str(sender_id)
-		print "Repo ID: " + str(repo_id)
-		print "Repo Name: " + repo_name
-		print "Commit URL: " + commit_url
-		print "Timestamp: " + formatted_ts
-
-		# Call commit handler Central Server script
-		# TODO: Check URL for spaces (if users input a malicious URL)		
-		push_command_file = open("push_command", "r")
-		push_command_file = push_command_file.read()
-		push_command_file.rstrip()	# Remove newlines from command
-		command = push_command_file.format(str(sender_id), str(repo_id), repo_name, commit_url, formatted_ts)
-		print "Command I'm running: " + command
-		os.system(command)
+		print "Sender ID: " + str(payload['sender']['id'])
+		print "Repo ID: " + str(payload['repository']['id'])
+		print "Repo Name: " + payload['repository']['name']
+		print "Branch: " + payload['ref']
+		print "Commits: " + str(len(payload.get('commits', [])))
+		COALESCER.add(payload)
 
 	def _installation_event(self, payload):
 		"""
@@ -352,10 +338,7 @@ approval_treshold=3
 		Args:
 			URL (string): The URL to send the GET request to (ex. https://api.github.com/repositories/152342203)
 		"""
-		headers = {'Authorization': ('Token ' + TOKEN)}		# Adds token to authorize as the Susereum bot
-		raw_data = requests.get(URL, headers=headers)
-		json_data = json.loads(raw_data.text)
-		return json_data
+		return GIT.get(URL, installation_id=self.installation_id)
 
 	def _git_put(self, URL, data):
 		"""
@@ -365,11 +348,7 @@ approval_treshold=3
 			URL (string): The URL to send the PUT request to (ex. https://api.github.com/repositories/155309878/contents/SuseMeasures.suse)
 			data (string): The payload you want to put (ex. the contents of the .suse file to override the current contents)
 		"""
-		global TOKEN
-		data = json.dumps(data)		# This encodes the data as json, which is necessary bc we have nested json data
-		headers = {'Authorization': ('Token ' + TOKEN)}		# Adds token to authorize as the Susereum bot
-		raw_data = requests.put(URL, data=data, headers=headers)
-		return raw_data.status_code
+		return GIT.put(URL, data, installation_id=self.installation_id)	# Encodes the data as json, which is necessary bc we have nested json data
 
 	def _git_update(self, URL, data):
 		"""
@@ -387,28 +366,51 @@ approval_treshold=3
 		return self._git_put(URL, data)
 
 	def POST(self):
-		""" Handles POST messages to this web app """
+		"""
+		Handles POST messages to this web app. Messages are only stored in the event queue and GitHub gets its
+		answer right away, the event workers process them with process().
+		"""
 		payload = web.data()
 		json_payload = json.loads(payload)
 
 		# Check if it's a Susereum internal message
-		if 'sender' in json_payload and json_payload['sender'] == 'ConfigurationURL':
+		if json_payload.get('sender') in ('ConfigurationURL', 'Sawtooth'):
+			event = json_payload['sender']
+			delivery_id = str(uuid.uuid4())
+		else:
+			# Assume that message is from GitHub
+			# Verify POST request from GitHub
+			signature = web.ctx.env.get('HTTP_X_HUB_SIGNATURE')
+			if(not self._valid_signature(signature, payload)):
+				return 'Unauthorized'
+			event = web.ctx.env.get('HTTP_X_GITHUB_EVENT')
+			# GitHub sends a redelivery with the same delivery id
+			delivery_id = web.ctx.env.get('HTTP_X_GITHUB_DELIVERY') or str(uuid.uuid4())
+
+		print '\nReceived ' + event + ' event'
+		if not QUEUE.put(delivery_id, event, _find_repo_id(json_payload), payload):
+			print 'Delivery ' + delivery_id + ' was already received'
+		web.ctx.status = '202 Accepted'
+		return 'Accepted'
+
+	def process(self, event, json_payload):
+		"""
+		Processes a message of the event queue
+
+		Args:
+			event (string): The GitHub event, or the sender of an internal message
+			json_payload (dict): The payload of the message
+		"""
+		self.installation_id = _find_installation_id(json_payload)	# Token used by the GitHub requests of this event
+
+		if event == 'ConfigurationURL':
 			print("Received ConfigurationURL from Central Server Scripts")
 			self._add_url_to_suse_file(json_payload)
-			return 'OK'
-		if 'sender' in json_payload and json_payload['sender'] == 'Sawtooth':
+			return
+		if event == 'Sawtooth':
 			self._handle_measure_change(json_payload)
-			return 'OK'
-		
-		# Assume that message is from GitHub
-		# Verify POST request from GitHub
-		signature = web.ctx.env.get('HTTP_X_HUB_SIGNATURE')
-		if(not self._valid_signature(signature, payload)):
-			return 'Unauthorized'		
-
-		# Figure out which event happend, call the function to handle it
-		event = web.ctx.env.get('HTTP_X_GITHUB_EVENT')
-		print '\nReceived ' + event + ' event'
+			return
+
 		#print 'PAYLOAD: ' + payload
 		# Map events to functions that handle those events
 		functionMapping = {
@@ -417,9 +419,11 @@ approval_treshold=3
 			'installation_repositories': self._install_event_to_ignore,
 		}
 		generic_func = functionMapping.get(event)	# Figure out which handler function to use
+		if generic_func is None:
+			print 'No handler for ' + event + ' event'
+			return
 		generic_func(json_payload)	# Call handler function with json payload
-		return 'OK'
-	
+
 def _create_listener():
 	""" Creates the web.py application """
 	url_regex = '/.*'        # Captures requests at this URL
@@ -428,6 +432,108 @@ def _create_listener():
 	urls = (url_regex, class_handler)
 	return web.application(urls, globals())	
 
+def _create_git_client():
+	"""
+	Creates the GitHub API client shared by all the requests, it authorizes with the cached installation tokens
+	"""
+	global GIT, TOKENS
+	TOKENS = TokenManager(APP_IDENTIFIER, PRIVATE_KEY)
+	TOKENS.token(DEFAULT_INSTALLATION_ID)		# Fails early when the app credentials are wrong
+	TOKENS.start()		# Renews the tokens before they expire
+	GIT = GitApiClient(lambda installation_id: TOKENS.token(installation_id or DEFAULT_INSTALLATION_ID))
+
+def _process_event(event, payload):
+	"""
+	Called by the event workers with each queued message
+
+	Args:
+		event (string): The GitHub event, or the sender of an internal message
+		payload (string): The raw payload
+	"""
+	RequestHandler().process(event, json.loads(payload))
+
+def _run_push_command(sender_id, repo_id, repo_name, commit_url, formatted_ts):
+	"""
+	Calls Central Server Scripts commit handler to analyze a commit
+
+	Args:
+		sender_id (int): The GitHub ID credited for the commit
+		repo_id (int): The GitHub ID for the project repository
+		repo_name (string): The name of the GitHub repository
+		commit_url (string): The URL of the commit
+		formatted_ts (string): The commit time as yyyy-mm-dd-hh-mm-ss
+	"""
+	# TODO: Check URL for spaces (if users input a malicious URL)
+	push_command_file = open("push_command", "r")
+	push_command_file = push_command_file.read()
+	push_command_file.rstrip()	# Remove newlines from command
+	command = push_command_file.format(str(sender_id), str(repo_id), repo_name, commit_url, formatted_ts)
+	print "Command I'm running: " + command
+	os.system(command)
+
+def _create_push_coalescer():
+	"""
+	Creates the push coalescer, commit authors are resolved to their GitHub id to credit them. The pending pushes are
+	kept in the event queue database, the ones left by the previous run are restored.
+	"""
+	global COALESCER
+	COALESCER = PushCoalescer(_run_push_command, lambda username, installation_id:
+		GIT.get('https://api.github.com/users/' + username, installation_id=installation_id).get('id'), store=QUEUE)
+	COALESCER.restore()
+
+def _open_event_queue():
+	""" Opens the event queue """
+	global QUEUE
+	QUEUE = EventQueue()
+
+def _start_event_workers():
+	""" Starts the workers that process the event queue """
+	EventWorkers(QUEUE, _process_event).start()
+
+def _find_repo_id(payload):
+	"""
+	Returns the repo a message is about, the events of a repo are processed in order
+
+	Args:
+		payload (dict): The payload of the message
+	"""
+	if 'repository' in payload:
+		return str(payload['repository']['id'])
+	if payload.get('repositories_added'):
+		return str(payload['repositories_added'][0]['id'])
+	repo_id = payload.get('repo', payload.get('repoID'))
+	return str(repo_id) if repo_id is not None else None
+
+def _find_installation_id(payload):
+	"""
+	Returns the installation a message belongs to. GitHub events carry it, the messages of Central Server Scripts
+	and Sawtooth only carry the repo id. The installation of each repo is stored in the event queue database so it is
+	still known after a restart.
+
+	Args:
+		payload (dict): The payload of the message
+	"""
+	if 'installation' in payload:
+		installation_id = str(payload['installation']['id'])
+		repos = payload.get('repositories_added', []) + payload.get('repositories', [])
+		if 'repository' in payload:
+			repos.append(payload['repository'])
+		for repo in repos:
+			repo_id = str(repo['id'])
+			if REPO_INSTALLATIONS.get(repo_id) != installation_id:
+				QUEUE.set_installation(repo_id, installation_id)
+				REPO_INSTALLATIONS[repo_id] = installation_id
+		return installation_id
+	repo_id = str(payload.get('repo', payload.get('repoID')))
+	installation_id = REPO_INSTALLATIONS.get(repo_id)
+	if installation_id is None:
+		installation_id = QUEUE.installation(repo_id)
+		if installation_id is None:
+			print 'No installation known for repo ' + repo_id + ', using the default installation'
+			return DEFAULT_INSTALLATION_ID
+		REPO_INSTALLATIONS[repo_id] = installation_id
+	return installation_id
+
 def _get_environment_vars():
 	"""
 	Gets environment variables needed to verify GitHub requests
@@ -441,40 +547,16 @@ def _get_environment_vars():
 	PRIVATE_KEY = os.environ['GITHUB_PRIVATE_KEY']
 	APP_IDENTIFIER = os.environ['GITHUB_APP_IDENTIFIER']
 
-def _create_installation_token(JWT):
-	"""
-	Generates token needed to authenticate Git API commands. You can send GitHub your JWT and installation ID
-	and GitHub will return an authentication token.
-	"""
-	global TOKEN
-	installation_id = "363304"	# This can be found in a integration_installation_repositories payload
-	URL = 'https://api.github.com/app/installations/'+installation_id+'/access_tokens'
-	headers = {'Accept': 'application/vnd.github.machine-man-preview+json',
-				'Authorization': ('Bearer ' + JWT)}
-	raw_data = requests.post(URL, headers = headers)
-	json_data = json.loads(raw_data.text)
-	TOKEN = json_data['token']
-	#print TOKEN
-
-def _generate_JWT():
-	"""
-	Creates a Json Web Token with a current time stamp and expiration time,
-	and then uses it to create an authentication token
-	"""
-	global PRIVATE_KEY, APP_IDENTIFIER 
-	current = datetime.datetime.utcnow()
-	current_time = calendar.timegm(current.timetuple())
-	
-	future = datetime.datetime.utcnow() + datetime.timedelta(minutes=10)
-	expiration_time = calendar.timegm(future.timetuple())
-	
-	payload = {'iat': current_time, 'exp': expiration_time, 'iss': APP_IDENTIFIER}
-	JWT = jwt.encode({'iat': current_time, 'exp': expiration_time, 'iss': APP_IDENTIFIER}, PRIVATE_KEY, algorithm='RS256')
-	_create_installation_token(JWT)
-	
 if __name__ == '__main__':
 	""" Begins the GitHub API Interface """
 	_get_environment_vars()
-	_generate_JWT()
+	_create_git_client()
+	_open_event_queue()
+	_create_push_coalescer()
+	_start_event_workers()
 	app = _create_listener()
-	app.run()
+	signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))	# Stops through the finally clause below
+	try:
+		app.run()
+	finally:
+		COALESCER.flush()	# The pushes waiting for their window are sent before the interface stops
@@ -0,0 +1,257 @@
+#!/usr/bin/env python2
+
+"""
+Push coalescer of the GitHub API Interface.
+Every commit of a push is considered, not only the head commit. Pushes to the same branch that arrive within a short
+window are merged, a push continuing the previous one (its before is the previous after) appends its commits and a
+forced push replaces the commits it discarded. When the window closes, consecutive commits of the same author are
+reduced to the last one: the health change between two analyzed commits is credited to a single author, so the
+commits in between do not need their own analysis. GitHub lists the commits of a push oldest first and the payload
+carries no parent links, so the order of the payload is taken as the order of the history.
+The pushes waiting for their window to close are written to the event queue database before their event is marked
+done. They are restored when the interface starts again and sent when it stops. A push with commits that could not be
+sent to analysis stays pending and is sent again when its next window closes.
+"""
+
+import os
+import json
+import time
+import datetime
+import threading
+
+# Seconds without a new push to a branch before its commits are analyzed
+COALESCE_WINDOW = int(os.environ.get('PUSH_COALESCE_WINDOW', 30))
+# A branch pushed continuously is still analyzed after this many windows
+MAX_WINDOWS = 5
+# Commits already sent for analysis, remembered to skip them when they are pushed to another branch
+SEEN_COMMITS = 10000
+
+class PushCoalescer:
+	""" Collects the commits of the pushes of each branch and sends the ones to analyze """
+	def __init__(self, analyze, resolve_user=None, window=COALESCE_WINDOW, store=None):
+		"""
+		Args:
+			analyze (function): Called with (sender_id, repo_id, repo_name, commit_url, timestamp) for each commit
+				to analyze, timestamp is formatted as yyyy-mm-dd-hh-mm-ss
+			resolve_user (function): Called with (username, installation id), returns the GitHub id of the username,
+				None to credit the pusher
+			window (int): Seconds without a new push before the commits of a branch are analyzed
+			store (EventQueue): Keeps the pending pushes, None to keep them in memory only
+		"""
+		self.analyze = analyze
+		self.resolve_user = resolve_user
+		self.window = window
+		self.store = store
+		self.lock = threading.Lock()
+		self.branches = {}		# (repo id, ref): pending push
+		self.seen = set()
+		self.seen_order = []
+		self.sending = set()
+
+	def restore(self):
+		""" Loads the pushes left pending by the previous run, their window starts again """
+		if self.store is None:
+			return
+		with self.lock:
+			for repo_id, ref, state in self.store.pending_pushes():
+				key = (repo_id, ref)
+				if key in self.branches:
+					continue
+				pending = json.loads(state)
+				pending['timer'] = None
+				self.branches[key] = pending
+				self._schedule(key, pending)
+				print "Restored " + str(len(pending['commits'])) + " pending commits of " + repo_id + " " + ref
+
+	def add(self, payload):
+		"""
+		Adds the commits of a push event
+
+		Args:
+			payload (dict): A push event payload from GitHub
+		"""
+		repo_id = str(payload['repository']['id'])
+		key = (repo_id, payload['ref'])
+		sender_id = str(payload['sender']['id'])
+		commits = [dict(commit, sender_id=sender_id) for commit in payload.get('commits', [])
+					if commit.get('distinct', True)]
+		if not commits and payload.get('head_commit'):
+			commits = [dict(payload['head_commit'], sender_id=sender_id)]
+
+		with self.lock:
+			pending = self.branches.get(key)
+			if pending is None:
+				pending = {'repo_name': payload['repository']['name'], 'commits': [], 'after': None,
+							'installation_id': payload.get('installation', {}).get('id'),
+							'first': time.time(), 'timer': None}
+				self.branches[key] = pending
+			if pending['after'] is not None and payload.get('before') != pending['after']:
+				# Forced push or a push missed in between, the commits of the new push are the branch history now
+				known = set(commit['id'] for commit in commits)
+				pending['commits'] = [commit for commit in pending['commits'] if commit['id'] in known]
+			known = set(commit['id'] for commit in pending['commits'])
+			pending['commits'].extend(commit for commit in commits if commit['id'] not in known)
+			pending['after'] = payload.get('after')
+			# Written before the event is marked done, a restart finds the push here
+			self._save(key, pending)
+			self._schedule(key, pending)
+
+	def _schedule(self, key, pending):
+		"""
+		Starts the timer closing the window of a branch, called with the lock held
+
+		Args:
+			key (tuple): (repo id, ref) of the branch
+			pending (dict): The pending push of the branch
+		"""
+		if pending['timer'] is not None:
+			pending['timer'].cancel()
+		delay = min(self.window, pending['first'] + self.window * MAX_WINDOWS - time.time())
+		pending['timer'] = threading.Timer(max(0, delay), self.flush, [key])
+		pending['timer'].daemon = True
+		pending['timer'].start()
+
+	def _save(self, key, pending):
+		"""
+		Writes the pending push of a branch to the store
+
+		Args:
+			key (tuple): (repo id, ref) of the branch
+			pending (dict): The pending push of the branch
+		"""
+		if self.store is None:
+			return
+		state = dict((name, value) for name, value in pending.items() if name != 'timer')
+		self.store.save_push(key[0], key[1], pending['first'], json.dumps(state))
+
+	def flush(self, key=None):
+		"""
+		Sends the commits of a branch to analysis, all the branches if key is None
+
+		Args:
+			key (tuple): (repo id, ref) of the branch
+		"""
+		with self.lock:
+			keys = [key] if key is not None else list(self.branches)
+			flushed = []
+			for branch in keys:
+				pending = self.branches.pop(branch, None)
+				if pending is not None:
+					if pending['timer'] is not None:
+						pending['timer'].cancel()
+					flushed.append((branch, pending))
+
+		for branch, pending in flushed:
+			failed = False
+			for commit, author_id in self._commits_to_analyze(pending['commits'], pending['installation_id']):
+				try:
+					self.analyze(author_id, branch[0], pending['repo_name'], commit['url'],
+									_format_timestamp(commit['timestamp']))
+					self._sent(commit['id'], True)
+				except Exception as e:
+					print "Problem sending commit " + commit['url'] + " to analysis: " + str(e)
+					self._sent(commit['id'], False)
+					failed = True
+			if failed:
+				self._retry(branch, pending)
+			elif self.store is not None:
+				self.store.delete_push(branch[0], branch[1], pending['first'])
+
+	def _retry(self, key, pending):
+		"""
+		Puts back a push with commits that could not be sent, the commits already sent are skipped next time
+
+		Args:
+			key (tuple): (repo id, ref) of the branch
+			pending (dict): The flushed push of the branch
+		"""
+		with self.lock:
+			current = self.branches.get(key)
+			if current is not None:
+				# A new push arrived during the flush, the commits of the flushed push come first
+				known = set(commit['id'] for commit in current['commits'])
+				current['commits'] = [commit for commit in pending['commits'] if commit['id'] not in known] + \
+					current['commits']
+				self._save(key, current)
+				return
+			pending['first'] = time.time()
+			pending['timer'] = None
+			self.branches[key] = pending
+			self._save(key, pending)
+			self._schedule(key, pending)
+
+	def _commits_to_analyze(self, commits, installation_id=None):
+		"""
+		Returns the commits ending a run of commits of the same author, in push order, with their author. Commits already
+		sent or being sent from another branch are skipped, the others are marked as being sent until _sent is called
+
+		Args:
+			commits (list): Commits of the push payloads, oldest first
+			installation_id (int): The installation of the repo, authors are resolved with its rate limit
+		"""
+		runs = []
+		for commit in commits:
+			author_id = self._author_id(commit, installation_id)
+			if runs and runs[-1][1] == author_id:
+				runs[-1] = (commit, author_id)
+			else:
+				runs.append((commit, author_id))
+
+		selected = []
+		with self.lock:
+			for commit, author_id in runs:
+				if commit['id'] in self.seen or commit['id'] in self.sending:
+					continue
+				self.sending.add(commit['id'])
+				selected.append((commit, author_id))
+		return selected
+
+	def _sent(self, commit_id, success):
+		"""
+		Ends the sending of a commit, a commit sent to analysis is remembered so it is never sent again
+
+		Args:
+			commit_id (string): The sha of the commit
+			success (bool): True when the analysis accepted the commit
+		"""
+		with self.lock:
+			self.sending.discard(commit_id)
+			if not success or commit_id in self.seen:
+				return
+			self.seen.add(commit_id)
+			self.seen_order.append(commit_id)
+			while len(self.seen_order) > SEEN_COMMITS:
+				self.seen.discard(self.seen_order.pop(0))
+
+	def _author_id(self, commit, installation_id=None):
+		"""
+		Returns the GitHub id credited for a commit, its author when GitHub knows the author, the pusher otherwise
+
+		Args:
+			commit (dict): A commit of a push payload
+			installation_id (int): The installation of the repo
+		"""
+		username = commit.get('author', {}).get('username')
+		if username and self.resolve_user is not None:
+			try:
+				author_id = self.resolve_user(username, installation_id)
+				if author_id is not None:
+					return str(author_id)
+			except Exception as e:
+				print "Problem resolving GitHub user " + username + ": " + str(e)
+		return commit['sender_id']
+
+def _format_timestamp(timestamp):
+	"""
+	Formats a commit timestamp as yyyy-mm-dd-hh-mm-ss in UTC
+
+	Args:
+		timestamp (string): ISO 8601 timestamp from GitHub (ex. 2015-05-05T19:40:15-04:00 or 2015-05-05T23:40:15Z)
+	"""
+	date = datetime.datetime.strptime(timestamp[:19], '%Y-%m-%dT%H:%M:%S')
+	offset = timestamp[19:]
+	if offset and offset != 'Z':
+		sign = -1 if offset[0] == '-' else 1
+		hours, minutes = offset[1:].split(':')
+		date -= sign * datetime.timedelta(hours=int(hours), minutes=int(minutes))
+	return date.strftime('%Y-%m-%d-%H-%M-%S')
@@ -0,0 +1,131 @@
+import os
+import sys
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+import eventQueue
+from eventQueue import EventQueue, EventWorkers, MAX_ATTEMPTS
+
+class EventQueueTest(unittest.TestCase):
+	def setUp(self):
+		self.directory = tempfile.mkdtemp()
+		self.path = os.path.join(self.directory, 'events.db')
+		self.queue = EventQueue(self.path)
+
+	def tearDown(self):
+		shutil.rmtree(self.directory)
+
+	def state(self, id):
+		return self.queue._connection().execute('SELECT state FROM events WHERE id = ?', (id,)).fetchone()[0]
+
+	def test_delivery_is_stored_once(self):
+		self.assertTrue(self.queue.put('d1', 'push', '42', '{}'))
+		self.assertFalse(self.queue.put('d1', 'push', '42', '{}'))
+		self.assertEqual(self.queue.take(0)['delivery_id'], 'd1')
+		self.assertIsNone(self.queue.take(0))
+
+	def test_done_delivery_is_not_stored_again(self):
+		self.queue.put('d1', 'push', '42', '{}')
+		self.queue.done(self.queue.take(0)['id'])
+		self.assertFalse(self.queue.put('d1', 'push', '42', '{}'))
+		self.assertIsNone(self.queue.take(0))
+
+	def test_events_of_a_repo_are_taken_in_order_one_at_a_time(self):
+		self.queue.put('d1', 'push', '42', '1')
+		self.queue.put('d2', 'pull_request', '42', '2')
+		self.queue.put('d3', 'push', '43', '3')
+		first = self.queue.take(0)
+		# The second event of repo 42 waits for the first one
+		self.assertEqual(first['payload'], '1')
+		self.assertEqual(self.queue.take(0)['payload'], '3')
+		self.assertIsNone(self.queue.take(0))
+		self.queue.done(first['id'])
+		self.assertEqual(self.queue.take(0)['payload'], '2')
+
+	def test_events_without_repo_are_not_serialized(self):
+		self.queue.put('d1', 'installation', None, '1')
+		self.queue.put('d2', 'installation', None, '2')
+		self.assertEqual(self.queue.take(0)['payload'], '1')
+		self.assertEqual(self.queue.take(0)['payload'], '2')
+
+	def test_failed_event_is_retried_before_later_events(self):
+		self.queue.put('d1', 'push', '42', '1')
+		self.queue.put('d2', 'push', '42', '2')
+		event = self.queue.take(0)
+		self.queue.retry(event['id'], event['attempts'])
+		event = self.queue.take(0)
+		self.assertEqual((event['payload'], event['attempts']), ('1', 2))
+
+	def test_event_is_given_up_after_max_attempts(self):
+		self.queue.put('d1', 'push', '42', '1')
+		self.queue.put('d2', 'push', '42', '2')
+		for attempt in range(1, MAX_ATTEMPTS + 1):
+			event = self.queue.take(0)
+			self.assertEqual((event['payload'], event['attempts']), ('1', attempt))
+			self.queue.retry(event['id'], event['attempts'])
+		self.assertEqual(self.state(event['id']), eventQueue.FAILED)
+		self.assertEqual(self.queue.take(0)['payload'], '2')
+
+	def test_running_events_are_queued_again_at_start(self):
+		self.queue.put('d1', 'push', '42', '1')
+		self.queue.take(0)
+		restarted = EventQueue(self.path)
+		self.assertEqual(restarted.take(0)['payload'], '1')
+
+	def test_take_wakes_up_on_put(self):
+		taken = []
+		thread = threading.Thread(target=lambda: taken.append(self.queue.take(5)))
+		thread.start()
+		time.sleep(0.05)
+		self.queue.put('d1', 'push', '42', '1')
+		thread.join()
+		self.assertEqual(taken[0]['payload'], '1')
+
+	def test_purge_keeps_recent_and_queued_events(self):
+		self.queue.put('d1', 'push', '42', '1')
+		self.queue.put('d2', 'push', '43', '2')
+		self.queue.done(self.queue.take(0)['id'])
+		self.queue._connection().execute('UPDATE events SET updated = 0 WHERE delivery_id = ?', ('d1',))
+		self.queue.purge()
+		self.assertTrue(self.queue.put('d1', 'push', '42', '1'))
+		self.assertFalse(self.queue.put('d2', 'push', '43', '2'))
+
+	def test_installation(self):
+		self.assertIsNone(self.queue.installation(42))
+		self.queue.set_installation(42, 3)
+		self.queue.set_installation('42', 4)
+		self.assertEqual(self.queue.installation('42'), '4')
+
+class EventWorkersTest(unittest.TestCase):
+	def setUp(self):
+		self.directory = tempfile.mkdtemp()
+		self.queue = EventQueue(os.path.join(self.directory, 'events.db'))
+		self.handled = []
+		self.finished = threading.Event()
+
+	def tearDown(self):
+		shutil.rmtree(self.directory)
+
+	def test_events_of_a_repo_are_handled_in_order(self):
+		def handler(event, payload):
+			self.handled.append(payload)
+			time.sleep(0.01)
+			if payload == '1' and self.handled.count('1') == 1:
+				raise IOError('GitHub unavailable')
+			if len(self.handled) == 4:
+				self.finished.set()
+		for index in range(1, 4):
+			self.queue.put('d' + str(index), 'push', '42', str(index))
+		workers = EventWorkers(self.queue, handler, workers=3)
+		workers.start()
+		self.assertTrue(self.finished.wait(10))
+		workers.stop()
+		self.assertEqual(self.handled, ['1', '1', '2', '3'])
+
+if __name__ == '__main__':
+	unittest.main()
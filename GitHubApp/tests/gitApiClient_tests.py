@@ -0,0 +1,179 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+import gitApiClient
+from gitApiClient import GitApiClient, TokenBucket
+
+URL = 'https://api.github.com/repositories/42/commits'
+
+class FakeClock:
+	""" Time of the tests, sleeping moves the clock forward """
+	def __init__(self):
+		self.now = 1000.0
+		self.sleeps = []
+
+	def time(self):
+		return self.now
+
+	def sleep(self, seconds):
+		self.sleeps.append(seconds)
+		self.now += seconds
+
+class FakeResponse:
+	def __init__(self, status_code, data=None, headers=None, links=None, text=None):
+		self.status_code = status_code
+		self.headers = headers or {}
+		self.links = links or {}
+		self.text = text if text is not None else gitApiClient.json.dumps(data)
+
+class FakeSession:
+	""" Answers the requests with the responses given, in order """
+	def __init__(self, responses):
+		self.responses = list(responses)
+		self.requests = []
+
+	def request(self, method, URL, params=None, data=None, headers=None, timeout=None):
+		self.requests.append((method, URL, params, headers))
+		return self.responses.pop(0)
+
+class ClockTest(unittest.TestCase):
+	def setUp(self):
+		self.clock = FakeClock()
+		self.time = gitApiClient.time
+		gitApiClient.time = self.clock
+
+	def tearDown(self):
+		gitApiClient.time = self.time
+
+class GitApiClientTest(ClockTest):
+	def client(self, responses):
+		client = GitApiClient(lambda installation_id: 'token' + str(installation_id))
+		client.session = FakeSession(responses)
+		return client
+
+	def test_unchanged_resource_is_read_from_cache(self):
+		client = self.client([FakeResponse(200, {'sha': '1'}, {'ETag': '"a"'}), FakeResponse(304)])
+		self.assertEqual(client.get(URL, installation_id=3), {'sha': '1'})
+		self.assertEqual(client.get(URL, installation_id=3), {'sha': '1'})
+		self.assertNotIn('If-None-Match', client.session.requests[0][3])
+		self.assertEqual(client.session.requests[1][3]['If-None-Match'], '"a"')
+		self.assertEqual(client.session.requests[1][3]['Authorization'], 'Token token3')
+
+	def test_changed_resource_replaces_cache(self):
+		client = self.client([FakeResponse(200, {'sha': '1'}, {'ETag': '"a"'}),
+			FakeResponse(200, {'sha': '2'}, {'ETag': '"b"'}), FakeResponse(304)])
+		client.get(URL)
+		self.assertEqual(client.get(URL), {'sha': '2'})
+		self.assertEqual(client.get(URL), {'sha': '2'})
+		self.assertEqual(client.session.requests[2][3]['If-None-Match'], '"b"')
+
+	def test_installations_do_not_share_cache(self):
+		client = self.client([FakeResponse(200, {'sha': '1'}, {'ETag': '"a"'}), FakeResponse(404, {'message': 'Not Found'})])
+		client.get(URL, installation_id=3)
+		self.assertEqual(client.get(URL, installation_id=4), {'message': 'Not Found'})
+		self.assertNotIn('If-None-Match', client.session.requests[1][3])
+
+	def test_cache_forgets_least_recently_used(self):
+		size = gitApiClient.ETAG_CACHE_SIZE
+		gitApiClient.ETAG_CACHE_SIZE = 2
+		try:
+			client = self.client([FakeResponse(200, {}, {'ETag': '"a"'}), FakeResponse(200, {}, {'ETag': '"b"'}),
+				FakeResponse(304), FakeResponse(200, {}, {'ETag': '"c"'}), FakeResponse(304), FakeResponse(200, {})])
+			client.get(URL + '/a')
+			client.get(URL + '/b')
+			# Reading a again makes b the least recently used
+			client.get(URL + '/a')
+			client.get(URL + '/a', params={'per_page': 1})
+			client.get(URL + '/a')
+			client.get(URL + '/b')
+		finally:
+			gitApiClient.ETAG_CACHE_SIZE = size
+		self.assertEqual(len(client.etags), 2)
+		self.assertEqual(client.session.requests[4][3]['If-None-Match'], '"a"')
+		self.assertNotIn('If-None-Match', client.session.requests[5][3])
+
+	def test_paginate_follows_link_header(self):
+		client = self.client([
+			FakeResponse(200, [1, 2], links={'next': {'url': URL + '?per_page=100&page=2'}}),
+			FakeResponse(200, [3], links={'next': {'url': URL + '?per_page=100&page=3'}}),
+			FakeResponse(200, [])])
+		self.assertEqual(list(client.paginate(URL, {'sha': 'abc'})), [1, 2, 3])
+		self.assertEqual([request[1:3] for request in client.session.requests], [
+			(URL, {'sha': 'abc', 'per_page': 100}),
+			(URL + '?per_page=100&page=2', None),
+			(URL + '?per_page=100&page=3', None)])
+
+	def test_paginate_is_lazy(self):
+		client = self.client([FakeResponse(200, [1, 2], links={'next': {'url': URL + '?page=2'}})])
+		pages = client.paginate(URL)
+		self.assertEqual(next(pages), 1)
+		self.assertEqual(next(pages), 2)
+		self.assertEqual(len(client.session.requests), 1)
+
+	def test_paginate_stops_on_error_message(self):
+		client = self.client([FakeResponse(409, {'message': 'Git Repository is empty.'})])
+		self.assertEqual(list(client.paginate(URL)), [])
+
+	def test_secondary_limit_is_retried(self):
+		client = self.client([FakeResponse(403, text='You have exceeded a secondary rate limit'),
+			FakeResponse(403, {}, {'Retry-After': '5'}), FakeResponse(200, {'sha': '1'})])
+		self.assertEqual(client.get(URL), {'sha': '1'})
+		self.assertEqual(self.clock.sleeps, [gitApiClient.SECONDARY_LIMIT_WAIT, 5.0])
+
+	def test_exhausted_limit_waits_for_reset(self):
+		client = self.client([FakeResponse(403, {}, {'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': '1030'}),
+			FakeResponse(200, {'sha': '1'})])
+		self.assertEqual(client.get(URL), {'sha': '1'})
+		self.assertEqual(self.clock.sleeps, [30.0])
+
+	def test_forbidden_is_not_retried(self):
+		client = self.client([FakeResponse(403, {'message': 'Resource not accessible by integration'})])
+		client.get(URL)
+		self.assertEqual(len(client.session.requests), 1)
+
+	def test_writes_are_spaced(self):
+		client = self.client([FakeResponse(200), FakeResponse(200)])
+		client.put(URL, {'state': 'success'})
+		client.put(URL, {'state': 'success'})
+		self.assertEqual(self.clock.sleeps, [gitApiClient.WRITE_INTERVAL])
+
+	def test_bucket_per_installation(self):
+		client = self.client([])
+		self.assertIs(client._bucket(3), client._bucket('3'))
+		self.assertIsNot(client._bucket(3), client._bucket(4))
+		self.assertIsNot(client._bucket(None), client._bucket(3))
+
+class TokenBucketTest(ClockTest):
+	def test_requests_before_rate_limit_are_not_paced(self):
+		bucket = TokenBucket(capacity=2)
+		for _ in range(5):
+			bucket.acquire()
+		self.assertEqual(self.clock.sleeps, [])
+
+	def test_remaining_limit_is_spread_until_reset(self):
+		bucket = TokenBucket(capacity=1)
+		bucket.update({'X-RateLimit-Remaining': '10', 'X-RateLimit-Reset': '1020'})
+		self.assertEqual(bucket.rate, 0.5)
+		bucket.acquire()
+		bucket.acquire()
+		self.assertAlmostEqual(sum(self.clock.sleeps), 2.0)
+
+	def test_exhausted_limit_waits_for_reset(self):
+		bucket = TokenBucket()
+		bucket.update({'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': '1060'})
+		bucket.acquire()
+		self.assertAlmostEqual(sum(self.clock.sleeps), 60.0)
+		# A new window starts with a full bucket
+		self.assertIsNone(bucket.rate)
+		self.assertEqual(bucket.tokens, bucket.capacity - 1)
+
+	def test_missing_headers_are_ignored(self):
+		bucket = TokenBucket()
+		bucket.update({'X-RateLimit-Remaining': '10'})
+		self.assertIsNone(bucket.rate)
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,152 @@
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from pushCoalescer import PushCoalescer, _format_timestamp
+from eventQueue import EventQueue
+
+REPO_URL = 'https://github.com/obahy/Susereum/commit/'
+
+def commit(sha, username=None):
+	commit = {'id': sha, 'url': REPO_URL + sha, 'timestamp': '2018-11-26T18:53:12Z', 'distinct': True}
+	if username is not None:
+		commit['author'] = {'username': username}
+	return commit
+
+def push(commits, before, after, ref='refs/heads/master', sender=7):
+	return {'ref': ref, 'before': before, 'after': after, 'commits': commits,
+			'repository': {'id': 42, 'name': 'Susereum'}, 'sender': {'id': sender},
+			'installation': {'id': 3}}
+
+class PushCoalescerTest(unittest.TestCase):
+	def setUp(self):
+		self.sent = []
+		self.failing = set()
+		# Windows never close on their own, the tests flush them
+		self.coalescer = PushCoalescer(self.analyze, resolve_user=self.resolve_user, window=3600)
+
+	def tearDown(self):
+		self.coalescer.flush()
+
+	def analyze(self, sender_id, repo_id, repo_name, commit_url, timestamp):
+		if commit_url in self.failing:
+			raise IOError('analysis unavailable')
+		self.sent.append((sender_id, commit_url[len(REPO_URL):]))
+
+	def resolve_user(self, username, installation_id):
+		self.assertEqual(installation_id, 3)
+		return {'alice': 1, 'bob': 2}.get(username)
+
+	def test_pushes_in_window_are_merged(self):
+		self.coalescer.add(push([commit('a', 'alice')], 'x', 'a'))
+		self.coalescer.add(push([commit('b', 'bob')], 'a', 'b'))
+		self.assertEqual(self.sent, [])
+		self.coalescer.flush(('42', 'refs/heads/master'))
+		self.assertEqual(self.sent, [('1', 'a'), ('2', 'b')])
+
+	def test_branches_are_flushed_separately(self):
+		self.coalescer.add(push([commit('a', 'alice')], 'x', 'a'))
+		self.coalescer.add(push([commit('b', 'bob')], 'x', 'b', ref='refs/heads/dev'))
+		self.coalescer.flush(('42', 'refs/heads/dev'))
+		self.assertEqual(self.sent, [('2', 'b')])
+
+	def test_forced_push_replaces_discarded_commits(self):
+		self.coalescer.add(push([commit('a', 'alice'), commit('b', 'bob')], 'x', 'b'))
+		self.coalescer.add(push([commit('a', 'alice'), commit('c', 'alice')], 'x', 'c'))
+		self.coalescer.flush()
+		self.assertEqual(self.sent, [('1', 'c')])
+
+	def test_runs_of_an_author_are_reduced_to_their_last_commit(self):
+		commits = [commit('a', 'alice'), commit('b', 'alice'), commit('c', 'bob'), commit('d', 'bob'),
+				commit('e', 'alice')]
+		self.coalescer.add(push(commits, 'x', 'e'))
+		self.coalescer.flush()
+		self.assertEqual(self.sent, [('1', 'b'), ('2', 'd'), ('1', 'e')])
+
+	def test_unknown_author_credits_pusher(self):
+		self.coalescer.add(push([commit('a', 'carol'), commit('b')], 'x', 'b'))
+		self.coalescer.flush()
+		self.assertEqual(self.sent, [('7', 'b')])
+
+	def test_commit_pushed_to_another_branch_is_sent_once(self):
+		self.coalescer.add(push([commit('a', 'alice')], 'x', 'a'))
+		self.coalescer.flush()
+		self.coalescer.add(push([commit('a', 'alice')], 'x', 'a', ref='refs/heads/dev'))
+		self.coalescer.flush()
+		self.assertEqual(self.sent, [('1', 'a')])
+
+	def test_failed_commits_are_sent_again(self):
+		self.failing.add(REPO_URL + 'b')
+		self.coalescer.add(push([commit('a', 'alice'), commit('b', 'bob')], 'x', 'b'))
+		self.coalescer.flush()
+		self.assertEqual(self.sent, [('1', 'a')])
+		self.assertIn(('42', 'refs/heads/master'), self.coalescer.branches)
+		self.failing.clear()
+		self.coalescer.flush()
+		self.assertEqual(self.sent, [('1', 'a'), ('2', 'b')])
+		self.assertEqual(self.coalescer.branches, {})
+
+	def test_failed_commits_come_before_a_new_push(self):
+		self.failing.add(REPO_URL + 'a')
+		self.coalescer.add(push([commit('a', 'alice')], 'x', 'a'))
+		self.coalescer.flush()
+		self.coalescer.add(push([commit('b', 'bob')], 'a', 'b'))
+		self.failing.clear()
+		self.coalescer.flush()
+		self.assertEqual(self.sent, [('1', 'a'), ('2', 'b')])
+
+	def test_format_timestamp(self):
+		self.assertEqual(_format_timestamp('2015-05-05T19:40:15-04:00'), '2015-05-05-23-40-15')
+		self.assertEqual(_format_timestamp('2015-05-05T23:40:15Z'), '2015-05-05-23-40-15')
+
+class PendingPushStoreTest(unittest.TestCase):
+	def setUp(self):
+		self.path = tempfile.mkdtemp()
+		self.addCleanup(shutil.rmtree, self.path)
+		self.store = EventQueue(os.path.join(self.path, 'event_queue.db'))
+		self.sent = []
+		self.failing = False
+
+	def analyze(self, sender_id, repo_id, repo_name, commit_url, timestamp):
+		if self.failing:
+			raise IOError('analysis unavailable')
+		self.sent.append(commit_url[len(REPO_URL):])
+
+	def coalescer(self):
+		return PushCoalescer(self.analyze, window=3600, store=self.store)
+
+	def test_pending_push_is_restored(self):
+		first = self.coalescer()
+		first.add(push([commit('a')], 'x', 'a'))
+		# The interface stops without flushing, the next one finds the push in the database
+		first.branches.values()[0]['timer'].cancel()
+		second = self.coalescer()
+		second.restore()
+		second.flush()
+		self.assertEqual(self.sent, ['a'])
+		self.assertEqual(self.store.pending_pushes(), [])
+
+	def test_failed_push_is_kept(self):
+		coalescer = self.coalescer()
+		coalescer.add(push([commit('a')], 'x', 'a'))
+		self.failing = True
+		coalescer.flush()
+		coalescer.flush()
+		coalescer.branches.values()[0]['timer'].cancel()
+		rows = self.store.pending_pushes()
+		self.assertEqual(len(rows), 1)
+		self.assertEqual([pending['id'] for pending in json.loads(rows[0][2])['commits']], ['a'])
+		self.failing = False
+		restored = self.coalescer()
+		restored.restore()
+		restored.flush()
+		self.assertEqual(self.sent, ['a'])
+		self.assertEqual(self.store.pending_pushes(), [])
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python2
+
+"""
+Installation token manager of the GitHub API Interface.
+Installation tokens are cached per installation and renewed in the background before they expire, so a webhook
+handler only waits for GitHub the first time an installation is seen. The JSON Web Token that signs the renewals is
+reused until it nears its expiration.
+"""
+
+import time
+import calendar
+import datetime
+import threading
+
+import jwt
+import requests
+
+ACCESS_TOKENS_URL = 'https://api.github.com/app/installations/{}/access_tokens'
+# GitHub accepts JSON Web Tokens valid for 10 minutes at most
+JWT_LIFETIME = 10 * 60
+# iat is set in the past to allow for clock drift with GitHub
+JWT_CLOCK_DRIFT = 60
+# Seconds before expiration when a JWT or an installation token is renewed
+JWT_MARGIN = 60
+TOKEN_MARGIN = 5 * 60
+# A cached token closer to its expiration is renewed before it is used
+TOKEN_MIN_VALIDITY = 60
+# Seconds between two checks of the background renewal
+REFRESH_INTERVAL = 30
+TIMEOUT = (3.05, 30)
+
+class TokenError(Exception):
+	""" Unable to create an installation token """
+	pass
+
+class TokenManager:
+	""" Creates, caches and renews the installation tokens of the app """
+	def __init__(self, app_identifier, private_key):
+		"""
+		Args:
+			app_identifier (string): The GitHub App Identifier
+			private_key (string): The private key of the app, signs the JSON Web Tokens
+		"""
+		self.app_identifier = app_identifier
+		self.private_key = private_key
+		self.session = requests.Session()
+		self.lock = threading.Lock()
+		self.jwt = None
+		self.jwt_expiration = 0
+		self.tokens = {}		# installation id: (token, expiration time)
+		self.installation_locks = {}
+		self.thread = None
+		self.stopped = threading.Event()
+
+	def start(self):
+		""" Starts renewing the cached tokens in the background """
+		if self.thread is None:
+			self.thread = threading.Thread(target=self._refresh_loop)
+			self.thread.daemon = True
+			self.thread.start()
+
+	def stop(self):
+		""" Stops the background renewal """
+		self.stopped.set()
+
+	def token(self, installation_id):
+		"""
+		Returns a valid installation token, only the first request of an installation waits for GitHub
+
+		Args:
+			installation_id (int): The GitHub installation ID (found in the webhook payloads)
+		"""
+		installation_id = str(installation_id)
+		cached = self.tokens.get(installation_id)
+		if cached is not None and cached[1] - time.time() > TOKEN_MIN_VALIDITY:
+			return cached[0]
+		return self._renew(installation_id)
+
+	def get_jwt(self):
+		""" Returns the JSON Web Token of the app, a new one is signed when the current one nears expiration """
+		with self.lock:
+			now = calendar.timegm(datetime.datetime.utcnow().timetuple())
+			if self.jwt is None or self.jwt_expiration - now <= JWT_MARGIN:
+				issued = now - JWT_CLOCK_DRIFT
+				expiration = issued + JWT_LIFETIME
+				payload = {'iat': issued, 'exp': expiration, 'iss': self.app_identifier}
+				self.jwt = jwt.encode(payload, self.private_key, algorithm='RS256')
+				self.jwt_expiration = expiration
+			return self.jwt
+
+	def _renew(self, installation_id):
+		"""
+		Asks GitHub for a new installation token, one request at a time per installation
+
+		Args:
+			installation_id (string): The GitHub installation ID
+		"""
+		with self.lock:
+			installation_lock = self.installation_locks.setdefault(installation_id, threading.Lock())
+		with installation_lock:
+			# Another thread may have renewed it while this one waited
+			cached = self.tokens.get(installation_id)
+			if cached is not None and cached[1] - time.time() > TOKEN_MARGIN:
+				return cached[0]
+
+			headers = {'Accept': 'application/vnd.github.machine-man-preview+json',
+						'Authorization': ('Bearer ' + self.get_jwt())}
+			try:
+				response = self.session.post(ACCESS_TOKENS_URL.format(installation_id), headers=headers, timeout=TIMEOUT)
+				json_data = response.json()
+				token = json_data['token']
+			except (requests.RequestException, ValueError, KeyError) as e:
+				if cached is not None and cached[1] > time.time():
+					# Still valid, the background renewal tries again
+					return cached[0]
+				raise TokenError("Unable to create a token for installation " + installation_id + ": " + str(e))
+
+			expiration = _parse_expiration(json_data.get('expires_at'))
+			self.tokens[installation_id] = (token, expiration)
+			return token
+
+	def _refresh_loop(self):
+		""" Renews the tokens that expire within TOKEN_MARGIN """
+		while not self.stopped.wait(REFRESH_INTERVAL):
+			for installation_id, (_, expiration) in list(self.tokens.items()):
+				if expiration - time.time() <= TOKEN_MARGIN:
+					try:
+						self._renew(installation_id)
+					except TokenError as e:
+						print str(e)
+
+def _parse_expiration(expires_at):
+	"""
+	Returns the expiration of a token as a unix time, tokens last one hour when GitHub does not tell
+
+	Args:
+		expires_at (string): Expiration from GitHub (ex. 2016-07-11T22:14:10Z)
+	"""
+	try:
+		return calendar.timegm(datetime.datetime.strptime(expires_at, '%Y-%m-%dT%H:%M:%SZ').timetuple())
+	except (TypeError, ValueError):
+		return time.time() + 60 * 60
@@ -297,6 +297,11 @@ def create_parent_parser(prog_name):
         action='count',
         help='enable more verbose output')
 
+    parent_parser.add_argument(
+        '--wait',
+        type=int,
+        help='seconds to wait for the transaction to be committed')
+
     return parent_parser
 
 def create_parser(prog_name):
@@ -340,7 +345,7 @@ def do_show(args):
 
     url = _get_url(args)
     keyfile = _get_keyfile(args)
-    client = CodeSmellClient(base_url=url, keyfile=keyfile, work_path=HOME)
+    client = CodeSmellClient(base_url=url, keyfile=keyfile, work_path=HOME, wait=args.wait)
 
     transaction = client.show(address=args.address)
 
@@ -369,7 +374,7 @@ def do_vote(args):
 
     url = _get_url(args)
     keyfile = _get_keyfile(args)
-    client = CodeSmellClient(base_url=url, keyfile=keyfile, work_path=HOME)
+    client = CodeSmellClient(base_url=url, keyfile=keyfile, work_path=HOME, wait=args.wait)
 
     if args.vote:
         response_dict = client.vote(proposal_id=args.id, vote=vote)
@@ -391,7 +396,7 @@ def do_proposal(args):
 
     url = _get_url(args)
     keyfile = _get_keyfile(args)
-    client = CodeSmellClient(base_url=url, keyfile=keyfile, work_path=HOME)
+    client = CodeSmellClient(base_url=url, keyfile=keyfile, work_path=HOME, wait=args.wait)
 
     #parse input into a dict
     code_smells = {}
@@ -415,7 +420,7 @@ def do_list(args):
 
     url = _get_url(args)
     keyfile = _get_keyfile(args)
-    client = CodeSmellClient(base_url=url, keyfile=keyfile, work_path=HOME)
+    client = CodeSmellClient(base_url=url, keyfile=keyfile, work_path=HOME, wait=args.wait)
 
     transactions = client.list(txn_type=args.type, active=args.active)
 
@@ -433,7 +438,7 @@ def do_default(args):
     """
     url = _get_url(args)
     keyfile = _get_keyfile(args)
-    client = CodeSmellClient(base_url=url, keyfile=keyfile, work_path=args.path)
+    client = CodeSmellClient(base_url=url, keyfile=keyfile, work_path=args.path, wait=args.wait)
 
     response = client.default(repo_id=args.repo)
 
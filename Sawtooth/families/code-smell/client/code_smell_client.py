@@ -20,22 +20,17 @@ and vote on proposals.
 """
 
 import os
+import sys
 import time
 import datetime
 import random
 import base64
 import hashlib
 import json
-import requests
 import yaml
-import toml #pylint: disable=import-error
 
 from pprint import pprint
 from base64 import b64encode
-from sawtooth_signing import ParseError #pylint: disable=import-error
-from sawtooth_signing import CryptoFactory #pylint: disable=import-error
-from sawtooth_signing import create_context #pylint: disable=import-error
-from sawtooth_signing.secp256k1 import Secp256k1PrivateKey #pylint: disable=import-error
 
 from sawtooth_sdk.protobuf.batch_pb2 import Batch #pylint: disable=import-error
 from sawtooth_sdk.protobuf.batch_pb2 import BatchList #pylint: disable=import-error
@@ -45,26 +40,37 @@ from sawtooth_sdk.protobuf.transaction_pb2 import TransactionHeader #pylint: dis
 
 from client.code_smell_exceptions import CodeSmellException
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__)))))
+from common.rest_client import RestClient #pylint: disable=wrong-import-position
+from common.rest_client import RestClientError #pylint: disable=wrong-import-position
+from common.batches import submit_batches #pylint: disable=wrong-import-position
+from common.batches import COMMITTED #pylint: disable=wrong-import-position
+from common.signing import load_signer #pylint: disable=wrong-import-position
+from common.signing import SigningError #pylint: disable=wrong-import-position
+from common.suse_config import load_suse_config #pylint: disable=wrong-import-position
+from common.suse_config import project_suse_path #pylint: disable=wrong-import-position
+from common.suse_config import SuseConfigError #pylint: disable=wrong-import-position
+from common.suse_config import schedule_suse_config #pylint: disable=wrong-import-position
+from common.suse_config import update_suse_config #pylint: disable=wrong-import-position
+
+GITHUB_APP_URL = 'http://129.108.7.2:3000'
+
 
 def update_config_file(config):
     """
-    update .suse file after getting new code smell configuration
+    update .suse file after getting new code smell configuration, configurations
+    committed back to back (a chain replaying its blocks) are written once
     """
     work_path = os.path.dirname(os.path.dirname(
         os.path.dirname(os.path.dirname(os.path.realpath(__file__)))))
 
     #get code_smell family configuration file
-    conf_file = work_path + '/etc/.suse'
+    conf_file = project_suse_path(work_path)
 
     suse_config = json.loads(config.replace(";", ",").replace("'", "\""))
 
-    #save new configuration
-    try:
-        with open(conf_file, 'w+') as suse_file:
-            toml.dump(suse_config, suse_file)
-            suse_file.close()
-    except IOError as error:
-        raise CodeSmellException("Unable to open configuration file {}".format(error))
+    #save new configuration, the file is replaced in one rename
+    schedule_suse_config(conf_file, suse_config)
 
 def _sha512(data):
     """
@@ -75,17 +81,18 @@ def _sha512(data):
     return hashlib.sha512(data).hexdigest()
 
 def _get_suse_config(conf_file=None):
-    if os.path.isfile(conf_file):
-        try:
-            with open(conf_file) as config:
-                raw_config = config.read()
-        except IOError as error:
-            raise CodeSmellException("Unable to load code smell family configuration file: {}"
-                                     .format(error))
-    #load toml config into a dict
-    print (raw_config)
-    toml_config = toml.loads(raw_config)
-    return toml_config
+    """
+    return the code smell configuration as a dict the caller can change, the
+    file is parsed once while it does not change
+
+    Args:
+        conf_file (str): path of the .suse file
+    """
+    try:
+        return load_suse_config(conf_file).to_dict()
+    except SuseConfigError as error:
+        raise CodeSmellException("Unable to load code smell family configuration file: {}"
+                                 .format(error))
 
 def _get_date():
     """
@@ -100,26 +107,21 @@ class CodeSmellClient:
     """
     construct and send code smell transaction.
     """
-    def __init__(self, base_url, work_path, keyfile=None):
+    def __init__(self, base_url, work_path, keyfile=None, wait=None):
         self._base_url = base_url
         self._work_path = work_path
+        self._wait = wait
+        self._rest = RestClient(base_url)
 
         if keyfile is None:
             self._signer = None
             return
 
+        #the signer is loaded once per key file and shared by all clients
         try:
-            with open(keyfile) as fileptr:
-                private_key_str = fileptr.read().strip()
-        except OSError as err:
-            raise CodeSmellException('Failed to read private key {}: {}'.format(keyfile, str(err)))
-
-        try:
-            private_key = Secp256k1PrivateKey.from_hex(private_key_str)
-        except ParseError as error:
-            raise CodeSmellException('Unable to load private key: {}'.format(str(error)))
-
-        self._signer = CryptoFactory(create_context('secp256k1')).new_signer(private_key)
+            self._signer = load_signer(keyfile)
+        except SigningError as err:
+            raise CodeSmellException(err)
 
     def default(self, repo_id=None):
         """
@@ -127,7 +129,7 @@ class CodeSmellClient:
         """
 
         #identify code_smell family configuration file
-        conf_file = self._work_path + '/etc/.suse'
+        conf_file = project_suse_path(self._work_path)
         response = ""
 
         #get date
@@ -135,15 +137,7 @@ class CodeSmellClient:
         #return txn_date
 
         if os.path.isfile(conf_file):
-            try:
-                with open(conf_file) as config:
-                    raw_config = config.read()
-            except IOError as error:
-                raise CodeSmellException("Unable to load code smell family configuration file: {}"
-                                         .format(error))
-
-            #load toml config into a dict
-            parsed_toml_config = toml.loads(raw_config)
+            parsed_toml_config = _get_suse_config(conf_file)
 
             #get default code smells
             code_smells_config = parsed_toml_config['code_smells']
@@ -292,6 +286,9 @@ class CodeSmellClient:
         Args:
             proposal_id (str), proposal ID
             state (Str), new proposal ID
+
+        Returns:
+            dict: batch id, status of the update
         """
         proposal = self.show(proposal_id)
 
@@ -300,7 +297,7 @@ class CodeSmellClient:
         else:
             state = "Rejected"
 
-        self._update_proposal(proposal, state, repo_id)
+        return self._update_proposal(proposal, state, repo_id)
 
     def _update_proposal(self, proposal, state, repo_id):
         """
@@ -310,8 +307,11 @@ class CodeSmellClient:
         Args:
             proposal (dict), proposal data
             sate (str), new proposal's state
+
+        Returns:
+            dict: batch id, status of the update
         """
-        conf_file = self._work_path + 'etc/.suse'
+        conf_file = project_suse_path(self._work_path)
         txn_date = _get_date()
         proposal = proposal["payload"].decode().split(',')
 
@@ -324,7 +324,9 @@ class CodeSmellClient:
 
         print (response)
 
-        if state == "Accepted":
+        #the configuration follows the chain, it is not changed by an update that was not committed
+        committed = all(status == COMMITTED for status in response.values())
+        if state == "Accepted" and committed:
             #update suse configuration file
             self._update_suse_file(proposal)
 
@@ -332,6 +334,8 @@ class CodeSmellClient:
             suse_config = _get_suse_config(conf_file)
             self._send_git_request(suse_config, repo_id)
 
+        return response
+
     def _send_git_request(self, toml_config, repo_id=None):
         """
         send new code smell configuration to github
@@ -344,7 +348,12 @@ class CodeSmellClient:
         wrapper_json["repo"] = repo_id
         wrapper_json["suse_file"] = toml_config
         data = json.dumps(wrapper_json)
-        requests.post('http://129.108.7.2:3000', data=data)
+        try:
+            RestClient(GITHUB_APP_URL).post('', data)
+        except RestClientError as err:
+            #the github app only acknowledges the request
+            if err.status_code is None:
+                raise CodeSmellException(err)
 
     def _update_suse_file(self, proposal):
         """
@@ -359,18 +368,13 @@ class CodeSmellClient:
         proposal_payload = yaml.safe_load(proposal[2].replace(";", ","))
 
         #identify code_smell family configuration file
-        conf_file = self._work_path + '/etc/.suse'
-
-        print(self._work_path)
-
-        #get current config
-        suse_config = _get_suse_config(conf_file)
+        conf_file = project_suse_path(self._work_path)
 
-        """
-        start by traversing the proposal,
-        get the code smell and the metric
-        """
-        try:
+        def apply_proposal(suse_config):
+            """
+            start by traversing the proposal,
+            get the code smell and the metric
+            """
             for proposal_key, proposal_metric in proposal_payload.items():
                 tmp_type = ""
                 """
@@ -391,41 +395,52 @@ class CodeSmellClient:
                 else:
                     suse_config["code_smells"][tmp_type][proposal_key][0] = int(proposal_metric)
 
-            #save new configuration
-            try:
-                with open(conf_file, 'w+') as config:
-                    toml.dump(suse_config, config)
-                #self._send_git_request(toml_config)
-            except IOError as error:
-                raise CodeSmellException("Unable to open configuration file {}".format(error))
-
-            #publish new configuration file to all peers
-            self._publish_config(conf_file=conf_file)
+        try:
+            #read, change and save the configuration under the lock of the file
+            suse_config = update_suse_config(conf_file, apply_proposal)
+        except SuseConfigError as error:
+            raise CodeSmellException("Unable to open configuration file {}".format(error))
         except:
             raise CodeSmellException("Incorrect proposal format")
 
+        #publish new configuration file to all peers
+        self._publish_config(suse_config=suse_config.to_dict())
+
     def check_votes(self, proposal_id):
         """
-        review the votes of a proposal
+        review the votes of a proposal, the proposal and its votes are read
+        from the same transaction list.
 
         Args:
             proposal_id (str), proposal id
         """
-        #print(self._base_url)
-        result = self._send_request("transactions/{}".format(proposal_id))
-        #print (proposal_id)
-        #print ("print"+result)
-        encoded_result = yaml.safe_load(result)["data"]
-        proposal = base64.b64decode(encoded_result["payload"]).decode().split(',')
+        result = self._send_request("transactions")
+        try:
+            encoded_entries = yaml.safe_load(result)["data"]
+        except BaseException:
+            return ""
+
+        payloads = {}
+        for entry in encoded_entries:
+            try:
+                payloads[entry["header_signature"]] = base64.b64decode(entry["payload"]).decode().split(',')
+            except BaseException:
+                pass
+
+        if proposal_id in payloads:
+            proposal = payloads[proposal_id]
+        else:
+            #older proposal, not in the latest transactions
+            result = self._send_request("transactions/{}".format(proposal_id))
+            encoded_result = yaml.safe_load(result)["data"]
+            proposal = base64.b64decode(encoded_result["payload"]).decode().split(',')
         proposal_id = proposal[1]
-        transactions = self.list(txn_type='vote')
+
         votes = []
-        if not transactions:
-            return ""
-        for vote in transactions:
+        for payload in payloads.values():
             #for all votes of proposal
-            if transactions[vote].decode().split(',')[2] == proposal_id:
-                votes.append(int(transactions[vote].decode().split(',')[3]))
+            if len(payload) > 3 and payload[0] == 'vote' and payload[2] == proposal_id:
+                votes.append(int(payload[3]))
         return votes
 
     def vote(self, proposal_id, vote):
@@ -453,7 +468,7 @@ class CodeSmellClient:
         # for entry in encoded_entries:
         #     transaction_type = base64.b64decode(entry["payload"]).decode().split(',')[0]
         #     if transaction_type == 'vote':
-        #         if entry['header']['signer_public_key'] == self._signer.get_public_key().as_hex():
+        #         if entry['header']['signer_public_key'] == self._signer.public_key_hex:
         #             return ("User already submitted a vote")
         txn_date = _get_date()
 
@@ -467,17 +482,19 @@ class CodeSmellClient:
 
         return response
 
-    def _publish_config(self,conf_file=None):
+    def _publish_config(self, conf_file=None, suse_config=None):
         """
         function to send an update configuration transaction to the chain
         after the code smell configuration is updated all peers in the network
         must update the local configuration file.
 
         Args:
-            config (dictionary), code smell configuration
+            conf_file (str), .suse file, read when suse_config is not given
+            suse_config (dictionary), code smell configuration
         """
         #read .suse configuration file
-        suse_config = _get_suse_config(conf_file)
+        if suse_config is None:
+            suse_config = _get_suse_config(conf_file)
 
         #get current time
         txn_date = _get_date()
@@ -516,11 +533,6 @@ class CodeSmellClient:
         send request to code smell processor
         the transaction will be validate by the processor of each family.
         """
-        if self._base_url.startswith("http://"):
-            url = "{}/{}".format(self._base_url, suffix)
-        else:
-            url = "http://{}/{}".format(self._base_url, suffix)
-
         headers = {}
         if auth_user is not None:
             auth_string = "{}:{}".format(auth_user, auth_password)
@@ -533,22 +545,15 @@ class CodeSmellClient:
 
         try:
             if data is not None:
-                result = requests.post(url, headers=headers, data=data)
+                result = self._rest.post(suffix, data, headers=headers)
             else:
-                result = requests.get(url, headers=headers)
-
-            if result.status_code == 404:
+                result = self._rest.get(suffix, headers=headers)
+        except RestClientError as err:
+            if err.status_code == 404:
                 raise CodeSmellException("No such transaction")
-            elif not result.ok:
-                raise CodeSmellException("Error {}:{}".format(result.status_code, result.reason))
-
-        except requests.ConnectionError as err:
-            raise CodeSmellException('Failed to connect to {}:{}'.format(url, str(err)))
-
-        except BaseException as err:
             raise CodeSmellException(err)
 
-        return result.text
+        return result
 
     def _send_code_smell_txn(self,
                              txn_type=None,
@@ -579,14 +584,14 @@ class CodeSmellClient:
 
         #construct header`
         header = TransactionHeader(
-            signer_public_key=self._signer.get_public_key().as_hex(),
+            signer_public_key=self._signer.public_key_hex,
             family_name="code-smell",
             family_version="0.1",
             inputs=[address],
             outputs=[address],
             dependencies=[],
             payload_sha512=_sha512(payload),
-            batcher_public_key=self._signer.get_public_key().as_hex(),
+            batcher_public_key=self._signer.public_key_hex,
             nonce=hex(random.randint(0, 2**64))
         ).SerializeToString()
 
@@ -602,10 +607,11 @@ class CodeSmellClient:
         #create batch list, suserum policy: one transaction per batch
         batch_list = self._create_batch_list([transaction])
 
-        return self._send_request(
-            "batches",
-            batch_list.SerializeToString(),
-            'application/octet-stream')
+        #batch id and status, committed or invalid when the client waits
+        try:
+            return submit_batches(self._rest, batch_list, wait=self._wait)
+        except RestClientError as err:
+            raise CodeSmellException(err)
 
     def _create_batch_list(self, transactions):
         """
@@ -620,7 +626,7 @@ class CodeSmellClient:
         transaction_signatures = [t.header_signature for t in transactions]
 
         header = BatchHeader(
-            signer_public_key=self._signer.get_public_key().as_hex(),
+            signer_public_key=self._signer.public_key_hex,
             transaction_ids=transaction_signatures
         ).SerializeToString()
 
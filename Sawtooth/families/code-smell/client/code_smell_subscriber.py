@@ -0,0 +1,117 @@
+# Copyright 2018 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# -----------------------------------------------------------------------------
+"""
+code smell family subscriber, runs the side effects of committed code smell
+transactions. a new configuration is written to the .suse file once the block
+that holds the config transaction is committed.
+"""
+import os
+import sys
+import logging
+import argparse
+
+from sawtooth_sdk.processor.log import init_console_logging #pylint: disable=import-error
+
+from processor.code_smell_payload import CodeSmellPayload
+from client.code_smell_client import update_config_file
+from client.code_smell_exceptions import CodeSmellException
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__)))))
+from common.events import EventSubscriber #pylint: disable=wrong-import-position
+from common.events import make_event_type #pylint: disable=wrong-import-position
+from common.suse_config import flush_suse_config #pylint: disable=wrong-import-position
+
+LOGGER = logging.getLogger(__name__)
+
+FAMILY_NAME = 'code-smell'
+
+def parse_args(args):
+    """
+    Parse Arguments.
+
+    Args:
+        args (*args): Program Arguments
+
+    Returns:
+        args: list of arguments
+    """
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.RawTextHelpFormatter)
+
+    parser.add_argument(
+        '-C', '--connect',
+        default='tcp://localhost:4004',
+        help='Endpoint for the validator connection')
+
+    parser.add_argument(
+        '-v', '--verbose',
+        action='count',
+        default=0,
+        help='Increase output sent to stderr')
+
+    return parser.parse_args(args)
+
+def on_config(event, block):
+    """
+    write the committed configuration to the .suse file
+
+    Args:
+        event (Event): code-smell/config event
+        block (dict): attributes of the committed block
+    """
+    code_smell_payload = CodeSmellPayload.from_bytes(event.data)
+    LOGGER.info("Block %s committed configuration %s",
+                block.get('block_num'), code_smell_payload.txn_id)
+    update_config_file(code_smell_payload.data)
+
+def create_subscriber(url):
+    """
+    create a subscriber with the code smell callbacks registered
+
+    Args:
+        url (str): validator component endpoint
+
+    Returns:
+        EventSubscriber: code smell subscriber
+    """
+    subscriber = EventSubscriber(url)
+    subscriber.on(make_event_type(FAMILY_NAME, 'config'), on_config)
+    return subscriber
+
+def main(args=None):
+    """
+    Main.
+
+    Raises:
+        CodeSmellException, connection error
+    """
+    if args is None:
+        args = sys.argv[1:]
+    opts = parse_args(args)
+    subscriber = None
+    try:
+        init_console_logging(verbose_level=opts.verbose)
+
+        subscriber = create_subscriber(opts.connect)
+        subscriber.start()
+    except KeyboardInterrupt:
+        pass
+    except RuntimeError as err:
+        raise CodeSmellException("Error: {}".format(err))
+    finally:
+        if subscriber is not None:
+            subscriber.stop()
+        #configurations still waiting to be coalesced
+        flush_suse_config()
@@ -15,6 +15,8 @@
 """
 code smell family handler, process and verifies that transaction's payload is correct
 """
+import os
+import sys
 import logging
 
 from sawtooth_sdk.processor.exceptions import InvalidTransaction #pylint: disable=import-error
@@ -24,17 +26,20 @@ from processor.code_smell_state import CodeSmellTransaction
 from processor.code_smell_state import CodeSmellState
 from processor.code_smell_state import CODESMELL_NAMESPACE
 from processor.code_smell_payload import CodeSmellPayload
-from client.code_smell_client import update_config_file
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__)))))
+from common.events import add_transaction_event #pylint: disable=wrong-import-position
 
 LOGGER = logging.getLogger(__name__)
 
 class CodeSmellTransactionHandler(TransactionHandler):
     """
     process all types of transactions regarding the code smell family
-    """
-    def __init__(self):
-        self._count_access = 0
 
+    the handler only validates the payload and updates the state, the validator
+    may apply the same transaction more than once so any side effect is done by
+    the code smell subscriber once the block is committed.
+    """
     @property
     def family_name(self):
         """
@@ -91,16 +96,12 @@ class CodeSmellTransactionHandler(TransactionHandler):
                 data=code_smell_payload.data,
                 state=code_smell_payload.state,
                 date=code_smell_payload.date)
-            if code_smell_payload.txn_type == 'config':
-                self._count_access += 1
-                ## TODO: validator sends multiple requests move the logic
-                if self._count_access == 2:
-                    self._count_access = 0
-                    update_config_file(code_smell_payload.data)
         else:
             raise InvalidTransaction('Unhandled Type: {}'.format(code_smell_payload.txn_type))
 
         code_smell_state.set_transaction(code_smell_payload.txn_id, active_transaction)
+        add_transaction_event(context, self.family_name, transaction,
+                              code_smell_payload.txn_type, code_smell_payload.txn_id)
 
         _display("transaction {},{} created".
                  format(code_smell_payload.txn_type, code_smell_payload.data))
@@ -15,16 +15,19 @@
 """
 main program, process the code smell family logic.
 """
+import os
 import sys
 import argparse
 
 from sawtooth_sdk.processor.config import get_log_dir #pylint: disable=import-error
 from sawtooth_sdk.processor.log  import log_configuration #pylint: disable=import-error
 from sawtooth_sdk.processor.log  import init_console_logging #pylint: disable=import-error
-from sawtooth_sdk.processor.core import TransactionProcessor #pylint: disable=import-error
 from processor.handler import CodeSmellTransactionHandler
 from processor.code_smell_exceptions import CodeSmellException
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__)))))
+from common.processors import SharedProcessor #pylint: disable=wrong-import-position
+
 DISTRIBUTION_NAME = 'sawtooth-codeSmell'
 
 def parse_args(args):
@@ -46,8 +49,14 @@ def parse_args(args):
 
     parser.add_argument(
         '-C', '--connect',
-        default='tcp://localhost:4004',
-        help='Endpoint for the validator connection')
+        action='append',
+        help='Endpoint for the validator connection, repeat to serve\n'
+             'several validators (default tcp://localhost:4004)')
+
+    parser.add_argument(
+        '-E', '--endpoints',
+        help='File with one validator endpoint per line, read again\n'
+             'when it changes')
 
     parser.add_argument(
         '-v', '--verbose',
@@ -68,21 +77,24 @@ def main(args=None):
     if args is None:
         args = sys.argv[1:]
     opts = parse_args(args)
+    endpoints = opts.connect
+    if not endpoints and opts.endpoints is None:
+        endpoints = ['tcp://localhost:4004']
     processor = None
     try:
-        processor = TransactionProcessor(url=opts.connect)
-
         log_dir = get_log_dir()
-        #use the transaction processor zmq idenity for filename
+        #one process serves every endpoint, use the process id for filename
         log_configuration(
             log_dir=log_dir,
-            name="code_smell-" + str(processor.zmq_id)[2:-1])
+            name="code_smell-" + str(os.getpid()))
 
         init_console_logging(verbose_level=opts.verbose)
 
+        #handlers are stateless, the same handler serves all the validators
         handler = CodeSmellTransactionHandler()
 
-        processor.add_handler(handler)
+        processor = SharedProcessor(
+            [handler], endpoints=endpoints, endpoints_file=opts.endpoints)
 
         processor.start()
     except KeyboardInterrupt:
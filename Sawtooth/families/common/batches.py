@@ -0,0 +1,233 @@
+# Copyright 2018 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# -----------------------------------------------------------------------------
+"""
+batch submission and batch status
+
+a batch posted to the rest api is only accepted, it is committed later. the
+functions in this module return the id and status of submitted batches and
+wait for the commit with the long polling of /batch_statuses (the rest api
+holds the request until the batches are no longer pending or the wait ends)
+instead of sleeping and listing the chain again.
+"""
+import json
+import time
+import logging
+import threading
+
+LOGGER = logging.getLogger(__name__)
+
+COMMITTED = 'COMMITTED'
+INVALID = 'INVALID'
+PENDING = 'PENDING'
+UNKNOWN = 'UNKNOWN'
+
+#longest wait accepted by the rest api (seconds)
+MAX_WAIT = 300
+
+def batch_ids(batch_list):
+    """
+    return the ids of the batches of a batch list
+
+    Args:
+        batch_list (BatchList): batches to submit
+
+    Returns:
+        list: batch ids
+    """
+    return [batch.header_signature for batch in batch_list.batches]
+
+def submit_batches(rest, batch_list, wait=None):
+    """
+    post a batch list and return the status of its batches
+
+    Args:
+        rest (RestClient): rest api client
+        batch_list (BatchList): batches to submit
+        wait (int): seconds to wait for the commit, None returns right after
+                    the batches are accepted
+
+    Returns:
+        dict: batch id, status (COMMITTED, INVALID, PENDING, UNKNOWN)
+    """
+    rest.post('batches', batch_list.SerializeToString(), 'application/octet-stream')
+
+    ids = batch_ids(batch_list)
+    if not wait:
+        return {batch_id: PENDING for batch_id in ids}
+    return wait_for_batches(rest, ids, wait)
+
+def get_batch_statuses(rest, ids, wait=None):
+    """
+    return the status of batches, with wait the rest api answers as soon as
+    no batch is pending
+
+    Args:
+        rest (RestClient): rest api client
+        ids (list): batch ids
+        wait (int): seconds the rest api holds the request
+
+    Returns:
+        dict: batch id, (status, invalid transactions)
+    """
+    suffix = 'batch_statuses'
+    timeout = None
+    if wait:
+        wait = min(int(wait), MAX_WAIT)
+        suffix = '{}?wait={}'.format(suffix, wait)
+        #the read timeout of the client would end the request before the rest api answers
+        timeout = rest.long_poll_timeout(wait)
+    #post the ids, a long list does not fit in a query string, the request only reads
+    result = rest.post(suffix, json.dumps(list(ids)), 'application/json', timeout=timeout,
+                       idempotent=True)
+
+    statuses = {}
+    for entry in json.loads(result)['data']:
+        statuses[entry['id']] = (entry['status'], entry.get('invalid_transactions', []))
+    return statuses
+
+def wait_for_batches(rest, ids, timeout):
+    """
+    wait until batches are committed or invalid
+
+    Args:
+        rest (RestClient): rest api client
+        ids (list): batch ids
+        timeout (int): seconds to wait
+
+    Returns:
+        dict: batch id, status, batches still pending after timeout are PENDING
+    """
+    deadline = time.time() + timeout
+    result = {batch_id: PENDING for batch_id in ids}
+    pending = list(ids)
+
+    while pending:
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            break
+        statuses = get_batch_statuses(rest, pending, wait=max(1, int(remaining)))
+        for batch_id, (status, _) in statuses.items():
+            result[batch_id] = status
+        pending = [batch_id for batch_id in pending if result[batch_id] == PENDING]
+
+    return result
+
+class BatchStatusWatcher:
+    """
+    follow the status of submitted batches on a background thread, callbacks
+    are called once per batch with (batch_id, status, invalid_transactions)
+    when the batch is committed, invalid or unknown. all watched batches are
+    checked with a single long polling request.
+    """
+    def __init__(self, rest, poll_wait=30):
+        """
+        Constructor
+
+        Args:
+            rest (RestClient): rest api client
+            poll_wait (int): seconds the rest api holds each request
+        """
+        self._rest = rest
+        self._poll_wait = poll_wait
+        self._callbacks = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._running = False
+        self._thread = None
+
+    def submit(self, batch_list, callback):
+        """
+        post a batch list and watch its batches
+
+        Args:
+            batch_list (BatchList): batches to submit
+            callback (function): called with (batch_id, status, invalid_transactions)
+
+        Returns:
+            list: batch ids
+        """
+        statuses = submit_batches(self._rest, batch_list)
+        self.watch(list(statuses), callback)
+        return list(statuses)
+
+    def watch(self, ids, callback):
+        """
+        watch batches already submitted
+
+        Args:
+            ids (list): batch ids
+            callback (function): called with (batch_id, status, invalid_transactions)
+        """
+        with self._lock:
+            for batch_id in ids:
+                self._callbacks.setdefault(batch_id, []).append(callback)
+            if not self._running:
+                self._running = True
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+
+    def pending(self):
+        """
+        return the batches not yet committed or invalid
+
+        Returns:
+            list: batch ids
+        """
+        with self._lock:
+            return list(self._callbacks)
+
+    def stop(self):
+        """
+        stop watching, pending batches are not reported
+        """
+        with self._lock:
+            self._running = False
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        """
+        long poll the status of watched batches
+        """
+        while True:
+            with self._lock:
+                if not self._running:
+                    return
+                ids = list(self._callbacks)
+            if not ids:
+                self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+
+            try:
+                statuses = get_batch_statuses(self._rest, ids, wait=self._poll_wait)
+            except Exception as err: #pylint: disable=broad-except
+                LOGGER.warning("Unable to get batch statuses: %s", err)
+                self._wakeup.wait(self._poll_wait)
+                self._wakeup.clear()
+                continue
+
+            for batch_id, (status, invalid) in statuses.items():
+                if status == PENDING:
+                    continue
+                with self._lock:
+                    callbacks = self._callbacks.pop(batch_id, [])
+                for callback in callbacks:
+                    try:
+                        callback(batch_id, status, invalid)
+                    except Exception as err: #pylint: disable=broad-except
+                        LOGGER.exception("Batch %s callback failed: %s", batch_id, err)
@@ -0,0 +1,487 @@
+# Copyright 2018 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# -----------------------------------------------------------------------------
+"""
+read only client of the susereum families
+
+returns the transactions of the chain as python objects instead of the printed
+output of the command line clients. transactions are indexed once and the
+index is refreshed with the new transactions only, the rest api returns the
+newest transactions first so a refresh stops at the first known transaction.
+
+a client may start from a snapshot of the derived state of the chain (see
+snapshot.py), only the transactions committed after the snapshot are then read
+and the queries combine both. a snapshot that is not part of the chain is
+dropped and the whole chain is read.
+"""
+import json
+import time
+import base64
+import datetime
+import threading
+import collections
+from collections import namedtuple
+
+from common.rest_client import RestClient
+
+FAMILIES = ('code-smell', 'health', 'suse')
+DATE_FORMAT = "%Y-%m-%d-%H-%M-%S"
+PAGE_LIMIT = 100
+
+Transaction = namedtuple('Transaction', [
+    'transaction_id', 'family', 'txn_type', 'txn_id', 'data', 'state',
+    'url', 'client_key', 'date', 'signer_public_key'])
+Health = namedtuple('Health', [
+    'transaction_id', 'github_id', 'health', 'commit_url', 'client_key', 'date'])
+Suse = namedtuple('Suse', ['transaction_id', 'github_id', 'suse', 'date'])
+Proposal = namedtuple('Proposal', [
+    'transaction_id', 'proposal_id', 'code_smells', 'state', 'date'])
+Vote = namedtuple('Vote', ['transaction_id', 'proposal_id', 'vote', 'date'])
+Capacity = namedtuple('Capacity', [
+    'transaction_id', 'peer', 'queue', 'workers', 'cores', 'analysis_seconds', 'date'])
+Assignment = namedtuple('Assignment', [
+    'transaction_id', 'commit_url', 'peer', 'date'])
+Config = namedtuple('Config', ['transaction_id', 'config_id', 'code_smells', 'date'])
+Outcome = namedtuple('Outcome', ['proposal', 'accepted', 'rejected'])
+
+def parse_date(date):
+    """
+    return the datetime of a transaction date
+
+    Args:
+        date (str): yyyy-mm-dd-hh-mm-ss
+
+    Returns:
+        datetime: date, None if the date has another format
+    """
+    try:
+        return datetime.datetime.strptime(date, DATE_FORMAT)
+    except (TypeError, ValueError):
+        return None
+
+def parse_code_smells(data):
+    """
+    return the code smells of a proposal or configuration payload, commas
+    are stored as semicolons in the payload
+
+    Args:
+        data (str): payload data
+
+    Returns:
+        dict: code smells
+    """
+    try:
+        return json.loads(data.replace(";", ",").replace("'", "\""))
+    except ValueError:
+        return {}
+
+def parse_transaction(entry):
+    """
+    return a transaction of the rest api as a Transaction
+
+    Args:
+        entry (dict): transaction of /transactions
+
+    Returns:
+        Transaction: transaction, None for transactions of other families
+    """
+    header = entry.get('header', {})
+    family = header.get('family_name')
+    if family not in FAMILIES:
+        return None
+    try:
+        fields = base64.b64decode(entry['payload']).decode().split(',')
+    except (KeyError, ValueError):
+        return None
+
+    #health: type,id,data,state,url,client_key,date
+    #code-smell and suse: type,id,data,state,date
+    if len(fields) == 7:
+        txn_type, txn_id, data, state, url, client_key, date = fields
+    elif len(fields) == 5:
+        txn_type, txn_id, data, state, date = fields
+        url = client_key = None
+    elif len(fields) == 4:
+        txn_type, txn_id, data, state = fields
+        url = client_key = date = None
+    else:
+        return None
+
+    return Transaction(
+        transaction_id=entry['header_signature'],
+        family=family,
+        txn_type=txn_type,
+        txn_id=txn_id,
+        data=data,
+        state=state,
+        url=url,
+        client_key=client_key,
+        date=date,
+        signer_public_key=header.get('signer_public_key'))
+
+class ChainClient:
+    """
+    query the transactions of the susereum families
+    """
+    def __init__(self, base_url, max_age=2, snapshot=None):
+        """
+        Constructor
+
+        Args:
+            base_url (str): rest api url
+            max_age (float): seconds before the index is refreshed again
+            snapshot (Snapshot): derived state of the chain to start from
+        """
+        self._rest = RestClient(base_url)
+        self._max_age = max_age
+        self._lock = threading.Lock()
+        self._transactions = []
+        self._snapshot = snapshot
+        self._known = set() if snapshot is None else set(snapshot.recent)
+        self._refreshed = None
+
+    @property
+    def snapshot(self):
+        """
+        return the snapshot the index started from
+
+        Returns:
+            Snapshot: snapshot, None when the whole chain is indexed
+        """
+        return self._snapshot
+
+    def refresh(self):
+        """
+        add the transactions committed since the last refresh to the index
+
+        Returns:
+            int: number of new transactions
+        """
+        with self._lock:
+            new = []
+            suffix = 'transactions?limit={}'.format(PAGE_LIMIT)
+            while suffix:
+                page = json.loads(self._rest.get(suffix))
+                done = False
+                for entry in page.get('data', []):
+                    if entry['header_signature'] in self._known:
+                        done = True
+                        break
+                    transaction = parse_transaction(entry)
+                    if transaction is not None:
+                        new.append(transaction)
+                if done:
+                    break
+                suffix = page.get('paging', {}).get('next')
+
+            if not done and self._snapshot is not None:
+                #the snapshot is not part of this chain, the whole chain was read
+                self._snapshot = None
+                self._transactions = []
+                self._known = set()
+
+            self._transactions = new + self._transactions
+            self._known.update(transaction.transaction_id for transaction in new)
+            self._refreshed = time.time()
+            return len(new)
+
+    def transactions(self, family=None, txn_type=None):
+        """
+        return the transactions of the index, newest first. when the client
+        started from a snapshot only the transactions committed after the
+        snapshot are returned
+
+        Args:
+            family (str): family name, None for all families
+            txn_type (str): type of transaction, None for all types
+
+        Returns:
+            list: Transaction
+        """
+        if self._refreshed is None or time.time() - self._refreshed > self._max_age:
+            self.refresh()
+        return [transaction for transaction in self._transactions
+                if (family is None or transaction.family == family) and
+                (txn_type is None or transaction.txn_type == txn_type)]
+
+    def healths(self):
+        """
+        return the healths of the project, oldest first
+
+        Returns:
+            list: Health
+        """
+        transactions = self.transactions('health', 'health')
+        healths = [] if self._snapshot is None else list(self._snapshot.healths)
+        for transaction in reversed(transactions):
+            try:
+                health = float(transaction.data)
+            except ValueError:
+                continue
+            healths.append(Health(
+                transaction_id=transaction.transaction_id,
+                github_id=transaction.txn_id,
+                health=health,
+                commit_url=transaction.url,
+                client_key=transaction.client_key,
+                date=parse_date(transaction.date)))
+        return healths
+
+    def healths_after(self, transaction_id=None):
+        """
+        return the healths committed after a health, oldest first
+
+        Args:
+            transaction_id (str): transaction id of the last known health,
+                                  None for all healths
+
+        Returns:
+            list: Health, None when the health is no longer on the chain
+        """
+        healths = self.healths()
+        if transaction_id is None:
+            return healths
+        for index in range(len(healths) - 1, -1, -1):
+            if healths[index].transaction_id == transaction_id:
+                return healths[index + 1:]
+        return None
+
+    def latest_health(self):
+        """
+        return the latest health of the project
+
+        Returns:
+            Health: latest health, None without health
+        """
+        healths = self.healths()
+        return healths[-1] if healths else None
+
+    def capacities(self):
+        """
+        return the latest capacity advertised by each peer
+
+        Returns:
+            dict: peer ip, Capacity
+        """
+        capacities = {}
+        for transaction in self.transactions('health', 'capacity'):
+            if transaction.txn_id in capacities:
+                continue
+            #data: queue:workers:cores:analysis seconds
+            try:
+                queue, workers, cores, seconds = transaction.data.split(':')
+                capacity = Capacity(
+                    transaction_id=transaction.transaction_id,
+                    peer=transaction.txn_id,
+                    queue=int(queue),
+                    workers=int(workers),
+                    cores=int(cores),
+                    analysis_seconds=float(seconds),
+                    date=parse_date(transaction.date))
+            except ValueError:
+                continue
+            capacities[capacity.peer] = capacity
+        if self._snapshot is not None:
+            for peer, capacity in self._snapshot.capacities.items():
+                capacities.setdefault(peer, capacity)
+        return capacities
+
+    def pending_assignments(self):
+        """
+        return the commits sent to a peer for code analysis that do not have
+        a health yet, oldest first
+
+        Returns:
+            list: Assignment
+        """
+        analyzed = set(health.commit_url for health in self.healths())
+        assignments = [] if self._snapshot is None else \
+            [assignment for assignment in self._snapshot.assignments
+             if assignment.commit_url not in analyzed]
+        for transaction in reversed(self.transactions('health', 'commit')):
+            if transaction.data in analyzed or not transaction.client_key:
+                continue
+            assignments.append(Assignment(
+                transaction_id=transaction.transaction_id,
+                commit_url=transaction.data,
+                peer=transaction.client_key,
+                date=parse_date(transaction.date)))
+        return assignments
+
+    def suses(self):
+        """
+        return the suse transactions, oldest first. a snapshot only keeps the
+        balances, the suses of a client started from a snapshot are the ones
+        committed after it
+
+        Returns:
+            list: Suse
+        """
+        suses = []
+        for transaction in reversed(self.transactions('suse', 'suse')):
+            try:
+                suse = float(transaction.data)
+            except ValueError:
+                continue
+            suses.append(Suse(
+                transaction_id=transaction.transaction_id,
+                github_id=transaction.txn_id,
+                suse=suse,
+                date=parse_date(transaction.date)))
+        return suses
+
+    def suse_balances(self):
+        """
+        return the amount of suse of each user
+
+        Returns:
+            dict: github id, suse
+        """
+        suses = self.suses()
+        balances = {} if self._snapshot is None else dict(self._snapshot.suse_balances)
+        for suse in suses:
+            balances[suse.github_id] = balances.get(suse.github_id, 0) + suse.suse
+        return balances
+
+    def latest_proposal(self):
+        """
+        return the latest proposal, updates of a proposal are new proposal
+        transactions so the latest transaction holds its current state
+
+        Returns:
+            Proposal: latest proposal, None without proposal
+        """
+        for transaction in self.transactions('code-smell', 'proposal'):
+            return Proposal(
+                transaction_id=transaction.transaction_id,
+                proposal_id=transaction.txn_id,
+                code_smells=parse_code_smells(transaction.data),
+                state=transaction.state,
+                date=transaction.date)
+        if self._snapshot is not None and self._snapshot.proposals:
+            return self._snapshot.proposals[-1].proposal
+        return None
+
+    def proposals(self):
+        """
+        return the outcome of each proposal, the latest state of the proposal
+        and the number of votes to accept and to reject it, oldest first
+
+        Returns:
+            list: Outcome
+        """
+        transactions = self.transactions('code-smell')
+        outcomes = collections.OrderedDict()
+        if self._snapshot is not None:
+            for outcome in self._snapshot.proposals:
+                outcomes[outcome.proposal.proposal_id] = outcome
+        for transaction in reversed(transactions):
+            if transaction.txn_type == 'proposal':
+                previous = outcomes.pop(transaction.txn_id, None)
+                outcomes[transaction.txn_id] = Outcome(
+                    proposal=Proposal(
+                        transaction_id=transaction.transaction_id,
+                        proposal_id=transaction.txn_id,
+                        code_smells=parse_code_smells(transaction.data),
+                        state=transaction.state,
+                        date=transaction.date),
+                    accepted=0 if previous is None else previous.accepted,
+                    rejected=0 if previous is None else previous.rejected)
+            elif transaction.txn_type == 'vote' and transaction.data in outcomes:
+                outcome = outcomes[transaction.data]
+                if transaction.state == '1':
+                    outcomes[transaction.data] = outcome._replace(accepted=outcome.accepted + 1)
+                elif transaction.state == '0':
+                    outcomes[transaction.data] = outcome._replace(rejected=outcome.rejected + 1)
+        return list(outcomes.values())
+
+    def latest_config(self):
+        """
+        return the latest code smell configuration published on the chain
+
+        Returns:
+            Config: latest configuration, None without configuration
+        """
+        for transaction in self.transactions('code-smell', 'config'):
+            return Config(
+                transaction_id=transaction.transaction_id,
+                config_id=transaction.txn_id,
+                code_smells=parse_code_smells(transaction.data),
+                date=transaction.date)
+        return None if self._snapshot is None else self._snapshot.config
+
+    def transaction_count(self):
+        """
+        return the number of transactions of the families on the chain
+
+        Returns:
+            int: transactions, including the ones of the snapshot
+        """
+        transactions = self.transactions()
+        return len(transactions) + (0 if self._snapshot is None else self._snapshot.transactions)
+
+    def latest_transaction_ids(self, count):
+        """
+        return the ids of the newest transactions of the families
+
+        Args:
+            count (int): number of ids
+
+        Returns:
+            list: transaction ids, newest first
+        """
+        ids = [transaction.transaction_id for transaction in self.transactions()[:count]]
+        if self._snapshot is not None:
+            ids.extend(self._snapshot.recent[:count - len(ids)])
+        return ids
+
+    def active_proposal(self):
+        """
+        return the proposal open to vote
+
+        Returns:
+            Proposal: active proposal, None without active proposal
+        """
+        proposal = self.latest_proposal()
+        if proposal is None or proposal.state != 'active':
+            return None
+        return proposal
+
+    def votes(self, proposal_id):
+        """
+        return the votes of a proposal
+
+        Args:
+            proposal_id (str): proposal id, the txn_id of the proposal
+
+        Returns:
+            list: Vote
+        """
+        transactions = self.transactions('code-smell', 'vote')
+        votes = []
+        for transaction in transactions:
+            if transaction.data != proposal_id:
+                continue
+            try:
+                vote = int(transaction.state)
+            except ValueError:
+                continue
+            votes.append(Vote(
+                transaction_id=transaction.transaction_id,
+                proposal_id=proposal_id,
+                vote=vote,
+                date=transaction.date))
+        if self._snapshot is not None:
+            votes.extend(vote for vote in self._snapshot.votes if vote.proposal_id == proposal_id)
+        return votes
@@ -0,0 +1,268 @@
+# Copyright 2018 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# -----------------------------------------------------------------------------
+"""
+block commit events
+
+the validator may call a transaction processor several times for the same
+transaction (once per candidate block, in parallel when the parallel scheduler
+is enabled, and on every processor instance of the family). handlers must be
+deterministic and free of side effects, instead of acting on the transaction
+they emit an event. the validator only delivers events of committed blocks, the
+subscriber in this module receives them and runs the side effects once.
+"""
+import time
+import uuid
+import logging
+import collections
+
+import zmq #pylint: disable=import-error
+
+from sawtooth_sdk.protobuf.client_event_pb2 import ClientEventsSubscribeRequest #pylint: disable=import-error
+from sawtooth_sdk.protobuf.client_event_pb2 import ClientEventsSubscribeResponse #pylint: disable=import-error
+from sawtooth_sdk.protobuf.client_event_pb2 import ClientEventsUnsubscribeRequest #pylint: disable=import-error
+from sawtooth_sdk.protobuf.events_pb2 import EventList #pylint: disable=import-error
+from sawtooth_sdk.protobuf.events_pb2 import EventSubscription #pylint: disable=import-error
+from sawtooth_sdk.protobuf.validator_pb2 import Message #pylint: disable=import-error
+
+LOGGER = logging.getLogger(__name__)
+
+BLOCK_COMMIT = 'sawtooth/block-commit'
+
+def make_event_type(family_name, txn_type):
+    """
+    return the event type used for a transaction type of a family
+
+    Args:
+        family_name (str): family name (code-smell, health, suse)
+        txn_type (str): type of transaction
+
+    Returns:
+        str: event type, <family>/<transaction type>
+    """
+    return '{}/{}'.format(family_name, txn_type)
+
+def add_transaction_event(context, family_name, transaction, txn_type, txn_id):
+    """
+    emit an event for an applied transaction, the event is delivered to
+    subscribers only after the block that holds the transaction is committed.
+
+    Args:
+        context (sawtooth_sdk.processor.context.Context): validator context
+        family_name (str): family name
+        transaction (TpProcessRequest): transaction being applied
+        txn_type (str): type of transaction
+        txn_id (str): transaction id
+    """
+    context.add_event(
+        event_type=make_event_type(family_name, txn_type),
+        attributes=[('txn_id', txn_id), ('signature', transaction.signature)],
+        data=transaction.payload)
+
+def event_attributes(event):
+    """
+    return the attributes of an event as a dictionary
+
+    Args:
+        event (Event): event received from the validator
+
+    Returns:
+        dict: attribute key, attribute value
+    """
+    return {attribute.key: attribute.value for attribute in event.attributes}
+
+class EventSubscriber:
+    """
+    subscribe to the events of a validator and dispatch them to callbacks.
+    callbacks are called with the event and the attributes of the block that
+    holds it (block_id, block_num, state_root_hash, previous_block_id).
+    """
+
+    RECONNECT_DELAY = 5
+    MAX_SEEN = 10000
+
+    def __init__(self, url, last_known_block_id=None):
+        """
+        Constructor
+
+        Args:
+            url (str): validator component endpoint (tcp://127.0.0.1:4004)
+            last_known_block_id (str): resume delivery after this block
+        """
+        self._url = url
+        self._callbacks = {}
+        self._last_block_id = last_known_block_id
+        self._seen = set()
+        self._seen_order = collections.deque()
+        self._running = False
+        self._context = zmq.Context()
+        self._socket = None
+
+    @property
+    def last_block_id(self):
+        """
+        return the id of the last block delivered
+
+        Returns:
+            str: block id
+        """
+        return self._last_block_id
+
+    def on(self, event_type, callback): #pylint: disable=invalid-name
+        """
+        register a callback for an event type
+
+        Args:
+            event_type (str): event type, see make_event_type
+            callback (function): called with (event, block)
+        """
+        self._callbacks.setdefault(event_type, []).append(callback)
+
+    def start(self):
+        """
+        subscribe and process events until stop is called, the subscription is
+        restored after a connection error starting at the last delivered block.
+        """
+        self._running = True
+        while self._running:
+            try:
+                self._subscribe()
+                self._listen()
+            except zmq.ZMQError as err:
+                LOGGER.warning("Lost connection to %s: %s", self._url, err)
+                self._close()
+                time.sleep(self.RECONNECT_DELAY)
+
+    def stop(self):
+        """
+        unsubscribe and stop processing events
+        """
+        self._running = False
+        if self._socket is not None:
+            try:
+                self._send(Message.CLIENT_EVENTS_UNSUBSCRIBE_REQUEST,
+                           ClientEventsUnsubscribeRequest())
+            except zmq.ZMQError:
+                pass
+        self._close()
+
+    def _subscribe(self):
+        """
+        connect to the validator and subscribe to block commits and to the
+        registered event types
+        """
+        self._socket = self._context.socket(zmq.DEALER)
+        self._socket.connect(self._url)
+
+        subscriptions = [EventSubscription(event_type=BLOCK_COMMIT)]
+        for event_type in self._callbacks:
+            subscriptions.append(EventSubscription(event_type=event_type))
+
+        last_known = [] if self._last_block_id is None else [self._last_block_id]
+        request = ClientEventsSubscribeRequest(
+            subscriptions=subscriptions,
+            last_known_block_ids=last_known)
+
+        response = ClientEventsSubscribeResponse()
+        response.ParseFromString(
+            self._send(Message.CLIENT_EVENTS_SUBSCRIBE_REQUEST, request).content)
+
+        if response.status == ClientEventsSubscribeResponse.UNKNOWN_BLOCK:
+            #the block was dropped in a fork, start from the chain head
+            LOGGER.warning("Unknown block %s, subscribing from chain head", self._last_block_id)
+            self._close()
+            self._last_block_id = None
+            self._subscribe()
+        elif response.status != ClientEventsSubscribeResponse.OK:
+            raise zmq.ZMQError(msg="Subscription failed: {}".format(response.response_message))
+
+        LOGGER.info("Subscribed to %s", ", ".join(s.event_type for s in subscriptions))
+
+    def _listen(self):
+        """
+        receive event lists, one list per committed block
+        """
+        while self._running:
+            message = Message()
+            message.ParseFromString(self._socket.recv_multipart()[-1])
+            if message.message_type != Message.CLIENT_EVENTS:
+                continue
+
+            event_list = EventList()
+            event_list.ParseFromString(message.content)
+
+            block = {}
+            for event in event_list.events:
+                if event.event_type == BLOCK_COMMIT:
+                    block = event_attributes(event)
+
+            for event in event_list.events:
+                if event.event_type != BLOCK_COMMIT:
+                    self._dispatch(event, block)
+
+            if block:
+                self._last_block_id = block.get('block_id')
+
+    def _dispatch(self, event, block):
+        """
+        call the callbacks of an event, events already delivered (after a
+        resubscription or a fork) are skipped.
+
+        Args:
+            event (Event): event to dispatch
+            block (dict): attributes of the committed block
+        """
+        signature = event_attributes(event).get('signature')
+        if signature is not None:
+            if signature in self._seen:
+                return
+            self._seen.add(signature)
+            self._seen_order.append(signature)
+            if len(self._seen_order) > self.MAX_SEEN:
+                self._seen.discard(self._seen_order.popleft())
+
+        for callback in self._callbacks.get(event.event_type, []):
+            try:
+                callback(event, block)
+            except Exception as err: #pylint: disable=broad-except
+                LOGGER.exception("Unable to process event %s: %s", event.event_type, err)
+
+    def _send(self, message_type, request):
+        """
+        send a request to the validator and wait for the reply
+
+        Args:
+            message_type (int): validator message type
+            request (protobuf): request to send
+
+        Returns:
+            Message: validator reply
+        """
+        message = Message(
+            correlation_id=uuid.uuid4().hex,
+            message_type=message_type,
+            content=request.SerializeToString())
+        self._socket.send_multipart([message.SerializeToString()])
+
+        reply = Message()
+        reply.ParseFromString(self._socket.recv_multipart()[-1])
+        return reply
+
+    def _close(self):
+        """
+        close the validator connection
+        """
+        if self._socket is not None:
+            self._socket.close(linger=0)
+            self._socket = None
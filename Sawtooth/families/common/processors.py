@@ -0,0 +1,172 @@
+# Copyright 2018 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# -----------------------------------------------------------------------------
+"""
+transaction processor serving several validators
+
+a transaction processor of the sdk is connected to a single validator, a host
+running many projects used to start one python process per family and per
+project. a shared processor keeps one sdk TransactionProcessor per validator
+endpoint in the same process and registers the same handler instance on all of
+them, handlers are free of state so apply can be called for any project. the
+endpoints can be given on the command line or in a file, one endpoint per
+line, that is read again when it changes so projects are added and removed
+without restarting the process.
+"""
+import os
+import logging
+import threading
+
+from sawtooth_sdk.processor.core import TransactionProcessor #pylint: disable=import-error
+
+LOGGER = logging.getLogger(__name__)
+
+RELOAD_INTERVAL = 2
+
+def read_endpoints(path):
+    """
+    return the endpoints of an endpoints file
+
+    Args:
+        path (str): file with one validator endpoint per line
+
+    Returns:
+        set: endpoints, empty when the file does not exist
+    """
+    try:
+        with open(path) as endpoints_file:
+            return set(line.strip() for line in endpoints_file if line.strip())
+    except (IOError, OSError):
+        return set()
+
+class SharedProcessor:
+    """
+    route the transactions of several validators to shared handlers
+    """
+    def __init__(self, handlers, endpoints=None, endpoints_file=None):
+        """
+        Constructor
+
+        Args:
+            handlers (list): TransactionHandler, registered on every validator
+            endpoints (list): validator endpoints (tcp://127.0.0.1:4004)
+            endpoints_file (str): file with more endpoints, read again when
+                                  it changes
+        """
+        self._handlers = handlers
+        self._endpoints = set(endpoints or [])
+        self._endpoints_file = endpoints_file
+        self._endpoints_mtime = None
+        self._processors = {}
+        self._threads = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    @property
+    def endpoints(self):
+        """
+        return the endpoints served
+
+        Returns:
+            list: endpoints
+        """
+        with self._lock:
+            return sorted(self._processors)
+
+    def add(self, url):
+        """
+        connect to a validator and serve its transactions
+
+        Args:
+            url (str): validator endpoint
+        """
+        with self._lock:
+            if url in self._processors:
+                return
+            processor = TransactionProcessor(url=url)
+            for handler in self._handlers:
+                processor.add_handler(handler)
+            thread = threading.Thread(target=self._run, args=(url, processor))
+            thread.daemon = True
+            self._processors[url] = processor
+            self._threads[url] = thread
+        LOGGER.info("Serving %s", url)
+        thread.start()
+
+    def remove(self, url):
+        """
+        unregister from a validator
+
+        Args:
+            url (str): validator endpoint
+        """
+        with self._lock:
+            processor = self._processors.pop(url, None)
+            self._threads.pop(url, None)
+        if processor is not None:
+            LOGGER.info("Leaving %s", url)
+            processor.stop()
+
+    def start(self):
+        """
+        serve the endpoints until stop is called
+        """
+        for url in self._endpoints:
+            self.add(url)
+        while not self._stopped.is_set():
+            self._reload()
+            self._stopped.wait(RELOAD_INTERVAL)
+
+    def stop(self):
+        """
+        unregister from all the validators
+        """
+        self._stopped.set()
+        for url in self.endpoints:
+            self.remove(url)
+
+    def _run(self, url, processor):
+        """
+        run the processor of an endpoint, the sdk reconnects on its own
+        """
+        try:
+            processor.start()
+        except Exception as err: #pylint: disable=broad-except
+            LOGGER.exception("Processor of %s stopped: %s", url, err)
+            with self._lock:
+                if self._processors.get(url) is processor:
+                    del self._processors[url]
+                    del self._threads[url]
+
+    def _reload(self):
+        """
+        add and remove endpoints after a change of the endpoints file, a
+        processor that stopped on an error is started again
+        """
+        mtime = None
+        wanted = set(self._endpoints)
+        if self._endpoints_file is not None:
+            try:
+                mtime = os.stat(self._endpoints_file).st_mtime
+            except OSError:
+                pass
+            wanted |= read_endpoints(self._endpoints_file)
+        current = set(self.endpoints)
+        if mtime == self._endpoints_mtime and wanted <= current:
+            return
+        self._endpoints_mtime = mtime
+        for url in wanted - current:
+            self.add(url)
+        for url in current - wanted:
+            self.remove(url)
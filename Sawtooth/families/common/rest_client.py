@@ -0,0 +1,302 @@
+# Copyright 2018 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# -----------------------------------------------------------------------------
+"""
+rest api client shared by the family clients
+
+all clients of the same host share one requests session, connections are kept
+alive and reused instead of opening a new connection per request. requests
+have a timeout and are retried with jittered backoff when the rest api is
+busy (429, 503) or the connection fails. a request that changes the chain
+(POST /batches) is only sent again when it never reached the rest api: after
+a read timeout the batch may already be accepted, and sending it again would
+only fail as a duplicate.
+"""
+import time
+import random
+import asyncio
+import threading
+from functools import partial
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+#connect timeout, read timeout (seconds)
+DEFAULT_TIMEOUT = (3.05, 30)
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 0.5
+DEFAULT_CONCURRENCY = 8
+POOL_SIZE = 16
+RETRY_STATUS = (429, 503)
+#methods retried whatever the stage the request failed at
+IDEMPOTENT_METHODS = ('GET', 'HEAD')
+#read time allowed beyond the wait of a long polling request (seconds)
+LONG_POLL_MARGIN = 10
+
+_SESSIONS = {}
+_SESSIONS_LOCK = threading.Lock()
+
+def get_session(base_url):
+    """
+    return the session shared by all clients of a host
+
+    Args:
+        base_url (str): rest api url
+
+    Returns:
+        requests.Session: pooled session
+    """
+    with _SESSIONS_LOCK:
+        session = _SESSIONS.get(base_url)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _SESSIONS[base_url] = session
+        return session
+
+def _not_sent(err):
+    """
+    return True when a request failed before the rest api received it:
+    connect timeout or connection refused
+
+    Args:
+        err (requests.RequestException): error of the request
+
+    Returns:
+        bool: request not sent
+    """
+    if isinstance(err, requests.exceptions.ConnectTimeout):
+        return True
+    if isinstance(err, requests.exceptions.Timeout):
+        return False
+    #requests wraps the urllib3 error: MaxRetryError(reason=NewConnectionError)
+    reason = getattr(err.args[0], 'reason', None) if err.args else None
+    return isinstance(reason, NewConnectionError)
+
+class RestClientError(Exception):
+    """
+    rest api request failed, status_code is None when the rest api is not
+    reachable
+    """
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+class RestClient:
+    """
+    send requests to the rest api of a validator
+    """
+    def __init__(self,
+                 base_url,
+                 timeout=DEFAULT_TIMEOUT,
+                 retries=DEFAULT_RETRIES,
+                 backoff=DEFAULT_BACKOFF):
+        """
+        Constructor
+
+        Args:
+            base_url (str): rest api url, http:// is added when missing
+            timeout (float or tuple): request timeout, (connect, read)
+            retries (int): number of retries on busy or unreachable rest api
+            backoff (float): base delay between retries (seconds)
+        """
+        if not base_url.startswith("http://") and not base_url.startswith("https://"):
+            base_url = "http://{}".format(base_url)
+        self._base_url = base_url.rstrip('/')
+        self._timeout = timeout
+        self._retries = retries
+        self._backoff = backoff
+        self._session = get_session(self._base_url)
+
+    @property
+    def base_url(self):
+        """
+        return the rest api url
+
+        Returns:
+            str: rest api url
+        """
+        return self._base_url
+
+    def long_poll_timeout(self, wait):
+        """
+        return the timeout of a request the rest api holds for up to wait
+        seconds, the connect timeout is kept and the read timeout covers the
+        wait
+
+        Args:
+            wait (float): seconds the rest api holds the request
+
+        Returns:
+            tuple: (connect, read) timeout
+        """
+        connect = self._timeout[0] if isinstance(self._timeout, tuple) else self._timeout
+        read = self._timeout[1] if isinstance(self._timeout, tuple) else self._timeout
+        return (connect, max(read, wait + LONG_POLL_MARGIN))
+
+    def get(self, suffix, headers=None, timeout=None):
+        """
+        send a GET request
+
+        Args:
+            suffix (str): resource, transactions, state?address=...
+            headers (dict): request headers
+            timeout (float or tuple): request timeout, None for the client timeout
+
+        Returns:
+            str: response body
+        """
+        return self.request('GET', suffix, headers=headers, timeout=timeout).text
+
+    def post(self, suffix, data, content_type=None, headers=None, timeout=None, idempotent=False):
+        """
+        send a POST request
+
+        Args:
+            suffix (str): resource
+            data (bytes): request body
+            content_type (str): content type of the body
+            headers (dict): request headers
+            timeout (float or tuple): request timeout, None for the client timeout
+            idempotent (bool): the request only reads, it is retried like a GET
+
+        Returns:
+            str: response body
+        """
+        headers = dict(headers or {})
+        if content_type is not None:
+            headers['Content-Type'] = content_type
+        return self.request('POST', suffix, data=data, headers=headers, timeout=timeout,
+                            idempotent=idempotent).text
+
+    def request(self, method, suffix, data=None, headers=None, timeout=None, idempotent=None):
+        """
+        send a request, busy responses are retried, connection errors are
+        retried for idempotent requests and for requests that were not sent
+
+        Args:
+            method (str): GET, POST
+            suffix (str): resource, or absolute url (paging links)
+            data (bytes): request body
+            headers (dict): request headers
+            timeout (float or tuple): request timeout, None for the client timeout
+            idempotent (bool): request safe to send twice, None for GET and HEAD
+
+        Returns:
+            requests.Response: response
+
+        Raises:
+            RestClientError: rest api unreachable or error response
+        """
+        url = self.url(suffix)
+        if timeout is None:
+            timeout = self._timeout
+        if idempotent is None:
+            idempotent = method.upper() in IDEMPOTENT_METHODS
+        attempt = 0
+        while True:
+            try:
+                response = self._session.request(
+                    method, url, data=data, headers=headers, timeout=timeout)
+            except (requests.ConnectionError, requests.Timeout) as err:
+                if attempt >= self._retries or not (idempotent or _not_sent(err)):
+                    raise RestClientError('Failed to connect to {}:{}'.format(url, str(err)))
+                self._sleep(attempt)
+                attempt += 1
+                continue
+
+            if response.status_code in RETRY_STATUS and attempt < self._retries:
+                self._sleep(attempt, response.headers.get('Retry-After'))
+                attempt += 1
+                continue
+
+            if not response.ok:
+                raise RestClientError(
+                    "Error {}:{}".format(response.status_code, response.reason),
+                    status_code=response.status_code)
+            return response
+
+    def get_many(self, suffixes, concurrency=DEFAULT_CONCURRENCY):
+        """
+        send GET requests concurrently
+
+        Args:
+            suffixes (list): resources to request
+            concurrency (int): maximum number of requests in flight
+
+        Returns:
+            list: response bodies in the order of suffixes, failed requests
+                  return the RestClientError
+        """
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(self.get_many_async(suffixes, concurrency))
+        finally:
+            loop.close()
+
+    async def get_many_async(self, suffixes, concurrency=DEFAULT_CONCURRENCY):
+        """
+        coroutine, send GET requests concurrently on the pooled session
+
+        Args:
+            suffixes (list): resources to request
+            concurrency (int): maximum number of requests in flight
+
+        Returns:
+            list: response bodies in the order of suffixes, failed requests
+                  return the RestClientError
+        """
+        loop = asyncio.get_event_loop()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def _get(suffix):
+            async with semaphore:
+                try:
+                    return await loop.run_in_executor(None, partial(self.get, suffix))
+                except RestClientError as err:
+                    return err
+
+        return await asyncio.gather(*[_get(suffix) for suffix in suffixes])
+
+    def url(self, suffix):
+        """
+        return the url of a resource
+
+        Args:
+            suffix (str): resource, or absolute url
+
+        Returns:
+            str: url
+        """
+        if suffix.startswith("http://") or suffix.startswith("https://"):
+            return suffix
+        return "{}/{}".format(self._base_url, suffix.lstrip('/'))
+
+    def _sleep(self, attempt, retry_after=None):
+        """
+        wait before a retry, full jitter exponential backoff unless the rest
+        api asks for a delay
+
+        Args:
+            attempt (int): retry number, starting at zero
+            retry_after (str): Retry-After header
+        """
+        try:
+            delay = float(retry_after)
+        except (TypeError, ValueError):
+            delay = random.uniform(0, self._backoff * (2 ** attempt))
+        time.sleep(delay)
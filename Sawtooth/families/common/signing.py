@@ -0,0 +1,171 @@
+# Copyright 2018 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# -----------------------------------------------------------------------------
+"""
+signer and key cache
+
+the secp256k1 context, the signer of each private key file and the public keys
+read from the key directory are created once per process and shared by all
+clients. a key file is loaded again only when it changes on disk.
+"""
+import os
+import threading
+
+from sawtooth_signing import ParseError #pylint: disable=import-error
+from sawtooth_signing import CryptoFactory #pylint: disable=import-error
+from sawtooth_signing import create_context #pylint: disable=import-error
+from sawtooth_signing.secp256k1 import Secp256k1PrivateKey #pylint: disable=import-error
+
+KEY_DIR = os.path.join(os.path.expanduser("~"), ".sawtooth", "keys")
+
+_LOCK = threading.Lock()
+_FACTORY = None
+_SIGNERS = {}
+_PUBLIC_KEYS = {}
+
+class SigningError(Exception):
+    """
+    unable to load key material
+    """
+    pass
+
+class CachedSigner:
+    """
+    signer with the hex of its public key computed once
+    """
+    def __init__(self, signer):
+        self._signer = signer
+        self._public_key = signer.get_public_key()
+        self._public_key_hex = self._public_key.as_hex()
+
+    @property
+    def public_key_hex(self):
+        """
+        return the public key of the signer
+
+        Returns:
+            str: public key hex
+        """
+        return self._public_key_hex
+
+    def get_public_key(self):
+        """
+        return the public key of the signer
+
+        Returns:
+            PublicKey: public key
+        """
+        return self._public_key
+
+    def sign(self, message):
+        """
+        sign a message
+
+        Args:
+            message (bytes): serialized header
+
+        Returns:
+            str: signature hex
+        """
+        return self._signer.sign(message)
+
+def _get_factory():
+    """
+    return the crypto factory of the secp256k1 context shared by all signers
+    """
+    global _FACTORY #pylint: disable=global-statement
+    if _FACTORY is None:
+        _FACTORY = CryptoFactory(create_context('secp256k1'))
+    return _FACTORY
+
+def _stat(path):
+    """
+    return the key used to detect a change of a file
+    """
+    stat = os.stat(path)
+    return (stat.st_mtime, stat.st_size)
+
+def load_signer(keyfile):
+    """
+    return the signer of a private key file, the file is read and parsed once
+    while it does not change
+
+    Args:
+        keyfile (str): path of the private key
+
+    Returns:
+        CachedSigner: signer
+
+    Raises:
+        SigningError: key file missing or invalid
+    """
+    path = os.path.realpath(keyfile)
+    try:
+        version = _stat(path)
+    except OSError as err:
+        raise SigningError('Failed to read private key {}: {}'.format(keyfile, str(err)))
+
+    with _LOCK:
+        cached = _SIGNERS.get(path)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        try:
+            with open(path) as file_ptr:
+                private_key_str = file_ptr.read().strip()
+        except OSError as err:
+            raise SigningError('Failed to read private key {}: {}'.format(keyfile, str(err)))
+
+        try:
+            private_key = Secp256k1PrivateKey.from_hex(private_key_str)
+        except ParseError as parser_error:
+            raise SigningError('Unable to load private key: {}'.format(str(parser_error)))
+
+        signer = CachedSigner(_get_factory().new_signer(private_key))
+        _SIGNERS[path] = (version, signer)
+        return signer
+
+def read_public_key(name, key_dir=KEY_DIR):
+    """
+    return a public key of the key directory, <name>.pub
+
+    Args:
+        name (str): key name, root for the validator key
+        key_dir (str): key directory
+
+    Returns:
+        str: public key hex
+
+    Raises:
+        SigningError: key file missing
+    """
+    path = os.path.join(key_dir, '{}.pub'.format(name))
+    try:
+        version = _stat(path)
+    except OSError as err:
+        raise SigningError('Failed to read public key {}: {}'.format(path, str(err)))
+
+    with _LOCK:
+        cached = _PUBLIC_KEYS.get(path)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        try:
+            with open(path) as file_ptr:
+                public_key = file_ptr.read().strip()
+        except OSError as err:
+            raise SigningError('Failed to read public key {}: {}'.format(path, str(err)))
+
+        _PUBLIC_KEYS[path] = (version, public_key)
+        return public_key
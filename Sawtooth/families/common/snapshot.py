@@ -0,0 +1,325 @@
+# Copyright 2018 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# -----------------------------------------------------------------------------
+"""
+snapshots of the derived state of a chain
+
+a new node or a new gui user used to read every transaction of a project
+before showing its health. a snapshot holds what the queries derive from the
+transactions: the latest code smell configuration, the health series, the suse
+balances, the outcome of the proposals (and the votes of the active ones), the
+capacity of the peers and the commits waiting for their analysis, with the ids
+of the newest transactions it covers. a ChainClient started from a snapshot
+reads only the transactions committed after it, so the time to start does not
+grow with the history of the chain.
+
+snapshots are gzipped json with a digest of their content, written to a
+temporary file renamed over the snapshot. the snapshot of a project is kept in
+its etc folder and written again once enough transactions were committed after
+the previous one.
+"""
+import os
+import gzip
+import json
+import hashlib
+import logging
+import datetime
+import threading
+
+from common.chain_client import ChainClient
+from common.chain_client import Health, Vote, Proposal, Capacity, Assignment, Config, Outcome
+from common.chain_client import DATE_FORMAT, parse_date
+
+LOGGER = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 1
+#ids of the newest transactions kept to find the snapshot on the chain
+RECENT_IDS = 100
+#transactions committed after a snapshot before it is written again
+COMPACT_TRANSACTIONS = 200
+
+_LOCK = threading.Lock()
+#snapshot file, transactions of the last snapshot written by this process
+_WRITTEN = {}
+
+class SnapshotError(Exception):
+    """
+    snapshot missing, corrupted or of another version
+    """
+    pass
+
+def _format_date(date):
+    return None if date is None else date.strftime(DATE_FORMAT)
+
+class Snapshot:
+    """
+    derived state of a chain up to its newest transactions
+    """
+    def __init__(self,
+                 recent,
+                 transactions,
+                 config=None,
+                 healths=None,
+                 suse_balances=None,
+                 proposals=None,
+                 votes=None,
+                 capacities=None,
+                 assignments=None,
+                 created=None):
+        """
+        Constructor
+
+        Args:
+            recent (list): ids of the newest transactions, newest first
+            transactions (int): number of transactions covered
+            config (Config): latest code smell configuration
+            healths (list): Health, oldest first
+            suse_balances (dict): github id, suse
+            proposals (list): Outcome of each proposal, oldest first
+            votes (list): Vote of the active proposals
+            capacities (dict): peer ip, Capacity
+            assignments (list): Assignment waiting for a health
+            created (str): date of the snapshot, yyyy-mm-dd-hh-mm-ss
+        """
+        self.recent = list(recent)
+        self.transactions = transactions
+        self.config = config
+        self.healths = list(healths or [])
+        self.suse_balances = dict(suse_balances or {})
+        self.proposals = list(proposals or [])
+        self.votes = list(votes or [])
+        self.capacities = dict(capacities or {})
+        self.assignments = list(assignments or [])
+        self.created = created or datetime.datetime.utcnow().strftime(DATE_FORMAT)
+
+    @property
+    def head(self):
+        """
+        return the newest transaction covered by the snapshot
+
+        Returns:
+            str: transaction id, None for the snapshot of an empty chain
+        """
+        return self.recent[0] if self.recent else None
+
+    def to_dict(self):
+        """
+        return the snapshot as json types
+
+        Returns:
+            dict: snapshot
+        """
+        return {
+            'version': SNAPSHOT_VERSION,
+            'created': self.created,
+            'recent': self.recent,
+            'transactions': self.transactions,
+            'config': None if self.config is None else list(self.config),
+            'healths': [[health.transaction_id, health.github_id, health.health,
+                         health.commit_url, health.client_key, _format_date(health.date)]
+                        for health in self.healths],
+            'suse_balances': self.suse_balances,
+            'proposals': [list(outcome.proposal) + [outcome.accepted, outcome.rejected]
+                          for outcome in self.proposals],
+            'votes': [list(vote) for vote in self.votes],
+            'capacities': [[capacity.transaction_id, capacity.peer, capacity.queue,
+                            capacity.workers, capacity.cores, capacity.analysis_seconds,
+                            _format_date(capacity.date)]
+                           for capacity in self.capacities.values()],
+            'assignments': [[assignment.transaction_id, assignment.commit_url, assignment.peer,
+                             _format_date(assignment.date)] for assignment in self.assignments],
+        }
+
+    @staticmethod
+    def from_dict(data):
+        """
+        return the snapshot of json types
+
+        Args:
+            data (dict): snapshot, as returned by to_dict
+
+        Returns:
+            Snapshot: snapshot
+
+        Raises:
+            SnapshotError: another version or missing fields
+        """
+        if data.get('version') != SNAPSHOT_VERSION:
+            raise SnapshotError('Unsupported snapshot version {}'.format(data.get('version')))
+        try:
+            capacities = [Capacity(*fields[:6], date=parse_date(fields[6]))
+                          for fields in data['capacities']]
+            return Snapshot(
+                recent=data['recent'],
+                transactions=data['transactions'],
+                config=None if data['config'] is None else Config(*data['config']),
+                healths=[Health(*fields[:5], date=parse_date(fields[5]))
+                         for fields in data['healths']],
+                suse_balances=data['suse_balances'],
+                proposals=[Outcome(Proposal(*fields[:5]), fields[5], fields[6])
+                           for fields in data['proposals']],
+                votes=[Vote(*fields) for fields in data['votes']],
+                capacities={capacity.peer: capacity for capacity in capacities},
+                assignments=[Assignment(*fields[:3], date=parse_date(fields[3]))
+                             for fields in data['assignments']],
+                created=data['created'])
+        except (KeyError, TypeError, IndexError) as err:
+            raise SnapshotError('Invalid snapshot: {}'.format(err))
+
+def _digest(body):
+    return hashlib.sha256(
+        json.dumps(body, sort_keys=True, separators=(',', ':')).encode('utf-8')).hexdigest()
+
+def take_snapshot(chain, recent=RECENT_IDS):
+    """
+    return the snapshot of the chain read by a client, the client is
+    refreshed first
+
+    Args:
+        chain (ChainClient): client of the chain
+        recent (int): ids of the newest transactions kept
+
+    Returns:
+        Snapshot: snapshot
+    """
+    chain.refresh()
+    proposals = chain.proposals()
+    active = set(outcome.proposal.proposal_id for outcome in proposals
+                 if outcome.proposal.state == 'active')
+    votes = []
+    for proposal_id in sorted(active):
+        votes.extend(chain.votes(proposal_id))
+    return Snapshot(
+        recent=chain.latest_transaction_ids(recent),
+        transactions=chain.transaction_count(),
+        config=chain.latest_config(),
+        healths=chain.healths(),
+        suse_balances=chain.suse_balances(),
+        proposals=proposals,
+        votes=votes,
+        capacities=chain.capacities(),
+        assignments=chain.pending_assignments())
+
+def write_snapshot(snapshot, path):
+    """
+    write a snapshot, readers see the previous snapshot or the new one
+
+    Args:
+        snapshot (Snapshot): snapshot
+        path (str): snapshot file
+
+    Raises:
+        SnapshotError: unable to write the file
+    """
+    body = snapshot.to_dict()
+    data = json.dumps({'digest': _digest(body), 'snapshot': body}).encode('utf-8')
+    tmp_path = '{}.{}.{}.tmp'.format(path, os.getpid(), threading.get_ident())
+    try:
+        with open(tmp_path, 'wb') as snapshot_file:
+            with gzip.GzipFile(fileobj=snapshot_file, mode='wb') as gzip_file:
+                gzip_file.write(data)
+            snapshot_file.flush()
+            os.fsync(snapshot_file.fileno())
+        os.rename(tmp_path, path)
+    except (IOError, OSError) as err:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise SnapshotError('Unable to write snapshot {}: {}'.format(path, err))
+
+def load_snapshot(path):
+    """
+    read a snapshot
+
+    Args:
+        path (str): snapshot file
+
+    Returns:
+        Snapshot: snapshot
+
+    Raises:
+        SnapshotError: file missing, corrupted or of another version
+    """
+    try:
+        with gzip.open(path, 'rb') as snapshot_file:
+            data = json.loads(snapshot_file.read().decode('utf-8'))
+    except (IOError, OSError, EOFError, ValueError) as err:
+        raise SnapshotError('Unable to read snapshot {}: {}'.format(path, err))
+    if not isinstance(data, dict) or not isinstance(data.get('snapshot'), dict):
+        raise SnapshotError('Invalid snapshot {}'.format(path))
+    if _digest(data['snapshot']) != data.get('digest'):
+        raise SnapshotError('Corrupted snapshot {}'.format(path))
+    return Snapshot.from_dict(data['snapshot'])
+
+def project_snapshot_path(work_path):
+    """
+    return the path of the snapshot of a project
+
+    Args:
+        work_path (str): project folder
+
+    Returns:
+        str: path
+    """
+    return os.path.join(work_path, 'etc', '.snapshot')
+
+def open_project_chain(base_url, work_path, max_age=2):
+    """
+    return a client of the chain of a project, started from the snapshot of
+    the project when there is a valid one
+
+    Args:
+        base_url (str): rest api url
+        work_path (str): project folder
+        max_age (float): seconds before the index is refreshed again
+
+    Returns:
+        ChainClient: client
+    """
+    snapshot = None
+    path = project_snapshot_path(work_path)
+    if os.path.exists(path):
+        try:
+            snapshot = load_snapshot(path)
+        except SnapshotError as err:
+            LOGGER.warning("Ignoring snapshot: %s", err)
+    return ChainClient(base_url, max_age=max_age, snapshot=snapshot)
+
+def compact_project_snapshot(chain, work_path, min_transactions=COMPACT_TRANSACTIONS):
+    """
+    write the snapshot of a project, again once enough transactions were
+    committed after the last snapshot written or the snapshot the client
+    started from
+
+    Args:
+        chain (ChainClient): client of the chain of the project
+        work_path (str): project folder
+        min_transactions (int): transactions after the snapshot
+
+    Returns:
+        Snapshot: snapshot written, None when the snapshot is recent enough
+    """
+    path = project_snapshot_path(work_path)
+    with _LOCK:
+        written = _WRITTEN.get(path)
+    if written is None and chain.snapshot is not None:
+        written = chain.snapshot.transactions
+    if written is not None and chain.transaction_count() - written < min_transactions:
+        return None
+    snapshot = take_snapshot(chain)
+    write_snapshot(snapshot, path)
+    with _LOCK:
+        _WRITTEN[path] = snapshot.transactions
+    return snapshot
@@ -0,0 +1,580 @@
+# Copyright 2018 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# -----------------------------------------------------------------------------
+"""
+code smell configuration cache
+
+the .suse file of a project holds its code smells and vote settings. it is
+read by the clients, the proposal manager and the gui, each read goes through
+this cache: a file is parsed once per process while its content does not
+change. the mtime and size of the file are checked first, a file changed
+recently (within the mtime resolution of some file systems) or with another
+mtime or size is read again and parsed only when the hash of its content
+changed.
+
+the file is written to a temporary file renamed over the .suse file, readers
+see the old or the new configuration and never a truncated one. a write of
+the content already on disk is skipped, writes scheduled close together are
+coalesced into the last one. a watcher calls back when the file of a project
+changes (inotify on linux, polling elsewhere).
+"""
+import os
+import copy
+import time
+import fcntl
+import select
+import struct
+import ctypes
+import ctypes.util
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+
+import toml #pylint: disable=import-error
+
+LOGGER = logging.getLogger(__name__)
+
+#files changed less than this many seconds ago are hashed even when their
+#mtime and size did not change, two writes may share the same mtime
+SETTLE_SECONDS = 2
+#seconds a scheduled write waits for a newer configuration
+DEBOUNCE_SECONDS = 1
+#seconds between two checks of the watched files without inotify
+POLL_INTERVAL = 1
+
+_LOCK = threading.Lock()
+_CONFIGS = {}
+_PENDING = {}
+_WATCHER = None
+
+class SuseConfigError(Exception):
+    """
+    unable to load a code smell configuration
+    """
+    pass
+
+def _first(value):
+    """
+    return the value of a setting, settings are written as name = 3 or as
+    name = [3, 1] with a weight
+    """
+    if isinstance(value, (list, tuple)):
+        return value[0] if value else None
+    return value
+
+class SuseConfig:
+    """
+    parsed code smell configuration, read only
+    """
+    def __init__(self, path, raw, digest):
+        """
+        Constructor
+
+        Args:
+            path (str): path of the .suse file
+            raw (str): content of the file
+            digest (str): hash of the content
+
+        Raises:
+            SuseConfigError: invalid toml
+        """
+        self._path = path
+        self._raw = raw
+        self._digest = digest
+        try:
+            self._data = toml.loads(raw)
+        except (TypeError, ValueError, IndexError) as err:
+            raise SuseConfigError('Invalid code smell configuration {}: {}'.format(path, err))
+
+    @property
+    def path(self):
+        """
+        return the path of the .suse file
+
+        Returns:
+            str: path
+        """
+        return self._path
+
+    @property
+    def raw(self):
+        """
+        return the content of the .suse file
+
+        Returns:
+            str: toml
+        """
+        return self._raw
+
+    @property
+    def digest(self):
+        """
+        return the hash of the content
+
+        Returns:
+            str: sha256 hex
+        """
+        return self._digest
+
+    def to_dict(self):
+        """
+        return the whole configuration, a copy the caller can change
+
+        Returns:
+            dict: configuration
+        """
+        return copy.deepcopy(self._data)
+
+    @property
+    def code_smells(self):
+        """
+        return the code smells by type (class, method, comments)
+
+        Returns:
+            dict: type, {code smell: [value, weight]}
+        """
+        return copy.deepcopy(self._data.get('code_smells', {}))
+
+    @property
+    def vote_settings(self):
+        """
+        return the vote settings
+
+        Returns:
+            dict: setting, value or [value, weight]
+        """
+        return copy.deepcopy(self._data.get('vote_setting', {}))
+
+    def smell(self, name):
+        """
+        return the value of a code smell
+
+        Args:
+            name (str): code smell (LargeClass)
+
+        Returns:
+            int or float: value, None when the code smell is not configured
+        """
+        for smells in self._data.get('code_smells', {}).values():
+            if name in smells:
+                return _first(smells[name])
+        return None
+
+    def _setting(self, name):
+        try:
+            return int(_first(self._data.get('vote_setting', {}).get(name, 0)) or 0)
+        except (TypeError, ValueError):
+            return 0
+
+    @property
+    def approval_treshold(self):
+        """
+        return the yes votes accepting a proposal
+
+        Returns:
+            int: votes
+        """
+        return self._setting('approval_treshold')
+
+    @property
+    def proposal_active_days(self):
+        """
+        return the days a proposal stays active
+
+        Returns:
+            int: days
+        """
+        return self._setting('proposal_active_days')
+
+def _version(path):
+    """
+    return the key used to detect a change of a file
+    """
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+def load_suse_config(path):
+    """
+    return the configuration of a .suse file, parsed again only when its
+    content changes
+
+    Args:
+        path (str): path of the .suse file
+
+    Returns:
+        SuseConfig: configuration
+
+    Raises:
+        SuseConfigError: file missing or invalid
+    """
+    path = os.path.realpath(path)
+    try:
+        version = _version(path)
+    except OSError as err:
+        raise SuseConfigError('Unable to load code smell configuration {}: {}'.format(path, err))
+
+    with _LOCK:
+        cached = _CONFIGS.get(path)
+        settled = time.time() - version[0] / 1e9 > SETTLE_SECONDS
+        if cached is not None and cached[0] == version and settled:
+            return cached[1]
+
+        try:
+            with open(path, 'rb') as suse_file:
+                content = suse_file.read()
+        except (IOError, OSError) as err:
+            raise SuseConfigError('Unable to load code smell configuration {}: {}'.format(path, err))
+
+        digest = hashlib.sha256(content).hexdigest()
+        if cached is not None and cached[1].digest == digest:
+            config = cached[1]
+        else:
+            config = SuseConfig(path, content.decode('utf-8'), digest)
+        _CONFIGS[path] = (version, config)
+        return config
+
+def project_suse_path(work_path):
+    """
+    return the path of the .suse file of a project
+
+    Args:
+        work_path (str): project folder
+
+    Returns:
+        str: path
+    """
+    return os.path.join(work_path, 'etc', '.suse')
+
+def _serialize(config):
+    """
+    return the toml of a configuration
+
+    Args:
+        config (dict, str or SuseConfig): configuration
+
+    Returns:
+        str: toml
+    """
+    if isinstance(config, SuseConfig):
+        return config.raw
+    if isinstance(config, dict):
+        return toml.dumps(config)
+    return config
+
+@contextmanager
+def locked_suse_config(path):
+    """
+    hold the lock of a .suse file, read-modify-write cycles of several
+    processes are applied one after the other
+
+    Args:
+        path (str): path of the .suse file
+    """
+    with open(os.path.realpath(path) + '.lock', 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+def write_suse_config(path, config):
+    """
+    replace a .suse file, the file is not touched when it already holds the
+    configuration
+
+    Args:
+        path (str): path of the .suse file
+        config (dict, str or SuseConfig): new configuration
+
+    Returns:
+        SuseConfig: configuration written
+
+    Raises:
+        SuseConfigError: unable to write the file
+    """
+    path = os.path.realpath(path)
+    content = _serialize(config).encode('utf-8')
+    digest = hashlib.sha256(content).hexdigest()
+    try:
+        current = load_suse_config(path)
+        if current.digest == digest:
+            return current
+    except SuseConfigError:
+        pass
+
+    tmp_path = '{}.{}.{}.tmp'.format(path, os.getpid(), threading.get_ident())
+    try:
+        with open(tmp_path, 'wb') as suse_file:
+            suse_file.write(content)
+            suse_file.flush()
+            os.fsync(suse_file.fileno())
+        os.rename(tmp_path, path)
+    except (IOError, OSError) as err:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise SuseConfigError('Unable to write code smell configuration {}: {}'.format(path, err))
+
+    written = SuseConfig(path, content.decode('utf-8'), digest)
+    with _LOCK:
+        _CONFIGS[path] = (_version(path), written)
+    return written
+
+def update_suse_config(path, change):
+    """
+    change a .suse file under its lock
+
+    Args:
+        path (str): path of the .suse file
+        change (function): called with the configuration as a dict, changes
+                           it in place
+
+    Returns:
+        SuseConfig: configuration written
+    """
+    with locked_suse_config(path):
+        config = load_suse_config(path).to_dict()
+        change(config)
+        return write_suse_config(path, config)
+
+def schedule_suse_config(path, config, delay=DEBOUNCE_SECONDS):
+    """
+    write a configuration after a delay, a configuration scheduled for the
+    same file within the delay replaces it and only the last one is written
+
+    Args:
+        path (str): path of the .suse file
+        config (dict, str or SuseConfig): new configuration
+        delay (float): seconds to wait for a newer configuration
+    """
+    path = os.path.realpath(path)
+    with _LOCK:
+        pending = _PENDING.get(path)
+        if pending is not None:
+            pending[1].cancel()
+        timer = threading.Timer(delay, _write_pending, args=(path,))
+        timer.daemon = True
+        _PENDING[path] = (config, timer)
+        timer.start()
+
+def _write_pending(path):
+    """
+    timer, write the last configuration scheduled for a file
+    """
+    with _LOCK:
+        pending = _PENDING.pop(path, None)
+    if pending is None:
+        return
+    try:
+        with locked_suse_config(path):
+            write_suse_config(path, pending[0])
+    except SuseConfigError as err:
+        LOGGER.error("%s", err)
+
+def flush_suse_config():
+    """
+    write the scheduled configurations now
+    """
+    with _LOCK:
+        paths = list(_PENDING)
+        for path in paths:
+            _PENDING[path][1].cancel()
+    for path in paths:
+        _write_pending(path)
+
+class _Inotify:
+    """
+    inotify instance of the linux kernel, called through libc
+    """
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    EVENT = struct.Struct('iIII')
+
+    def __init__(self):
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self._directories = {}
+
+    def add(self, directory):
+        """
+        watch the files written or renamed into a directory
+        """
+        mask = self.IN_CLOSE_WRITE | self.IN_MOVED_TO | self.IN_CREATE
+        descriptor = self._libc.inotify_add_watch(self.fd, directory.encode(), mask)
+        if descriptor < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_add_watch failed on ' + directory)
+        self._directories[descriptor] = directory
+
+    def read(self):
+        """
+        return the paths of the files changed since the last read
+        """
+        paths = set()
+        try:
+            data = os.read(self.fd, 65536)
+        except BlockingIOError:
+            return paths
+        offset = 0
+        while offset + self.EVENT.size <= len(data):
+            descriptor, _, _, length = self.EVENT.unpack_from(data, offset)
+            offset += self.EVENT.size
+            name = data[offset:offset + length].split(b'\0', 1)[0].decode()
+            offset += length
+            if descriptor in self._directories and name:
+                paths.add(os.path.join(self._directories[descriptor], name))
+        return paths
+
+    def close(self):
+        os.close(self.fd)
+
+class SuseConfigWatcher:
+    """
+    call back when the .suse file of a project changes, several processes
+    writing the same configuration call back once
+    """
+    def __init__(self, poll_interval=POLL_INTERVAL):
+        """
+        Constructor
+
+        Args:
+            poll_interval (float): seconds between two checks without inotify
+        """
+        self._poll_interval = poll_interval
+        self._callbacks = {}
+        self._digests = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+        try:
+            self._inotify = _Inotify()
+        except (OSError, AttributeError) as err:
+            LOGGER.debug("inotify not available, polling .suse files: %s", err)
+            self._inotify = None
+
+    def watch(self, path, callback):
+        """
+        call callback with the new SuseConfig after each change of a file
+
+        Args:
+            path (str): path of the .suse file
+            callback (function): called from the watcher thread
+        """
+        path = os.path.realpath(path)
+        with self._lock:
+            if path not in self._callbacks:
+                self._callbacks[path] = []
+                try:
+                    self._digests[path] = load_suse_config(path).digest
+                except SuseConfigError:
+                    self._digests[path] = None
+                if self._inotify is not None:
+                    self._inotify.add(os.path.dirname(path))
+            self._callbacks[path].append(callback)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run)
+                self._thread.daemon = True
+                self._thread.start()
+
+    def unwatch(self, path, callback):
+        """
+        stop calling back a callback
+
+        Args:
+            path (str): path of the .suse file
+            callback (function): callback given to watch
+        """
+        path = os.path.realpath(path)
+        with self._lock:
+            callbacks = self._callbacks.get(path, [])
+            if callback in callbacks:
+                callbacks.remove(callback)
+
+    def stop(self):
+        """
+        stop the watcher thread
+        """
+        self._stopped.set()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            if self._inotify is None:
+                self._stopped.wait(self._poll_interval)
+                with self._lock:
+                    changed = set(self._callbacks)
+            else:
+                readable, _, _ = select.select([self._inotify.fd], [], [], self._poll_interval)
+                if not readable:
+                    continue
+                changed = self._inotify.read()
+            for path in changed:
+                self._check(path)
+        if self._inotify is not None:
+            self._inotify.close()
+
+    def _check(self, path):
+        """
+        call back when the content of a watched file changed
+        """
+        with self._lock:
+            if path not in self._callbacks:
+                return
+        try:
+            config = load_suse_config(path)
+        except SuseConfigError as err:
+            LOGGER.debug("%s", err)
+            return
+        with self._lock:
+            if self._digests.get(path) == config.digest:
+                return
+            self._digests[path] = config.digest
+            callbacks = list(self._callbacks.get(path, []))
+        for callback in callbacks:
+            try:
+                callback(config)
+            except Exception as err: #pylint: disable=broad-except
+                LOGGER.exception("Configuration callback failed: %s", err)
+
+def watch_suse_config(path, callback):
+    """
+    call callback with the new SuseConfig after each change of a .suse file,
+    the callbacks of a process share one watcher thread
+
+    Args:
+        path (str): path of the .suse file
+        callback (function): called from the watcher thread
+    """
+    global _WATCHER #pylint: disable=global-statement
+    with _LOCK:
+        if _WATCHER is None:
+            _WATCHER = SuseConfigWatcher()
+        watcher = _WATCHER
+    watcher.watch(path, callback)
+
+def unwatch_suse_config(path, callback):
+    """
+    stop calling back a callback given to watch_suse_config
+
+    Args:
+        path (str): path of the .suse file
+        callback (function): callback
+    """
+    with _LOCK:
+        watcher = _WATCHER
+    if watcher is not None:
+        watcher.unwatch(path, callback)
@@ -0,0 +1,138 @@
+import unittest
+import os
+import sys
+import json
+import threading
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__)))))
+
+from common.batches import COMMITTED, INVALID, PENDING, MAX_WAIT #pylint: disable=wrong-import-position
+from common.batches import submit_batches, get_batch_statuses, wait_for_batches #pylint: disable=wrong-import-position
+from common.batches import BatchStatusWatcher #pylint: disable=wrong-import-position
+
+class FakeBatch:
+    def __init__(self, header_signature):
+        self.header_signature = header_signature
+
+class FakeBatchList:
+    def __init__(self, ids):
+        self.batches = [FakeBatch(batch_id) for batch_id in ids]
+
+    def SerializeToString(self): #pylint: disable=invalid-name
+        return b'batches'
+
+class FakeRest:
+    """
+    rest api answering /batch_statuses with the statuses of the rounds given,
+    one round per request, the last round is kept
+    """
+    def __init__(self, rounds):
+        self.rounds = list(rounds)
+        self.requests = []
+        self.polled = threading.Event()
+
+    def long_poll_timeout(self, wait):
+        return (3.05, wait + 10)
+
+    def post(self, suffix, data, content_type=None, timeout=None, idempotent=False):
+        self.requests.append((suffix, data, timeout, idempotent))
+        if suffix == 'batches':
+            return ''
+        statuses = self.rounds[0] if len(self.rounds) == 1 else self.rounds.pop(0)
+        self.polled.set()
+        if isinstance(statuses, Exception):
+            raise statuses
+        data = [{'id': batch_id, 'status': statuses.get(batch_id, PENDING),
+                 'invalid_transactions': [{'id': 'txn1'}] if statuses.get(batch_id) == INVALID else []}
+                for batch_id in json.loads(data)]
+        return json.dumps({'data': data})
+
+class BatchesTest(unittest.TestCase):
+    def test_submit_without_wait(self):
+        rest = FakeRest([{}])
+        self.assertEqual(submit_batches(rest, FakeBatchList(['a', 'b'])), {'a': PENDING, 'b': PENDING})
+        self.assertEqual([request[0] for request in rest.requests], ['batches'])
+
+    def test_get_batch_statuses_long_polls(self):
+        rest = FakeRest([{'a': COMMITTED}])
+        statuses = get_batch_statuses(rest, ['a', 'b'], wait=MAX_WAIT + 100)
+        self.assertEqual(statuses, {'a': (COMMITTED, []), 'b': (PENDING, [])})
+        suffix, data, timeout, idempotent = rest.requests[0]
+        self.assertEqual(suffix, 'batch_statuses?wait={}'.format(MAX_WAIT))
+        self.assertEqual(json.loads(data), ['a', 'b'])
+        self.assertEqual(timeout, (3.05, MAX_WAIT + 10))
+        self.assertTrue(idempotent)
+
+    def test_wait_for_batches_asks_only_pending(self):
+        rest = FakeRest([{'a': COMMITTED}, {'b': INVALID}])
+        self.assertEqual(wait_for_batches(rest, ['a', 'b'], 60), {'a': COMMITTED, 'b': INVALID})
+        self.assertEqual([json.loads(request[1]) for request in rest.requests], [['a', 'b'], ['b']])
+
+    def test_wait_for_batches_times_out(self):
+        rest = FakeRest([{}])
+        with mock.patch('common.batches.time.time', side_effect=[0, 0, 30, 61]):
+            self.assertEqual(wait_for_batches(rest, ['a'], 60), {'a': PENDING})
+        self.assertEqual(len(rest.requests), 2)
+        #the second request waits the time left
+        self.assertEqual(rest.requests[1][0], 'batch_statuses?wait=30')
+
+    def test_submit_with_wait(self):
+        rest = FakeRest([{'a': COMMITTED}])
+        self.assertEqual(submit_batches(rest, FakeBatchList(['a']), wait=10), {'a': COMMITTED})
+
+class BatchStatusWatcherTest(unittest.TestCase):
+    def setUp(self):
+        self.done = threading.Event()
+        self.reported = []
+
+    def callback(self, batch_id, status, invalid):
+        self.reported.append((batch_id, status, invalid))
+        if len(self.reported) == self.expected:
+            self.done.set()
+
+    def watcher(self, rounds, expected):
+        self.expected = expected
+        watcher = BatchStatusWatcher(FakeRest(rounds), poll_wait=0.01)
+        self.addCleanup(watcher.stop)
+        return watcher
+
+    def test_batches_are_reported_once(self):
+        watcher = self.watcher([{}, {'a': COMMITTED}, {'a': COMMITTED, 'b': INVALID}], 2)
+        self.assertEqual(watcher.submit(FakeBatchList(['a', 'b']), self.callback), ['a', 'b'])
+        self.assertTrue(self.done.wait(5))
+        self.assertEqual(self.reported, [('a', COMMITTED, []), ('b', INVALID, [{'id': 'txn1'}])])
+        self.assertEqual(watcher.pending(), [])
+
+    def test_all_batches_in_one_request(self):
+        watcher = self.watcher([{}, {'a': COMMITTED, 'b': COMMITTED}], 2)
+        watcher.watch(['a', 'b'], self.callback)
+        self.assertTrue(self.done.wait(5))
+        self.assertTrue(all(json.loads(request[1]) == ['a', 'b'] for request in watcher._rest.requests))
+
+    def test_error_is_retried(self):
+        watcher = self.watcher([IOError('unreachable'), {'a': COMMITTED}], 1)
+        watcher.watch(['a'], self.callback)
+        self.assertTrue(self.done.wait(5))
+        self.assertEqual(self.reported, [('a', COMMITTED, [])])
+
+    def test_failing_callback_does_not_stop_watcher(self):
+        watcher = self.watcher([{'a': COMMITTED}, {'b': COMMITTED}], 1)
+        def fail(batch_id, status, invalid):
+            raise ValueError('bad callback')
+        watcher.watch(['a'], fail)
+        watcher.watch(['b'], self.callback)
+        self.assertTrue(self.done.wait(5))
+        self.assertEqual(self.reported, [('b', COMMITTED, [])])
+
+    def test_stop(self):
+        watcher = self.watcher([{}], 1)
+        watcher.watch(['a'], self.callback)
+        self.assertTrue(watcher._rest.polled.wait(5))
+        watcher.stop()
+        self.assertFalse(watcher._thread.is_alive())
+        self.assertEqual(watcher.pending(), ['a'])
+        self.assertEqual(self.reported, [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import unittest
+import os
+import sys
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__)))))
+
+from common.events import EventSubscriber, make_event_type, add_transaction_event #pylint: disable=wrong-import-position
+from common.events import event_attributes #pylint: disable=wrong-import-position
+
+class FakeAttribute:
+    def __init__(self, key, value):
+        self.key = key
+        self.value = value
+
+class FakeEvent:
+    def __init__(self, event_type, signature=None, data=b''):
+        self.event_type = event_type
+        self.attributes = [FakeAttribute('txn_id', 'txn1')]
+        if signature is not None:
+            self.attributes.append(FakeAttribute('signature', signature))
+        self.data = data
+
+class FakeContext:
+    def __init__(self):
+        self.events = []
+
+    def add_event(self, event_type, attributes, data):
+        self.events.append((event_type, attributes, data))
+
+class FakeTransaction:
+    signature = 'sig1'
+    payload = b'commit,user,url'
+
+class EventTest(unittest.TestCase):
+    def test_make_event_type(self):
+        self.assertEqual(make_event_type('health', 'commit'), 'health/commit')
+
+    def test_add_transaction_event(self):
+        context = FakeContext()
+        add_transaction_event(context, 'health', FakeTransaction(), 'commit', 'txn1')
+        self.assertEqual(context.events, [('health/commit', [('txn_id', 'txn1'), ('signature', 'sig1')],
+                                           b'commit,user,url')])
+
+    def test_event_attributes(self):
+        self.assertEqual(event_attributes(FakeEvent('health/commit', 'sig1')),
+                         {'txn_id': 'txn1', 'signature': 'sig1'})
+
+class EventSubscriberTest(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch('common.events.zmq.Context', mock.Mock())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.subscriber = EventSubscriber('tcp://127.0.0.1:4004')
+        self.delivered = []
+        self.subscriber.on('health/commit', lambda event, block: self.delivered.append(
+            (event_attributes(event).get('signature'), block.get('block_num'))))
+
+    def test_event_is_delivered_once(self):
+        self.subscriber._dispatch(FakeEvent('health/commit', 'sig1'), {'block_num': '1'})
+        #delivered again after a resubscription
+        self.subscriber._dispatch(FakeEvent('health/commit', 'sig1'), {'block_num': '1'})
+        self.subscriber._dispatch(FakeEvent('health/commit', 'sig2'), {'block_num': '2'})
+        self.assertEqual(self.delivered, [('sig1', '1'), ('sig2', '2')])
+
+    def test_event_without_signature_is_always_delivered(self):
+        self.subscriber._dispatch(FakeEvent('health/commit'), {})
+        self.subscriber._dispatch(FakeEvent('health/commit'), {})
+        self.assertEqual(len(self.delivered), 2)
+
+    def test_oldest_signatures_are_forgotten(self):
+        self.subscriber.MAX_SEEN = 2
+        for signature in ('sig1', 'sig2', 'sig3'):
+            self.subscriber._dispatch(FakeEvent('health/commit', signature), {})
+        self.subscriber._dispatch(FakeEvent('health/commit', 'sig3'), {})
+        self.subscriber._dispatch(FakeEvent('health/commit', 'sig1'), {})
+        self.assertEqual([signature for signature, _ in self.delivered], ['sig1', 'sig2', 'sig3', 'sig1'])
+
+    def test_failing_callback_does_not_stop_others(self):
+        def fail(event, block):
+            raise ValueError('bad payload')
+        self.subscriber.on('health/health', fail)
+        self.subscriber.on('health/health', lambda event, block: self.delivered.append('health'))
+        self.subscriber._dispatch(FakeEvent('health/health', 'sig1'), {})
+        self.assertEqual(self.delivered, ['health'])
+
+    def test_other_event_types_are_ignored(self):
+        self.subscriber._dispatch(FakeEvent('suse/suse', 'sig1'), {})
+        self.assertEqual(self.delivered, [])
+
+if __name__ == '__main__':
+    unittest.main()
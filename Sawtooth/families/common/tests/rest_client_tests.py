@@ -0,0 +1,126 @@
+import unittest
+import os
+import sys
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__)))))
+
+import requests #pylint: disable=wrong-import-position
+from urllib3.exceptions import MaxRetryError, NewConnectionError #pylint: disable=wrong-import-position
+from common.rest_client import RestClient, RestClientError #pylint: disable=wrong-import-position
+
+URL = 'http://127.0.0.1:8008'
+
+class FakeResponse:
+    def __init__(self, status_code, text='', headers=None):
+        self.status_code = status_code
+        self.ok = status_code < 400
+        self.reason = 'reason'
+        self.text = text
+        self.headers = headers or {}
+
+class FakeSession:
+    """
+    answer the requests with the results given, an exception is raised
+    """
+    def __init__(self, results):
+        self.results = list(results)
+        self.requests = []
+
+    def request(self, method, url, data=None, headers=None, timeout=None):
+        self.requests.append((method, url, timeout))
+        result = self.results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+def refused():
+    return requests.exceptions.ConnectionError(
+        MaxRetryError(None, URL, NewConnectionError(None, 'Connection refused')))
+
+class RestClientTest(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch('common.rest_client.time.sleep')
+        self.sleep = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def client(self, results, retries=3):
+        client = RestClient('127.0.0.1:8008', retries=retries, backoff=0.5)
+        client._session = FakeSession(results)
+        return client
+
+    def test_url(self):
+        client = self.client([])
+        self.assertEqual(client.url('/batches'), URL + '/batches')
+        self.assertEqual(client.url(URL + '/blocks?start=1'), URL + '/blocks?start=1')
+
+    def test_get_retries_timeouts_and_connection_errors(self):
+        client = self.client([requests.exceptions.ReadTimeout(), refused(),
+                              requests.exceptions.ConnectionError('reset'), FakeResponse(200, 'ok')])
+        self.assertEqual(client.get('blocks'), 'ok')
+        self.assertEqual(len(client._session.requests), 4)
+
+    def test_get_gives_up_after_retries(self):
+        client = self.client([requests.exceptions.ReadTimeout()] * 3, retries=2)
+        with self.assertRaises(RestClientError) as context:
+            client.get('blocks')
+        self.assertIsNone(context.exception.status_code)
+        self.assertEqual(len(client._session.requests), 3)
+
+    def test_post_is_not_sent_again_after_read_timeout(self):
+        client = self.client([requests.exceptions.ReadTimeout(), FakeResponse(202)])
+        with self.assertRaises(RestClientError):
+            client.post('batches', b'batch')
+        self.assertEqual(len(client._session.requests), 1)
+
+    def test_post_is_not_sent_again_after_connection_reset(self):
+        client = self.client([requests.exceptions.ConnectionError('Connection aborted'),
+                              FakeResponse(202)])
+        with self.assertRaises(RestClientError):
+            client.post('batches', b'batch')
+        self.assertEqual(len(client._session.requests), 1)
+
+    def test_post_not_sent_is_retried(self):
+        client = self.client([requests.exceptions.ConnectTimeout(), refused(), FakeResponse(202, 'ok')])
+        self.assertEqual(client.post('batches', b'batch'), 'ok')
+        self.assertEqual(len(client._session.requests), 3)
+
+    def test_idempotent_post_is_retried(self):
+        client = self.client([requests.exceptions.ReadTimeout(), FakeResponse(200, 'ok')])
+        self.assertEqual(client.post('batch_statuses', '[]', idempotent=True), 'ok')
+
+    def test_busy_responses_are_retried(self):
+        client = self.client([FakeResponse(429, headers={'Retry-After': '2'}), FakeResponse(503),
+                              FakeResponse(202, 'ok')])
+        self.assertEqual(client.post('batches', b'batch'), 'ok')
+        #the delay asked by the rest api, then jittered backoff
+        self.assertEqual(self.sleep.call_args_list[0], mock.call(2.0))
+        self.assertLessEqual(self.sleep.call_args_list[1][0][0], 1.0)
+
+    def test_backoff_grows(self):
+        client = self.client([FakeResponse(503)] * 4)
+        with mock.patch('common.rest_client.random.uniform', lambda low, high: high):
+            with self.assertRaises(RestClientError) as context:
+                client.get('blocks')
+        self.assertEqual(context.exception.status_code, 503)
+        self.assertEqual([call[0][0] for call in self.sleep.call_args_list], [0.5, 1.0, 2.0])
+
+    def test_error_response(self):
+        client = self.client([FakeResponse(404)])
+        with self.assertRaises(RestClientError) as context:
+            client.get('transactions/1')
+        self.assertEqual(context.exception.status_code, 404)
+        self.sleep.assert_not_called()
+
+    def test_long_poll_timeout(self):
+        client = self.client([])
+        self.assertEqual(client.long_poll_timeout(5), (3.05, 30))
+        self.assertEqual(client.long_poll_timeout(60), (3.05, 70))
+
+    def test_get_many_keeps_order(self):
+        client = self.client([])
+        client.get = lambda suffix: suffix.upper()
+        self.assertEqual(client.get_many(['a', 'b', 'c'], concurrency=2), ['A', 'B', 'C'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,212 @@
+import unittest
+import os
+import sys
+import gzip
+import json
+import base64
+import random
+import shutil
+import tempfile
+from unittest import mock
+from urllib.parse import urlparse, parse_qs
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__)))))
+
+from common.chain_client import ChainClient #pylint: disable=wrong-import-position
+from common.snapshot import Snapshot, SnapshotError, SNAPSHOT_VERSION #pylint: disable=wrong-import-position
+from common.snapshot import take_snapshot, write_snapshot, load_snapshot #pylint: disable=wrong-import-position
+from common.snapshot import open_project_chain, compact_project_snapshot #pylint: disable=wrong-import-position
+from common.snapshot import project_snapshot_path #pylint: disable=wrong-import-position
+
+DATE = '2018-11-26-18-53-12'
+
+def transaction_entry(family, fields, rng):
+    """
+    return a transaction as listed by the rest api
+    """
+    return {
+        'header_signature': '{:0128x}'.format(rng.getrandbits(512)),
+        'header': {'family_name': family, 'signer_public_key': '02' + '{:064x}'.format(rng.getrandbits(256))},
+        'payload': base64.b64encode(','.join(fields).encode()).decode()
+    }
+
+def make_chain(count, seed=1):
+    """
+    return the transactions of a project, newest first: commits and their
+    healths, suse rewards, capacities, configurations, proposals and votes.
+    a new proposal closes the previous one, so the chain holds a few more
+    than count transactions
+    """
+    rng = random.Random(seed)
+    entries = []
+    proposal_id = None
+    for index in range(count):
+        kind = index % 8
+        user = 'user{}'.format(rng.randint(1, 5))
+        commit = 'https://github.com/obahy/Susereum/commit/{:040x}'.format(rng.getrandbits(160))
+        peer = 'tcp://10.0.0.{}:8800'.format(rng.randint(1, 3))
+        if kind in (0, 1):
+            fields = ['commit', user, commit, 'new', 'http://127.0.0.1:8008', peer, DATE]
+            entries.append(transaction_entry('health', fields, rng))
+        elif kind == 2:
+            fields = ['health', user, str(rng.uniform(0, 100)), 'processed', commit, peer, DATE]
+            entries.append(transaction_entry('health', fields, rng))
+        elif kind == 3:
+            fields = ['suse', user, str(rng.randint(1, 40)), 'new', DATE]
+            entries.append(transaction_entry('suse', fields, rng))
+        elif kind == 4:
+            fields = ['capacity', peer.split('//')[1].split(':')[0], '1:2:4:30.0', 'new',
+                      'http://127.0.0.1:8008', peer, DATE]
+            entries.append(transaction_entry('health', fields, rng))
+        elif kind == 5:
+            fields = ['config', str(index), "{'LargeClass': 400; 'SmallMethod': 3}", 'update', DATE]
+            entries.append(transaction_entry('code-smell', fields, rng))
+        elif kind == 6 or proposal_id is None:
+            #each proposal closes the previous one
+            if proposal_id is not None:
+                fields = ['proposal', proposal_id, "{'LargeClass': 300}", 'accepted', DATE]
+                entries.append(transaction_entry('code-smell', fields, rng))
+            proposal_id = str(index)
+            fields = ['proposal', proposal_id, "{'LargeClass': 300}", 'active', DATE]
+            entries.append(transaction_entry('code-smell', fields, rng))
+        else:
+            fields = ['vote', str(index), proposal_id, str(rng.randint(0, 1)), DATE]
+            entries.append(transaction_entry('code-smell', fields, rng))
+    entries.reverse()
+    return entries
+
+class FakeRest:
+    """
+    rest api serving the /transactions pages of a chain
+    """
+    def __init__(self, entries):
+        self.entries = list(entries)
+
+    def add(self, entry):
+        self.entries.insert(0, entry)
+
+    def get(self, suffix):
+        query = parse_qs(urlparse(suffix).query)
+        limit = int(query.get('limit', ['100'])[0])
+        start = int(query.get('start', ['0'])[0])
+        page = {'data': self.entries[start:start + limit], 'paging': {}}
+        if start + limit < len(self.entries):
+            page['paging']['next'] = 'transactions?limit={}&start={}'.format(limit, start + limit)
+        return json.dumps(page)
+
+def chain_state(chain):
+    """
+    return what the queries of a client derive from the chain
+    """
+    proposal = chain.latest_proposal()
+    return {
+        'transactions': chain.transaction_count(),
+        'config': chain.latest_config(),
+        'healths': chain.healths(),
+        'suse_balances': chain.suse_balances(),
+        'proposals': chain.proposals(),
+        'active_proposal': chain.active_proposal(),
+        'votes': sorted(chain.votes(proposal.proposal_id)) if proposal else None,
+        'capacities': chain.capacities(),
+        'assignments': chain.pending_assignments(),
+    }
+
+class SnapshotTest(unittest.TestCase):
+    def setUp(self):
+        self.entries = make_chain(600)
+        #the oldest 400 transactions are committed before the snapshot
+        self.rests = {'http://127.0.0.1:8008': FakeRest(self.entries[200:])}
+        self.url = 'http://127.0.0.1:8008'
+        self.api = self.rests[self.url]
+        patcher = mock.patch('common.chain_client.RestClient', lambda base_url: self.rests[base_url])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.work_path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.work_path)
+        os.makedirs(os.path.join(self.work_path, 'etc'))
+
+    def test_dict_round_trip(self):
+        snapshot = take_snapshot(ChainClient(self.url, max_age=0))
+        copy = Snapshot.from_dict(json.loads(json.dumps(snapshot.to_dict())))
+        self.assertEqual(copy.to_dict(), snapshot.to_dict())
+        self.assertEqual(copy.head, snapshot.head)
+        self.assertEqual(copy.healths, snapshot.healths)
+        self.assertEqual(copy.proposals, snapshot.proposals)
+        self.assertEqual(copy.capacities, snapshot.capacities)
+        self.assertEqual(copy.assignments, snapshot.assignments)
+
+    def test_empty_snapshot_round_trip(self):
+        snapshot = Snapshot(recent=[], transactions=0)
+        copy = Snapshot.from_dict(snapshot.to_dict())
+        self.assertIsNone(copy.head)
+        self.assertIsNone(copy.config)
+        self.assertEqual(copy.to_dict(), snapshot.to_dict())
+
+    def test_other_version_is_refused(self):
+        data = Snapshot(recent=[], transactions=0).to_dict()
+        data['version'] = SNAPSHOT_VERSION + 1
+        with self.assertRaises(SnapshotError):
+            Snapshot.from_dict(data)
+        del data['version']
+        with self.assertRaises(SnapshotError):
+            Snapshot.from_dict(data)
+
+    def test_missing_fields_are_refused(self):
+        data = Snapshot(recent=[], transactions=0).to_dict()
+        del data['healths']
+        with self.assertRaises(SnapshotError):
+            Snapshot.from_dict(data)
+
+    def test_file_round_trip(self):
+        snapshot = take_snapshot(ChainClient(self.url, max_age=0))
+        path = project_snapshot_path(self.work_path)
+        write_snapshot(snapshot, path)
+        self.assertEqual(load_snapshot(path).to_dict(), snapshot.to_dict())
+        self.assertEqual(os.listdir(os.path.join(self.work_path, 'etc')), ['.snapshot'])
+
+    def test_corrupted_file_is_refused(self):
+        path = project_snapshot_path(self.work_path)
+        write_snapshot(take_snapshot(ChainClient(self.url, max_age=0)), path)
+        with gzip.open(path, 'rb') as snapshot_file:
+            data = json.loads(snapshot_file.read().decode('utf-8'))
+        data['snapshot']['transactions'] += 1
+        with gzip.open(path, 'wb') as snapshot_file:
+            snapshot_file.write(json.dumps(data).encode('utf-8'))
+        with self.assertRaises(SnapshotError):
+            load_snapshot(path)
+        with open(path, 'wb') as snapshot_file:
+            snapshot_file.write(b'garbage')
+        with self.assertRaises(SnapshotError):
+            load_snapshot(path)
+        self.assertIsNone(open_project_chain(self.url, self.work_path, max_age=0).snapshot)
+
+    def test_client_from_snapshot_reads_new_transactions(self):
+        compact_project_snapshot(ChainClient(self.url, max_age=0), self.work_path)
+        for entry in reversed(self.entries[:200]):
+            self.api.add(entry)
+        chain = open_project_chain(self.url, self.work_path, max_age=0)
+        self.assertIsNotNone(chain.snapshot)
+        self.assertEqual(chain_state(chain), chain_state(ChainClient(self.url, max_age=0)))
+        self.assertEqual(chain.transaction_count(), len(self.entries))
+
+    def test_snapshot_not_on_chain_reads_whole_chain(self):
+        compact_project_snapshot(ChainClient(self.url, max_age=0), self.work_path)
+        other_url = 'http://127.0.0.1:8009'
+        other = make_chain(300, seed=7)
+        self.rests[other_url] = FakeRest(other)
+        chain = open_project_chain(other_url, self.work_path, max_age=0)
+        self.assertEqual(chain_state(chain), chain_state(ChainClient(other_url, max_age=0)))
+        self.assertIsNone(chain.snapshot)
+        self.assertEqual(chain.transaction_count(), len(other))
+
+    def test_compaction_waits_for_new_transactions(self):
+        chain = ChainClient(self.url, max_age=0)
+        self.assertIsNotNone(compact_project_snapshot(chain, self.work_path))
+        self.assertIsNone(compact_project_snapshot(chain, self.work_path))
+        for entry in reversed(self.entries[:200]):
+            self.api.add(entry)
+        snapshot = compact_project_snapshot(chain, self.work_path, min_transactions=200)
+        self.assertEqual(snapshot.transactions, len(self.entries))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,220 @@
+import unittest
+import os
+import sys
+import time
+import shutil
+import threading
+import tempfile
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__)))))
+
+from common import suse_config #pylint: disable=wrong-import-position
+from common.suse_config import SuseConfigError, SuseConfigWatcher, SETTLE_SECONDS #pylint: disable=wrong-import-position
+from common.suse_config import load_suse_config, project_suse_path, write_suse_config #pylint: disable=wrong-import-position
+from common.suse_config import update_suse_config, schedule_suse_config, flush_suse_config #pylint: disable=wrong-import-position
+
+SUSE = '''title = "code smell family configuration"
+[vote_setting]
+approval_treshold = [ 3, 1,]
+proposal_active_days = 5
+[code_smells.class]
+LargeClass = [ 999, 1,]
+[code_smells.method]
+SmallMethod = [ 190, 1,]
+'''
+
+class SuseConfigTest(unittest.TestCase):
+    def setUp(self):
+        self.work_path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.work_path)
+        os.makedirs(os.path.join(self.work_path, 'etc'))
+        self.path = project_suse_path(self.work_path)
+        self.write(SUSE)
+
+    def write(self, content, age=0):
+        with open(self.path, 'w') as suse_file:
+            suse_file.write(content)
+        if age:
+            mtime = time.time() - age
+            os.utime(self.path, (mtime, mtime))
+
+class LoadSuseConfigTest(SuseConfigTest):
+    def test_settings(self):
+        config = load_suse_config(self.path)
+        self.assertEqual(config.path, os.path.realpath(self.path))
+        self.assertEqual(config.raw, SUSE)
+        self.assertEqual(config.smell('LargeClass'), 999)
+        self.assertEqual(config.smell('SmallMethod'), 190)
+        self.assertIsNone(config.smell('GodClass'))
+        self.assertEqual(config.approval_treshold, 3)
+        self.assertEqual(config.proposal_active_days, 5)
+        self.assertEqual(config.code_smells['class'], {'LargeClass': [999, 1]})
+
+    def test_config_is_read_only(self):
+        config = load_suse_config(self.path)
+        config.to_dict()['code_smells']['class']['LargeClass'] = [1, 1]
+        config.code_smells['class']['LargeClass'] = [1, 1]
+        self.assertEqual(config.smell('LargeClass'), 999)
+
+    def test_file_is_parsed_once(self):
+        self.assertIs(load_suse_config(self.path), load_suse_config(self.path))
+
+    def test_settled_file_is_not_read_again(self):
+        self.write(SUSE, age=SETTLE_SECONDS + 10)
+        config = load_suse_config(self.path)
+        with mock.patch('common.suse_config.open', side_effect=AssertionError('read again'), create=True):
+            self.assertIs(load_suse_config(self.path), config)
+
+    def test_same_content_is_not_parsed_again(self):
+        config = load_suse_config(self.path)
+        self.write(SUSE, age=SETTLE_SECONDS + 10)
+        with mock.patch('common.suse_config.SuseConfig', side_effect=AssertionError('parsed again')):
+            self.assertIs(load_suse_config(self.path), config)
+
+    def test_recent_change_with_same_mtime_and_size(self):
+        config = load_suse_config(self.path)
+        stat = os.stat(self.path)
+        self.write(SUSE.replace('999', '998'))
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        changed = load_suse_config(self.path)
+        self.assertNotEqual(changed.digest, config.digest)
+        self.assertEqual(changed.smell('LargeClass'), 998)
+
+    def test_changed_file_is_parsed_again(self):
+        load_suse_config(self.path)
+        self.write(SUSE.replace('999', '400'), age=SETTLE_SECONDS + 10)
+        self.assertEqual(load_suse_config(self.path).smell('LargeClass'), 400)
+
+    def test_paths_of_the_same_file_share_the_cache(self):
+        link = os.path.join(self.work_path, 'suse')
+        os.symlink(self.path, link)
+        self.assertIs(load_suse_config(link), load_suse_config(self.path))
+
+    def test_missing_file(self):
+        with self.assertRaises(SuseConfigError):
+            load_suse_config(os.path.join(self.work_path, 'missing'))
+
+    def test_invalid_file(self):
+        self.write('[code_smells\nLargeClass = ')
+        with self.assertRaises(SuseConfigError):
+            load_suse_config(self.path)
+
+class WriteSuseConfigTest(SuseConfigTest):
+    def read(self):
+        with open(self.path) as suse_file:
+            return suse_file.read()
+
+    def test_write_replaces_file(self):
+        config = load_suse_config(self.path).to_dict()
+        config['code_smells']['class']['LargeClass'] = [400, 1]
+        written = write_suse_config(self.path, config)
+        self.assertEqual(written.smell('LargeClass'), 400)
+        self.assertIs(load_suse_config(self.path), written)
+        self.assertEqual(self.read(), written.raw)
+        #the temporary file is renamed over the .suse file
+        self.assertEqual(os.listdir(os.path.dirname(self.path)), ['.suse'])
+
+    def test_same_content_is_not_written(self):
+        self.write(SUSE, age=SETTLE_SECONDS + 10)
+        mtime = os.stat(self.path).st_mtime_ns
+        self.assertEqual(write_suse_config(self.path, SUSE).raw, SUSE)
+        self.assertEqual(write_suse_config(self.path, load_suse_config(self.path)).raw, SUSE)
+        self.assertEqual(os.stat(self.path).st_mtime_ns, mtime)
+
+    def test_failed_write_keeps_file(self):
+        with mock.patch('common.suse_config.os.rename', side_effect=OSError('disk full')):
+            with self.assertRaises(SuseConfigError):
+                write_suse_config(self.path, SUSE.replace('999', '400'))
+        self.assertEqual(self.read(), SUSE)
+        self.assertEqual(os.listdir(os.path.dirname(self.path)), ['.suse'])
+
+    def test_update(self):
+        def change(config):
+            config['vote_setting']['proposal_active_days'] = 7
+        update_suse_config(self.path, change)
+        self.assertEqual(load_suse_config(self.path).proposal_active_days, 7)
+        self.assertEqual(load_suse_config(self.path).smell('LargeClass'), 999)
+
+    def test_updates_of_several_threads_are_applied(self):
+        def change(config):
+            config['vote_setting']['proposal_active_days'] += 1
+        threads = [threading.Thread(target=update_suse_config, args=(self.path, change)) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(load_suse_config(self.path).proposal_active_days, 13)
+
+    def test_scheduled_writes_are_coalesced(self):
+        with mock.patch('common.suse_config.write_suse_config', wraps=write_suse_config) as write:
+            for value in ('100', '200', '300'):
+                schedule_suse_config(self.path, SUSE.replace('999', value), delay=60)
+            self.assertEqual(self.read(), SUSE)
+            flush_suse_config()
+        self.assertEqual(write.call_count, 1)
+        self.assertEqual(load_suse_config(self.path).smell('LargeClass'), 300)
+
+    def test_scheduled_write_after_delay(self):
+        schedule_suse_config(self.path, SUSE.replace('999', '400'), delay=0.01)
+        deadline = time.time() + 5
+        while load_suse_config(self.path).smell('LargeClass') != 400 and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(load_suse_config(self.path).smell('LargeClass'), 400)
+
+class SuseConfigWatcherTest(SuseConfigTest):
+    def setUp(self):
+        super().setUp()
+        self.changes = []
+        self.changed = threading.Event()
+
+    def callback(self, config):
+        self.changes.append(config.smell('LargeClass'))
+        self.changed.set()
+
+    def watcher(self):
+        watcher = SuseConfigWatcher(poll_interval=0.01)
+        self.addCleanup(watcher.stop)
+        watcher.watch(self.path, self.callback)
+        return watcher
+
+    def check_change_is_notified(self):
+        write_suse_config(self.path, SUSE.replace('999', '400'))
+        self.assertTrue(self.changed.wait(5))
+        self.assertEqual(self.changes, [400])
+
+    def test_change_is_notified(self):
+        self.watcher()
+        self.check_change_is_notified()
+
+    def test_change_is_notified_without_inotify(self):
+        with mock.patch('common.suse_config._Inotify', side_effect=OSError('not linux')):
+            watcher = self.watcher()
+        self.assertIsNone(watcher._inotify)
+        self.check_change_is_notified()
+
+    def test_same_content_is_not_notified(self):
+        watcher = self.watcher()
+        self.write(SUSE)
+        #a check of the file without change of content
+        watcher._check(os.path.realpath(self.path))
+        self.assertEqual(self.changes, [])
+        self.check_change_is_notified()
+
+    def test_unwatch(self):
+        watcher = self.watcher()
+        watcher.unwatch(self.path, self.callback)
+        write_suse_config(self.path, SUSE.replace('999', '400'))
+        watcher._check(os.path.realpath(self.path))
+        self.assertEqual(self.changes, [])
+
+    def test_shared_watcher(self):
+        self.addCleanup(setattr, suse_config, '_WATCHER', None)
+        suse_config._WATCHER = None
+        suse_config.watch_suse_config(self.path, self.callback)
+        self.addCleanup(suse_config._WATCHER.stop)
+        self.check_change_is_notified()
+        suse_config.unwatch_suse_config(self.path, self.callback)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -25,6 +25,7 @@ Raises:
 from __future__ import print_function
 
 import os
+import re
 import sys
 import getpass
 import logging
@@ -34,6 +35,15 @@ import traceback
 from colorlog import ColoredFormatter #pylint: disable=import-error
 from client.health_client import HealthClient
 from client.health_exceptions import HealthException
+from client.health_placement import place, POLICIES, LEAST_LOADED
+from client.health_verify import write_report
+from client.health_verify import METRICS_PORT
+from client.health_verify import DEFAULT_RECOMPUTE_RATE
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__)))))
+from common.chain_client import ChainClient #pylint: disable=wrong-import-position
+from common.snapshot import take_snapshot, write_snapshot, load_snapshot #pylint: disable=wrong-import-position
+from common.snapshot import SnapshotError #pylint: disable=wrong-import-position
 
 DISTRIBUTION_NAME = 'susereum-health'
 HOME = os.getenv('SAWTOOTH_HOME')
@@ -176,6 +186,109 @@ def add_commit_parser(subparser, parent_parser):
         type=str,
         help="key to identify client")
 
+def add_place_parser(subparser, parent_parser):
+    """
+    add subparser place. this subparser prints the peer that should run the
+        code analysis of the next commit
+
+    Args:
+        subparser (subparser): subparser handler
+        parent_parser (parser): parent parser
+    """
+    parser = subparser.add_parser(
+        'place',
+        help='Choose the peer of the next code analysis',
+        description='Print the least loaded peer from the capacity advertised by the peers',
+        parents=[parent_parser])
+
+    parser.add_argument(
+        '--peers',
+        type=str,
+        help='file with one peer endpoint per line')
+
+    parser.add_argument(
+        '--policy',
+        type=str,
+        default=LEAST_LOADED,
+        choices=POLICIES,
+        help='placement policy')
+
+    parser.add_argument(
+        '--url',
+        type=str,
+        help='specify URL of REST API')
+
+def add_snapshot_parser(subparser, parent_parser):
+    """
+    add subparser snapshot. this subparser writes the snapshot of the chain
+        a new node starts from
+
+    Args:
+        subparser (subparser): subparser handler
+        parent_parser (parser): parent parser
+    """
+    parser = subparser.add_parser(
+        'snapshot',
+        help='Export the snapshot of the chain',
+        description='Write the state derived from the transactions of the chain to a file, '
+                    'a node with the file in the etc folder of the project reads only the '
+                    'transactions committed after it',
+        parents=[parent_parser])
+
+    parser.add_argument(
+        'output',
+        type=str,
+        help='snapshot file')
+
+    parser.add_argument(
+        '--base',
+        type=str,
+        help='previous snapshot, only the transactions committed after it are read')
+
+    parser.add_argument(
+        '--url',
+        type=str,
+        help='specify URL of REST API')
+
+def add_verify_parser(subparser, parent_parser):
+    """
+    add subparser verify. this subparser checks the latest healths posted by
+        the peers against their metrics
+
+    Args:
+        subparser (subparser): subparser handler
+        parent_parser (parser): parent parser
+    """
+    parser = subparser.add_parser(
+        'verify',
+        help='Verify the latest healths',
+        description='Check the healths against the metrics of the analyzing peers '
+                    'and append the mismatches to the verification report',
+        parents=[parent_parser])
+
+    parser.add_argument(
+        '--limit',
+        type=int,
+        default=1,
+        help='number of healths to verify, latest first')
+
+    parser.add_argument(
+        '--recompute-rate',
+        type=float,
+        default=1.0,
+        help='fraction of the healths for which the analysis is run again')
+
+    parser.add_argument(
+        '--metrics-port',
+        type=int,
+        default=METRICS_PORT,
+        help='port of the metrics of the peers')
+
+    parser.add_argument(
+        '--url',
+        type=str,
+        help='specify URL of REST API')
+
 def create_parent_parser(prog_name):
     """
     Create parent parser
@@ -196,6 +309,11 @@ def create_parent_parser(prog_name):
         action='count',
         help='enable more verbose output')
 
+    parent_parser.add_argument(
+        '--wait',
+        type=int,
+        help='seconds to wait for the transaction to be committed')
+
     return parent_parser
 
 def create_parser(prog_name):
@@ -220,6 +338,9 @@ def create_parser(prog_name):
     subparsers.required = True
     add_commit_parser(subparsers, parent_parser)
     add_list_parser(subparsers, parent_parser)
+    add_place_parser(subparsers, parent_parser)
+    add_verify_parser(subparsers, parent_parser)
+    add_snapshot_parser(subparsers, parent_parser)
 
     return parser
 
@@ -232,7 +353,7 @@ def do_list(args):
     """
     url = _get_url(args)
     keyfile = _get_keyfile(args)
-    client = HealthClient(base_url=url, keyfile=keyfile, work_path=HOME)
+    client = HealthClient(base_url=url, keyfile=keyfile, work_path=HOME, wait=args.wait)
 
     if args.limit is None:
         transactions = client.list(txn_type=args.type)
@@ -253,6 +374,28 @@ def process_health(github_user, github_url, url, commit_date, client_key):
 
     client.code_analysis(github_url, github_user, commit_date, client_key)
 
+def advertise_capacity(url, queue, workers, cores, analysis_seconds):
+    """
+    Advertise the capacity of this peer to run code analysis
+    """
+    keyfile = _get_keyfile()
+    client = HealthClient(base_url=url, keyfile=keyfile, work_path=HOME)
+
+    client.advertise(queue, workers, cores, analysis_seconds)
+
+def verify_health(url, commit_url, posted_health, state, client_key,
+                  recompute_rate=DEFAULT_RECOMPUTE_RATE, port=METRICS_PORT):
+    """
+    Verify the health posted by another peer, mismatches go to the report
+    """
+    #the rest api is not used by the verification
+    client = HealthClient(base_url=url or DEFAULT_URL, work_path=HOME)
+
+    report = client.verify(commit_url, posted_health, state, client_key,
+                           recompute_rate=recompute_rate, port=port)
+    write_report(report)
+    return report
+
 def do_commit(args):
     """
     load a set of default code smells.
@@ -272,10 +415,64 @@ def do_commit(args):
 
     url = _get_url(args)
     keyfile = _get_keyfile(args)
-    client = HealthClient(base_url=url, keyfile=keyfile, work_path=HOME)
+    client = HealthClient(base_url=url, keyfile=keyfile, work_path=HOME, wait=args.wait)
 
     client.commit(commit_url=args.giturl, github_id=args.gituser, commit_date=args.date, client_key=args.client_key)
 
+def do_place(args):
+    """
+    print the peer that runs the code analysis of the next commit
+
+    Args:
+        args (array) arguments
+    """
+    if args.peers is None:
+        raise HealthException("Missing peers file")
+    try:
+        with open(args.peers) as peers_file:
+            #peer list output is comma separated, the local peer may follow without separator
+            peers = re.findall(r'tcp://[^,\s]+?(?=tcp://|,|\s|$)', peers_file.read())
+    except IOError as error:
+        raise HealthException("Unable to open peers file {}".format(error))
+
+    peer = place(ChainClient(_get_url(args)), peers, args.policy)
+    if peer is None:
+        raise HealthException("No peer to place the code analysis")
+    print(peer)
+
+def do_verify(args):
+    """
+    verify the latest healths of the chain
+
+    Args:
+        args (array) arguments
+    """
+    url = _get_url(args)
+    healths = ChainClient(url).transactions('health', 'health')[:args.limit]
+    for health in healths:
+        report = verify_health(url, health.url, health.data, health.state, health.client_key,
+                               args.recompute_rate, args.metrics_port)
+        print('{} {} {}'.format(health.url, 'ok' if not report.mismatches else 'MISMATCH',
+                                health.client_key))
+        for mismatch in report.mismatches:
+            print('    {}'.format(', '.join('{}={}'.format(name, value) for name, value
+                                           in mismatch._asdict().items() if value is not None)))
+
+def do_snapshot(args):
+    """
+    write the snapshot of the chain
+
+    Args:
+        args (array) arguments
+    """
+    try:
+        base = None if args.base is None else load_snapshot(args.base)
+        snapshot = take_snapshot(ChainClient(_get_url(args), snapshot=base))
+        write_snapshot(snapshot, args.output)
+    except SnapshotError as err:
+        raise HealthException(str(err))
+    print('{} transactions up to {}'.format(snapshot.transactions, snapshot.head))
+
 def _get_url(args):
     """
     Pull rest_api url, use default if user does not specify
@@ -334,6 +531,12 @@ def main(prog_name=os.path.basename(sys.argv[0]), args=None):
         do_commit(args)
     elif args.command == 'list':
         do_list(args)
+    elif args.command == 'place':
+        do_place(args)
+    elif args.command == 'verify':
+        do_verify(args)
+    elif args.command == 'snapshot':
+        do_snapshot(args)
     else:
         raise HealthException("Invalid command: {}".format(args.command))
 
@@ -27,21 +27,15 @@ import time
 import datetime
 import random
 import base64
+import shutil
 import hashlib
 import subprocess
 import yaml
-import requests
 import sys
 import socket
-import toml #pylint: disable=import-error
-import sys
 
 from pprint import pprint
 from base64 import b64encode
-from sawtooth_signing import ParseError #pylint: disable=import-error
-from sawtooth_signing import CryptoFactory #pylint: disable=import-error
-from sawtooth_signing import create_context #pylint: disable=import-error
-from sawtooth_signing.secp256k1 import Secp256k1PrivateKey #pylint: disable=import-error
 
 from sawtooth_sdk.protobuf.batch_pb2 import Batch #pylint: disable=import-error
 from sawtooth_sdk.protobuf.batch_pb2 import BatchList #pylint: disable=import-error
@@ -51,9 +45,23 @@ from sawtooth_sdk.protobuf.transaction_pb2 import TransactionHeader #pylint: dis
 
 from client.health_exceptions import HealthException
 from client.health_process import calculate_health
+from client.health_verify import store_metrics
+from client.health_verify import health_state
+from client.health_verify import verify_health
 sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__)))), 'suse/client'))
 from suse_cli import do_suse
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__)))))
+from common.rest_client import RestClient #pylint: disable=wrong-import-position
+from common.rest_client import RestClientError #pylint: disable=wrong-import-position
+from common.batches import submit_batches #pylint: disable=wrong-import-position
+from common.signing import load_signer #pylint: disable=wrong-import-position
+from common.signing import SigningError #pylint: disable=wrong-import-position
+from common.signing import read_public_key #pylint: disable=wrong-import-position
+from common.suse_config import load_suse_config #pylint: disable=wrong-import-position
+from common.suse_config import project_suse_path #pylint: disable=wrong-import-position
+from common.suse_config import SuseConfigError #pylint: disable=wrong-import-position
+
 def _sha512(data):
     """
     return hash of data
@@ -66,19 +74,12 @@ def _get_config_file():
     work_path = os.path.dirname(os.path.dirname(
         os.path.dirname(os.path.dirname(os.path.realpath(__file__)))))
 
-    #identify code_smell family configuration file
-    conf_file = work_path + '/etc/.suse'
-
-    if os.path.isfile(conf_file):
-        try:
-            with open(conf_file) as config:
-                raw_config = config.read()
-        except IOError as error:
-            raise HealthException("Unable to load health family configuration file: {}"
-                                  .format(error))
-    #load toml config into a dict
-    suse_config = toml.loads(raw_config)
-    return suse_config
+    #identify code_smell family configuration file, parsed once while it does not change
+    try:
+        return load_suse_config(project_suse_path(work_path))
+    except SuseConfigError as error:
+        raise HealthException("Unable to load health family configuration file: {}"
+                              .format(error))
 
 def _get_date():
     """
@@ -89,30 +90,40 @@ def _get_date():
     current_time = current_time.strftime("%Y-%m-%d-%H-%M-%S")
     return str(current_time)
 
+def local_ip():
+    """
+    return the ip address of the host, the address used to reach other hosts
+
+    Returns:
+        str: ip address
+    """
+    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        #no packet is sent, connect only selects the outgoing interface
+        s.connect(("8.8.8.8", 80))
+        return s.getsockname()[0]
+    finally:
+        s.close()
+
 class HealthClient:
     """
     construct and send health transaction.
     """
-    def __init__(self, base_url, work_path, keyfile=None):
+    def __init__(self, base_url, work_path, keyfile=None, wait=None):
         self._base_url = base_url
         self._work_path = work_path
+        self._wait = wait
+        self._rest = RestClient(base_url)
 
         if keyfile is None:
             self._signer = None
             return
 
+        #the signer is loaded once per key file and shared by all clients
         try:
-            with open(keyfile) as file_ptr:
-                private_key_str = file_ptr.read().strip()
-        except OSError as err:
-            raise HealthException('Failed to read private key {}: {}'.format(keyfile, str(err)))
-
-        try:
-            private_key = Secp256k1PrivateKey.from_hex(private_key_str)
-        except ParseError as parser_error:
-            raise HealthException('Unable to load private key: {}'.format(str(parser_error)))
-
-        self._signer = CryptoFactory(create_context('secp256k1')).new_signer(private_key)
+            self._signer = load_signer(keyfile)
+        except SigningError as err:
+            raise HealthException(err)
 
     def code_analysis(self, github_url, github_user, commit_date, client_key):
         """
@@ -127,10 +138,7 @@ class HealthClient:
 
         #get host ip adress
         process_flag = 1
-        s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        s.connect(("8.8.8.8", 80))
-        my_ip = s.getsockname()[0]
-        s.close()
+        my_ip = local_ip()
 
         if my_ip == client_key[6:].split(':')[0]:
             process_flag = 0
@@ -162,51 +170,108 @@ class HealthClient:
                 if previous_commit == github_url:
                     #if the commit url of the previous health is equal to the new commit url
                     #then ignore the transaction
-                    process_flag == 1
+                    process_flag = 1
                 break
 
         #we got a new commit, calculate health
         if process_flag == 0:
-            work_path = os.path.dirname(os.path.dirname(
-                os.path.dirname(os.path.dirname(os.path.realpath(__file__)))))
-            sawtooth_home = work_path + "/results"
+            sawtooth_home, csv_path = self._run_analysis(github_url)
 
-            #get repo path
-            conf_file = work_path + '/etc/.repo'
             try:
-                with open(conf_file, 'r') as path:
-                    repo_path = path.read()
-                path.close()
-            except IOError as error:
-                raise HealthException("Unable to open configuration file {}".format(error))
-
-            repo_path = repo_path.replace('\n', '') + '/CodeAnalysis/SourceMeter_Interface/src/sourceMeterWrapper.py'
-            print('CALLING ANLSYIS WITH:',['python2.7', repo_path, github_url, sawtooth_home])
-            subprocess.check_output(['python2.7', repo_path, github_url, sawtooth_home])
-
-            for filename in os.listdir(sawtooth_home):
-                csv_path = sawtooth_home+'/'+filename
-                break
-
-            try:
-                suse_config = _get_config_file()
-                suse_config = suse_config["code_smells"]
+                suse_config = _get_config_file().code_smells
                 health = calculate_health(suse_config=suse_config, csv_path=csv_path)
 
                 if health > 0:
                     do_suse(url=self._base_url, health=health, github_id=github_user)
 
+                #the metrics are kept for the peers that verify the health
+                digest = store_metrics(csv_path)
+                shutil.rmtree(sawtooth_home, ignore_errors=True)
+
                 response = self._send_health_txn(
                     txn_type='health',
                     txn_id=github_user,
                     data=str(health),
-                    state='processed',
+                    state=health_state(digest),
                     url=github_url,
                     client_key=client_key,
                     txn_date=txn_date)
                 return response
             except Exception as error:
-                return error
+                raise HealthException("Unable to post the health of {}: {}".format(github_url, error))
+
+    def analyze(self, github_url):
+        """
+        run the code analysis of a commit and keep its metrics, used to
+        verify the health posted by other peers
+
+        Args:
+            github_url (str): commit url
+
+        Returns:
+            str: digest of the metrics
+        """
+        sawtooth_home, csv_path = self._run_analysis(github_url)
+        try:
+            return store_metrics(csv_path)
+        finally:
+            shutil.rmtree(sawtooth_home, ignore_errors=True)
+
+    def verify(self, commit_url, posted_health, state, client_key, **rates):
+        """
+        check the health posted by another peer against its metrics
+
+        Args:
+            commit_url (str): commit url of the health
+            posted_health (str): health posted on the chain
+            state (str): state of the health transaction
+            client_key (str): analyzing peer (tcp://ip:port)
+            rates: recompute_rate and port of verify_health
+
+        Returns:
+            Report: result of the verification
+        """
+        suse_config = _get_config_file().code_smells
+        peer = client_key[6:].split(':')[0] if client_key.startswith('tcp://') else client_key
+        return verify_health(commit_url, posted_health, state, peer, suse_config,
+                             analyze=self.analyze, **rates)
+
+    def _run_analysis(self, github_url):
+        """
+        run SourceMeter on a commit
+
+        Args:
+            github_url (str): commit url
+
+        Returns:
+            (str, str): results directory and csv file of the analysis
+        """
+        work_path = os.path.dirname(os.path.dirname(
+            os.path.dirname(os.path.dirname(os.path.realpath(__file__)))))
+        #each commit gets its own results directory, analyses of different
+        #commits may run at the same time in the health subscriber workers
+        sawtooth_home = os.path.join(work_path, "results",
+                                     _sha512(github_url.encode('utf-8'))[0:16])
+        if not os.path.isdir(sawtooth_home):
+            os.makedirs(sawtooth_home)
+
+        #get repo path
+        conf_file = work_path + '/etc/.repo'
+        try:
+            with open(conf_file, 'r') as path:
+                repo_path = path.read()
+            path.close()
+        except IOError as error:
+            raise HealthException("Unable to open configuration file {}".format(error))
+
+        repo_path = repo_path.replace('\n', '') + '/CodeAnalysis/SourceMeter_Interface/src/sourceMeterWrapper.py'
+        subprocess.check_output(['python2.7', repo_path, github_url, sawtooth_home])
+
+        csv_path = None
+        for filename in os.listdir(sawtooth_home):
+            csv_path = sawtooth_home+'/'+filename
+            break
+        return sawtooth_home, csv_path
 
     def commit(self, commit_url, github_id, commit_date, client_key):
         """
@@ -228,6 +293,30 @@ class HealthClient:
 
         return response
 
+    def advertise(self, queue, workers, cores, analysis_seconds, peer=None):
+        """
+        advertise the capacity of this peer to run code analysis, used to
+        place the analysis of new commits
+
+        Args:
+            queue (int): analysis waiting or running
+            workers (int): analysis running at the same time
+            cores (int): processors of the host
+            analysis_seconds (float): average duration of the last analysis
+            peer (str): ip of the peer, the host ip by default
+        """
+        peer = peer or local_ip()
+        response = self._send_health_txn(
+            txn_type='capacity',
+            txn_id=peer,
+            data='{}:{}:{}:{:.0f}'.format(queue, workers, cores, analysis_seconds),
+            state='advertised',
+            url=self._base_url,
+            client_key=peer,
+            txn_date=_get_date())
+
+        return response
+
     def list(self, txn_type=None, limit=None):
         """
         list all transactions.
@@ -288,11 +377,6 @@ class HealthClient:
         """
         send request to health processor`
         """
-        if self._base_url.startswith("http://"):
-            url = "{}/{}".format(self._base_url, suffix)
-        else:
-            url = "http://{}/{}".format(self._base_url, suffix)
-
         headers = {}
         if auth_user is not None:
             auth_string = "{}:{}".format(auth_user, auth_password)
@@ -305,22 +389,15 @@ class HealthClient:
 
         try:
             if data is not None:
-                result = requests.post(url, headers=headers, data=data)
+                result = self._rest.post(suffix, data, headers=headers)
             else:
-                result = requests.get(url, headers=headers)
-
-            if result.status_code == 404:
+                result = self._rest.get(suffix, headers=headers)
+        except RestClientError as err:
+            if err.status_code == 404:
                 raise HealthException("No such transaction")
-            elif not result.ok:
-                raise HealthException("Error {}:{}".format(result.status_code, result.reason))
-
-        except requests.ConnectionError as err:
-            raise HealthException('Failed to connect to {}:{}'.format(url, str(err)))
-
-        except BaseException as err:
             raise HealthException(err)
 
-        return result.text
+        return result
 
     def _send_health_txn(self,
                          txn_type=None,
@@ -349,18 +426,11 @@ class HealthClient:
 
         #construct header
 
-        key_path = os.path.expanduser('~')
-        key_path = key_path + "/.sawtooth/keys"
-        print (key_path)
-        print ("hash:" + self._signer.get_public_key().as_hex())
-        for pub_file in os.listdir(key_path):
-            if "root.pub" in pub_file:
-                print ("File:" + pub_file)
-                line = open(key_path + '/' + pub_file, 'r')
-                key = line.read().strip()
-                line.close()
-                print("user key: " + key)
-                break
+        #the root public key is read once and cached
+        try:
+            key = read_public_key('root')
+        except SigningError as err:
+            raise HealthException(err)
 
         header = TransactionHeader(
             signer_public_key=str(key),
@@ -370,7 +440,7 @@ class HealthClient:
             outputs=[address],
             dependencies=[],
             payload_sha512=_sha512(payload),
-            batcher_public_key=self._signer.get_public_key().as_hex(),
+            batcher_public_key=self._signer.public_key_hex,
             nonce=hex(random.randint(0, 2**64))
         ).SerializeToString()
 
@@ -386,10 +456,11 @@ class HealthClient:
         #create batch list, suserum policy: one transaction per batch
         batch_list = self._create_batch_list([transaction])
 
-        return self._send_request(
-            "batches",
-            batch_list.SerializeToString(),
-            'application/octet-stream')
+        #batch id and status, committed or invalid when the client waits
+        try:
+            return submit_batches(self._rest, batch_list, wait=self._wait)
+        except RestClientError as err:
+            raise HealthException(err)
 
     def _create_batch_list(self, transactions):
         """
@@ -404,7 +475,7 @@ class HealthClient:
         transaction_signatures = [t.header_signature for t in transactions]
 
         header = BatchHeader(
-            signer_public_key=self._signer.get_public_key().as_hex(),
+            signer_public_key=self._signer.public_key_hex,
             transaction_ids=transaction_signatures
         ).SerializeToString()
 
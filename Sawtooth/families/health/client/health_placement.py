@@ -0,0 +1,245 @@
+# Copyright 2018 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# -----------------------------------------------------------------------------
+"""
+Code Analysis Placement
+
+Chooses the peer that runs the code analysis of a commit. Peers advertise
+their capacity with capacity transactions (analysis waiting or running,
+workers, cores and the average duration of their last analysis). The load of
+a peer is its advertised queue plus the commits sent to it since then that do
+not have a health yet, a new analysis is placed where it is expected to
+finish first. Peers that never advertised are assumed idle with one worker.
+
+Two policies are available: least-loaded looks at every peer, two-choices
+(power of two choices) compares two random peers. Least-loaded is the best
+choice for a single placer, two-choices keeps several placers working from
+the same stale loads from all picking the same peer.
+
+Run this module to compare the policies on simulated peers:
+    python3 health_placement.py --peers 8 --jobs 2000
+"""
+import random
+import heapq
+import datetime
+import argparse
+from collections import namedtuple
+
+LEAST_LOADED = 'least-loaded'
+TWO_CHOICES = 'two-choices'
+RANDOM = 'random'
+POLICIES = (LEAST_LOADED, TWO_CHOICES, RANDOM)
+
+#seconds of an analysis for peers that never advertised
+DEFAULT_ANALYSIS_SECONDS = 300.0
+#advertisements and commits older than this no longer describe the peer
+MAX_AGE = datetime.timedelta(hours=1)
+
+PeerLoad = namedtuple('PeerLoad', ['peer', 'queue', 'workers', 'analysis_seconds'])
+
+def peer_ip(peer):
+    """
+    return the ip address of a peer
+
+    Args:
+        peer (str): peer endpoint (tcp://10.0.0.1:8800) or ip
+
+    Returns:
+        str: ip address
+    """
+    if '://' in peer:
+        peer = peer.split('://', 1)[1]
+    return peer.split(':')[0]
+
+def expected_finish(load):
+    """
+    return the seconds before a new analysis placed on a peer would finish
+
+    Args:
+        load (PeerLoad): load of the peer
+
+    Returns:
+        float: seconds
+    """
+    workers = max(1, load.workers)
+    #analysis waiting in front of the new one, shared by the workers
+    waiting = max(0, load.queue + 1 - workers)
+    return (waiting / float(workers) + 1) * load.analysis_seconds
+
+def peer_loads(peers, capacities, assignments, now=None):
+    """
+    return the load of each peer
+
+    Args:
+        peers (list): peer endpoints
+        capacities (dict): peer ip, Capacity (see ChainClient.capacities)
+        assignments (list): Assignment without health (see
+                            ChainClient.pending_assignments)
+        now (datetime): current utc time
+
+    Returns:
+        list: PeerLoad, in the order of peers
+    """
+    now = now or datetime.datetime.utcnow()
+    loads = []
+    for peer in peers:
+        ip = peer_ip(peer)
+        capacity = capacities.get(ip)
+        if capacity is not None and capacity.date is not None and now - capacity.date > MAX_AGE:
+            capacity = None
+        since = capacity.date if capacity is not None else now - MAX_AGE
+
+        queue = capacity.queue if capacity is not None else 0
+        for assignment in assignments:
+            if peer_ip(assignment.peer) == ip and (assignment.date is None or assignment.date > since):
+                queue += 1
+
+        loads.append(PeerLoad(
+            peer=peer,
+            queue=queue,
+            workers=capacity.workers if capacity is not None else 1,
+            analysis_seconds=capacity.analysis_seconds if capacity is not None and
+            capacity.analysis_seconds > 0 else DEFAULT_ANALYSIS_SECONDS))
+    return loads
+
+def choose(loads, policy=LEAST_LOADED, rng=random):
+    """
+    return the peer that runs the next analysis
+
+    Args:
+        loads (list): PeerLoad of the candidate peers
+        policy (str): least-loaded, two-choices or random
+        rng (Random): random generator
+
+    Returns:
+        str: peer, None without peers
+    """
+    if not loads:
+        return None
+    if policy == RANDOM:
+        return rng.choice(loads).peer
+    if policy == TWO_CHOICES and len(loads) > 2:
+        loads = rng.sample(loads, 2)
+    elif policy not in POLICIES:
+        raise ValueError("Unknown placement policy: {}".format(policy))
+    #ties are broken at random so idle peers share the work
+    best = min(expected_finish(load) for load in loads)
+    return rng.choice([load for load in loads if expected_finish(load) == best]).peer
+
+def place(chain, peers, policy=LEAST_LOADED):
+    """
+    return the peer that runs the next analysis of a chain
+
+    Args:
+        chain (ChainClient): client of the chain
+        peers (list): peer endpoints
+        policy (str): least-loaded, two-choices or random
+
+    Returns:
+        str: peer
+    """
+    return choose(peer_loads(peers, chain.capacities(), chain.pending_assignments()), policy)
+
+class SimulatedPeer:
+    """
+    peer of the simulation, runs analysis on its workers in arrival order
+    """
+    def __init__(self, workers, speed):
+        self.speed = speed
+        #time each worker is free again
+        self.workers = [0.0] * workers
+        #finish times of the analysis placed on the peer
+        self.finishes = []
+        self.average = DEFAULT_ANALYSIS_SECONDS
+
+    def load(self, index, seen):
+        """
+        return the load of the peer as the placement sees it, analysis
+        unfinished at the time of the last advertisement
+        """
+        self.finishes = [finish for finish in self.finishes if finish > seen]
+        return PeerLoad(index, len(self.finishes), len(self.workers), self.average)
+
+    def run(self, now, duration):
+        """
+        run an analysis on the first free worker, return the seconds it waited
+        """
+        start = max(now, heapq.heappop(self.workers))
+        heapq.heappush(self.workers, start + duration)
+        self.finishes.append(start + duration)
+        self.average = 0.8 * self.average + 0.2 * duration
+        return start - now
+
+def simulate(peers, jobs, interval, policy, advertise_delay=60.0, seed=1):
+    """
+    place jobs on simulated peers and return the time each job waited for a
+    worker. peers advertise their load with a delay, as on the chain.
+
+    Args:
+        peers (list): (workers, speed) of each peer, speed multiplies the
+                      duration of an analysis
+        jobs (int): number of analysis
+        interval (float): average seconds between two commits
+        policy (str): least-loaded, two-choices or random
+        advertise_delay (float): age of the load seen by the placement
+        seed (int): random seed, the same seed gives the same jobs
+
+    Returns:
+        list: seconds each job waited
+    """
+    rng = random.Random(seed)
+    durations = random.Random(seed + 1)
+    simulated = [SimulatedPeer(workers, speed) for workers, speed in peers]
+    waits = []
+    now = 0.0
+    for _ in range(jobs):
+        now += rng.expovariate(1.0 / interval)
+        loads = [peer.load(index, now - advertise_delay) for index, peer in enumerate(simulated)]
+        peer = simulated[choose(loads, policy, rng)]
+        duration = DEFAULT_ANALYSIS_SECONDS * peer.speed * durations.lognormvariate(0, 0.3)
+        waits.append(peer.run(now, duration))
+    return waits
+
+def _percentile(values, percent):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100.0))]
+
+def main(args=None):
+    """
+    compare the placement policies on simulated peers
+    """
+    parser = argparse.ArgumentParser(description='Simulate code analysis placement')
+    parser.add_argument('--peers', type=int, default=8, help='number of peers')
+    parser.add_argument('--jobs', type=int, default=2000, help='number of commits')
+    parser.add_argument('--load', type=float, default=0.8,
+                        help='fraction of the workers busy on average')
+    parser.add_argument('--delay', type=float, default=60.0,
+                        help='seconds before a peer load is seen')
+    parser.add_argument('--seed', type=int, default=1)
+    opts = parser.parse_args(args)
+
+    rng = random.Random(opts.seed)
+    #mixed hosts: one to four workers, up to twice slower
+    peers = [(rng.randint(1, 4), rng.uniform(1.0, 2.0)) for _ in range(opts.peers)]
+    capacity = sum(workers / (DEFAULT_ANALYSIS_SECONDS * speed) for workers, speed in peers)
+    interval = 1.0 / (capacity * opts.load)
+
+    print('{:<14}{:>12}{:>12}{:>12}'.format('policy', 'mean wait', 'p95 wait', 'max wait'))
+    for policy in (RANDOM, LEAST_LOADED, TWO_CHOICES):
+        waits = simulate(peers, opts.jobs, interval, policy, opts.delay, opts.seed)
+        print('{:<14}{:>11.0f}s{:>11.0f}s{:>11.0f}s'.format(
+            policy, sum(waits) / len(waits), _percentile(waits, 95), max(waits)))
+
+if __name__ == '__main__':
+    main()
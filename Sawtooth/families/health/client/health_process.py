@@ -19,6 +19,8 @@ This process calculates the health of a code base by using the code smells for
 the project. It reads the csv file from code analyzer and the code_smell.toml
 """
 import csv
+import json
+import hashlib
 import toml
 import os
 
@@ -137,11 +139,41 @@ def health_function(_type, _smell , _cm, rows, switch_cs_data):
    else:
      return 100
 
+def read_metrics(csv_path):
+   """
+        Reads the csv file from code analyzer.
+
+        Args:
+            csv_path (str): path of the csv file
+
+        Returns:
+            head (list): csv header
+            rows (list): one list of values per class or method
+   """
+   with open(csv_path, newline='') as csvfile:
+     reader = csv.reader(csvfile)
+     head = next(reader, [])
+     rows = [x for x in reader]
+   return head, rows
+
+def metrics_digest(head, rows):
+   """
+        Digest of the code analyzer metrics, the same metrics give the same
+        digest whatever the csv quoting.
+
+        Args:
+            head (list): csv header
+            rows (list): values per class or method
+
+        Returns:
+            digest (str): hex digest
+   """
+   return hashlib.sha256(json.dumps([head] + rows).encode('utf-8')).hexdigest()[0:32]
+
 def calculate_health(suse_config, csv_path):
    """
         Opens the csv file from code analyzer that contains all the transactions of the
-        code base. A for loop traverses each transaction to call the health_function,
-        sums the results and gets the average heal for the code base.
+        code base and gets the average heal for the code base.
 
         Args:
             suse_config (int, float) : code smell data dictionary
@@ -151,55 +183,64 @@ def calculate_health(suse_config, csv_path):
             total_health (float): Total health of the code base
    """
    if os.path.exists(csv_path):
-       with open(csv_path, newline='') as csvfile:
-         # Using csv Reader
-         reader = csv.reader(csvfile)
-         # CSV Header list:
-         # 0: Type of Smell, 1: Name, 2: Lines of Code, 3: Comment-to-Code Ratio
-         # 4: Number of Directly-Used Elements, 5: Number of Outgoing Invocations
-         # 6: Name of Owner Class, 7: Number of Parameters
-         head = next(reader)
-         # h is a DD with the necessary Header to count returned by health_function
-         h = {head[2]: 0, head[3]: 0.00, head[5]: 0, head[4]: 0,head[7]: 0}
-         rows = {head[2]: 0, head[3]: 0, head[5]: 0, head[4]: 0, head[7]: 0}
-         avg = {head[2]: 0.00, head[3]: 0.00, head[5]: 0, head[4]: 0, head[7]: 0.00}
-         lines = 0
-         for x in reader:
-             h[head[2]] = h[head[2]] + health_function(x[0].lower(), head[2], x[2], rows, suse_config)
-             h[head[3]] = h[head[3]] + health_function(x[0].lower(), head[3], x[3], rows, suse_config)
-             h[head[4]] = h[head[4]] + health_function(x[0].lower(), head[4], x[4], rows, suse_config)
-             h[head[5]] = h[head[5]] + health_function(x[0].lower(), head[5], x[5], rows, suse_config)
-             h[head[7]] = h[head[7]] + health_function(x[0].lower(), head[7], x[7], rows, suse_config)
-             lines = lines +1
-       if lines == 0:
-          total_health = -2
-          return (total_health) # Return -2 when file is empty
-       #Calculate average of each header
-       #Validates each measure has rows > 0
-       div = 0
-       if rows[head[2]] > 0:
-           avg[head[2]] = h[head[2]]/rows[head[2]]
-           div = div +1
-       if rows[head[3]]>0:
-           avg[head[3]] = h[head[3]]/rows[head[3]]
-           div = div +1
-       if rows[head[5]]>0:
-          avg[head[5]] = h[head[5]]/rows[head[5]]
-          div = div +1
-       if rows[head[4]]>0:
-          avg[head[4]] = h[head[4]]/rows[head[4]]
-          div = div +1
-       if rows[head[7]]>0:
-          avg[head[7]] = h[head[7]]/rows[head[7]]
-          div = div +1
-       #Validates number of code smells calculated > 0
-       if div > 0:
-          total_health = (avg[head[2]] + avg[head[3]] + avg[head[5]] + avg[head[4]] + avg[head[7]]) / div
-       else:
-          total_health = 0
-       return total_health
+       head, rows = read_metrics(csv_path)
+       return calculate_health_from_rows(suse_config, head, rows)
    else:
        print("File not found")
        total_health = -1
        return (total_health) # Return -1 when file is not found
-       
+
+def calculate_health_from_rows(suse_config, head, rows):
+   """
+        Traverses each transaction of the code analyzer to call the health_function,
+        sums the results and gets the average heal for the code base.
+
+        Args:
+            suse_config (int, float) : code smell data dictionary
+            head (list): csv header
+            rows (list): values per class or method
+
+        Returns:
+            total_health (float): Total health of the code base
+   """
+   if len(rows) == 0:
+      total_health = -2
+      return (total_health) # Return -2 when file is empty
+   # CSV Header list:
+   # 0: Type of Smell, 1: Name, 2: Lines of Code, 3: Comment-to-Code Ratio
+   # 4: Number of Directly-Used Elements, 5: Number of Outgoing Invocations
+   # 6: Name of Owner Class, 7: Number of Parameters
+   # h is a DD with the necessary Header to count returned by health_function
+   h = {head[2]: 0, head[3]: 0.00, head[5]: 0, head[4]: 0,head[7]: 0}
+   counts = {head[2]: 0, head[3]: 0, head[5]: 0, head[4]: 0, head[7]: 0}
+   avg = {head[2]: 0.00, head[3]: 0.00, head[5]: 0, head[4]: 0, head[7]: 0.00}
+   for x in rows:
+       h[head[2]] = h[head[2]] + health_function(x[0].lower(), head[2], x[2], counts, suse_config)
+       h[head[3]] = h[head[3]] + health_function(x[0].lower(), head[3], x[3], counts, suse_config)
+       h[head[4]] = h[head[4]] + health_function(x[0].lower(), head[4], x[4], counts, suse_config)
+       h[head[5]] = h[head[5]] + health_function(x[0].lower(), head[5], x[5], counts, suse_config)
+       h[head[7]] = h[head[7]] + health_function(x[0].lower(), head[7], x[7], counts, suse_config)
+   #Calculate average of each header
+   #Validates each measure has rows > 0
+   div = 0
+   if counts[head[2]] > 0:
+       avg[head[2]] = h[head[2]]/counts[head[2]]
+       div = div +1
+   if counts[head[3]]>0:
+       avg[head[3]] = h[head[3]]/counts[head[3]]
+       div = div +1
+   if counts[head[5]]>0:
+      avg[head[5]] = h[head[5]]/counts[head[5]]
+      div = div +1
+   if counts[head[4]]>0:
+      avg[head[4]] = h[head[4]]/counts[head[4]]
+      div = div +1
+   if counts[head[7]]>0:
+      avg[head[7]] = h[head[7]]/counts[head[7]]
+      div = div +1
+   #Validates number of code smells calculated > 0
+   if div > 0:
+      total_health = (avg[head[2]] + avg[head[3]] + avg[head[5]] + avg[head[4]] + avg[head[7]]) / div
+   else:
+      total_health = 0
+   return total_health
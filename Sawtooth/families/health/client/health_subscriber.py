@@ -0,0 +1,370 @@
+# Copyright 2018 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# -----------------------------------------------------------------------------
+"""
+health family subscriber, runs the side effects of committed health
+transactions. the code analysis of a commit starts once the block that holds
+the commit transaction is committed.
+
+the analysis clones the repository and runs SourceMeter, which takes minutes,
+so commits are queued to a bounded pool of workers and the subscriber keeps
+reading events. each worker posts the result back as a health transaction.
+the pool advertises its queue, workers and recent analysis durations with
+capacity transactions so new commits are placed on the least loaded peer.
+
+healths posted by the other peers are verified on a separate worker against
+the metrics of the analyzing peer (see health_verify.py), the subscriber
+serves the metrics of its own analysis to the other peers.
+"""
+import os
+import sys
+import time
+import random
+import logging
+import argparse
+import threading
+import collections
+from concurrent.futures import ThreadPoolExecutor
+
+from sawtooth_sdk.processor.log import init_console_logging #pylint: disable=import-error
+
+from processor.health_payload import HealthPayload
+from client.health_cli import process_health
+from client.health_cli import advertise_capacity
+from client.health_cli import verify_health
+from client.health_client import local_ip
+from client.health_placement import peer_ip
+from client.health_verify import serve_metrics
+from client.health_verify import METRICS_PORT
+from client.health_verify import DEFAULT_RECOMPUTE_RATE
+from client.health_exceptions import HealthException
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__)))))
+from common.events import EventSubscriber #pylint: disable=wrong-import-position
+from common.events import make_event_type #pylint: disable=wrong-import-position
+
+LOGGER = logging.getLogger(__name__)
+
+FAMILY_NAME = 'health'
+#seconds between two capacity transactions of the peer
+ADVERTISE_INTERVAL = 30
+#analysis durations averaged in the capacity
+RECENT_ANALYSIS = 10
+
+def parse_args(args):
+    """
+    Parse Arguments.
+
+    Args:
+        args (*args): Program Arguments
+
+    Returns:
+        args: list of arguments
+    """
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.RawTextHelpFormatter)
+
+    parser.add_argument(
+        '-C', '--connect',
+        default='tcp://localhost:4004',
+        help='Endpoint for the validator connection')
+
+    parser.add_argument(
+        '-v', '--verbose',
+        action='count',
+        default=0,
+        help='Increase output sent to stderr')
+
+    parser.add_argument(
+        '-w', '--workers',
+        type=int,
+        default=2,
+        help='Number of code analysis running at the same time')
+
+    parser.add_argument(
+        '--max-pending',
+        type=int,
+        default=32,
+        help='Number of commits waiting for a worker before events are held')
+
+    parser.add_argument(
+        '--url',
+        type=str,
+        help='REST API used to advertise the capacity of the peer,\n'
+             'the REST API of the commits by default')
+
+    parser.add_argument(
+        '--verify-rate',
+        type=float,
+        default=1.0,
+        help='Fraction of the healths of other peers checked against their metrics')
+
+    parser.add_argument(
+        '--recompute-rate',
+        type=float,
+        default=DEFAULT_RECOMPUTE_RATE,
+        help='Fraction of the verified healths analyzed again by this peer')
+
+    parser.add_argument(
+        '--metrics-port',
+        type=int,
+        default=METRICS_PORT,
+        help='Port serving the metrics of the analysis of this host, 0 to not serve them')
+
+    return parser.parse_args(args)
+
+class AnalysisPool:
+    """
+    run the code analysis of committed commits on a bounded pool of workers.
+    a commit url placed on this peer is analyzed once, commits already
+    analyzed or waiting for a worker are ignored. a failed analysis releases
+    its commit so the commit can be placed again.
+    """
+    #commit urls remembered, the oldest are forgotten first
+    MAX_COMMITS = 10000
+
+    def __init__(self, workers, max_pending, url=None, rates=None):
+        """
+        Constructor
+
+        Args:
+            workers (int): number of analysis running at the same time
+            max_pending (int): number of commits waiting for a worker
+            url (str): REST API used to advertise the capacity
+            rates (dict): verify_rate, recompute_rate and port
+                          of the verification of other peers
+        """
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        self._slots = threading.BoundedSemaphore(workers + max_pending)
+        self._lock = threading.Lock()
+        #claimed commit urls in claim order
+        self._commits = collections.OrderedDict()
+        self._workers = workers
+        self._url = url
+        self._queue = 0
+        self._durations = collections.deque(maxlen=RECENT_ANALYSIS)
+        self._advertised = None
+        self._advertised_at = 0
+        self._timer = None
+        self._ip = local_ip()
+        self._rates = dict(rates or {})
+        self._verify_rate = self._rates.pop('verify_rate', 0)
+        #verifications are dropped rather than queued behind a long recompute
+        self._verifier = ThreadPoolExecutor(max_workers=1)
+        self._verifying = 0
+        self._max_verifying = max_pending
+
+    def on_commit(self, event, block):
+        """
+        queue the committed commit for code analysis, blocks when the queue is
+        full so events are held by the validator instead of piling up in memory
+
+        Args:
+            event (Event): health/commit event
+            block (dict): attributes of the committed block
+        """
+        health_payload = HealthPayload.from_bytes(event.data)
+        if peer_ip(health_payload.client_key) != self._ip:
+            LOGGER.debug("Commit %s placed on %s", health_payload.data, health_payload.client_key)
+            return
+        if not self._claim(health_payload.data):
+            LOGGER.debug("Commit %s already processed", health_payload.data)
+            return
+
+        LOGGER.info("Block %s committed commit %s",
+                    block.get('block_num'), health_payload.data)
+        self._slots.acquire()
+        with self._lock:
+            self._queue += 1
+            if self._url is None:
+                self._url = health_payload.url
+        self._advertise()
+        self._executor.submit(self._analyze, health_payload)
+
+    def on_health(self, event, block): #pylint: disable=unused-argument
+        """
+        mark the commit of a committed health as processed, health posted by
+        other peers prevent a second analysis of the same commit
+
+        Args:
+            event (Event): health/health event
+            block (dict): attributes of the committed block
+        """
+        health_payload = HealthPayload.from_bytes(event.data)
+        self._claim(health_payload.url)
+        if peer_ip(health_payload.client_key) == self._ip or random.random() >= self._verify_rate:
+            return
+        with self._lock:
+            if self._verifying >= self._max_verifying:
+                LOGGER.warning("Health of %s not verified, too many verifications pending",
+                               health_payload.url)
+                return
+            self._verifying += 1
+        self._verifier.submit(self._verify, health_payload)
+
+    def shutdown(self):
+        """
+        wait for the running analysis and stop the workers
+        """
+        self._executor.shutdown(wait=True)
+        self._verifier.shutdown(wait=False)
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+
+    def _claim(self, commit_url):
+        """
+        register a commit url
+
+        Args:
+            commit_url (str): commit url
+
+        Returns:
+            bool: True if the commit was not registered before
+        """
+        with self._lock:
+            if commit_url in self._commits:
+                return False
+            self._commits[commit_url] = None
+            if len(self._commits) > self.MAX_COMMITS:
+                self._commits.popitem(last=False)
+            return True
+
+    def _release(self, commit_url):
+        """
+        forget a commit url, the commit is analyzed again when it is placed on
+        this peer again
+
+        Args:
+            commit_url (str): commit url
+        """
+        with self._lock:
+            self._commits.pop(commit_url, None)
+
+    def _analyze(self, health_payload):
+        """
+        worker, run the code analysis and post the health
+
+        Args:
+            health_payload (HealthPayload): committed commit
+        """
+        started = time.time()
+        try:
+            process_health(health_payload.txn_id, health_payload.data, health_payload.url,
+                           health_payload.txn_date, health_payload.client_key)
+        except Exception as err: #pylint: disable=broad-except
+            LOGGER.exception("Unable to analyze commit %s: %s", health_payload.data, err)
+            self._release(health_payload.data)
+        finally:
+            with self._lock:
+                self._queue -= 1
+                self._durations.append(time.time() - started)
+            self._slots.release()
+            self._advertise()
+
+    def _verify(self, health_payload):
+        """
+        verifier, check the health posted by another peer
+
+        Args:
+            health_payload (HealthPayload): committed health
+        """
+        try:
+            verify_health(self._url, health_payload.url, health_payload.data, health_payload.state,
+                          health_payload.client_key, **self._rates)
+        except Exception as err: #pylint: disable=broad-except
+            LOGGER.exception("Unable to verify health of %s: %s", health_payload.url, err)
+        finally:
+            with self._lock:
+                self._verifying -= 1
+
+    def _advertise(self):
+        """
+        send the capacity of the peer, at most once per ADVERTISE_INTERVAL,
+        the last change within the interval is sent at its end
+        """
+        with self._lock:
+            if self._url is None or self._timer is not None:
+                return
+            delay = max(0, self._advertised_at + ADVERTISE_INTERVAL - time.time())
+            self._timer = threading.Timer(delay, self._send_capacity)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _send_capacity(self):
+        """
+        timer, post a capacity transaction if the capacity changed
+        """
+        with self._lock:
+            self._timer = None
+            seconds = sum(self._durations) / len(self._durations) if self._durations else 0
+            capacity = (self._queue, self._workers, os.cpu_count() or 1, round(seconds))
+            if capacity == self._advertised:
+                return
+            self._advertised = capacity
+            self._advertised_at = time.time()
+            url = self._url
+        try:
+            advertise_capacity(url, *capacity)
+        except Exception as err: #pylint: disable=broad-except
+            LOGGER.warning("Unable to advertise capacity: %s", err)
+
+def create_subscriber(url, pool):
+    """
+    create a subscriber with the health callbacks registered
+
+    Args:
+        url (str): validator component endpoint
+        pool (AnalysisPool): workers running the code analysis
+
+    Returns:
+        EventSubscriber: health subscriber
+    """
+    subscriber = EventSubscriber(url)
+    subscriber.on(make_event_type(FAMILY_NAME, 'commit'), pool.on_commit)
+    subscriber.on(make_event_type(FAMILY_NAME, 'health'), pool.on_health)
+    return subscriber
+
+def main(args=None):
+    """
+    Main.
+
+    Raises:
+        HealthException, connection error
+    """
+    if args is None:
+        args = sys.argv[1:]
+    opts = parse_args(args)
+    subscriber = None
+    pool = None
+    try:
+        init_console_logging(verbose_level=opts.verbose)
+
+        if opts.metrics_port:
+            serve_metrics(opts.metrics_port)
+        pool = AnalysisPool(workers=opts.workers, max_pending=opts.max_pending, url=opts.url,
+                            rates=dict(verify_rate=opts.verify_rate,
+                                       recompute_rate=opts.recompute_rate,
+                                       port=opts.metrics_port or METRICS_PORT))
+        subscriber = create_subscriber(opts.connect, pool)
+        subscriber.start()
+    except KeyboardInterrupt:
+        pass
+    except RuntimeError as err:
+        raise HealthException("Error: {}".format(err))
+    finally:
+        if subscriber is not None:
+            subscriber.stop()
+        if pool is not None:
+            pool.shutdown()
@@ -0,0 +1,444 @@
+# Copyright 2018 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# -----------------------------------------------------------------------------
+"""
+Health Verification
+
+Only the peer a commit is placed on runs the code analysis, the other peers
+used to accept its health as posted. The analyzing peer keeps the metrics of
+the analysis (one row per class or method) in its metrics cache and posts
+their digest in the state of the health transaction, the cache is served over
+http so other peers can check the health without running SourceMeter:
+
+    - the metrics they download must have the digest posted on the chain,
+    - the health computed again from the metrics must be the health posted,
+    - the entities are compared with the analysis of the verifier when it
+      analyzed the commit before, and for a fraction of the other commits
+      (recompute rate) the verifier runs its own analysis, cached per commit.
+
+The first two checks cost a download and a pass over the metrics. SourceMeter
+is the cost of the last one, once its metrics are known every entity is
+compared, so metrics made up by the analyzing peer are caught with the
+probability of the recompute rate. Mismatches are logged and appended to the
+verification report.
+"""
+import os
+import re
+import csv
+import json
+import fcntl
+import random
+import shutil
+import socket
+import logging
+import datetime
+import threading
+import urllib.request
+from collections import namedtuple
+from socketserver import ThreadingMixIn
+from http.server import HTTPServer
+from http.server import BaseHTTPRequestHandler
+
+from client.health_process import read_metrics
+from client.health_process import metrics_digest
+from client.health_process import calculate_health_from_rows
+
+LOGGER = logging.getLogger(__name__)
+
+#metrics of the analysis of this peer and of the peers it verified, named by
+#digest so the subscribers of all the projects of the host share one cache
+METRICS_DIR = os.path.join(os.path.expanduser('~'), '.susereum', 'metrics')
+REPORT_PATH = os.path.join(METRICS_DIR, 'verify.log')
+METRICS_PORT = 8010
+#metrics files kept in the cache, oldest are removed first
+MAX_CACHED = 500
+
+DEFAULT_RECOMPUTE_RATE = 0.05
+#difference allowed between two health or two metric values
+TOLERANCE = 1e-6
+#columns of the metrics compared between two analysis: lines of code,
+#comment-to-code ratio, directly-used elements, outgoing invocations, parameters
+METRIC_COLUMNS = (2, 3, 4, 5, 7)
+#state of a health transaction with the digest of its metrics
+STATE_PREFIX = 'processed:'
+
+Mismatch = namedtuple('Mismatch', ['kind', 'entity', 'metric', 'posted', 'expected'])
+Report = namedtuple('Report', [
+    'commit_url', 'peer', 'posted_health', 'computed_health', 'entities_checked',
+    'mismatches', 'date'])
+
+def health_state(digest):
+    """
+    return the state of a health transaction
+
+    Args:
+        digest (str): digest of the metrics
+
+    Returns:
+        str: state
+    """
+    return STATE_PREFIX + digest
+
+def state_digest(state):
+    """
+    return the digest of the metrics of a health transaction
+
+    Args:
+        state (str): state of the health transaction
+
+    Returns:
+        str: digest, None for healths posted without digest
+    """
+    if state is None or not state.startswith(STATE_PREFIX):
+        return None
+    digest = state[len(STATE_PREFIX):]
+    return digest if re.match(r'^[0-9a-f]{32}$', digest) else None
+
+def metrics_path(digest, metrics_dir=METRICS_DIR):
+    """
+    return the path of metrics in the cache
+
+    Args:
+        digest (str): digest of the metrics
+        metrics_dir (str): metrics cache
+
+    Returns:
+        str: path
+    """
+    return os.path.join(metrics_dir, digest + '.csv')
+
+def store_metrics(csv_path, metrics_dir=METRICS_DIR):
+    """
+    copy the metrics of an analysis to the cache
+
+    Args:
+        csv_path (str): csv file of the code analyzer
+        metrics_dir (str): metrics cache
+
+    Returns:
+        str: digest of the metrics
+    """
+    head, rows = read_metrics(csv_path)
+    digest = metrics_digest(head, rows)
+    if not os.path.isdir(metrics_dir):
+        os.makedirs(metrics_dir)
+    path = metrics_path(digest, metrics_dir)
+    if not os.path.isfile(path):
+        #copied under a temporary name, the server never sends half a file
+        tmp_path = '{}.{}.tmp'.format(path, threading.get_ident())
+        shutil.copyfile(csv_path, tmp_path)
+        os.rename(tmp_path, path)
+    _prune(metrics_dir)
+    return digest
+
+def _prune(metrics_dir, keep=MAX_CACHED):
+    """
+    remove the oldest metrics of the cache
+    """
+    try:
+        paths = [os.path.join(metrics_dir, name) for name in os.listdir(metrics_dir)
+                 if name.endswith('.csv')]
+        paths.sort(key=os.path.getmtime)
+        for path in paths[:max(0, len(paths) - keep)]:
+            os.remove(path)
+    except OSError:
+        pass
+
+def fetch_metrics(peer, digest, port=METRICS_PORT, metrics_dir=METRICS_DIR, timeout=30):
+    """
+    return the metrics of a digest, from the cache or from the peer that
+    posted them
+
+    Args:
+        peer (str): ip of the analyzing peer
+        digest (str): digest posted on the chain
+        port (int): metrics port of the peer
+        metrics_dir (str): metrics cache
+        timeout (int): seconds to wait for the peer
+
+    Returns:
+        (list, list): header and rows, None when the peer does not serve
+                      metrics with this digest
+    """
+    path = metrics_path(digest, metrics_dir)
+    if not os.path.isfile(path):
+        url = 'http://{}:{}/{}.csv'.format(peer, port, digest)
+        tmp_path = '{}.{}.tmp'.format(path, threading.get_ident())
+        try:
+            if not os.path.isdir(metrics_dir):
+                os.makedirs(metrics_dir)
+            with urllib.request.urlopen(url, timeout=timeout) as response, \
+                    open(tmp_path, 'wb') as metrics_file:
+                shutil.copyfileobj(response, metrics_file)
+            head, rows = read_metrics(tmp_path)
+        except (IOError, OSError, socket.timeout, csv.Error) as err:
+            LOGGER.warning("Unable to fetch metrics %s from %s: %s", digest, peer, err)
+            _remove(tmp_path)
+            return None
+        if metrics_digest(head, rows) != digest:
+            LOGGER.warning("Metrics %s sent by %s do not match their digest", digest, peer)
+            _remove(tmp_path)
+            return None
+        os.rename(tmp_path, path)
+        return head, rows
+    return read_metrics(path)
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+def _own_index(index_path):
+    try:
+        with open(index_path) as index_file:
+            return json.load(index_file)
+    except (IOError, OSError, ValueError):
+        return {}
+
+def cached_own_metrics(commit_url, metrics_dir=METRICS_DIR):
+    """
+    return the metrics of the analysis of a commit by this peer when they are
+    still in the cache
+
+    Args:
+        commit_url (str): commit url
+        metrics_dir (str): metrics cache
+
+    Returns:
+        (list, list): header and rows, None when this peer did not analyze
+                      the commit
+    """
+    digest = _own_index(os.path.join(metrics_dir, 'own.json')).get(commit_url)
+    if digest is None or not os.path.isfile(metrics_path(digest, metrics_dir)):
+        return None
+    return read_metrics(metrics_path(digest, metrics_dir))
+
+def own_metrics(commit_url, analyze, metrics_dir=METRICS_DIR):
+    """
+    return the metrics of the analysis of a commit by this peer, the analysis
+    runs once per commit
+
+    Args:
+        commit_url (str): commit url
+        analyze (function): runs the code analysis of a commit url, stores
+                            its metrics in the cache and returns their digest
+        metrics_dir (str): metrics cache
+
+    Returns:
+        (list, list): header and rows
+    """
+    metrics = cached_own_metrics(commit_url, metrics_dir)
+    if metrics is not None:
+        return metrics
+
+    digest = analyze(commit_url)
+    index_path = os.path.join(metrics_dir, 'own.json')
+    #the subscribers of all the projects of the host share the index, the
+    #analysis runs outside the lock and the index is read again under it
+    with open(index_path + '.lock', 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            index = _own_index(index_path)
+            index[commit_url] = digest
+            tmp_path = '{}.{}.{}.tmp'.format(index_path, os.getpid(), threading.get_ident())
+            with open(tmp_path, 'w') as index_file:
+                json.dump(index, index_file)
+            os.rename(tmp_path, index_path)
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+    return read_metrics(metrics_path(digest, metrics_dir))
+
+def _entity(row):
+    #type, name and owner class
+    return (row[0], row[1], row[6] if len(row) > 6 else '')
+
+def _same(posted, expected):
+    if posted == expected:
+        return True
+    try:
+        return abs(float(posted) - float(expected)) <= TOLERANCE
+    except ValueError:
+        return False
+
+def compare_entities(head, rows, own_head, own_rows):
+    """
+    compare the entities of an analysis with the analysis of this peer
+
+    Args:
+        head (list): header of the posted metrics
+        rows (list): posted metrics
+        own_head (list): header of the metrics of this peer
+        own_rows (list): metrics of this peer
+
+    Returns:
+        (int, list): entities compared, Mismatch
+    """
+    mismatches = []
+    own = dict((_entity(row), row) for row in own_rows)
+    posted = dict((_entity(row), row) for row in rows)
+    if head != own_head:
+        mismatches.append(Mismatch('header', None, None, ','.join(head), ','.join(own_head)))
+        return 0, mismatches
+
+    #entities the peer left out are found in the analysis of this peer
+    entities = sorted(set(own) | set(posted))
+    for entity in entities:
+        if entity not in posted or entity not in own:
+            mismatches.append(Mismatch(
+                'entity', '/'.join(entity), None,
+                'present' if entity in posted else 'missing',
+                'present' if entity in own else 'missing'))
+            continue
+        for column in METRIC_COLUMNS:
+            if not _same(posted[entity][column], own[entity][column]):
+                mismatches.append(Mismatch(
+                    'metric', '/'.join(entity), head[column],
+                    posted[entity][column], own[entity][column]))
+    return len(entities), mismatches
+
+def verify_health(commit_url, posted_health, state, peer, suse_config, analyze=None,
+                  recompute_rate=DEFAULT_RECOMPUTE_RATE, port=METRICS_PORT,
+                  metrics_dir=METRICS_DIR, rng=random):
+    """
+    check the health posted by another peer
+
+    Args:
+        commit_url (str): commit url of the health
+        posted_health (str): health posted on the chain
+        state (str): state of the health transaction
+        peer (str): ip of the analyzing peer
+        suse_config (dict): code smells of the project
+        analyze (function): runs the code analysis of a commit url, stores
+                            its metrics in the cache and returns their
+                            digest, None to never recompute
+        recompute_rate (float): fraction of the commits analyzed again when
+                                this peer did not analyze them before
+        port (int): metrics port of the peer
+        metrics_dir (str): metrics cache
+        rng (Random): random generator
+
+    Returns:
+        Report: result of the verification
+    """
+    mismatches = []
+    computed = None
+    checked = 0
+    digest = state_digest(state)
+    metrics = None
+    if digest is None:
+        mismatches.append(Mismatch('digest', None, None, state, None))
+    else:
+        metrics = fetch_metrics(peer, digest, port, metrics_dir)
+        if metrics is None:
+            mismatches.append(Mismatch('unavailable', None, None, digest, None))
+
+    if metrics is not None:
+        head, rows = metrics
+        computed = calculate_health_from_rows(suse_config, head, rows)
+        if not _same(posted_health, computed):
+            mismatches.append(Mismatch('health', None, None, posted_health, computed))
+
+        own = cached_own_metrics(commit_url, metrics_dir)
+        if own is None and analyze is not None and rng.random() < recompute_rate:
+            own = own_metrics(commit_url, analyze, metrics_dir)
+        if own is not None:
+            checked, entity_mismatches = compare_entities(head, rows, own[0], own[1])
+            mismatches.extend(entity_mismatches)
+
+    report = Report(
+        commit_url=commit_url,
+        peer=peer,
+        posted_health=posted_health,
+        computed_health=computed,
+        entities_checked=checked,
+        mismatches=mismatches,
+        date=datetime.datetime.utcnow().strftime("%Y-%m-%d-%H-%M-%S"))
+    if mismatches:
+        LOGGER.warning("Health of %s posted by %s does not verify: %s",
+                       commit_url, peer, ', '.join(m.kind for m in mismatches))
+    else:
+        LOGGER.info("Health of %s posted by %s verified, %s entities compared",
+                    commit_url, peer, checked)
+    return report
+
+def write_report(report, path=REPORT_PATH):
+    """
+    append a verification to the report, one json object per line
+
+    Args:
+        report (Report): result of a verification
+        path (str): report file
+    """
+    entry = report._asdict()
+    entry['mismatches'] = [mismatch._asdict() for mismatch in report.mismatches]
+    directory = os.path.dirname(path)
+    if directory and not os.path.isdir(directory):
+        os.makedirs(directory)
+    with open(path, 'a') as report_file:
+        report_file.write(json.dumps(entry, sort_keys=True) + '\n')
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    """
+    send the metrics of the cache by digest
+    """
+    def do_GET(self): #pylint: disable=invalid-name
+        match = re.match(r'^/([0-9a-f]{32})\.csv$', self.path)
+        path = metrics_path(match.group(1), self.server.metrics_dir) if match else None
+        if path is None or not os.path.isfile(path):
+            self.send_error(404)
+            return
+        with open(path, 'rb') as metrics_file:
+            data = metrics_file.read()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/csv')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args): #pylint: disable=redefined-builtin
+        LOGGER.debug(format, *args)
+
+class MetricsServer(ThreadingMixIn, HTTPServer):
+    """
+    http server of the metrics cache
+    """
+    daemon_threads = True
+
+    def __init__(self, port=METRICS_PORT, metrics_dir=METRICS_DIR):
+        HTTPServer.__init__(self, ('', port), _MetricsHandler)
+        self.metrics_dir = metrics_dir
+
+def serve_metrics(port=METRICS_PORT, metrics_dir=METRICS_DIR):
+    """
+    serve the metrics cache in a thread, the cache is shared by the projects
+    of the host so one server is enough
+
+    Args:
+        port (int): metrics port
+        metrics_dir (str): metrics cache
+
+    Returns:
+        MetricsServer: server, None when the port is already used
+    """
+    try:
+        server = MetricsServer(port, metrics_dir)
+    except OSError as err:
+        LOGGER.debug("Metrics port %s not available: %s", port, err)
+        return None
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    LOGGER.info("Serving metrics of %s on port %s", metrics_dir, port)
+    return server
@@ -15,8 +15,9 @@
 """
 health family handler, verifies that transaction's payload
 """
+import os
+import sys
 import logging
-from pprint import pprint
 
 from sawtooth_sdk.processor.exceptions import InvalidTransaction #pylint: disable=import-error
 from sawtooth_sdk.processor.handler import TransactionHandler #pylint: disable=import-error
@@ -25,17 +26,20 @@ from processor.health_state import HealthTransaction
 from processor.health_state import HealthState
 from processor.health_state import HEALTH_NAMESPACE
 from processor.health_payload import HealthPayload
-from client.health_cli import process_health
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__)))))
+from common.events import add_transaction_event #pylint: disable=wrong-import-position
 
 LOGGER = logging.getLogger(__name__)
 
 class HealthTransactionHandler(TransactionHandler):
     """
-    process all types of transactions regarding the code smell family
-    """
-    def __init__(self):
-        self.count_access = 0
+    process all types of transactions regarding the health family
 
+    the handler only validates the payload and updates the state, the validator
+    may apply the same transaction more than once so the code analysis of a
+    commit is started by the health subscriber once the block is committed.
+    """
     @property
     def family_name(self):
         """
@@ -84,10 +88,8 @@ class HealthTransactionHandler(TransactionHandler):
         """
         health_payload = HealthPayload.from_bytes(transaction.payload)
         health_state = HealthState(context)
-        print (health_payload.client_key)
 
         if health_payload.txn_type == 'commit':
-            self.count_access += 1
             active_transaction = HealthTransaction(
                 txn_type=health_payload.txn_type,
                 txn_id=health_payload.txn_id,
@@ -97,16 +99,6 @@ class HealthTransactionHandler(TransactionHandler):
                 client_key=health_payload.client_key,
                 txn_date=health_payload.txn_date)
             health_state.set_transaction(health_payload.txn_id, active_transaction)
-            print (health_payload.client_key)
-            print (self.count_access)
-            #call code analysis
-            #the validator access the processor a couple of times, first to do a
-            #kind of setup and second to publish the validated block
-            #that's why6 we have a counter, we don't want to calculate the Health
-            #each time. in the second time is when we know the block was validated
-            if self.count_access == 1:
-                self.count_access = 0
-                process_health(health_payload.txn_id, health_payload.data, health_payload.url, health_payload.txn_date, health_payload.client_key)
         elif health_payload.txn_type == 'health':
             active_transaction = HealthTransaction(
                 txn_type=health_payload.txn_type,
@@ -117,9 +109,23 @@ class HealthTransactionHandler(TransactionHandler):
                 client_key=health_payload.client_key,
                 txn_date=health_payload.txn_date)
             health_state.set_transaction(health_payload.txn_id, active_transaction)
+        elif health_payload.txn_type == 'capacity':
+            #capacity of a peer to run code analysis, the id is the peer ip
+            active_transaction = HealthTransaction(
+                txn_type=health_payload.txn_type,
+                txn_id=health_payload.txn_id,
+                data=health_payload.data,
+                state=health_payload.state,
+                url=health_payload.url,
+                client_key=health_payload.client_key,
+                txn_date=health_payload.txn_date)
+            health_state.set_transaction(health_payload.txn_id, active_transaction)
         else:
             raise InvalidTransaction('Unhandled Type: {}'.format(health_payload.txn_type))
 
+        add_transaction_event(context, self.family_name, transaction,
+                              health_payload.txn_type, health_payload.txn_id)
+
         _display("transaction {},{} created".
                  format(health_payload.txn_type, health_payload.data))
 
@@ -38,7 +38,7 @@ class HealthPayload(object):
     def __init__(self, payload):
         #The payload is csv utf-8 encoded string
         try:
-            if payload.decode().split(",")[0] in ("commit", "health"):
+            if payload.decode().split(",")[0] in ("commit", "health", "capacity"):
                 txn_type, txn_id, data, state, url, client_key, txn_date = payload.decode().split(",")
             else:
                 txn_type, txn_id, data, state, txn_date = payload.decode().split(",")
@@ -54,7 +54,7 @@ class HealthPayload(object):
             raise InvalidTransaction('Data is required')
         if not state:
             raise InvalidTransaction('State is required')
-        if txn_type not in ('commit', 'health'):
+        if txn_type not in ('commit', 'health', 'capacity'):
             raise InvalidTransaction('Invalid action: {}'.format(txn_type))
 
         self._txn_type = txn_type
@@ -0,0 +1,91 @@
+import unittest
+import os
+import sys
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from client.health_subscriber import AnalysisPool #pylint: disable=import-error
+
+LOCAL_IP = '10.0.0.1'
+COMMIT_URL = 'https://github.com/obahy/Susereum/commit/1'
+
+class FakeEvent:
+    def __init__(self, txn_type, data, url, client_key):
+        self.data = ','.join([txn_type, 'txn1', data, 'processed', url, client_key,
+                              '2018-11-26-18-53-12']).encode()
+
+def commit_event(peer=LOCAL_IP, commit_url=COMMIT_URL):
+    return FakeEvent('commit', commit_url, 'http://127.0.0.1:8008', 'tcp://{}:8800'.format(peer))
+
+def health_event(peer, commit_url=COMMIT_URL):
+    return FakeEvent('health', '78.5', commit_url, 'tcp://{}:8800'.format(peer))
+
+class AnalysisPoolTest(unittest.TestCase):
+    def setUp(self):
+        self.analyzed = []
+        self.failing = False
+        for name, value in (('local_ip', lambda: LOCAL_IP),
+                            ('process_health', self.process_health),
+                            ('advertise_capacity', lambda *args: None)):
+            patcher = mock.patch('client.health_subscriber.' + name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.pool = AnalysisPool(workers=1, max_pending=4)
+        self.addCleanup(self.pool.shutdown)
+
+    def process_health(self, github_user, github_url, url, commit_date, client_key):
+        self.analyzed.append(github_url)
+        if self.failing:
+            raise IOError('analysis failed')
+
+    def commit(self, event):
+        self.pool.on_commit(event, {'block_num': 1})
+        #one worker, the analysis queued before is done
+        self.pool._executor.submit(lambda: None).result()
+
+    def test_commit_is_analyzed_once(self):
+        self.commit(commit_event())
+        self.commit(commit_event())
+        self.assertEqual(self.analyzed, [COMMIT_URL])
+
+    def test_commit_placed_on_another_peer_is_not_claimed(self):
+        self.commit(commit_event(peer='10.0.0.2'))
+        self.assertEqual(self.analyzed, [])
+        #placed again on this peer
+        self.commit(commit_event())
+        self.assertEqual(self.analyzed, [COMMIT_URL])
+
+    def test_failed_analysis_releases_commit(self):
+        self.failing = True
+        self.commit(commit_event())
+        self.failing = False
+        self.commit(commit_event())
+        self.commit(commit_event())
+        self.assertEqual(self.analyzed, [COMMIT_URL, COMMIT_URL])
+
+    def test_health_of_another_peer_claims_commit(self):
+        self.pool.on_health(health_event('10.0.0.2'), {})
+        self.commit(commit_event())
+        self.assertEqual(self.analyzed, [])
+
+    def test_oldest_claims_are_forgotten(self):
+        self.pool.MAX_COMMITS = 3
+        for commit_url in ('a', 'b', 'c', 'd'):
+            self.assertTrue(self.pool._claim(commit_url))
+        self.assertTrue(self.pool._claim('a'))
+        self.assertFalse(self.pool._claim('d'))
+
+    def test_released_claim_is_not_forgotten_early(self):
+        self.pool.MAX_COMMITS = 3
+        for commit_url in ('a', 'b', 'c'):
+            self.pool._claim(commit_url)
+        self.pool._release('a')
+        self.assertTrue(self.pool._claim('a'))
+        #the claim of a is the newest now, b is forgotten first
+        self.assertTrue(self.pool._claim('d'))
+        self.assertFalse(self.pool._claim('a'))
+        self.assertTrue(self.pool._claim('b'))
+
+if __name__ == '__main__':
+    unittest.main()
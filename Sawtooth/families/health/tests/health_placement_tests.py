@@ -0,0 +1,93 @@
+import unittest
+import os
+import sys
+import random
+import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__)))))
+
+from client.health_placement import PeerLoad, DEFAULT_ANALYSIS_SECONDS, MAX_AGE #pylint: disable=import-error
+from client.health_placement import LEAST_LOADED, TWO_CHOICES, RANDOM #pylint: disable=import-error
+from client.health_placement import peer_ip, expected_finish, peer_loads, choose, simulate #pylint: disable=import-error
+from common.chain_client import Capacity, Assignment #pylint: disable=import-error
+
+NOW = datetime.datetime(2018, 11, 26, 18, 53, 12)
+
+def capacity(peer, queue, workers, analysis_seconds, age=0):
+    return Capacity('txn', peer, queue, workers, 4, analysis_seconds, NOW - datetime.timedelta(seconds=age))
+
+def assignment(peer, age=0):
+    return Assignment('txn', 'commit', peer, NOW - datetime.timedelta(seconds=age))
+
+class PlacementTest(unittest.TestCase):
+    def setUp(self):
+        self.rng = random.Random(1)
+
+    def test_peer_ip(self):
+        self.assertEqual(peer_ip('tcp://10.0.0.1:8800'), '10.0.0.1')
+        self.assertEqual(peer_ip('10.0.0.1'), '10.0.0.1')
+
+    def test_expected_finish(self):
+        #a free worker starts right away
+        self.assertEqual(expected_finish(PeerLoad('a', 1, 2, 100.0)), 100.0)
+        #two analysis waiting for two workers
+        self.assertEqual(expected_finish(PeerLoad('a', 3, 2, 100.0)), 200.0)
+        self.assertEqual(expected_finish(PeerLoad('a', 0, 0, 100.0)), 100.0)
+
+    def test_peer_loads(self):
+        peers = ['tcp://10.0.0.1:8800', 'tcp://10.0.0.2:8800', 'tcp://10.0.0.3:8800']
+        capacities = {
+            '10.0.0.1': capacity('10.0.0.1', 2, 4, 60.0, age=600),
+            '10.0.0.3': capacity('10.0.0.3', 5, 1, 60.0, age=MAX_AGE.total_seconds() + 1)}
+        assignments = [assignment('tcp://10.0.0.1:8800', age=300), assignment('tcp://10.0.0.1:8800', age=900),
+                       assignment('tcp://10.0.0.2:8800')]
+        loads = peer_loads(peers, capacities, assignments, now=NOW)
+        #the commit sent before the advertisement is already counted in its queue
+        self.assertEqual(loads[0], PeerLoad(peers[0], 3, 4, 60.0))
+        self.assertEqual(loads[1], PeerLoad(peers[1], 1, 1, DEFAULT_ANALYSIS_SECONDS))
+        #an old advertisement is ignored
+        self.assertEqual(loads[2], PeerLoad(peers[2], 0, 1, DEFAULT_ANALYSIS_SECONDS))
+
+    def test_no_peers(self):
+        for policy in (LEAST_LOADED, TWO_CHOICES, RANDOM):
+            self.assertIsNone(choose([], policy, self.rng))
+
+    def test_unknown_policy(self):
+        with self.assertRaises(ValueError):
+            choose([PeerLoad('a', 0, 1, 1.0)], 'round-robin', self.rng)
+
+    def test_least_loaded_picks_first_finish(self):
+        loads = [PeerLoad('slow', 0, 1, 600.0), PeerLoad('busy', 4, 1, 100.0), PeerLoad('fast', 1, 2, 200.0)]
+        for _ in range(20):
+            self.assertEqual(choose(loads, LEAST_LOADED, self.rng), 'fast')
+
+    def test_least_loaded_shares_ties(self):
+        loads = [PeerLoad(name, 0, 1, 100.0) for name in 'abc']
+        self.assertEqual(set(choose(loads, LEAST_LOADED, self.rng) for _ in range(100)), set('abc'))
+
+    def test_two_choices_never_picks_worst(self):
+        loads = [PeerLoad('a', 0, 1, 100.0), PeerLoad('b', 1, 1, 100.0), PeerLoad('c', 9, 1, 100.0)]
+        chosen = [choose(loads, TWO_CHOICES, self.rng) for _ in range(200)]
+        self.assertNotIn('c', chosen)
+        self.assertEqual(set(chosen), {'a', 'b'})
+
+    def test_two_choices_of_two_peers_is_least_loaded(self):
+        loads = [PeerLoad('a', 3, 1, 100.0), PeerLoad('b', 0, 1, 100.0)]
+        for _ in range(20):
+            self.assertEqual(choose(loads, TWO_CHOICES, self.rng), 'b')
+
+    def test_random_uses_every_peer(self):
+        loads = [PeerLoad('a', 0, 1, 100.0), PeerLoad('b', 9, 1, 100.0)]
+        self.assertEqual(set(choose(loads, RANDOM, self.rng) for _ in range(100)), {'a', 'b'})
+
+    def test_simulation_favors_load_aware_policies(self):
+        peers = [(1, 1.0), (2, 1.5), (4, 2.0), (1, 1.2)]
+        waits = {policy: sum(simulate(peers, 500, 60.0, policy)) for policy in (RANDOM, LEAST_LOADED, TWO_CHOICES)}
+        self.assertLess(waits[LEAST_LOADED], waits[RANDOM])
+        self.assertLess(waits[TWO_CHOICES], waits[RANDOM])
+        #the same seed gives the same jobs
+        self.assertEqual(sum(simulate(peers, 500, 60.0, RANDOM)), waits[RANDOM])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,156 @@
+import unittest
+import os
+import sys
+import csv
+import json
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from client.health_process import calculate_health_from_rows #pylint: disable=import-error
+from client.health_verify import health_state, state_digest, store_metrics, fetch_metrics #pylint: disable=import-error
+from client.health_verify import compare_entities, verify_health, write_report, serve_metrics #pylint: disable=import-error
+
+COMMIT_URL = 'https://github.com/obahy/Susereum/commit/1'
+HEAD = ['Type', 'Name', 'Lines of Code', 'Comment-to-Code Ratio', 'Number of Directly-Used Elements',
+        'Number of Outgoing Invocations', 'Name of Owner Class', 'Number of Parameters']
+ROWS = [
+    ['Class', 'Block', '120', '0.15', '3', '4', '-', '-'],
+    ['Method', 'hash', '12', '0.3', '-', '-', 'Block', '1'],
+    ['Method', 'validate', '300', '0.05', '-', '-', 'Block', '6']]
+SUSE_CONFIG = {
+    'class': {'InappropriateIntimacy': [2, 1], 'SmallClass': [91, 1], 'GodClass': [5, 1], 'LargeClass': [999, 1]},
+    'method': {'LargeParameterList': [4, 1], 'SmallMethod': [190, 1], 'LargeMethod': [250, 1]},
+    'comments': {'CommentsToCodeRatioUpper': [0.1, 1.0], 'CommentsToCodeRatioLower': [0.2, 1.0]}}
+HEALTH = calculate_health_from_rows(SUSE_CONFIG, HEAD, ROWS)
+
+class FixedRandom:
+    def __init__(self, value):
+        self.value = value
+
+    def random(self):
+        return self.value
+
+class CompareEntitiesTest(unittest.TestCase):
+    def test_same_analysis(self):
+        self.assertEqual(compare_entities(HEAD, ROWS, HEAD, [list(row) for row in reversed(ROWS)]), (3, []))
+
+    def test_metric_mismatch(self):
+        own = [list(row) for row in ROWS]
+        own[2][2] = '250'
+        #differences under the tolerance are the same value
+        own[1][3] = '0.3000000001'
+        checked, mismatches = compare_entities(HEAD, ROWS, HEAD, own)
+        self.assertEqual(checked, 3)
+        self.assertEqual([(m.kind, m.entity, m.metric, m.posted, m.expected) for m in mismatches],
+                         [('metric', 'Method/validate/Block', 'Lines of Code', '300', '250')])
+
+    def test_entity_left_out_or_made_up(self):
+        posted = ROWS[:2] + [['Method', 'fake', '10', '0.2', '-', '-', 'Block', '0']]
+        checked, mismatches = compare_entities(HEAD, posted, HEAD, ROWS)
+        self.assertEqual(checked, 4)
+        self.assertEqual(sorted((m.entity, m.posted, m.expected) for m in mismatches), [
+            ('Method/fake/Block', 'present', 'missing'), ('Method/validate/Block', 'missing', 'present')])
+
+    def test_header_mismatch(self):
+        checked, mismatches = compare_entities(HEAD, ROWS, HEAD[:-1] + ['Parameters'], ROWS)
+        self.assertEqual((checked, [m.kind for m in mismatches]), (0, ['header']))
+
+class VerifyHealthTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        #metrics cache of the analyzing peer and of the verifying peer
+        self.peer_dir = os.path.join(self.directory, 'peer')
+        self.metrics_dir = os.path.join(self.directory, 'verifier')
+        server = serve_metrics(0, self.peer_dir)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.port = server.server_address[1]
+        self.digest = store_metrics(self.write_csv('posted.csv', ROWS), self.peer_dir)
+        self.analyzed = []
+
+    def write_csv(self, name, rows):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', newline='') as csv_file:
+            writer = csv.writer(csv_file)
+            writer.writerow(HEAD)
+            writer.writerows(rows)
+        return path
+
+    def analyze(self, commit_url):
+        self.analyzed.append(commit_url)
+        return store_metrics(self.write_csv('own.csv', ROWS), self.metrics_dir)
+
+    def verify(self, health=HEALTH, state=None, **kwargs):
+        kwargs.setdefault('rng', FixedRandom(0.5))
+        return verify_health(COMMIT_URL, str(health), state or health_state(self.digest), '127.0.0.1',
+                             SUSE_CONFIG, port=self.port, metrics_dir=self.metrics_dir, **kwargs)
+
+    def test_state_digest(self):
+        self.assertEqual(state_digest(health_state(self.digest)), self.digest)
+        self.assertIsNone(state_digest('processed'))
+        self.assertIsNone(state_digest('processed:../../etc/passwd'))
+        self.assertIsNone(state_digest(None))
+
+    def test_posted_health_verifies(self):
+        report = self.verify()
+        self.assertEqual(report.mismatches, [])
+        self.assertAlmostEqual(report.computed_health, HEALTH)
+        self.assertEqual(report.entities_checked, 0)
+        #the metrics are kept in the cache of the verifier
+        self.assertEqual(fetch_metrics('127.0.0.1', self.digest, 1, self.metrics_dir), (HEAD, ROWS))
+
+    def test_wrong_health(self):
+        report = self.verify(health=HEALTH + 10)
+        self.assertEqual([m.kind for m in report.mismatches], ['health'])
+
+    def test_health_without_digest(self):
+        report = self.verify(state='processed')
+        self.assertEqual([m.kind for m in report.mismatches], ['digest'])
+        self.assertIsNone(report.computed_health)
+
+    def test_metrics_not_served(self):
+        report = self.verify(state=health_state('0' * 32))
+        self.assertEqual([m.kind for m in report.mismatches], ['unavailable'])
+
+    def test_metrics_not_matching_digest(self):
+        tampered = self.write_csv('tampered.csv', ROWS[:2])
+        shutil.copyfile(tampered, os.path.join(self.peer_dir, self.digest + '.csv'))
+        report = self.verify()
+        self.assertEqual([m.kind for m in report.mismatches], ['unavailable'])
+        self.assertEqual([name for name in os.listdir(self.metrics_dir)], [])
+
+    def test_recompute_runs_analysis_once(self):
+        self.verify(analyze=self.analyze, rng=FixedRandom(0.0))
+        report = self.verify(analyze=self.analyze, rng=FixedRandom(0.99))
+        self.assertEqual(self.analyzed, [COMMIT_URL])
+        self.assertEqual(report.entities_checked, 3)
+        self.assertEqual(report.mismatches, [])
+
+    def test_recompute_rate(self):
+        self.verify(analyze=self.analyze, rng=FixedRandom(0.5), recompute_rate=0.4)
+        self.assertEqual(self.analyzed, [])
+        self.verify(analyze=self.analyze, rng=FixedRandom(0.5), recompute_rate=0.6)
+        self.assertEqual(self.analyzed, [COMMIT_URL])
+
+    def test_recompute_finds_made_up_metrics(self):
+        rows = [list(row) for row in ROWS]
+        rows[2][2] = '200'
+        self.digest = store_metrics(self.write_csv('posted.csv', rows), self.peer_dir)
+        health = calculate_health_from_rows(SUSE_CONFIG, HEAD, rows)
+        report = self.verify(health=health, analyze=self.analyze, rng=FixedRandom(0.0))
+        self.assertEqual([(m.kind, m.posted, m.expected) for m in report.mismatches], [('metric', '200', '300')])
+
+    def test_write_report(self):
+        path = os.path.join(self.directory, 'reports', 'verify.log')
+        write_report(self.verify(health=HEALTH + 10), path)
+        write_report(self.verify(), path)
+        with open(path) as report_file:
+            entries = [json.loads(line) for line in report_file]
+        self.assertEqual([len(entry['mismatches']) for entry in entries], [1, 0])
+        self.assertEqual(entries[0]['mismatches'][0]['kind'], 'health')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -174,6 +174,11 @@ def create_parent_parser(prog_name):
         action='count',
         help='enable more verbose output')
 
+    parent_parser.add_argument(
+        '--wait',
+        type=int,
+        help='seconds to wait for the transaction to be committed')
+
     return parent_parser
 
 def create_parser(prog_name):
@@ -211,7 +216,7 @@ def do_list(args):
     """
     url = _get_url(args)
     keyfile = _get_keyfile(args)
-    client = SuseClient(base_url=url, keyfile=keyfile, work_path=HOME)
+    client = SuseClient(base_url=url, keyfile=keyfile, work_path=HOME, wait=args.wait)
 
     transactions = client.list()
 
@@ -235,13 +240,15 @@ def do_suse(args=None, url=None, health=None, github_id=None):
         home = os.path.expanduser("~")
         key_dir = os.path.join(home, ".sawtooth", "keys")
         keyfile = '{}/{}.priv'.format(key_dir, username)
+        wait = None
     else:
         health = args.health
         gituser = args.gituser
         url = _get_url(args)
         keyfile = _get_keyfile(args)
+        wait = args.wait
 
-    client = SuseClient(base_url=url, keyfile=keyfile, work_path=HOME)
+    client = SuseClient(base_url=url, keyfile=keyfile, work_path=HOME, wait=wait)
 
     response = client.suse(new_health=health, github_id=gituser)
 
@@ -23,6 +23,7 @@ Raises:
     health exceptions: health family exceptions to display misuse of functions
 """
 import os
+import sys
 import time
 import datetime
 import random
@@ -30,15 +31,10 @@ import base64
 import hashlib
 import subprocess
 import yaml
-import requests
 import toml #pylint: disable=import-error
 
 from pprint import pprint
 from base64 import b64encode
-from sawtooth_signing import ParseError #pylint: disable=import-error
-from sawtooth_signing import CryptoFactory #pylint: disable=import-error
-from sawtooth_signing import create_context #pylint: disable=import-error
-from sawtooth_signing.secp256k1 import Secp256k1PrivateKey #pylint: disable=import-error
 
 from sawtooth_sdk.protobuf.batch_pb2 import Batch #pylint: disable=import-error
 from sawtooth_sdk.protobuf.batch_pb2 import BatchList #pylint: disable=import-error
@@ -48,6 +44,13 @@ from sawtooth_sdk.protobuf.transaction_pb2 import TransactionHeader #pylint: dis
 
 from suse_exceptions import SuseException
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__)))))
+from common.rest_client import RestClient #pylint: disable=wrong-import-position
+from common.rest_client import RestClientError #pylint: disable=wrong-import-position
+from common.batches import submit_batches #pylint: disable=wrong-import-position
+from common.signing import load_signer #pylint: disable=wrong-import-position
+from common.signing import SigningError #pylint: disable=wrong-import-position
+
 def _sha512(data):
     """
     return hash of data
@@ -69,26 +72,21 @@ class SuseClient:
     """
     construct and send health transaction.
     """
-    def __init__(self, base_url, work_path, keyfile=None):
+    def __init__(self, base_url, work_path, keyfile=None, wait=None):
         self._base_url = base_url
         self._work_path = work_path
+        self._wait = wait
+        self._rest = RestClient(base_url)
 
         if keyfile is None:
             self._signer = None
             return
 
+        #the signer is loaded once per key file and shared by all clients
         try:
-            with open(keyfile) as file_ptr:
-                private_key_str = file_ptr.read().strip()
-        except OSError as err:
-            raise SuseException('Failed to read private key {}: {}'.format(keyfile, str(err)))
-
-        try:
-            private_key = Secp256k1PrivateKey.from_hex(private_key_str)
-        except ParseError as parser_error:
-            raise SuseException('Unable to load private key: {}'.format(str(parser_error)))
-
-        self._signer = CryptoFactory(create_context('secp256k1')).new_signer(private_key)
+            self._signer = load_signer(keyfile)
+        except SigningError as err:
+            raise SuseException(err)
 
     def suse(self, new_health, github_id):
         """
@@ -200,11 +198,6 @@ class SuseClient:
         """
         send request to code smell processor`
         """
-        if self._base_url.startswith("http://"):
-            url = "{}/{}".format(self._base_url, suffix)
-        else:
-            url = "http://{}/{}".format(self._base_url, suffix)
-
         headers = {}
         if auth_user is not None:
             auth_string = "{}:{}".format(auth_user, auth_password)
@@ -217,22 +210,15 @@ class SuseClient:
 
         try:
             if data is not None:
-                result = requests.post(url, headers=headers, data=data)
+                result = self._rest.post(suffix, data, headers=headers)
             else:
-                result = requests.get(url, headers=headers)
-
-            if result.status_code == 404:
+                result = self._rest.get(suffix, headers=headers)
+        except RestClientError as err:
+            if err.status_code == 404:
                 raise SuseException("No such transaction")
-            elif not result.ok:
-                raise SuseException("Error {}:{}".format(result.status_code, result.reason))
-
-        except requests.ConnectionError as err:
-            raise SuseException('Failed to connect to {}:{}'.format(url, str(err)))
-
-        except BaseException as err:
             raise SuseException(err)
 
-        return result.text
+        return result
 
     def _send_suse_txn(self,
                        txn_type=None,
@@ -259,14 +245,14 @@ class SuseClient:
 
         #construct header
         header = TransactionHeader(
-            signer_public_key=self._signer.get_public_key().as_hex(),
+            signer_public_key=self._signer.public_key_hex,
             family_name="suse",
             family_version="0.1",
             inputs=[address],
             outputs=[address],
             dependencies=[],
             payload_sha512=_sha512(payload),
-            batcher_public_key=self._signer.get_public_key().as_hex(),
+            batcher_public_key=self._signer.public_key_hex,
             nonce=hex(random.randint(0, 2**64))
         ).SerializeToString()
 
@@ -282,10 +268,11 @@ class SuseClient:
         #create batch list, suserum policy: one transaction per batch
         batch_list = self._create_batch_list([transaction])
 
-        return self._send_request(
-            "batches",
-            batch_list.SerializeToString(),
-            'application/octet-stream')
+        #batch id and status, committed or invalid when the client waits
+        try:
+            return submit_batches(self._rest, batch_list, wait=self._wait)
+        except RestClientError as err:
+            raise SuseException(err)
 
     def _create_batch_list(self, transactions):
         """
@@ -300,7 +287,7 @@ class SuseClient:
         transaction_signatures = [t.header_signature for t in transactions]
 
         header = BatchHeader(
-            signer_public_key=self._signer.get_public_key().as_hex(),
+            signer_public_key=self._signer.public_key_hex,
             transaction_ids=transaction_signatures
         ).SerializeToString()
 
@@ -15,8 +15,9 @@
 """
 suse family handler, verifies that transaction's payload
 """
+import os
+import sys
 import logging
-from pprint import pprint
 
 from sawtooth_sdk.processor.exceptions import InvalidTransaction #pylint: disable=import-error
 from sawtooth_sdk.processor.handler import TransactionHandler #pylint: disable=import-error
@@ -26,15 +27,15 @@ from processor.suse_state import SuseState
 from processor.suse_state import SUSE_NAMESPACE
 from processor.suse_payload import SusePayload
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__)))))
+from common.events import add_transaction_event #pylint: disable=wrong-import-position
+
 LOGGER = logging.getLogger(__name__)
 
 class SuseTransactionHandler(TransactionHandler):
     """
     process all types of transactions regarding the suse family
     """
-    def __init__(self):
-        self.count_access = 0
-
     @property
     def family_name(self):
         """
@@ -95,6 +96,9 @@ class SuseTransactionHandler(TransactionHandler):
         else:
             raise InvalidTransaction('Unhandled Type: {}'.format(suse_payload.txn_type))
 
+        add_transaction_event(context, self.family_name, transaction,
+                              suse_payload.txn_type, suse_payload.txn_id)
+
         _display("transaction {},{} created".
                  format(suse_payload.txn_type, suse_payload.data))
 
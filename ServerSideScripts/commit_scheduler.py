@@ -0,0 +1,205 @@
+"""
+Commit scheduler.
+commit_handler.sh adds a job per commit and a single resident scheduler sends the commits to their chain. A commit is
+done when the health of its commit url is on the chain: the scheduler follows the health events of each chain with
+pending jobs and looks the commit up in the indexed transactions of the chain before sending it again, with an
+exponential backoff per job. Jobs are kept in a SQLite table so they survive restarts.
+
+usage:
+	python3 commit_scheduler.py add SENDERID REPOID NAME COMMIT_URL TIME
+	python3 commit_scheduler.py run
+"""
+import os
+import sys
+import time
+import random
+import sqlite3
+import logging
+import threading
+import subprocess
+
+FAMILIES_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), 'Sawtooth', 'families')
+sys.path.append(FAMILIES_PATH)
+from common.chain_client import ChainClient
+from common.events import EventSubscriber, make_event_type
+
+LOGGER = logging.getLogger('commit_scheduler')
+
+DIR = os.path.dirname(os.path.realpath(__file__))
+JOBS_PATH = os.path.join(DIR, 'commit_jobs.db')
+MAP_PATH = os.path.join(DIR, 'map')
+COMMIT_HANDLER = os.path.join(DIR, 'commit_handler.sh')
+
+#seconds before the first check of a sent commit, doubled after each attempt
+BASE_DELAY = 60
+MAX_DELAY = 60 * 60
+MAX_ATTEMPTS = 12
+#seconds between two reads of the job table
+POLL_INTERVAL = 10
+
+PENDING = 'pending'
+DONE = 'done'
+FAILED = 'failed'
+
+def connect(path=JOBS_PATH):
+	#the scheduler shares its connection with the event threads, under its lock
+	connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+	connection.execute('PRAGMA journal_mode=WAL')
+	connection.execute("""CREATE TABLE IF NOT EXISTS jobs (
+		repo_id TEXT NOT NULL,
+		name TEXT NOT NULL,
+		commit_url TEXT NOT NULL,
+		sender_id TEXT NOT NULL,
+		time TEXT NOT NULL,
+		state TEXT NOT NULL,
+		attempts INTEGER NOT NULL DEFAULT 0,
+		next_run REAL NOT NULL,
+		PRIMARY KEY (repo_id, commit_url))""")
+	connection.execute('CREATE INDEX IF NOT EXISTS jobs_due ON jobs (state, next_run)')
+	connection.commit()
+	return connection
+
+def add_job(sender_id, repo_id, name, commit_url, commit_time):
+	"""
+	add a commit to send, a commit already known is left as it is
+	"""
+	connection = connect()
+	connection.execute(
+		'INSERT OR IGNORE INTO jobs (repo_id, name, commit_url, sender_id, time, state, next_run) '
+		'VALUES (?, ?, ?, ?, ?, ?, ?)',
+		(repo_id, name, commit_url, sender_id, commit_time, PENDING, time.time()))
+	connection.commit()
+	connection.close()
+
+def read_ports(repo_id):
+	"""
+	return the ports of a chain from the map folder: validator component, validator network, rest api
+	"""
+	with open(os.path.join(MAP_PATH, repo_id)) as ports_file:
+		return [line.strip() for line in ports_file.read().split('\n') if line.strip()]
+
+def backoff(attempts):
+	"""
+	return the seconds before the next check of a job, jittered so jobs sent together are not checked together
+	"""
+	delay = min(MAX_DELAY, BASE_DELAY * (2 ** max(0, attempts - 1)))
+	return delay / 2 + random.uniform(0, delay / 2)
+
+class ChainWatch:
+	"""
+	commits with a health on a chain, from the health events of the validator and the transaction index
+	"""
+	def __init__(self, repo_id, scheduler):
+		ports = read_ports(repo_id)
+		self.repo_id = repo_id
+		self.scheduler = scheduler
+		self.chain = ChainClient('http://127.0.0.1:' + ports[2])
+		self.commit_urls = set()
+		self.last_health = None
+		self.subscriber = EventSubscriber('tcp://127.0.0.1:' + ports[0])
+		self.subscriber.on(make_event_type('health', 'health'), self.on_health)
+		self.thread = threading.Thread(target=self.subscriber.start, daemon=True)
+		self.thread.start()
+
+	def on_health(self, event, block):
+		#health payload: type,id,data,state,url,client_key,date
+		fields = event.data.decode().split(',')
+		if len(fields) > 4:
+			self.scheduler.mark_done(self.repo_id, fields[4])
+
+	def has_health(self, commit_url):
+		"""
+		return True if the commit has a health, the index only reads the transactions added since the last lookup
+		"""
+		healths = self.chain.healths_after(self.last_health)
+		if healths is None:
+			#the last health left the chain in a fork, read them all again
+			self.commit_urls = set()
+			healths = self.chain.healths()
+		for health in healths:
+			self.commit_urls.add(health.commit_url)
+			self.last_health = health.transaction_id
+		return commit_url in self.commit_urls
+
+	def stop(self):
+		self.subscriber.stop()
+
+class Scheduler:
+	"""
+	send the due jobs and follow the chains of the pending jobs
+	"""
+	def __init__(self):
+		self.connection = connect()
+		self.lock = threading.Lock()
+		self.watches = {}
+
+	def run(self):
+		LOGGER.info("Commit scheduler started")
+		while True:
+			for job in self.due_jobs():
+				try:
+					self.process(*job)
+				except Exception as err:
+					LOGGER.exception("Unable to process commit %s: %s", job[2], err)
+					self.set_state(job[0], job[2], PENDING, job[5] + 1, time.time() + backoff(job[5] + 1))
+			self.stop_idle_watches()
+			time.sleep(POLL_INTERVAL)
+
+	def due_jobs(self):
+		with self.lock:
+			return self.connection.execute(
+				'SELECT repo_id, name, commit_url, sender_id, time, attempts FROM jobs '
+				'WHERE state = ? AND next_run <= ? ORDER BY next_run', (PENDING, time.time())).fetchall()
+
+	def process(self, repo_id, name, commit_url, sender_id, commit_time, attempts):
+		watch = self.watch(repo_id)
+		if watch.has_health(commit_url):
+			self.mark_done(repo_id, commit_url)
+			return
+		if attempts >= MAX_ATTEMPTS:
+			LOGGER.warning("Giving up on commit %s after %s attempts", commit_url, attempts)
+			self.set_state(repo_id, commit_url, FAILED, attempts, time.time())
+			return
+
+		LOGGER.info("Sending commit %s (attempt %s)", commit_url, attempts + 1)
+		subprocess.call([COMMIT_HANDLER, '--send', sender_id, repo_id, name, commit_url, commit_time])
+		self.set_state(repo_id, commit_url, PENDING, attempts + 1, time.time() + backoff(attempts + 1))
+
+	def watch(self, repo_id):
+		if repo_id not in self.watches:
+			self.watches[repo_id] = ChainWatch(repo_id, self)
+		return self.watches[repo_id]
+
+	def stop_idle_watches(self):
+		"""
+		stop following the chains without pending jobs
+		"""
+		with self.lock:
+			pending = set(row[0] for row in self.connection.execute(
+				'SELECT DISTINCT repo_id FROM jobs WHERE state = ?', (PENDING,)))
+		for repo_id in list(self.watches):
+			if repo_id not in pending:
+				self.watches.pop(repo_id).stop()
+
+	def mark_done(self, repo_id, commit_url):
+		with self.lock:
+			self.connection.execute('UPDATE jobs SET state = ? WHERE repo_id = ? AND commit_url = ? AND state = ?',
+				(DONE, repo_id, commit_url, PENDING))
+			self.connection.commit()
+
+	def set_state(self, repo_id, commit_url, state, attempts, next_run):
+		with self.lock:
+			self.connection.execute(
+				'UPDATE jobs SET state = ?, attempts = ?, next_run = ? WHERE repo_id = ? AND commit_url = ? AND state = ?',
+				(state, attempts, next_run, repo_id, commit_url, PENDING))
+			self.connection.commit()
+
+if __name__ == '__main__':
+	logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+	if len(sys.argv) == 7 and sys.argv[1] == 'add':
+		add_job(*sys.argv[2:])
+	elif len(sys.argv) == 2 and sys.argv[1] == 'run':
+		Scheduler().run()
+	else:
+		print(__doc__)
+		sys.exit(1)
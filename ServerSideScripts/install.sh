@@ -53,7 +53,6 @@ pwd
 )
 crontab -l > mycron
 echo "@reboot $Dir/startup.sh" >> mycron
-#echo "3 * * * * $Dir/proposal_listener.sh" #this is only for server
 crontab mycron
 rm mycron
 
@@ -19,43 +19,20 @@ fi
 echo $NAME $ID
 export SAWTOOTH_HOME="$HOME/.sawtooth_projects/.$(echo $NAME)_$(echo $ID)"
 
-#TODO make thread safe (else ports may conflict)
-#generate ports based on availablity
-STARTINGPORT=1000
-ENDINGPORT=655354
-
-for i in $(seq $STARTINGPORT $ENDINGPORT);do
-port=$(netstat -an | grep "LISTEN" | grep "$i ")
-echo trying port - $port - $i
-if [ -z "$port" ]
-then
-#assign first port
-if [ -z "$VALIDATOR_PORT_COM" ] 
-then
-VALIDATOR_PORT_COM=$i
-echo I set $VALIDATOR_PORT_COM
-continue
-fi
-#assign second port
-if [ -z "$VALIDATOR_PORT_NET" ] 
-then
-VALIDATOR_PORT_NET=$i
-echo I set $VALIDATOR_PORT_NET
-continue
-fi
-#assign third port
-if [ -z "$API_PORT" ] 
-then
-API_PORT=$i
-echo I set $API_PORT
-break
-fi
-fi
-done 
-
+#generate ports based on availablity, the allocator keeps the ports given to each project
+#so chains created at the same time get different ports
+Dir=$(
+cd $(dirname "$0")
+pwd
+)
+readarray ports < <(python3 $Dir/port_allocator.py allocate $ID)
+VALIDATOR_PORT_COM=$(echo ${ports[0]} | tr -d '\n')
+VALIDATOR_PORT_NET=$(echo ${ports[1]} | tr -d '\n')
+API_PORT=$(echo ${ports[2]} | tr -d '\n')
+echo I set $VALIDATOR_PORT_COM $VALIDATOR_PORT_NET $API_PORT
 
 #check if i got all the ports
-if [ -z VALIDATOR_PORT_COM ] || [ -z VALIDATOR_PORT_NET ] || [ -z API_PORT ]; then
+if [ -z "$VALIDATOR_PORT_COM" ] || [ -z "$VALIDATOR_PORT_NET" ] || [ -z "$API_PORT" ]; then
 echo 'ERROR: the system could not get an available port'
 exit 1
 fi
@@ -135,9 +112,10 @@ curl --silent --request POST --url http://129.108.7.2:3000/  --header '"CONTENT_
 cat /opt/lampp/htdocs/connect/$web #TODO delete me on the first proposal
 #rm $SUSE_PATH
 
-#start services
+#start services, under the supervisor when it runs
+if ! python3 $Dir/supervisor.py start $ID ;then
 #validator
-sawtooth-validator -vv --bind component:tcp://127.0.0.1:$VALIDATOR_PORT_COM --bind network:tcp://$IP:$VALIDATOR_PORT_NET --endpoint tcp://$IP:$VALIDATOR_PORT_NET --peering dynamic &
+sawtooth-validator -vv --scheduler parallel --bind component:tcp://127.0.0.1:$VALIDATOR_PORT_COM --bind network:tcp://$IP:$VALIDATOR_PORT_NET --endpoint tcp://$IP:$VALIDATOR_PORT_NET --peering dynamic &
 #sleep 3
 #rest api
 sawtooth-rest-api -v --bind 0.0.0.0:$API_PORT --connect 127.0.0.1:$VALIDATOR_PORT_COM &
@@ -151,7 +129,10 @@ poet-validator-registry-tp --connect tcp://127.0.0.1:$VALIDATOR_PORT_COM &
 #sawtooth block list --url http://$IP:$API_PORT
 python3 bin/codesmell-tp --connect tcp://127.0.0.1:$VALIDATOR_PORT_COM &
 python3 bin/health-tp --connect tcp://127.0.0.1:$VALIDATOR_PORT_COM &
+python3 bin/codesmell-events --connect tcp://127.0.0.1:$VALIDATOR_PORT_COM &
+python3 bin/health-events --connect tcp://127.0.0.1:$VALIDATOR_PORT_COM &
 python3 bin/suse-tp --connect tcp://127.0.0.1:$VALIDATOR_PORT_COM &
+fi
 
 #TODO call default - url-validator, and sawtooth repo ($SAWTOOTH_HOME/Sawtooth)
 #python3 families/code-smell/client/code_smell.py default --url http://127.0.0.1:$VALIDATOR_PORT_COM --path $SAWTOOTH_HOME 
@@ -0,0 +1,128 @@
+"""
+Port allocator.
+Gives the three ports of a new chain (validator component, validator network, rest api). The listening sockets are
+read once from /proc/net/tcp instead of running netstat for each candidate port, and the ports given to each project
+are kept in a registry so chains created at the same time never get the same ports, even before their validator
+listens. The registry is only read and written under an exclusive lock.
+
+usage:
+	python3 port_allocator.py allocate REPOID		prints the ports of the project, one per line
+	python3 port_allocator.py release REPOID
+"""
+import os
+import sys
+import json
+import fcntl
+from contextlib import contextmanager
+
+DIR = os.path.dirname(os.path.realpath(__file__))
+REGISTRY_PATH = os.path.join(DIR, 'ports.json')
+LOCK_PATH = os.path.join(DIR, 'ports.lock')
+MAP_PATH = os.path.join(DIR, 'map')
+
+STARTING_PORT = 1000
+ENDING_PORT = 65535
+PORTS_PER_CHAIN = 3
+#state of a listening socket in /proc/net/tcp
+TCP_LISTEN = '0A'
+
+def listening_ports(tables=('/proc/net/tcp', '/proc/net/tcp6')):
+	"""
+	return the ports of the listening tcp sockets
+	"""
+	ports = set()
+	for table in tables:
+		try:
+			with open(table) as sockets:
+				next(sockets)
+				for line in sockets:
+					#sl local_address rem_address st ...
+					fields = line.split()
+					if len(fields) > 3 and fields[3] == TCP_LISTEN:
+						ports.add(int(fields[1].rsplit(':', 1)[1], 16))
+		except (IOError, OSError, StopIteration):
+			continue
+	return ports
+
+def mapped_ports():
+	"""
+	return the ports of the chains in the map folder, chains created before the registry or not running
+	"""
+	ports = set()
+	if not os.path.isdir(MAP_PATH):
+		return ports
+	for repo_id in os.listdir(MAP_PATH):
+		try:
+			with open(os.path.join(MAP_PATH, repo_id)) as ports_file:
+				ports.update(int(line) for line in ports_file.read().split() if line.isdigit())
+		except (IOError, OSError):
+			continue
+	return ports
+
+@contextmanager
+def registry():
+	"""
+	yield the registry (repo id: ports) under an exclusive lock, changes are saved when the block ends
+	"""
+	with open(LOCK_PATH, 'a') as lock:
+		fcntl.flock(lock, fcntl.LOCK_EX)
+		try:
+			try:
+				with open(REGISTRY_PATH) as registry_file:
+					projects = json.load(registry_file)
+			except (IOError, OSError, ValueError):
+				projects = {}
+			saved = json.dumps(projects, sort_keys=True)
+			yield projects
+			if json.dumps(projects, sort_keys=True) != saved:
+				#written to a temporary file first so a crash never leaves half a registry
+				tmp_path = REGISTRY_PATH + '.tmp'
+				with open(tmp_path, 'w') as registry_file:
+					json.dump(projects, registry_file, indent=1, sort_keys=True)
+					registry_file.flush()
+					os.fsync(registry_file.fileno())
+				os.rename(tmp_path, REGISTRY_PATH)
+		finally:
+			fcntl.flock(lock, fcntl.LOCK_UN)
+
+def allocate(repo_id, count=PORTS_PER_CHAIN):
+	"""
+	return the ports of a project, free ports are assigned the first time
+	"""
+	with registry() as projects:
+		if repo_id in projects:
+			return projects[repo_id]
+		taken = listening_ports() | mapped_ports()
+		for ports in projects.values():
+			taken.update(ports)
+
+		ports = []
+		for port in range(STARTING_PORT, ENDING_PORT + 1):
+			if port not in taken:
+				ports.append(port)
+				if len(ports) == count:
+					break
+		if len(ports) < count:
+			raise RuntimeError('the system could not get an available port')
+		projects[repo_id] = ports
+		return ports
+
+def release(repo_id):
+	"""
+	give the ports of a deleted project back
+	"""
+	with registry() as projects:
+		projects.pop(repo_id, None)
+
+if __name__ == '__main__':
+	if len(sys.argv) == 3 and sys.argv[1] == 'allocate':
+		try:
+			print('\n'.join(str(port) for port in allocate(sys.argv[2])))
+		except RuntimeError as err:
+			print('ERROR: ' + str(err), file=sys.stderr)
+			sys.exit(1)
+	elif len(sys.argv) == 3 and sys.argv[1] == 'release':
+		release(sys.argv[2])
+	else:
+		print(__doc__)
+		sys.exit(1)
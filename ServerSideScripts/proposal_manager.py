@@ -0,0 +1,345 @@
+"""
+Proposal manager.
+A single resident process resolves the proposals of every project instead of an hourly vote_listener.py cron job per
+proposal. The manager follows the code-smell proposal and vote events of each chain and keeps the tally of the active
+proposal in memory, seeded from the transactions of the chain when the project is loaded. A proposal is accepted as
+soon as its yes votes reach the approval threshold. Deadlines of all projects share one timer wheel, when a deadline
+passes the proposal is accepted with half of the votes or rejected. A proposal without votes stays open and is checked
+again every hour, as the vote_listener.py cron job did.
+
+usage:
+	python3 proposal_manager.py
+"""
+import os
+import sys
+import glob
+import time
+import queue
+import getpass
+import logging
+import datetime
+import threading
+
+FAMILIES_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), 'Sawtooth', 'families')
+sys.path.append(FAMILIES_PATH)
+sys.path.append(os.path.join(FAMILIES_PATH, 'code-smell'))
+from common.batches import COMMITTED
+from common.chain_client import parse_date
+from common.snapshot import open_project_chain, compact_project_snapshot
+from common.events import EventSubscriber, make_event_type, event_attributes
+from common.suse_config import load_suse_config, project_suse_path
+from client.code_smell_client import CodeSmellClient
+
+LOGGER = logging.getLogger('proposal_manager')
+
+PROJECTS_PATH = '/home/practicum2018/.sawtooth_projects'
+#seconds between two scans of the projects folder for new chains
+SCAN_INTERVAL = 60
+#seconds per slot of the timer wheel, deadlines are days away so a minute is precise enough
+TICK = 60
+WHEEL_SLOTS = 1024
+#seconds before a proposal without votes at its deadline is checked again
+NO_VOTE_RECHECK = 3600
+#seconds before a failed update is tried again, doubled after each failure
+RESOLVE_RETRY = 60
+RESOLVE_RETRY_MAX = 3600
+
+ACCEPTED = 1
+REJECTED = 0
+
+def read_ports(prj_path):
+	"""
+	return the ports of a chain: validator component, validator network, rest api
+	"""
+	with open(os.path.join(prj_path, 'etc', '.ports')) as ports_file:
+		return [line.strip() for line in ports_file.read().split('\n') if line.strip()]
+
+class TimerWheel:
+	"""
+	hashed timer wheel, a timer is added to the slot of its deadline and the wheel only looks at the slots of the
+	ticks that passed, whatever the number of timers
+	"""
+	def __init__(self, tick=TICK, slots=WHEEL_SLOTS):
+		self.tick = tick
+		self.slots = [dict() for _ in range(slots)]
+		self.timers = {}		# key: slot
+		self.lock = threading.Lock()
+		self.current = int(time.time() // tick)
+
+	def add(self, key, deadline, callback):
+		"""
+		call callback at deadline (unix time), a timer added again with the same key replaces the previous one
+		"""
+		with self.lock:
+			self._cancel(key)
+			#a deadline already passed is run at the next tick
+			tick = max(self.current + 1, int(deadline // self.tick))
+			slot = tick % len(self.slots)
+			self.slots[slot][key] = (tick, callback)
+			self.timers[key] = slot
+
+	def cancel(self, key):
+		with self.lock:
+			self._cancel(key)
+
+	def _cancel(self, key):
+		slot = self.timers.pop(key, None)
+		if slot is not None:
+			self.slots[slot].pop(key, None)
+
+	def advance(self):
+		"""
+		run the timers of the ticks passed since the last call
+		"""
+		due = []
+		with self.lock:
+			now = int(time.time() // self.tick)
+			while self.current < now:
+				self.current += 1
+				slot = self.slots[self.current % len(self.slots)]
+				#timers further than a turn of the wheel wait for their turn in the same slot
+				for key, (tick, callback) in list(slot.items()):
+					if tick <= self.current:
+						del slot[key]
+						del self.timers[key]
+						due.append(callback)
+		for callback in due:
+			try:
+				callback()
+			except Exception as err:
+				LOGGER.exception("Timer failed: %s", err)
+
+	def run(self):
+		while True:
+			self.advance()
+			time.sleep(self.tick - time.time() % self.tick)
+
+class Project:
+	"""
+	active proposal of a chain and its tally
+	"""
+	def __init__(self, prj_path, manager):
+		self.path = prj_path
+		self.manager = manager
+		self.repo_id = os.path.basename(os.path.normpath(prj_path)).split('_')[-1]
+		self.suse_path = project_suse_path(prj_path)
+		#fails early on a project without configuration
+		load_suse_config(self.suse_path)
+		ports = read_ports(prj_path)
+		url = 'http://127.0.0.1:' + ports[2]
+		#the chain is read from the snapshot of the project on, the manager keeps the snapshot recent
+		self.chain = open_project_chain(url, prj_path)
+		#the client waits for the proposal update to be committed
+		self.client = CodeSmellClient(base_url=url, keyfile=manager.keyfile, work_path=prj_path, wait=60)
+		self.lock = threading.Lock()
+		self.proposal = None
+		self.votes = {}		# vote transaction id: vote
+		self.resolving = False
+		self.failures = 0
+		self.subscriber = EventSubscriber('tcp://127.0.0.1:' + ports[0])
+		self.subscriber.on(make_event_type('code-smell', 'proposal'), self.on_proposal)
+		self.subscriber.on(make_event_type('code-smell', 'vote'), self.on_vote)
+
+	@property
+	def approval_treshold(self):
+		#read through the configuration cache, an accepted proposal may change the settings
+		return load_suse_config(self.suse_path).approval_treshold
+
+	@property
+	def proposal_active_days(self):
+		return load_suse_config(self.suse_path).proposal_active_days
+
+	def start(self):
+		thread = threading.Thread(target=self.subscriber.start, daemon=True)
+		thread.start()
+		self.load()
+
+	def load(self):
+		"""
+		seed the tally from the chain, events committed from now on are applied to it
+		"""
+		proposal = self.chain.active_proposal()
+		votes = [] if proposal is None else self.chain.votes(proposal.proposal_id)
+		with self.lock:
+			if proposal is None:
+				self._set_proposal(None)
+				return
+			if self.proposal is None or self.proposal[1] != proposal.proposal_id:
+				self._set_proposal(proposal.transaction_id, proposal.proposal_id, proposal.date)
+			else:
+				#votes received by the events while the chain was read are kept
+				self.resolving = False
+				self._set_deadline(proposal.date)
+			for vote in votes:
+				self.votes[vote.transaction_id] = vote.vote
+		self.check_threshold()
+
+	def on_proposal(self, event, block):
+		#code-smell payload: type,id,data,state,date
+		fields = event.data.decode().split(',')
+		if len(fields) < 5:
+			return
+		with self.lock:
+			if fields[3] == 'active':
+				self._set_proposal(event_attributes(event).get('signature'), fields[1], fields[4])
+			elif self.proposal is not None and fields[1] == self.proposal[1]:
+				#accepted or rejected
+				self._set_proposal(None)
+
+	def on_vote(self, event, block):
+		#vote payload: type,id,proposal id,vote,date
+		fields = event.data.decode().split(',')
+		if len(fields) < 4:
+			return
+		with self.lock:
+			if self.proposal is None or fields[2] != self.proposal[1]:
+				return
+			try:
+				self.votes[event_attributes(event).get('signature')] = int(fields[3])
+			except ValueError:
+				return
+		self.check_threshold()
+
+	def _set_proposal(self, transaction_id, proposal_id=None, date=None):
+		"""
+		start the tally of a new proposal and set its deadline, called with the lock
+		"""
+		self.votes = {}
+		self.resolving = False
+		if transaction_id is None:
+			self.proposal = None
+			self.manager.wheel.cancel(self.repo_id)
+			return
+		self.proposal = (transaction_id, proposal_id)
+		self._set_deadline(date)
+
+	def _set_deadline(self, date):
+		"""
+		add the deadline of the proposal to the timer wheel, called with the lock
+		"""
+		proposal_date = parse_date(date)
+		if proposal_date is None:
+			LOGGER.warning("Proposal %s of %s has no date, it is only resolved by votes", self.proposal[1], self.repo_id)
+			return
+		#proposal dates are utc
+		deadline = proposal_date + datetime.timedelta(days=self.proposal_active_days)
+		deadline = (deadline - datetime.datetime(1970, 1, 1)).total_seconds()
+		self.manager.wheel.add(self.repo_id, deadline, self.on_deadline)
+
+	def check_threshold(self):
+		with self.lock:
+			if self.proposal is None or self.resolving:
+				return
+			yes_votes = list(self.votes.values()).count(ACCEPTED)
+			if yes_votes < self.approval_treshold:
+				return
+			LOGGER.info("Proposal %s of %s passed by vote threshold with %s votes",
+				self.proposal[1], self.repo_id, yes_votes)
+			self._resolve(ACCEPTED)
+
+	def on_deadline(self):
+		with self.lock:
+			if self.proposal is None or self.resolving:
+				return
+			votes = list(self.votes.values())
+			if not votes:
+				LOGGER.info("Proposal %s of %s reached its deadline without votes, it stays open",
+					self.proposal[1], self.repo_id)
+				self.manager.wheel.add(self.repo_id, time.time() + NO_VOTE_RECHECK, self.on_deadline)
+				return
+			state = ACCEPTED if votes.count(ACCEPTED) >= int(len(votes) / 2) else REJECTED
+			LOGGER.info("Proposal %s of %s reached its deadline with %s votes: %s",
+				self.proposal[1], self.repo_id, len(votes), 'accepted' if state == ACCEPTED else 'rejected')
+			self._resolve(state)
+
+	def _resolve(self, state):
+		"""
+		queue the update of the proposal, called with the lock
+		"""
+		self.resolving = True
+		self.manager.wheel.cancel(self.repo_id)
+		self.manager.resolutions.put((self, self.proposal[0], state))
+
+	def on_resolved(self, statuses):
+		"""
+		check the status of the update of the proposal, an update that was not committed is tried again later
+		"""
+		if statuses and all(status == COMMITTED for status in statuses.values()):
+			self.failures = 0
+			return
+		delay = min(RESOLVE_RETRY_MAX, RESOLVE_RETRY * 2 ** self.failures)
+		self.failures += 1
+		LOGGER.warning("Update of proposal of %s not committed (%s), checked again in %s seconds",
+			self.repo_id, statuses, delay)
+		with self.lock:
+			self.resolving = False
+		#the tally is checked again against the chain, an update committed late closes the proposal
+		self.manager.wheel.add(self.repo_id, time.time() + delay, self.load)
+
+	def compact(self):
+		"""
+		write the snapshot of the chain once enough transactions were committed after it
+		"""
+		if compact_project_snapshot(self.chain, self.path) is not None:
+			LOGGER.info("Snapshot of %s written", self.path)
+
+	def stop(self):
+		self.manager.wheel.cancel(self.repo_id)
+		self.subscriber.stop()
+
+class ProposalManager:
+	"""
+	follow the proposals of all the projects
+	"""
+	def __init__(self, projects_path=PROJECTS_PATH):
+		self.projects_path = projects_path
+		self.projects = {}		# project path: Project
+		self.wheel = TimerWheel()
+		#updates wait for their block to be committed, they are sent one at a time out of the event threads
+		self.resolutions = queue.Queue()
+		username = getpass.getuser()
+		self.keyfile = os.path.join(os.path.expanduser('~'), '.sawtooth', 'keys', username + '.priv')
+
+	def run(self):
+		LOGGER.info("Proposal manager started")
+		threading.Thread(target=self.wheel.run, daemon=True).start()
+		threading.Thread(target=self.resolve, daemon=True).start()
+		while True:
+			self.scan()
+			time.sleep(SCAN_INTERVAL)
+
+	def scan(self):
+		"""
+		load the new projects, stop following the deleted ones, write the snapshots of the others
+		"""
+		paths = set(path for path in glob.glob(os.path.join(self.projects_path, '.*', ''))
+					if os.path.isfile(os.path.join(path, 'etc', '.ports')))
+		for path in paths - set(self.projects):
+			try:
+				project = Project(path, self)
+				project.start()
+				self.projects[path] = project
+				LOGGER.info("Following proposals of %s", path)
+			except Exception as err:
+				LOGGER.exception("Unable to load project %s: %s", path, err)
+		for path in set(self.projects) - paths:
+			self.projects.pop(path).stop()
+		for path, project in self.projects.items():
+			try:
+				project.compact()
+			except Exception as err:
+				LOGGER.warning("Unable to write the snapshot of %s: %s", path, err)
+
+	def resolve(self):
+		while True:
+			project, transaction_id, state = self.resolutions.get()
+			try:
+				statuses = project.client.update_proposal(transaction_id, state, project.repo_id)
+			except Exception as err:
+				LOGGER.exception("Unable to update proposal %s of %s: %s", transaction_id, project.repo_id, err)
+				statuses = None
+			project.on_resolved(statuses)
+
+if __name__ == '__main__':
+	logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+	ProposalManager().run()
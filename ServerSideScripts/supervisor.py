@@ -0,0 +1,467 @@
+"""
+Process supervisor.
+Runs the validator stack of every project (validator, rest api, transaction processors and event subscribers) as
+children of a single process instead of background jobs of starup.sh. The code smell, health and suse processors are
+shared: one process per family serves the validators of all the running projects. A stack is started on demand: while a project
+is cold the supervisor listens on its rest api port, the first connection starts the stack and is forwarded to the
+rest api once it listens. Crashed components are restarted with a backoff and a project without a new block for
+IDLE_TIMEOUT seconds is stopped to free its memory.
+
+usage:
+	python3 supervisor.py run [--ip IP] [--endpoint ENDPOINT] [--eager]
+	python3 supervisor.py start|stop REPOID
+	python3 supervisor.py status
+"""
+import os
+import sys
+import glob
+import json
+import time
+import signal
+import socket
+import logging
+import argparse
+import threading
+import subprocess
+import socketserver
+import urllib.request
+
+LOGGER = logging.getLogger('supervisor')
+
+DIR = os.path.dirname(os.path.realpath(__file__))
+SOCKET_PATH = os.path.join(DIR, 'supervisor.sock')
+SAWTOOTH_PATH = os.path.join(os.path.dirname(DIR), 'Sawtooth')
+#endpoints of the running validators, read by the shared processors, and their logs
+SHARED_PATH = os.path.join(DIR, 'shared')
+ENDPOINTS_PATH = os.path.join(SHARED_PATH, 'endpoints')
+SHARED_PROCESSORS = (('codesmell-tp', 'bin/codesmell-tp'), ('health-tp', 'bin/health-tp'), ('suse-tp', 'bin/suse-tp'))
+PROJECTS_PATH = '/home/practicum2018/.sawtooth_projects'
+
+#seconds without a new block before a project is stopped
+IDLE_TIMEOUT = int(os.environ.get('SUPERVISOR_IDLE_TIMEOUT', 2 * 60 * 60))
+#seconds between two checks of the components, of the chain heads and of the projects folder
+CHECK_INTERVAL = 5
+ACTIVITY_INTERVAL = 60
+SCAN_INTERVAL = 60
+#seconds to wait for a component to listen on its port
+START_TIMEOUT = 60
+#restart delay doubles after each crash, a component running this long is stable again
+MAX_RESTART_DELAY = 60
+STABLE_TIME = 10 * 60
+
+COLD = 'cold'
+RUNNING = 'running'
+EXTERNAL = 'external'
+
+def read_ports(prj_path):
+	"""
+	return the ports of a chain: validator component, validator network, rest api
+	"""
+	with open(os.path.join(prj_path, 'etc', '.ports')) as ports_file:
+		return [line.strip() for line in ports_file.read().split('\n') if line.strip()]
+
+def wait_for_port(port, timeout=START_TIMEOUT):
+	"""
+	return True once a local port accepts connections, False after timeout
+	"""
+	deadline = time.time() + timeout
+	while time.time() < deadline:
+		try:
+			socket.create_connection(('127.0.0.1', int(port)), timeout=1).close()
+			return True
+		except OSError:
+			time.sleep(0.5)
+	return False
+
+def pipe(source, destination):
+	"""
+	copy a socket into another until it closes
+	"""
+	try:
+		while True:
+			data = source.recv(65536)
+			if not data:
+				break
+			destination.sendall(data)
+	except OSError:
+		pass
+	finally:
+		for connection in (source, destination):
+			try:
+				connection.shutdown(socket.SHUT_RDWR)
+			except OSError:
+				pass
+
+class Component:
+	"""
+	a process of a stack, restarted when it crashes
+	"""
+	def __init__(self, name, argv, cwd, env, port=None, log_dir=None):
+		self.name = name
+		self.argv = argv
+		self.cwd = cwd
+		self.env = env
+		self.log_dir = log_dir or os.path.join(cwd, 'logs')
+		#port listened by the component, the next components wait for it
+		self.port = port
+		self.process = None
+		self.started = 0
+		self.crashes = 0
+		self.restart_at = None
+
+	def start(self):
+		log = open(os.path.join(self.log_dir, self.name + '.log'), 'a')
+		self.process = subprocess.Popen(self.argv, cwd=self.cwd, env=self.env, stdout=log, stderr=subprocess.STDOUT)
+		log.close()
+		self.started = time.time()
+		self.restart_at = None
+
+	def check(self):
+		"""
+		restart the component if it exited, after a delay doubled at each crash
+		"""
+		if self.process is None:
+			return
+		if self.process.poll() is None:
+			if self.crashes and time.time() - self.started > STABLE_TIME:
+				self.crashes = 0
+			return
+		now = time.time()
+		if self.restart_at is None:
+			self.crashes += 1
+			self.restart_at = now + min(MAX_RESTART_DELAY, 2 ** (self.crashes - 1))
+			LOGGER.warning("%s exited with %s, restarting in %s seconds",
+				self.name, self.process.returncode, int(self.restart_at - now))
+		elif now >= self.restart_at:
+			self.start()
+
+	def stop(self):
+		if self.process is None:
+			return
+		if self.process.poll() is None:
+			self.process.terminate()
+			try:
+				self.process.wait(10)
+			except subprocess.TimeoutExpired:
+				self.process.kill()
+				self.process.wait()
+		self.process = None
+
+class Project:
+	"""
+	validator stack of a chain
+	"""
+	def __init__(self, prj_path, supervisor):
+		self.path = prj_path
+		self.supervisor = supervisor
+		self.repo_id = os.path.basename(os.path.normpath(prj_path)).split('_')[-1]
+		self.ports = read_ports(prj_path)
+		self.lock = threading.RLock()
+		self.state = COLD
+		self.components = []
+		self.listener = None
+		self.head = None
+		self.last_active = time.time()
+
+	def stack(self):
+		"""
+		return the components of the stack, in start order
+		"""
+		com, net, api = self.ports[0], self.ports[1], self.ports[2]
+		validator = 'tcp://127.0.0.1:' + com
+		env = dict(os.environ, SAWTOOTH_HOME=self.path)
+		ip = self.supervisor.ip
+		commands = [
+			('validator', ['sawtooth-validator', '-vv', '--scheduler', 'parallel',
+				'--bind', 'component:' + validator, '--bind', 'network:tcp://' + ip + ':' + net,
+				'--endpoint', 'tcp://' + self.supervisor.endpoint + ':' + net, '--peering', 'dynamic'], com),
+			('rest-api', ['sawtooth-rest-api', '-v', '--bind', '0.0.0.0:' + api, '--connect', '127.0.0.1:' + com], api),
+			('settings-tp', ['settings-tp', '-v', '--connect', validator], None),
+			('poet-validator-registry-tp', ['poet-validator-registry-tp', '--connect', validator], None),
+		]
+		#the family processors are shared by the projects, the event subscribers write to the project folder
+		commands.append(('codesmell-events', [sys.executable, 'bin/codesmell-events', '--connect', validator], None))
+		commands.append(('health-events', [sys.executable, 'bin/health-events', '--connect', validator,
+			'--url', 'http://127.0.0.1:' + api], None))
+		return [Component(name, argv, self.path, env, port) for name, argv, port in commands]
+
+	def start(self):
+		"""
+		start the stack, each component waits for the port of the previous one
+		"""
+		with self.lock:
+			if self.state == RUNNING:
+				return
+			if self.state == EXTERNAL and wait_for_port(self.ports[2], timeout=1):
+				LOGGER.warning("Project %s already runs outside the supervisor", self.repo_id)
+				return
+			self._close_listener()
+			LOGGER.info("Starting project %s", self.repo_id)
+			self.components = self.stack()
+			for component in self.components:
+				component.start()
+				if component.port is not None and not wait_for_port(component.port):
+					LOGGER.warning("%s of project %s is not listening on %s", component.name, self.repo_id, component.port)
+			self.state = RUNNING
+			self.last_active = time.time()
+		self.supervisor.write_endpoints()
+
+	def stop(self, listen=True):
+		"""
+		stop the stack and wait for a connection to the rest api to start it again
+		"""
+		with self.lock:
+			if self.state == RUNNING:
+				LOGGER.info("Stopping project %s", self.repo_id)
+				for component in reversed(self.components):
+					component.stop()
+				self.components = []
+			self.state = COLD
+			if listen:
+				self.listen()
+			else:
+				self._close_listener()
+		self.supervisor.write_endpoints()
+
+	def listen(self):
+		"""
+		listen on the rest api port of the cold project, a project whose port is taken runs outside the supervisor
+		"""
+		with self.lock:
+			if self.listener is not None:
+				return
+			listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+			listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+			try:
+				listener.bind(('0.0.0.0', int(self.ports[2])))
+				listener.listen(16)
+			except OSError:
+				listener.close()
+				LOGGER.warning("Rest api port %s of project %s is taken, leaving it to its owner", self.ports[2], self.repo_id)
+				self.state = EXTERNAL
+				return
+			self.listener = listener
+			threading.Thread(target=self._accept, args=(listener,), daemon=True).start()
+
+	def _accept(self, listener):
+		try:
+			connection, _ = listener.accept()
+		except OSError:
+			#closed by start or stop
+			return
+		self.start()
+		threading.Thread(target=self._forward, args=(connection,), daemon=True).start()
+
+	def _forward(self, connection):
+		"""
+		hand the connection that started the project to its rest api
+		"""
+		try:
+			upstream = socket.create_connection(('127.0.0.1', int(self.ports[2])), timeout=START_TIMEOUT)
+		except OSError:
+			connection.close()
+			return
+		upstream.settimeout(None)
+		threading.Thread(target=pipe, args=(connection, upstream), daemon=True).start()
+		pipe(upstream, connection)
+		upstream.close()
+		connection.close()
+
+	def _close_listener(self):
+		if self.listener is not None:
+			self.listener.close()
+			self.listener = None
+
+	def check(self):
+		with self.lock:
+			if self.state == RUNNING:
+				for component in self.components:
+					component.check()
+
+	def check_activity(self):
+		"""
+		stop the project when its chain head did not change for IDLE_TIMEOUT seconds
+		"""
+		if self.state != RUNNING:
+			return
+		try:
+			url = 'http://127.0.0.1:' + self.ports[2] + '/blocks?limit=1'
+			with urllib.request.urlopen(url, timeout=10) as response:
+				head = json.loads(response.read().decode())['data'][0]['header_signature']
+		except (OSError, ValueError, KeyError, IndexError):
+			head = None
+		if head is not None and head != self.head:
+			self.head = head
+			self.last_active = time.time()
+		elif time.time() - self.last_active > IDLE_TIMEOUT:
+			self.stop()
+
+	def status(self):
+		with self.lock:
+			running = sum(1 for component in self.components
+						if component.process is not None and component.process.poll() is None)
+			return '{} {} {}/{} {}s'.format(self.repo_id, self.state, running, len(self.components),
+				int(time.time() - self.last_active))
+
+class Supervisor:
+	"""
+	supervise the stacks of all the projects
+	"""
+	def __init__(self, ip, endpoint, eager=False, projects_path=PROJECTS_PATH):
+		self.ip = ip
+		self.endpoint = endpoint
+		self.eager = eager
+		self.projects_path = projects_path
+		self.projects = {}		# repo id: Project
+		self.stopped = threading.Event()
+		self.endpoints_lock = threading.Lock()
+		self.shared = [Component(name, [sys.executable, os.path.join(SAWTOOTH_PATH, script), '--endpoints', ENDPOINTS_PATH],
+							SAWTOOTH_PATH, None, log_dir=SHARED_PATH) for name, script in SHARED_PROCESSORS]
+
+	def run(self):
+		LOGGER.info("Supervisor started")
+		if not os.path.isdir(SHARED_PATH):
+			os.makedirs(SHARED_PATH)
+		self.write_endpoints()
+		for component in self.shared:
+			component.start()
+		self.serve()
+		last_scan = last_activity = 0
+		while not self.stopped.is_set():
+			now = time.time()
+			if now - last_scan >= SCAN_INTERVAL:
+				self.scan()
+				last_scan = now
+			for component in self.shared:
+				component.check()
+			for project in list(self.projects.values()):
+				project.check()
+			if now - last_activity >= ACTIVITY_INTERVAL:
+				for project in list(self.projects.values()):
+					project.check_activity()
+				last_activity = now
+			self.stopped.wait(CHECK_INTERVAL)
+		for project in self.projects.values():
+			project.stop(listen=False)
+		for component in self.shared:
+			component.stop()
+
+	def scan(self):
+		"""
+		add the new projects, cold unless eager
+		"""
+		for path in glob.glob(os.path.join(self.projects_path, '.*', '')):
+			if not os.path.isfile(os.path.join(path, 'etc', '.ports')):
+				continue
+			try:
+				project = Project(path, self)
+			except (IOError, OSError, IndexError) as err:
+				LOGGER.warning("Unable to read project %s: %s", path, err)
+				continue
+			if project.repo_id in self.projects:
+				continue
+			self.projects[project.repo_id] = project
+			if self.eager:
+				threading.Thread(target=project.start, daemon=True).start()
+			else:
+				project.listen()
+
+	def write_endpoints(self):
+		"""
+		write the validators of the running projects for the shared processors
+		"""
+		with self.endpoints_lock:
+			endpoints = sorted('tcp://127.0.0.1:' + project.ports[0] for project in list(self.projects.values())
+							if project.state == RUNNING)
+			tmp_path = ENDPOINTS_PATH + '.tmp'
+			with open(tmp_path, 'w') as endpoints_file:
+				endpoints_file.write(''.join(endpoint + '\n' for endpoint in endpoints))
+			os.rename(tmp_path, ENDPOINTS_PATH)
+
+	def command(self, line):
+		"""
+		run a command of the control socket and return its answer
+		"""
+		words = line.split()
+		if words == ['status']:
+			shared = ['{} {}'.format(component.name, 'running' if component.process is not None and
+						component.process.poll() is None else 'stopped') for component in self.shared]
+			return '\n'.join(shared + [project.status() for project in self.projects.values()])
+		if len(words) == 2 and words[0] in ('start', 'stop'):
+			if words[1] not in self.projects:
+				self.scan()
+			project = self.projects.get(words[1])
+			if project is None:
+				return 'ERROR: unknown project ' + words[1]
+			if words[0] == 'start':
+				project.start()
+			else:
+				project.stop()
+			return project.status()
+		return 'ERROR: unknown command ' + line
+
+	def serve(self):
+		"""
+		answer the commands of supervisor.py start|stop|status on a unix socket
+		"""
+		supervisor = self
+
+		class Handler(socketserver.StreamRequestHandler):
+			def handle(self):
+				line = self.rfile.readline().decode().strip()
+				self.wfile.write((supervisor.command(line) + '\n').encode())
+
+		if os.path.exists(SOCKET_PATH):
+			os.remove(SOCKET_PATH)
+		server = socketserver.ThreadingUnixStreamServer(SOCKET_PATH, Handler)
+		server.daemon_threads = True
+		threading.Thread(target=server.serve_forever, daemon=True).start()
+
+	def stop(self, *args):
+		self.stopped.set()
+
+def send_command(line):
+	"""
+	send a command to the running supervisor, return its answer
+	"""
+	connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+	connection.connect(SOCKET_PATH)
+	connection.sendall((line + '\n').encode())
+	answer = b''
+	while True:
+		data = connection.recv(65536)
+		if not data:
+			break
+		answer += data
+	connection.close()
+	return answer.decode().strip()
+
+def parse_args(args):
+	parser = argparse.ArgumentParser(description='Supervise the validator stacks of the projects')
+	parser.add_argument('command', choices=['run', 'start', 'stop', 'status'])
+	parser.add_argument('repo_id', nargs='?')
+	parser.add_argument('--ip', default='127.0.0.1', help='address of the validator network ports')
+	parser.add_argument('--endpoint', default=None, help='address advertised to the peers, the ip by default')
+	parser.add_argument('--eager', action='store_true', help='start every project instead of waiting for a request')
+	return parser.parse_args(args)
+
+if __name__ == '__main__':
+	logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+	opts = parse_args(sys.argv[1:])
+	if opts.command == 'run':
+		supervisor = Supervisor(opts.ip, opts.endpoint or opts.ip, opts.eager)
+		signal.signal(signal.SIGTERM, supervisor.stop)
+		signal.signal(signal.SIGINT, supervisor.stop)
+		supervisor.run()
+	else:
+		if opts.command != 'status' and opts.repo_id is None:
+			print('ERROR: ' + opts.command + ' needs a REPOID')
+			sys.exit(1)
+		try:
+			answer = send_command(opts.command if opts.repo_id is None else opts.command + ' ' + opts.repo_id)
+		except OSError as err:
+			print('ERROR: supervisor is not running: ' + str(err))
+			sys.exit(1)
+		print(answer)
+		if answer.startswith('ERROR'):
+			sys.exit(1)
@@ -0,0 +1,85 @@
+import os
+import sys
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+import port_allocator
+
+class PortAllocatorTest(unittest.TestCase):
+	def setUp(self):
+		self.path = tempfile.mkdtemp()
+		self.addCleanup(shutil.rmtree, self.path)
+		self.listening = set()
+		for name, value in (('REGISTRY_PATH', os.path.join(self.path, 'ports.json')),
+				('LOCK_PATH', os.path.join(self.path, 'ports.lock')),
+				('MAP_PATH', os.path.join(self.path, 'map')),
+				('listening_ports', lambda: set(self.listening))):
+			patcher = mock.patch.object(port_allocator, name, value)
+			patcher.start()
+			self.addCleanup(patcher.stop)
+
+	def test_projects_get_disjoint_ports(self):
+		first = port_allocator.allocate('1')
+		second = port_allocator.allocate('2')
+		self.assertEqual(first, [1000, 1001, 1002])
+		self.assertEqual(second, [1003, 1004, 1005])
+
+	def test_same_project_gets_same_ports(self):
+		first = port_allocator.allocate('1')
+		self.listening.update(first)
+		self.assertEqual(port_allocator.allocate('1'), first)
+
+	def test_listening_and_mapped_ports_are_skipped(self):
+		self.listening.update([1000, 1002])
+		os.makedirs(port_allocator.MAP_PATH)
+		with open(os.path.join(port_allocator.MAP_PATH, '7'), 'w') as ports_file:
+			ports_file.write('1003\n1004\n')
+		self.assertEqual(port_allocator.allocate('1'), [1001, 1005, 1006])
+
+	def test_concurrent_allocations_never_collide(self):
+		results = {}
+		def allocate(repo_id):
+			results[repo_id] = port_allocator.allocate(repo_id)
+		threads = [threading.Thread(target=allocate, args=(str(repo_id),)) for repo_id in range(20)]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+		ports = [port for allocated in results.values() for port in allocated]
+		self.assertEqual(len(results), 20)
+		self.assertEqual(len(ports), len(set(ports)))
+
+	def test_released_ports_are_reused(self):
+		first = port_allocator.allocate('1')
+		port_allocator.allocate('2')
+		port_allocator.release('1')
+		port_allocator.release('unknown')
+		self.assertEqual(port_allocator.allocate('3'), first)
+
+	def test_no_free_port(self):
+		self.listening.update(range(port_allocator.STARTING_PORT, port_allocator.ENDING_PORT))
+		with self.assertRaises(RuntimeError):
+			port_allocator.allocate('1')
+		self.assertFalse(os.path.exists(port_allocator.REGISTRY_PATH))
+
+class ListeningPortsTest(unittest.TestCase):
+	def test_reads_listening_sockets(self):
+		path = tempfile.mkdtemp()
+		self.addCleanup(shutil.rmtree, path)
+		table = os.path.join(path, 'tcp')
+		with open(table, 'w') as table_file:
+			table_file.write('  sl  local_address rem_address   st tx_queue rx_queue\n')
+			#listening on 8008 and 4004, one established connection from 8800
+			table_file.write('   0: 00000000:1F48 00000000:0000 0A 00000000:00000000\n')
+			table_file.write('   1: 0100007F:0FA4 00000000:0000 0A 00000000:00000000\n')
+			table_file.write('   2: 0100007F:2260 0100007F:D2F0 01 00000000:00000000\n')
+		ports = port_allocator.listening_ports((table, os.path.join(path, 'missing')))
+		self.assertEqual(ports, {8008, 4004})
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,239 @@
+import os
+import sys
+import queue
+import shutil
+import tempfile
+import datetime
+import threading
+import unittest
+from collections import namedtuple
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+import proposal_manager
+from proposal_manager import TimerWheel, Project, ACCEPTED, REJECTED
+
+Attribute = namedtuple('Attribute', ['key', 'value'])
+
+class FakeEvent:
+	def __init__(self, data, signature):
+		self.data = data.encode()
+		self.attributes = [Attribute('signature', signature)]
+
+class FakeManager:
+	def __init__(self):
+		self.wheel = TimerWheel()
+		self.resolutions = queue.Queue()
+
+class TimerWheelTest(unittest.TestCase):
+	def setUp(self):
+		self.now = 6000.0
+		patcher = mock.patch('time.time', lambda: self.now)
+		patcher.start()
+		self.addCleanup(patcher.stop)
+		#tick 100 when created
+		self.wheel = TimerWheel(tick=60, slots=4)
+		self.fired = []
+
+	def advance_to(self, tick):
+		self.now = tick * 60.0
+		self.wheel.advance()
+
+	def test_timer_runs_at_its_tick(self):
+		self.wheel.add('a', 102 * 60, lambda: self.fired.append('a'))
+		self.advance_to(101)
+		self.assertEqual(self.fired, [])
+		self.advance_to(102)
+		self.assertEqual(self.fired, ['a'])
+		self.advance_to(106)
+		self.assertEqual(self.fired, ['a'])
+
+	def test_timer_waits_for_its_turn_of_the_wheel(self):
+		#tick 106 shares the slot of tick 102
+		self.wheel.add('a', 106 * 60, lambda: self.fired.append('a'))
+		self.advance_to(102)
+		self.assertEqual(self.fired, [])
+		self.advance_to(105)
+		self.assertEqual(self.fired, [])
+		self.advance_to(106)
+		self.assertEqual(self.fired, ['a'])
+
+	def test_ticks_missed_are_run(self):
+		self.wheel.add('a', 101 * 60, lambda: self.fired.append('a'))
+		self.wheel.add('b', 109 * 60, lambda: self.fired.append('b'))
+		self.advance_to(120)
+		self.assertEqual(sorted(self.fired), ['a', 'b'])
+
+	def test_past_deadline_runs_at_next_tick(self):
+		self.wheel.add('a', 10 * 60, lambda: self.fired.append('a'))
+		self.advance_to(101)
+		self.assertEqual(self.fired, ['a'])
+
+	def test_cancel(self):
+		self.wheel.add('a', 102 * 60, lambda: self.fired.append('a'))
+		self.wheel.cancel('a')
+		self.wheel.cancel('unknown')
+		self.advance_to(110)
+		self.assertEqual(self.fired, [])
+		self.assertEqual(self.wheel.timers, {})
+
+	def test_add_replaces_timer_of_same_key(self):
+		self.wheel.add('a', 102 * 60, lambda: self.fired.append('first'))
+		self.wheel.add('a', 103 * 60, lambda: self.fired.append('second'))
+		self.advance_to(110)
+		self.assertEqual(self.fired, ['second'])
+
+	def test_failing_timer_does_not_stop_others(self):
+		def fail():
+			raise RuntimeError('timer failed')
+		self.wheel.add('a', 101 * 60, fail)
+		self.wheel.add('b', 101 * 60, lambda: self.fired.append('b'))
+		self.advance_to(101)
+		self.assertEqual(self.fired, ['b'])
+
+class ProjectTest(unittest.TestCase):
+	def setUp(self):
+		self.path = tempfile.mkdtemp()
+		self.addCleanup(shutil.rmtree, self.path)
+		os.makedirs(os.path.join(self.path, 'etc'))
+		with open(os.path.join(self.path, 'etc', '.suse'), 'w') as suse_file:
+			suse_file.write('[vote_setting]\nproposal_active_days = 1\napproval_treshold = 3\n')
+		self.manager = FakeManager()
+		self.project = self.make_project()
+
+	def make_project(self):
+		#the tally does not use the chain, the client and the subscriber of the constructor
+		project = Project.__new__(Project)
+		project.path = self.path
+		project.manager = self.manager
+		project.repo_id = '42'
+		project.suse_path = os.path.join(self.path, 'etc', '.suse')
+		project.lock = threading.Lock()
+		project.proposal = None
+		project.votes = {}
+		project.resolving = False
+		project.failures = 0
+		return project
+
+	def propose(self, date=None):
+		date = date or datetime.datetime.utcnow().strftime('%Y-%m-%d-%H-%M-%S')
+		self.project.on_proposal(FakeEvent('proposal,p1,LargeClass=10,active,' + date, 'txn1'), {})
+
+	def vote(self, signature, vote, proposal_id='p1'):
+		self.project.on_vote(FakeEvent('vote,{},{},{},2018-01-01-00-00-00'.format(
+			signature, proposal_id, vote), signature), {})
+
+	def resolutions(self):
+		result = []
+		while not self.manager.resolutions.empty():
+			project, transaction_id, state = self.manager.resolutions.get()
+			result.append((transaction_id, state))
+		return result
+
+class DeadlineTallyTest(ProjectTest):
+	def test_proposal_sets_deadline(self):
+		self.propose()
+		self.assertIn('42', self.manager.wheel.timers)
+
+	def test_no_vote_stays_open_at_deadline(self):
+		self.propose()
+		self.project.on_deadline()
+		self.assertEqual(self.resolutions(), [])
+		self.assertEqual(self.project.proposal, ('txn1', 'p1'))
+		#checked again later, the first votes received resolve it
+		self.assertIn('42', self.manager.wheel.timers)
+		self.vote('v1', ACCEPTED)
+		self.project.on_deadline()
+		self.assertEqual(self.resolutions(), [('txn1', ACCEPTED)])
+
+	def test_half_yes_votes_accepted_at_deadline(self):
+		self.propose()
+		self.vote('v1', ACCEPTED)
+		self.vote('v2', REJECTED)
+		self.project.on_deadline()
+		self.assertEqual(self.resolutions(), [('txn1', ACCEPTED)])
+
+	def test_minority_rejected_at_deadline(self):
+		self.propose()
+		self.vote('v1', ACCEPTED)
+		self.vote('v2', REJECTED)
+		self.vote('v3', REJECTED)
+		self.vote('v4', REJECTED)
+		self.project.on_deadline()
+		self.assertEqual(self.resolutions(), [('txn1', REJECTED)])
+
+	def test_threshold_accepts_before_deadline(self):
+		self.propose()
+		for signature in ('v1', 'v2', 'v3'):
+			self.vote(signature, ACCEPTED)
+		self.assertEqual(self.resolutions(), [('txn1', ACCEPTED)])
+		self.assertNotIn('42', self.manager.wheel.timers)
+		#the proposal is resolved once
+		self.project.on_deadline()
+		self.vote('v4', ACCEPTED)
+		self.assertEqual(self.resolutions(), [])
+
+	def test_votes_of_other_proposals_are_ignored(self):
+		self.propose()
+		for signature in ('v1', 'v2', 'v3'):
+			self.vote(signature, ACCEPTED, proposal_id='p0')
+		self.assertEqual(self.resolutions(), [])
+		self.assertEqual(self.project.votes, {})
+
+	def test_vote_sent_again_counts_once(self):
+		self.propose()
+		for _ in range(3):
+			self.vote('v1', ACCEPTED)
+		self.assertEqual(self.resolutions(), [])
+
+	def test_closed_proposal_has_no_deadline(self):
+		self.propose()
+		self.project.on_proposal(FakeEvent('proposal,p1,LargeClass=10,accepted,2018-01-01-00-00-00', 'txn2'), {})
+		self.assertIsNone(self.project.proposal)
+		self.assertNotIn('42', self.manager.wheel.timers)
+		self.project.on_deadline()
+		self.assertEqual(self.resolutions(), [])
+
+	def test_deadline_of_old_proposal_runs_at_next_tick(self):
+		self.propose('2018-01-01-00-00-00')
+		self.vote('v1', ACCEPTED)
+		with mock.patch('time.time', lambda: (self.manager.wheel.current + 1) * self.manager.wheel.tick):
+			self.manager.wheel.advance()
+		self.assertEqual(self.resolutions(), [('txn1', ACCEPTED)])
+
+class ResolutionTest(ProjectTest):
+	def resolve(self, statuses):
+		self.propose()
+		for signature in ('v1', 'v2', 'v3'):
+			self.vote(signature, ACCEPTED)
+		self.assertEqual(self.resolutions(), [('txn1', ACCEPTED)])
+		self.project.on_resolved(statuses)
+
+	def test_committed_update(self):
+		self.resolve({'batch1': 'COMMITTED'})
+		self.assertTrue(self.project.resolving)
+		self.assertNotIn('42', self.manager.wheel.timers)
+
+	def test_update_not_committed_is_checked_again(self):
+		for statuses in ({'batch1': 'INVALID'}, {'batch1': 'PENDING'}, None):
+			self.resolve(statuses)
+			self.assertFalse(self.project.resolving)
+			self.assertIn('42', self.manager.wheel.timers)
+			self.project.on_proposal(FakeEvent('proposal,p1,LargeClass=10,rejected,2018-01-01-00-00-00', 'txn2'), {})
+		self.assertEqual(self.project.failures, 3)
+
+	def test_retries_back_off(self):
+		deadlines = []
+		with mock.patch.object(self.manager.wheel, 'add', lambda key, deadline, callback: deadlines.append(deadline)):
+			for _ in range(10):
+				self.project.on_resolved({'batch1': 'INVALID'})
+		delays = [deadline - deadlines[0] for deadline in deadlines]
+		self.assertLess(delays[1] - proposal_manager.RESOLVE_RETRY, 5)
+		self.assertGreater(delays[3] - delays[2], delays[2] - delays[1])
+		self.assertLess(deadlines[-1] - deadlines[-2], 5)
+		self.project.on_resolved({'batch1': 'COMMITTED'})
+		self.assertEqual(self.project.failures, 0)
+
+if __name__ == '__main__':
+	unittest.main()